@@ -1,105 +1,129 @@
-import time
-from dotenv import load_dotenv
-import google.generativeai as genai
+import logging
+
 import gradio as gr
 
-# --- Configuration and Initialization ---
+from src.utils.cancellation import StreamCancelled
+from src.utils.chat_service import ChatService, QueueFullError, gemini_chat_backend
+from src.utils.chat_sessions import SessionStore
 
-# Load environment variables from a .env file.
-# Make sure your GOOGLE_API_KEY is set in this file.
-load_dotenv()
-
-# Configure the Google Generative AI client.
-# The API key will be automatically picked up from the GOOGLE_API_KEY environment variable.
-try:
-    genai.configure()
-except Exception as e:
-    print(f"Error configuring Google Generative AI: {e}")
-    print(
-        "Please ensure your GOOGLE_API_KEY is correctly set in your .env file or environment variables."
-    )
-    exit()
+# Run from the repository root with:
+#     python -m playground.gemini.gemini_gradio_chat
+#
+# The GOOGLE_API_KEY is read from your environment or .env file by
+# src.utils.providers (the shared google.genai client).
+
+# --- Configuration and Initialization ---
 
 # Define the system instruction for the AI model.
 # This sets the overall persona or guidelines for the AI.
 system_instruction = "You are a helpful and friendly AI assistant."
 
-# Initialize the Generative Model globally.
+# Give up on (and close) a response stream after this many seconds.
+RESPONSE_TIMEOUT_SECONDS = 120
+
+# Output budget per response; also used to count the tokens saved when a
+# response is cut short.
+MAX_OUTPUT_TOKENS = 2048
+
+# Concurrency limits:
+# - MAX_UPSTREAM_STREAMS: Gemini streams running at the same time; further
+#   requests wait in the chat service (first come, first served).
+# - MAX_QUEUE_PER_USER: requests one browser session may have running or
+#   waiting; extra messages are refused instead of queueing up.
+# - MAX_ACTIVE_EVENTS / MAX_GRADIO_QUEUE: Gradio's own limits on handlers
+#   running at once and on events waiting to start. The handler is async, so
+#   a waiting request costs a coroutine rather than a thread.
+MAX_UPSTREAM_STREAMS = 32
+MAX_QUEUE_PER_USER = 2
+MAX_ACTIVE_EVENTS = 256
+MAX_GRADIO_QUEUE = 1024
+
+# Safety settings applied to every message.
+safety_settings = [
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+]
+
+logger = logging.getLogger(__name__)
+
+# Chat histories are kept server-side, one per browser session.
+sessions = SessionStore(ttl_seconds=3600, max_messages=100)
+
 # We use 'gemini-1.5-flash' for faster responses.
-# The system_instruction is set here for the entire chat session.
-model = genai.GenerativeModel(
-    model_name="gemini-1.5-flash", system_instruction=system_instruction
+# The backend streams through the shared (pooled) google.genai client.
+chat_service = ChatService(
+    gemini_chat_backend(
+        "gemini-1.5-flash",
+        config={
+            "system_instruction": system_instruction,
+            "safety_settings": safety_settings,
+            "max_output_tokens": MAX_OUTPUT_TOKENS,
+        },
+    ),
+    sessions=sessions,
+    max_concurrency=MAX_UPSTREAM_STREAMS,
+    max_queue_per_user=MAX_QUEUE_PER_USER,
+    timeout=RESPONSE_TIMEOUT_SECONDS,
 )
 
-# Initialize a chat session.
-# The chat history will be managed by this object.
-chat = model.start_chat(history=[])
-
-# --- Helper Function for Gradio History Transformation ---
+# --- Gradio Chat Interface Function ---
 
 
-def transform_history_to_gemini_format(gradio_history: list) -> list:
+def sync_history(session_id: str, history: list) -> None:
     """
-    Transforms Gradio's 'messages' chat history format into Gemini API's message format.
-    Gradio history is now a list of dicts with 'role' and 'content'.
-    Gemini expects a list of dicts with 'role' and 'parts'.
-    """
-    gemini_history = []
-    for msg in gradio_history:
-        if msg.get("role") and msg.get("content"):
-            # Map Gradio's 'assistant' role to Gemini's 'model'
-            role = "model" if msg["role"] == "assistant" else msg["role"]
-            gemini_history.append({"role": role, "parts": [{"text": msg["content"]}]})
-    return gemini_history
-
-
-# --- Gradio Chat Interface Function ---
+    Make the stored session match the chat shown in the UI.
 
-
-def respond(message: str, history: list):
+    Usually they agree. They differ after the user retries, undoes or edits a
+    turn, clears the chat, or after the server restarted; the UI history
+    then wins.
+    """
+    ui_messages = [
+        {"role": m["role"], "content": m["content"]}
+        for m in history
+        if isinstance(m.get("content"), str)
+    ]
+    if sessions.max_messages is not None:
+        ui_messages = ui_messages[-sessions.max_messages :]
+    if ui_messages != sessions.history(session_id):
+        sessions.replace(session_id, ui_messages)
+
+
+async def respond(message: str, history: list, request: gr.Request):
     """
     This function is called by Gradio's ChatInterface for each user message.
-    It manages the chat history and streams the AI's response.
+    It streams the AI's response; the conversation itself is kept in the
+    session store under the browser session's id.
+
+    If the user presses stop, Gradio cancels this coroutine; if they close
+    the tab, Gradio's queue notices the dropped event stream and closes this
+    generator at its next step. Either way the Gemini stream is closed.
+    (`request.is_disconnected()` cannot tell: in a queued handler it belongs
+    to the already answered /queue/join request.)
     """
-    global chat
-
-    # Update the Gemini chat object's history with the current Gradio history.
-    # This ensures the model has the full context of the conversation.
-    chat.history = transform_history_to_gemini_format(history)
+    session_id = request.session_hash
+    sync_history(session_id, history)
 
-    # Send the current user message to the Gemini model in streaming mode.
-    # Safety settings are applied here for each message.
+    response_text = ""
     try:
-        stream = chat.send_message(
-            message,
-            safety_settings=[
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_NONE",
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_NONE",
-                },
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-            ],
-            stream=True,
-        )
-
-        response_text = ""
-        # Iterate over the streamed chunks and yield partial responses
-        for chunk in stream:
-            # Check if chunk.text exists and is not empty
-            if chunk.text:
-                response_text += chunk.text
-                yield response_text
-            # Optional: Add a small delay for a more natural typing effect
-            time.sleep(0.02)
-
-    except Exception as e:
-        error_message = f"An error occurred while generating response: {e}"
-        print(error_message)
+        async for delta in chat_service.stream_reply(
+            session_id, message, max_tokens=MAX_OUTPUT_TOKENS
+        ):
+            response_text += delta
+            yield response_text
+
+    except QueueFullError:
+        raise gr.Error(
+            "Please wait for the current answer before sending another message."
+        ) from None
+
+    except StreamCancelled as e:
+        reason = "timed out" if e.args and e.args[0] == "timeout" else "was stopped"
+        yield response_text + f"\n\n*(Response {reason}.)*"
+
+    except Exception:
+        logger.exception("An error occurred while generating response")
         yield "I'm sorry, I encountered an error. Please try again."
 
 
@@ -120,8 +144,10 @@ iface = gr.ChatInterface(
     ],
     theme="soft",
     type="messages",
+    concurrency_limit=MAX_ACTIVE_EVENTS,
 )
 
-# Launch the Gradio web interface.
-# debug=True provides more detailed logging in the console.
-iface.launch(debug=True)
+if __name__ == "__main__":
+    # Launch the Gradio web interface.
+    # debug=True provides more detailed logging in the console.
+    iface.queue(max_size=MAX_GRADIO_QUEUE).launch(debug=True)
@@ -16,49 +16,33 @@ Usage:
     1. Ensure your .env file contains GOOGLE_API_KEY.
     2. Install dependencies:
         pip install google-generativeai python-dotenv requests beautifulsoup4
-    3. Run this script:
-        python playground/gemini_list_models.py
+    3. Run this script from the repository root (so `src` is importable):
+        python -m playground.gemini.gemini_list_models
+
+The SDK is loaded through the shared provider layer in `src.utils.providers`,
+which imports `google.generativeai` lazily and silences its TensorFlow/gRPC
+logging, so nothing heavy is imported until the first API call.
 """
 
 # Standard library imports
-import os
-import logging
 from typing import Optional
 
-# Third-party imports
-from dotenv import load_dotenv
-
-# Google Generative AI import
-import google.generativeai as genai
-
-# Configure logging to suppress gRPC and TensorFlow warnings
-logging.basicConfig(level=logging.ERROR)
-os.environ["TF_CPP_MIN_LOG_LEVEL"] = "2"  # Suppress TensorFlow logging
-
-# Suppress specific gRPC warnings (optional, for cleaner output)
-try:
-    import absl.logging
+# Shared provider layer (lazy SDK import, .env loading, API key validation)
+from src.utils.providers import get_generativeai
 
-    absl.logging.set_verbosity(absl.logging.ERROR)
-except ImportError:
-    pass
 
-
-def setup_gemini_api() -> None:
+def setup_gemini_api():
     """
     Set up the Gemini API with the API key from environment variables.
 
+    Returns:
+        module: The configured `google.generativeai` module.
+
     Raises:
         ValueError: If the GOOGLE_API_KEY environment variable is not set
     """
-    # Load environment variables from .env file
-    load_dotenv(override=True)
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key:
-        raise ValueError(
-            "GOOGLE_API_KEY not set. Please set it in your environment or .env file."
-        )
-    genai.configure(api_key=api_key)
+    # Loads the .env file, validates the key and configures the SDK once.
+    return get_generativeai()
 
 
 def display_available_models() -> None:
@@ -70,6 +54,7 @@ def display_available_models() -> None:
     """
     print("Available models that support 'generateContent':")
     print("-" * 50)
+    genai = setup_gemini_api()
     for model in genai.list_models():
         if "generateContent" in model.supported_generation_methods:
             print(f"Model: {model.name}")
@@ -97,6 +82,7 @@ def interact_with_gemini(
         >>> print(response)
     """
     try:
+        genai = setup_gemini_api()
         model = genai.GenerativeModel(model_name)
         response = model.generate_content(
             message, generation_config={"temperature": temperature}
@@ -6,6 +6,9 @@ It uses two sequential LLM calls:
 1. Generates a story based on a given topic.
 2. Analyzes the mood of the generated story.
 Finally, it combines and prints both the story and its analyzed mood.
+
+Run it from the repository root (so `src` is importable):
+    python -m playground.lcel.ex_gemini_02
 """
 
 from langchain_core.output_parsers import StrOutputParser
@@ -16,6 +19,8 @@ import os
 from dotenv import load_dotenv
 from operator import itemgetter  # Used for extracting values from dictionaries
 
+from src.utils.context_compression import ContextCompressor
+
 # --- Configuration and API Key Loading ---
 
 # Load environment variables from a .env file.
@@ -50,6 +55,11 @@ analysis_prompt = PromptTemplate.from_template(
 )
 analysis_chain = analysis_prompt | chat | StrOutputParser()
 
+# Context compression: the mood analysis does not need every sentence of the story.
+# The compressor drops repeated passages and trims the story to ~400 tokens before
+# it is sent, cutting prompt tokens (and latency) of the second call.
+compressor = ContextCompressor(token_budget=400)
+
 # Output formatter prompt: Combines the generated story and its mood into a final display format.
 # This prompt expects both `story` and `mood` as input variables.
 output_prompt = PromptTemplate.from_template(
@@ -87,7 +97,7 @@ story_with_analysis = (
     }
     | RunnableParallel(
         story=itemgetter("story"),
-        mood=({"story": itemgetter("story")} | analysis_chain),
+        mood=({"story": itemgetter("story") | compressor.as_runnable()} | analysis_chain),
     )
     | output_prompt
     | chat
@@ -100,3 +110,5 @@ print("--- Running combined chain ---")
 # Invoke the final chain with the initial 'topic' input.
 result = story_with_analysis.invoke({"topic": "a lonely astronaut"})
 print(result)
+report = compressor.last_report
+print(f"\nStory sent for analysis: {report.tokens_before} -> {report.tokens_after} tokens")
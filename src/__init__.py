@@ -0,0 +1 @@
+"""Core modules, reusable components and custom tools for CreateAgents."""
@@ -0,0 +1,7 @@
+"""
+Agent orchestration: an in-process message bus, the orchestrator that runs
+agents on it and adapters for AutoGen, CrewAI and OpenAI Agents.
+
+Submodules are intentionally not imported here; import what you need
+directly, e.g. ``from src.agents.orchestrator import Orchestrator``.
+"""
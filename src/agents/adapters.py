@@ -0,0 +1,118 @@
+"""
+Adapters that put AutoGen, CrewAI and OpenAI Agents agents on the bus.
+
+Each adapter is an `Agent` that turns an incoming message into one turn of
+the wrapped framework agent and replies with its text output. The
+frameworks are imported lazily, so this module can be imported without
+them installed.
+
+    - `AutoGenAgent`: `autogen_agentchat` agents (`AssistantAgent`, ...),
+      driven through their async `on_messages()`.
+    - `CrewAIAgent`: a `crewai.Agent` executing one `crewai.Task` per
+      message. CrewAI is synchronous, so the task runs in a thread and
+      several crew members can think at the same time.
+    - `OpenAIAgentsAgent`: an `agents.Agent` from `openai-agents`, run with
+      the async `Runner.run()`.
+
+Example:
+    >>> from autogen_agentchat.agents import AssistantAgent
+    >>> critic = AssistantAgent("critic", model_client=model_client)
+    >>> orchestrator.register(AutoGenAgent(critic, topics="review"))
+"""
+
+from typing import Any, Iterable, Optional
+
+from src.agents.bus import Message
+from src.agents.orchestrator import Agent, AgentContext
+from src.utils.lazy_imports import lazy_import
+
+_autogen_messages = lazy_import("autogen_agentchat.messages")
+_autogen_core = lazy_import("autogen_core")
+_crewai = lazy_import("crewai")
+_openai_agents = lazy_import("agents")
+
+
+class AutoGenAgent(Agent):
+    """
+    Wrap an `autogen_agentchat` chat agent.
+
+    Args:
+        agent (Any): The AutoGen agent, e.g. an `AssistantAgent`.
+        topics (Iterable[str] | str): Topics to subscribe to.
+        name (Optional[str]): Bus name; defaults to the AutoGen agent's name.
+    """
+
+    def __init__(self, agent: Any, topics: Iterable[str] | str, name: Optional[str] = None):
+        # AutoGen agents keep conversation state, so one turn at a time.
+        super().__init__(name or agent.name, topics, concurrency=1)
+        self.agent = agent
+
+    async def handle(self, message: Message, ctx: AgentContext) -> None:
+        text_message = _autogen_messages.TextMessage(
+            content=str(message.payload), source=message.sender or "user"
+        )
+        response = await self.agent.on_messages(
+            [text_message], _autogen_core.CancellationToken()
+        )
+        await ctx.reply(message, response.chat_message.content)
+
+
+class CrewAIAgent(Agent):
+    """
+    Wrap a `crewai.Agent`; every message becomes a `crewai.Task`.
+
+    Args:
+        agent (Any): The CrewAI agent.
+        topics (Iterable[str] | str): Topics to subscribe to.
+        expected_output (str): `expected_output` of the generated tasks.
+        name (Optional[str]): Bus name; defaults to the agent's role.
+        concurrency (int): Tasks executed at the same time (in threads).
+    """
+
+    def __init__(
+        self,
+        agent: Any,
+        topics: Iterable[str] | str,
+        expected_output: str = "A concise answer.",
+        name: Optional[str] = None,
+        concurrency: int = 1,
+    ):
+        super().__init__(name or agent.role, topics, concurrency)
+        self.agent = agent
+        self.expected_output = expected_output
+
+    def _execute(self, description: str) -> str:
+        task = _crewai.Task(
+            description=description, expected_output=self.expected_output, agent=self.agent
+        )
+        return str(self.agent.execute_task(task))
+
+    async def handle(self, message: Message, ctx: AgentContext) -> None:
+        result = await ctx.run_blocking(self._execute, str(message.payload))
+        await ctx.reply(message, result)
+
+
+class OpenAIAgentsAgent(Agent):
+    """
+    Wrap an `openai-agents` `Agent`.
+
+    Args:
+        agent (Any): The `agents.Agent`.
+        topics (Iterable[str] | str): Topics to subscribe to.
+        name (Optional[str]): Bus name; defaults to the agent's name.
+        concurrency (int): Runs executed at the same time.
+    """
+
+    def __init__(
+        self,
+        agent: Any,
+        topics: Iterable[str] | str,
+        name: Optional[str] = None,
+        concurrency: int = 1,
+    ):
+        super().__init__(name or agent.name, topics, concurrency)
+        self.agent = agent
+
+    async def handle(self, message: Message, ctx: AgentContext) -> None:
+        result = await _openai_agents.Runner.run(self.agent, str(message.payload))
+        await ctx.reply(message, str(result.final_output))
@@ -0,0 +1,378 @@
+"""
+In-process async message bus for agents.
+
+Agents subscribe to topics and exchange `Message`s. Every subscription has
+its own bounded inbox and worker task(s), so:
+
+    - different agents handle their messages concurrently, while
+    - one agent (with the default `concurrency=1`) sees its messages in
+      order, one at a time, like a mailbox,
+    - a slow agent applies back-pressure to publishers instead of growing
+      an unbounded queue.
+
+Request/reply is built in: `request()` publishes a message with a private
+reply topic and waits for the handler to `reply()`; an exception raised by
+the handler is propagated to the requester.
+
+A handler that waits for a request occupies one of its subscription's
+workers. A request that could only be handled by subscriptions whose
+workers are all waiting on it - an agent with `concurrency=1` requesting
+its own topic, or a cycle such as A -> B -> A - would wait forever, so
+`request()` raises `DeadlockError` instead. Waits that only block each
+other through exhausted concurrency across separate requests are not
+detected; give such requests a `timeout`.
+
+Example:
+    >>> bus = MessageBus()
+    >>> async def upper(message):
+    ...     await bus.reply(message, message.payload.upper())
+    >>> bus.subscribe("upper", upper)
+    >>> await bus.request("upper", "hi")
+    'HI'
+"""
+
+import asyncio
+import contextvars
+import logging
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+REPLY_PREFIX = "_reply."
+
+
+class DeadlockError(RuntimeError):
+    """Raised by `request()` when the request could only be handled by its own waiting callers."""
+
+
+@dataclass
+class Message:
+    """
+    A message on the bus.
+
+    Attributes:
+        topic (str): Topic the message is published to.
+        payload (Any): Message content.
+        sender (Optional[str]): Name of the sending agent.
+        reply_to (Optional[str]): Topic the recipient should reply on.
+        correlation_id (Optional[str]): Ties a reply to its request.
+        id (str): Unique message id.
+        callers (tuple[Subscription, ...]): Subscriptions whose handlers wait,
+            directly or through other requests, for the reply to this message.
+    """
+
+    topic: str
+    payload: Any
+    sender: Optional[str] = None
+    reply_to: Optional[str] = None
+    correlation_id: Optional[str] = None
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    callers: tuple["Subscription", ...] = field(default=(), repr=False, compare=False)
+
+
+Handler = Callable[[Message], Awaitable[None]]
+
+# The handling subscription and its message's callers, in a worker task.
+_handling: contextvars.ContextVar[tuple["Subscription", ...]] = contextvars.ContextVar("handling", default=())
+
+
+@dataclass
+class BusStats:
+    """
+    Bus counters.
+
+    Attributes:
+        published (int): Messages published.
+        delivered (int): Messages handed to handlers.
+        failed (int): Handler invocations that raised.
+        undeliverable (int): Messages published to topics nobody listens on.
+    """
+
+    published: int = 0
+    delivered: int = 0
+    failed: int = 0
+    undeliverable: int = 0
+
+
+class Subscription:
+    """
+    A handler attached to a topic, with its own inbox and workers.
+
+    Args:
+        topic (str): Topic to receive.
+        handler (Handler): Coroutine function called per message.
+        concurrency (int): Messages handled at the same time.
+        max_queue (int): Inbox size; publishers wait when it is full.
+        name (Optional[str]): Name used in logs.
+    """
+
+    def __init__(
+        self,
+        topic: str,
+        handler: Handler,
+        concurrency: int = 1,
+        max_queue: int = 1000,
+        name: Optional[str] = None,
+    ):
+        self.topic = topic
+        self.handler = handler
+        self.concurrency = concurrency
+        self.name = name or getattr(handler, "__qualname__", repr(handler))
+        self.inbox: asyncio.Queue[Message] = asyncio.Queue(max_queue)
+        self.unfinished = 0  # messages put in the inbox and not handled yet
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._workers: list[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def put(self, message: Message) -> None:
+        """Add a message to the inbox, waiting while it is full."""
+        self.unfinished += 1
+        self._idle.clear()
+        try:
+            await self.inbox.put(message)
+        except BaseException:
+            self._done()
+            raise
+
+    def _done(self) -> None:
+        self.unfinished -= 1
+        if not self.unfinished:
+            self._idle.set()
+
+    async def join(self) -> None:
+        """Wait until every message put so far has been handled (or dropped)."""
+        await self._idle.wait()
+
+    def saturated_by(self, callers: tuple["Subscription", ...]) -> bool:
+        """True if all workers are busy waiting for a request from `callers`."""
+        return callers.count(self) >= self.concurrency
+
+    def start(self, bus: "MessageBus") -> None:
+        """Start the worker tasks (requires a running event loop)."""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(bus._work(self), name=f"{self.name}-{i}")
+                for i in range(self.concurrency)
+            ]
+
+    async def stop(self) -> None:
+        """Cancel the workers; unhandled messages are dropped."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        while not self.inbox.empty():
+            self.inbox.get_nowait()
+            self._done()
+
+
+class MessageBus:
+    """
+    Topic-based publish/subscribe bus running on one event loop.
+
+    Args:
+        max_queue (int): Default inbox size of new subscriptions.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self.stats = BusStats()
+        self._subscriptions: dict[str, list[Subscription]] = {}
+        self._waiters: dict[str, asyncio.Future] = {}
+        self._started = False
+
+    def subscribe(
+        self,
+        topic: str,
+        handler: Handler,
+        concurrency: int = 1,
+        name: Optional[str] = None,
+    ) -> Subscription:
+        """
+        Attach `handler` to `topic`.
+
+        Every subscription receives its own copy of each message on the topic.
+
+        Args:
+            topic (str): Topic name.
+            handler (Handler): Coroutine function called with each message.
+            concurrency (int): Messages this subscription handles at once.
+            name (Optional[str]): Name used in logs and task names.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        subscription = Subscription(topic, handler, concurrency, self.max_queue, name)
+        self._subscriptions.setdefault(topic, []).append(subscription)
+        if self._started:
+            subscription.start(self)
+        return subscription
+
+    async def unsubscribe(self, subscription: Subscription) -> None:
+        """Detach a subscription and stop its workers."""
+        subscriptions = self._subscriptions.get(subscription.topic, [])
+        if subscription in subscriptions:
+            subscriptions.remove(subscription)
+        await subscription.stop()
+
+    async def start(self) -> None:
+        """Start the workers of all subscriptions."""
+        self._started = True
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.start(self)
+
+    async def close(self) -> None:
+        """Stop all workers and fail pending requests."""
+        self._started = False
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                await subscription.stop()
+        for waiter in self._waiters.values():
+            if not waiter.done():
+                waiter.cancel()
+        self._waiters.clear()
+
+    async def __aenter__(self) -> "MessageBus":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def publish(self, message: Message) -> None:
+        """
+        Deliver a message to every subscription of its topic.
+
+        Waits while a recipient's inbox is full.
+
+        Args:
+            message (Message): The message.
+        """
+        self.stats.published += 1
+        waiter = self._waiters.get(message.topic)
+        if waiter is not None:
+            if not waiter.done():
+                waiter.set_result(message)
+            return
+        subscriptions = self._subscriptions.get(message.topic)
+        if not subscriptions:
+            self.stats.undeliverable += 1
+            logger.debug("No subscribers for topic %s", message.topic)
+            return
+        for subscription in subscriptions:
+            await subscription.put(message)
+
+    async def send(self, topic: str, payload: Any, sender: Optional[str] = None) -> None:
+        """Publish `payload` on `topic` without expecting a reply."""
+        await self.publish(Message(topic, payload, sender=sender))
+
+    async def request(
+        self,
+        topic: str,
+        payload: Any,
+        sender: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Any:
+        """
+        Publish a message and wait for the handler's reply.
+
+        Args:
+            topic (str): Topic to send the request to.
+            payload (Any): Request content.
+            sender (Optional[str]): Name of the requesting agent.
+            timeout (Optional[float]): Seconds to wait for the reply.
+
+        Returns:
+            Any: The reply's payload.
+
+        Raises:
+            LookupError: If nobody subscribes to `topic`.
+            DeadlockError: If every subscription of `topic` is busy waiting
+                for this request (e.g. a `concurrency=1` agent requesting
+                its own topic).
+            asyncio.TimeoutError: If no reply arrived in time.
+            Exception: Whatever the handler raised.
+        """
+        subscriptions = self._subscriptions.get(topic)
+        if not subscriptions:
+            raise LookupError(f"No subscribers for topic {topic!r}")
+        callers = _handling.get()
+        if all(subscription.saturated_by(callers) for subscription in subscriptions):
+            chain = " -> ".join(caller.name for caller in callers)
+            raise DeadlockError(f"Request to {topic!r} from {chain} would wait for itself")
+        message = Message(topic, payload, sender=sender, callers=callers)
+        message.reply_to = REPLY_PREFIX + message.id
+        message.correlation_id = message.id
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters[message.reply_to] = waiter
+        try:
+            await self.publish(message)
+            reply = await asyncio.wait_for(waiter, timeout)
+        finally:
+            self._waiters.pop(message.reply_to, None)
+        return reply.payload
+
+    async def reply(self, message: Message, payload: Any, sender: Optional[str] = None) -> None:
+        """
+        Answer a message received through `request()`.
+
+        Does nothing for messages that do not expect a reply.
+
+        Args:
+            message (Message): The request.
+            payload (Any): Reply content.
+            sender (Optional[str]): Name of the replying agent.
+        """
+        if message.reply_to is None:
+            return
+        await self.publish(
+            Message(
+                message.reply_to,
+                payload,
+                sender=sender,
+                correlation_id=message.correlation_id or message.id,
+            )
+        )
+
+    async def join(self) -> None:
+        """Wait until every inbox is empty and all handlers are done."""
+        while True:
+            busy = [
+                subscription
+                for subscriptions in self._subscriptions.values()
+                for subscription in subscriptions
+                if subscription.unfinished
+            ]
+            if not busy:
+                return
+            await asyncio.gather(*(subscription.join() for subscription in busy))
+
+    async def _work(self, subscription: Subscription) -> None:
+        """Worker loop of one subscription."""
+        while True:
+            message = await subscription.inbox.get()
+            handling = _handling.set(message.callers + (subscription,))
+            try:
+                self.stats.delivered += 1
+                await subscription.handler(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats.failed += 1
+                waiter = self._waiters.get(message.reply_to) if message.reply_to else None
+                if waiter is not None and not waiter.done():
+                    waiter.set_exception(e)
+                else:
+                    logger.exception(
+                        "Handler %s failed on topic %s", subscription.name, message.topic
+                    )
+            finally:
+                _handling.reset(handling)
+                subscription._done()
@@ -0,0 +1,667 @@
+"""
+Distributed agent runtime: a host dispatching agent tasks to worker
+processes or nodes over gRPC.
+
+The host owns the task queues; workers connect to it, announce which task
+kinds (agent handlers) they serve and how many tasks they run at once, and
+then pull work. Scheduling:
+
+    - Load-aware placement: a submitted task goes to the queue of the live
+      worker with the lowest load, (queued + running) / capacity, among the
+      workers that serve its kind.
+    - Work stealing: a worker whose own queue is empty takes the newest
+      task from the most loaded worker's queue, so a slow or busy node
+      does not sit on a backlog while others idle (and new workers pick up
+      work immediately).
+    - Heartbeats: workers report every `heartbeat_interval` seconds. A
+      worker silent for `heartbeat_timeout` seconds is declared dead and
+      its queued and running tasks are requeued (up to `max_attempts`).
+    - Task leases: a handed-out task must be completed within
+      `task_timeout` seconds. Otherwise it is reassigned, even if its worker
+      still heartbeats (a hung handler, a lost completion report); a late
+      result from the first worker is ignored.
+
+The wire protocol is JSON over gRPC generic handlers (service
+`agents.Dispatcher`, methods `Heartbeat`, `Poll`, `Complete`), so no
+generated stubs are needed and task payloads/results must be JSON
+serializable. Handlers are plain functions (or coroutine functions)
+`handler(payload) -> result`; for worker processes they are given as
+"module:function" import paths.
+
+Example (everything on localhost):
+    >>> host = AgentHost("127.0.0.1:50051").start()
+    >>> workers = spawn_local_workers(host.address, {"echo": "src.agents.distributed:echo"}, count=4)
+    >>> host.run("echo", {"text": "hi"}, timeout=10)
+    {'text': 'hi'}
+
+A worker on another node:
+    python -m src.agents.distributed --host 10.0.0.5:50051 \\
+        --handler research=my_project.agents:research --capacity 8
+"""
+
+import argparse
+import asyncio
+import importlib
+import inspect
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from src.utils.lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+_grpc = lazy_import("grpc")
+
+SERVICE = "agents.Dispatcher"
+
+
+def _dumps(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _loads(data: bytes) -> Any:
+    return json.loads(data)
+
+
+class RemoteTaskError(RuntimeError):
+    """A task failed on a worker (or ran out of attempts)."""
+
+
+# --- Host ---
+
+
+@dataclass
+class _Task:
+    id: str
+    kind: str
+    payload: Any
+    future: Future
+    attempts: int = 0
+    worker_id: Optional[str] = None
+    lease_until: Optional[float] = None
+
+    def wire(self) -> dict[str, Any]:
+        return {"id": self.id, "kind": self.kind, "payload": self.payload}
+
+
+@dataclass
+class WorkerInfo:
+    """
+    The host's view of a worker.
+
+    Attributes:
+        id (str): Worker id.
+        kinds (frozenset[str]): Task kinds the worker serves.
+        capacity (int): Tasks the worker runs at once.
+        last_seen (float): `time.monotonic()` of the last heartbeat or poll.
+        queue (deque): Tasks placed on the worker, not yet handed out.
+        running (dict): Tasks handed out and not yet completed.
+        completed (int): Tasks completed by the worker.
+        stolen (int): Tasks the worker took from other workers' queues.
+    """
+
+    id: str
+    kinds: frozenset
+    capacity: int
+    last_seen: float
+    queue: deque = field(default_factory=deque)
+    running: dict = field(default_factory=dict)
+    completed: int = 0
+    stolen: int = 0
+
+    @property
+    def load(self) -> float:
+        return (len(self.queue) + len(self.running)) / self.capacity
+
+
+@dataclass
+class HostStats:
+    """
+    Host counters.
+
+    Attributes:
+        submitted (int): Tasks submitted.
+        completed (int): Tasks finished successfully.
+        failed (int): Tasks that failed for good.
+        stolen (int): Tasks moved between worker queues by stealing.
+        requeued (int): Tasks requeued after their worker died or their
+            lease expired.
+        expired (int): Tasks whose lease expired on a live worker.
+        dead_workers (int): Workers declared dead.
+    """
+
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    stolen: int = 0
+    requeued: int = 0
+    expired: int = 0
+    dead_workers: int = 0
+
+
+class AgentHost:
+    """
+    gRPC host that places tasks on workers and collects their results.
+
+    Args:
+        address (str): "host:port" to listen on; port 0 picks a free port.
+        heartbeat_timeout (float): Seconds without contact before a worker
+            is declared dead.
+        max_attempts (int): Times a task is tried before it fails.
+        task_timeout (Optional[float]): Seconds a worker has to complete a
+            task it was handed before the task is reassigned. None waits
+            as long as the worker heartbeats.
+        max_threads (int): gRPC server threads; each waiting worker poll
+            holds one, so keep it above the number of workers.
+    """
+
+    def __init__(
+        self,
+        address: str = "127.0.0.1:0",
+        heartbeat_timeout: float = 5.0,
+        max_attempts: int = 3,
+        task_timeout: Optional[float] = 300.0,
+        max_threads: int = 64,
+    ):
+        self.heartbeat_timeout = heartbeat_timeout
+        self.max_attempts = max_attempts
+        self.task_timeout = task_timeout
+        self.stats = HostStats()
+        self._requested_address = address
+        self._max_threads = max_threads
+        self._workers: dict[str, WorkerInfo] = {}
+        self._backlog: deque[_Task] = deque()
+        self._lock = threading.Lock()
+        self._work_available = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._server = None
+        self._monitor: Optional[threading.Thread] = None
+        self.address: Optional[str] = None
+
+    # --- Lifecycle ---
+
+    def start(self) -> "AgentHost":
+        """Start the gRPC server and the heartbeat monitor."""
+        handlers = {
+            "Heartbeat": self._rpc_heartbeat,
+            "Poll": self._rpc_poll,
+            "Complete": self._rpc_complete,
+        }
+        self._server = _grpc.server(ThreadPoolExecutor(self._max_threads))
+        self._server.add_generic_rpc_handlers(
+            [
+                _grpc.method_handlers_generic_handler(
+                    SERVICE,
+                    {
+                        name: _grpc.unary_unary_rpc_method_handler(
+                            handler, request_deserializer=_loads, response_serializer=_dumps
+                        )
+                        for name, handler in handlers.items()
+                    },
+                )
+            ]
+        )
+        port = self._server.add_insecure_port(self._requested_address)
+        self.address = f"{self._requested_address.rsplit(':', 1)[0]}:{port}"
+        self._server.start()
+        self._monitor = threading.Thread(target=self._monitor_workers, daemon=True)
+        self._monitor.start()
+        return self
+
+    def stop(self, grace: Optional[float] = 1.0) -> None:
+        """Stop the server; pending tasks fail with `RemoteTaskError`."""
+        self._stopped.set()
+        with self._work_available:
+            self._work_available.notify_all()
+            pending = list(self._backlog)
+            for worker in self._workers.values():
+                pending.extend(worker.queue)
+                pending.extend(worker.running.values())
+            self._backlog.clear()
+            self._workers.clear()
+        for task in pending:
+            if not task.future.done():
+                task.future.set_exception(RemoteTaskError("Host stopped"))
+        if self._server is not None:
+            self._server.stop(grace).wait()
+
+    def __enter__(self) -> "AgentHost":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    # --- Public API ---
+
+    def submit(self, kind: str, payload: Any) -> Future:
+        """
+        Queue a task.
+
+        Args:
+            kind (str): Handler name registered by the workers.
+            payload (Any): JSON-serializable task input.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the handler's result or
+            raises `RemoteTaskError`.
+        """
+        task = _Task(uuid.uuid4().hex, kind, payload, Future())
+        with self._work_available:
+            self.stats.submitted += 1
+            self._place(task)
+            self._work_available.notify_all()
+        return task.future
+
+    def run(self, kind: str, payload: Any, timeout: Optional[float] = None) -> Any:
+        """Submit a task and wait for its result."""
+        return self.submit(kind, payload).result(timeout)
+
+    async def arun(self, kind: str, payload: Any) -> Any:
+        """Async counterpart of `run()`, e.g. from an orchestrator agent."""
+        return await asyncio.wrap_future(self.submit(kind, payload))
+
+    def workers(self) -> list[WorkerInfo]:
+        """Snapshot of the live workers."""
+        with self._lock:
+            return list(self._workers.values())
+
+    def wait_for_workers(self, count: int, timeout: float = 30.0) -> None:
+        """
+        Block until at least `count` workers are connected.
+
+        Raises:
+            TimeoutError: If they do not show up in time.
+        """
+        deadline = time.monotonic() + timeout
+        with self._work_available:
+            while len(self._workers) < count:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Only {len(self._workers)} of {count} workers connected")
+                self._work_available.wait(remaining)
+
+    # --- Scheduling (callers hold the lock) ---
+
+    def _place(self, task: _Task) -> None:
+        candidates = [w for w in self._workers.values() if task.kind in w.kinds]
+        if not candidates:
+            self._backlog.append(task)
+            return
+        worker = min(candidates, key=lambda w: w.load)
+        task.worker_id = worker.id
+        worker.queue.append(task)
+
+    def _next_tasks(self, worker: WorkerInfo, limit: int) -> list[_Task]:
+        tasks = []
+        while len(tasks) < limit and worker.queue:
+            tasks.append(worker.queue.popleft())
+        # Unplaced tasks from before any suitable worker connected.
+        for task in list(self._backlog):
+            if len(tasks) >= limit:
+                break
+            if task.kind in worker.kinds:
+                self._backlog.remove(task)
+                tasks.append(task)
+        while len(tasks) < limit:
+            victims = [
+                w
+                for w in self._workers.values()
+                if w is not worker and any(t.kind in worker.kinds for t in w.queue)
+            ]
+            if not victims:
+                break
+            victim = max(victims, key=lambda w: w.load)
+            # Steal the newest task: the victim keeps the ones it will run next.
+            for task in reversed(victim.queue):
+                if task.kind in worker.kinds:
+                    victim.queue.remove(task)
+                    tasks.append(task)
+                    worker.stolen += 1
+                    self.stats.stolen += 1
+                    break
+        lease_until = None if self.task_timeout is None else time.monotonic() + self.task_timeout
+        for task in tasks:
+            task.worker_id = worker.id
+            task.attempts += 1
+            task.lease_until = lease_until
+            worker.running[task.id] = task
+        return tasks
+
+    def _touch(self, request: dict[str, Any]) -> WorkerInfo:
+        worker = self._workers.get(request["worker_id"])
+        now = time.monotonic()
+        if worker is None:
+            worker = WorkerInfo(
+                id=request["worker_id"],
+                kinds=frozenset(request["kinds"]),
+                capacity=max(int(request["capacity"]), 1),
+                last_seen=now,
+            )
+            self._workers[worker.id] = worker
+            logger.info("Worker %s connected (%s)", worker.id, ", ".join(sorted(worker.kinds)))
+            self._work_available.notify_all()
+        worker.last_seen = now
+        return worker
+
+    def _requeue(self, tasks: list[_Task], worker: WorkerInfo) -> None:
+        for task in tasks:
+            if task.future.done():
+                continue
+            task.lease_until = None
+            if task.attempts >= self.max_attempts:
+                self.stats.failed += 1
+                task.future.set_exception(
+                    RemoteTaskError(f"Task {task.id} lost {task.attempts} times (last on {worker.id})")
+                )
+                continue
+            self.stats.requeued += 1
+            self._place(task)
+
+    def _monitor_workers(self) -> None:
+        interval = self.heartbeat_timeout / 4
+        if self.task_timeout is not None:
+            interval = min(interval, self.task_timeout / 4)
+        while not self._stopped.wait(max(interval, 0.05)):
+            with self._work_available:
+                now = time.monotonic()
+                dead = [
+                    w for w in self._workers.values() if now - w.last_seen > self.heartbeat_timeout
+                ]
+                for worker in dead:
+                    logger.warning("Worker %s missed its heartbeats; requeueing its tasks", worker.id)
+                    del self._workers[worker.id]
+                    self.stats.dead_workers += 1
+                    self._requeue(list(worker.queue) + list(worker.running.values()), worker)
+                expired = 0
+                for worker in self._workers.values():
+                    overdue = [
+                        task
+                        for task in worker.running.values()
+                        if task.lease_until is not None and now > task.lease_until
+                    ]
+                    for task in overdue:
+                        logger.warning("Task %s timed out on worker %s; reassigning", task.id, worker.id)
+                        del worker.running[task.id]
+                    expired += len(overdue)
+                    self._requeue(overdue, worker)
+                self.stats.expired += expired
+                if dead or expired:
+                    self._work_available.notify_all()
+
+    # --- RPC handlers ---
+
+    def _rpc_heartbeat(self, request: dict[str, Any], context: Any) -> dict[str, Any]:
+        with self._work_available:
+            worker = self._touch(request)
+            return {"load": worker.load}
+
+    def _rpc_poll(self, request: dict[str, Any], context: Any) -> dict[str, Any]:
+        deadline = time.monotonic() + float(request.get("wait", 1.0))
+        with self._work_available:
+            while not self._stopped.is_set():
+                worker = self._touch(request)
+                tasks = self._next_tasks(worker, int(request["max_tasks"]))
+                remaining = deadline - time.monotonic()
+                if tasks or remaining <= 0:
+                    return {"tasks": [task.wire() for task in tasks]}
+                self._work_available.wait(remaining)
+        return {"tasks": []}
+
+    def _rpc_complete(self, request: dict[str, Any], context: Any) -> dict[str, Any]:
+        with self._work_available:
+            worker = self._touch(request)
+            task = worker.running.pop(request["task_id"], None)
+            if task is None:
+                # Requeued after a missed heartbeat or an expired lease.
+                return {"accepted": False}
+            worker.completed += 1
+            if task.future.done():
+                return {"accepted": False}
+            if request.get("error") is None:
+                self.stats.completed += 1
+                task.future.set_result(request.get("result"))
+            else:
+                self.stats.failed += 1
+                task.future.set_exception(RemoteTaskError(request["error"]))
+            # A free slot on this worker may unblock a waiting poll.
+            self._work_available.notify_all()
+            return {"accepted": True}
+
+
+# --- Worker ---
+
+
+def resolve_handler(path: str) -> Callable[[Any], Any]:
+    """
+    Import a handler from a "module:function" path.
+
+    Args:
+        path (str): Import path, e.g. "src.agents.distributed:echo".
+
+    Returns:
+        Callable[[Any], Any]: The handler.
+    """
+    module_name, _, attribute = path.partition(":")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+class AgentWorker:
+    """
+    Worker that pulls tasks from an `AgentHost` and runs them in threads.
+
+    Args:
+        host_address (str): The host's "host:port".
+        handlers (dict[str, Callable[[Any], Any]]): Task kind -> handler;
+            coroutine functions are run on a per-thread event loop.
+        capacity (int): Tasks run at the same time.
+        worker_id (Optional[str]): Stable id; defaults to hostname-pid-suffix.
+        heartbeat_interval (float): Seconds between heartbeats.
+        poll_wait (float): Seconds a poll waits on the host for new work.
+    """
+
+    def __init__(
+        self,
+        host_address: str,
+        handlers: dict[str, Callable[[Any], Any]],
+        capacity: int = 4,
+        worker_id: Optional[str] = None,
+        heartbeat_interval: float = 1.0,
+        poll_wait: float = 1.0,
+    ):
+        self.host_address = host_address
+        self.handlers = handlers
+        self.capacity = capacity
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_wait = poll_wait
+        self._running = 0
+        self._slots = threading.Condition()
+        self._stopped = threading.Event()
+        self._loops = threading.local()
+
+    def _identity(self) -> dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "kinds": sorted(self.handlers),
+            "capacity": self.capacity,
+        }
+
+    def stop(self) -> None:
+        """Ask `run()` to return after the current poll."""
+        self._stopped.set()
+        with self._slots:
+            self._slots.notify_all()
+
+    def run(self) -> None:
+        """Connect to the host and process tasks until `stop()` is called."""
+        channel = _grpc.insecure_channel(self.host_address)
+        calls = {
+            name: channel.unary_unary(
+                f"/{SERVICE}/{name}", request_serializer=_dumps, response_deserializer=_loads
+            )
+            for name in ("Heartbeat", "Poll", "Complete")
+        }
+        heartbeat = threading.Thread(target=self._heartbeat, args=(calls["Heartbeat"],), daemon=True)
+        heartbeat.start()
+        with ThreadPoolExecutor(self.capacity, thread_name_prefix="agent-task") as pool:
+            while not self._stopped.is_set():
+                with self._slots:
+                    while self._running >= self.capacity and not self._stopped.is_set():
+                        self._slots.wait()
+                    free = self.capacity - self._running
+                if self._stopped.is_set():
+                    break
+                request = dict(self._identity(), max_tasks=free, wait=self.poll_wait)
+                try:
+                    response = calls["Poll"](request, timeout=self.poll_wait + 10)
+                except _grpc.RpcError as e:
+                    logger.warning("Poll failed (%s); retrying", e.code())
+                    self._stopped.wait(1.0)
+                    continue
+                for task in response["tasks"]:
+                    with self._slots:
+                        self._running += 1
+                    pool.submit(self._execute, calls["Complete"], task)
+        channel.close()
+
+    def _heartbeat(self, call: Callable) -> None:
+        while not self._stopped.wait(self.heartbeat_interval):
+            try:
+                call(self._identity(), timeout=self.heartbeat_interval * 2)
+            except _grpc.RpcError as e:
+                logger.debug("Heartbeat failed: %s", e.code())
+
+    def _call_handler(self, kind: str, payload: Any) -> Any:
+        handler = self.handlers[kind]
+        if inspect.iscoroutinefunction(handler):
+            loop = getattr(self._loops, "loop", None)
+            if loop is None:
+                loop = self._loops.loop = asyncio.new_event_loop()
+            return loop.run_until_complete(handler(payload))
+        return handler(payload)
+
+    def _execute(self, complete: Callable, task: dict[str, Any]) -> None:
+        request = dict(self._identity(), task_id=task["id"], result=None, error=None)
+        try:
+            request["result"] = self._call_handler(task["kind"], task["payload"])
+        except Exception as e:
+            request["error"] = f"{type(e).__name__}: {e}"
+        try:
+            for attempt in itertools.count():
+                try:
+                    complete(request, timeout=10)
+                    break
+                except _grpc.RpcError as e:
+                    if attempt >= 2:
+                        logger.error("Could not report task %s: %s", task["id"], e.code())
+                        break
+                    time.sleep(0.5)
+        finally:
+            with self._slots:
+                self._running -= 1
+                self._slots.notify_all()
+
+
+def run_worker(
+    host_address: str, handler_paths: dict[str, str], capacity: int = 4, **kwargs: Any
+) -> None:
+    """
+    Process entry point: resolve handlers by import path and run a worker.
+
+    Args:
+        host_address (str): The host's "host:port".
+        handler_paths (dict[str, str]): Task kind -> "module:function".
+        capacity (int): Tasks run at the same time.
+        **kwargs: Further `AgentWorker` arguments.
+    """
+    handlers = {kind: resolve_handler(path) for kind, path in handler_paths.items()}
+    AgentWorker(host_address, handlers, capacity=capacity, **kwargs).run()
+
+
+def spawn_local_workers(
+    host_address: str,
+    handler_paths: dict[str, str],
+    count: int = 2,
+    capacity: int = 4,
+    **kwargs: Any,
+) -> list[multiprocessing.Process]:
+    """
+    Start `count` worker processes on this machine.
+
+    Args:
+        host_address (str): The host's "host:port".
+        handler_paths (dict[str, str]): Task kind -> "module:function".
+        count (int): Number of processes.
+        capacity (int): Tasks per process run at the same time.
+        **kwargs: Further `AgentWorker` arguments.
+
+    Returns:
+        list[multiprocessing.Process]: The started processes (daemonic).
+    """
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for i in range(count):
+        process = context.Process(
+            target=run_worker,
+            args=(host_address, handler_paths, capacity),
+            kwargs=kwargs,
+            name=f"agent-worker-{i}",
+            daemon=True,
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+
+def echo(payload: Any) -> Any:
+    """Trivial handler returning its payload, for smoke tests."""
+    return payload
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run a worker process connected to a remote host.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description="Run a distributed agent worker.")
+    parser.add_argument("--host", required=True, help="host address, e.g. 10.0.0.5:50051")
+    parser.add_argument(
+        "--handler",
+        action="append",
+        required=True,
+        metavar="KIND=MODULE:FUNCTION",
+        help="task kind and handler import path (repeatable)",
+    )
+    parser.add_argument("--capacity", type=int, default=4)
+    parser.add_argument("--heartbeat-interval", type=float, default=1.0)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    handler_paths = dict(spec.split("=", 1) for spec in args.handler)
+    run_worker(
+        args.host,
+        handler_paths,
+        capacity=args.capacity,
+        heartbeat_interval=args.heartbeat_interval,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,295 @@
+"""
+Orchestrator running agents on the in-process message bus.
+
+Role-playing crews used to call each agent one after the other, so every
+LLM call blocked the whole workflow. Here agents are bus subscribers: an
+agent turn is a coroutine, turns of different agents (and of different
+tasks) run concurrently, and an agent fans work out with
+`AgentContext.gather()`. CPU-heavy tool work (parsing, scoring, number
+crunching) goes to a process pool through `AgentContext.run_tool()` so it
+neither blocks the event loop nor contends for the GIL; blocking SDK calls
+go to a thread through `AgentContext.run_blocking()`.
+
+Agents can be written directly (`FunctionAgent`, `LLMAgent`, or a subclass
+of `Agent`) or wrap AutoGen/CrewAI/OpenAI Agents objects via
+`src.agents.adapters`.
+
+Example:
+    >>> async def plan(task, ctx):
+    ...     notes = await ctx.gather("research", [f"{task}: {q}" for q in ("who", "why")])
+    ...     return await ctx.request("write", "\\n".join(notes))
+    >>> async with Orchestrator(max_workers=4) as orchestrator:
+    ...     orchestrator.register(FunctionAgent("planner", "task", plan))
+    ...     orchestrator.register(LLMAgent("researcher", "research", backend, concurrency=8))
+    ...     orchestrator.register(LLMAgent("writer", "write", backend))
+    ...     report = await orchestrator.submit("task", "Compare vector databases")
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+from src.agents.bus import Message, MessageBus
+from src.utils.chat_service import ChatBackend
+
+
+class AgentContext:
+    """
+    What an agent can do while handling a message.
+
+    Args:
+        orchestrator (Orchestrator): The running orchestrator.
+        agent (Agent): The agent the context belongs to.
+    """
+
+    def __init__(self, orchestrator: "Orchestrator", agent: "Agent"):
+        self.orchestrator = orchestrator
+        self.agent = agent
+        self.bus = orchestrator.bus
+
+    async def send(self, topic: str, payload: Any) -> None:
+        """Publish `payload` on `topic` without waiting for an answer."""
+        await self.bus.send(topic, payload, sender=self.agent.name)
+
+    async def request(self, topic: str, payload: Any, timeout: Optional[float] = None) -> Any:
+        """Send a request to the agent(s) on `topic` and return the reply."""
+        return await self.bus.request(topic, payload, sender=self.agent.name, timeout=timeout)
+
+    async def gather(
+        self, topic: str, payloads: Iterable[Any], timeout: Optional[float] = None
+    ) -> list[Any]:
+        """
+        Send several requests to `topic` concurrently.
+
+        Args:
+            topic (str): Topic to send to.
+            payloads (Iterable[Any]): One request per payload.
+            timeout (Optional[float]): Per-request timeout.
+
+        Returns:
+            list[Any]: Replies, in the order of `payloads`.
+        """
+        return list(
+            await asyncio.gather(
+                *(self.request(topic, payload, timeout) for payload in payloads)
+            )
+        )
+
+    async def reply(self, message: Message, payload: Any) -> None:
+        """Answer a request."""
+        await self.bus.reply(message, payload, sender=self.agent.name)
+
+    async def run_tool(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run CPU-heavy tool code in the orchestrator's process pool.
+
+        `fn` and its arguments must be picklable (a module-level function).
+        Without a process pool (`max_workers=0`) the tool runs in a thread.
+
+        Args:
+            fn (Callable[..., Any]): The tool function.
+            *args: Positional arguments.
+
+        Returns:
+            Any: The tool's result.
+        """
+        executor = self.orchestrator.executor
+        if executor is None:
+            return await asyncio.to_thread(fn, *args)
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+    async def run_blocking(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run blocking I/O (e.g. a synchronous SDK call) in a thread."""
+        return await asyncio.to_thread(fn, *args, **kwargs)
+
+
+class Agent:
+    """
+    Base class for agents.
+
+    Subclasses implement `handle()`. An agent receives every message on its
+    `topics`; with `concurrency > 1` it handles several messages at once
+    (use that for stateless agents such as researchers). While an agent
+    waits for `ctx.request()`, the waiting turn holds one of its workers:
+    with the default `concurrency=1` it cannot request its own topic, nor
+    be requested back along a cycle of agents; such a request raises
+    `src.agents.bus.DeadlockError`.
+
+    Args:
+        name (str): Agent name, used as the sender of its messages.
+        topics (Iterable[str] | str): Topics to subscribe to.
+        concurrency (int): Messages handled at the same time.
+    """
+
+    def __init__(self, name: str, topics: Iterable[str] | str, concurrency: int = 1):
+        self.name = name
+        self.topics = (topics,) if isinstance(topics, str) else tuple(topics)
+        self.concurrency = concurrency
+
+    async def handle(self, message: Message, ctx: AgentContext) -> None:
+        """
+        Handle one message.
+
+        Args:
+            message (Message): The message.
+            ctx (AgentContext): Access to the bus and the executors.
+        """
+        raise NotImplementedError
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.name!r}, topics={self.topics})"
+
+
+class FunctionAgent(Agent):
+    """
+    Agent backed by a coroutine function `fn(payload, ctx) -> result`.
+
+    The result is sent back when the message was a request.
+
+    Args:
+        name (str): Agent name.
+        topics (Iterable[str] | str): Topics to subscribe to.
+        fn (Callable[[Any, AgentContext], Awaitable[Any]]): The turn logic.
+        concurrency (int): Messages handled at the same time.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        topics: Iterable[str] | str,
+        fn: Callable[[Any, AgentContext], Awaitable[Any]],
+        concurrency: int = 1,
+    ):
+        super().__init__(name, topics, concurrency)
+        self.fn = fn
+
+    async def handle(self, message: Message, ctx: AgentContext) -> None:
+        result = await self.fn(message.payload, ctx)
+        await ctx.reply(message, result)
+
+
+class LLMAgent(Agent):
+    """
+    Agent that answers each message with one model call.
+
+    Args:
+        name (str): Agent name.
+        topics (Iterable[str] | str): Topics to subscribe to.
+        backend (ChatBackend): Streaming chat backend, e.g.
+            `src.utils.chat_service.gemini_chat_backend(...)` or
+            `src.utils.fake_llm.FakeStreamingLLM(...)`.
+        instructions (Optional[str]): Role description prepended to every prompt.
+        concurrency (int): Messages handled at the same time.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        topics: Iterable[str] | str,
+        backend: ChatBackend,
+        instructions: Optional[str] = None,
+        concurrency: int = 1,
+    ):
+        super().__init__(name, topics, concurrency)
+        self.backend = backend
+        self.instructions = instructions
+
+    async def handle(self, message: Message, ctx: AgentContext) -> None:
+        prompt = str(message.payload)
+        if self.instructions:
+            prompt = f"{self.instructions}\n\n{prompt}"
+        parts = [delta async for delta in self.backend([{"role": "user", "content": prompt}])]
+        await ctx.reply(message, "".join(parts))
+
+
+class Orchestrator:
+    """
+    Runs agents on a `MessageBus` and owns the tool process pool.
+
+    Use it as an async context manager; agents can be registered before or
+    after entering it.
+
+    Args:
+        bus (Optional[MessageBus]): Bus to use; a new one by default.
+        max_workers (Optional[int]): Tool process pool size (default: CPU
+            count). 0 disables the pool; tools then run in threads.
+    """
+
+    def __init__(self, bus: Optional[MessageBus] = None, max_workers: Optional[int] = None):
+        self.bus = bus or MessageBus()
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.agents: dict[str, Agent] = {}
+
+    def register(self, agent: Agent) -> Agent:
+        """
+        Subscribe an agent to its topics.
+
+        Args:
+            agent (Agent): The agent.
+
+        Returns:
+            Agent: The same agent.
+
+        Raises:
+            ValueError: If an agent with the same name is registered.
+        """
+        if agent.name in self.agents:
+            raise ValueError(f"Agent {agent.name!r} is already registered")
+        self.agents[agent.name] = agent
+        ctx = AgentContext(self, agent)
+
+        async def handler(message: Message) -> None:
+            await agent.handle(message, ctx)
+
+        for topic in agent.topics:
+            self.bus.subscribe(topic, handler, concurrency=agent.concurrency, name=agent.name)
+        return agent
+
+    async def start(self) -> None:
+        """Start the bus and the tool process pool."""
+        if self.max_workers and self.executor is None:
+            # "spawn" keeps SDK threads and sockets of this process out of
+            # the workers; they start once and are reused for every tool call.
+            self.executor = ProcessPoolExecutor(
+                self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        await self.bus.start()
+
+    async def stop(self) -> None:
+        """Stop the bus and shut the process pool down."""
+        await self.bus.close()
+        if self.executor is not None:
+            executor, self.executor = self.executor, None
+            await asyncio.to_thread(executor.shutdown, cancel_futures=True)
+
+    async def __aenter__(self) -> "Orchestrator":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+    async def submit(self, topic: str, payload: Any, timeout: Optional[float] = None) -> Any:
+        """
+        Start a workflow by sending a request to `topic` and wait for its result.
+
+        Args:
+            topic (str): Entry topic of the workflow.
+            payload (Any): The task.
+            timeout (Optional[float]): Seconds to wait.
+
+        Returns:
+            Any: The entry agent's reply.
+        """
+        return await self.bus.request(topic, payload, sender="orchestrator", timeout=timeout)
+
+    async def run_all(
+        self, topic: str, payloads: Iterable[Any], timeout: Optional[float] = None
+    ) -> list[Any]:
+        """Submit several tasks concurrently and return their results in order."""
+        return list(
+            await asyncio.gather(*(self.submit(topic, payload, timeout) for payload in payloads))
+        )
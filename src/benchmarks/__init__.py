@@ -0,0 +1,7 @@
+"""
+Benchmark commands for the shared components in ``src``.
+
+Each module is runnable from the repository root, e.g.::
+
+    python -m src.benchmarks.import_time
+"""
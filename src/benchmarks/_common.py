@@ -0,0 +1,148 @@
+"""
+Small helpers shared by the benchmark commands: timing, summary statistics,
+plain-text result tables and local stub HTTP servers.
+"""
+
+import statistics
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, Optional, Sequence
+
+
+@contextmanager
+def timer() -> Iterator[dict]:
+    """
+    Measure the wall-clock duration of a block.
+
+    Yields:
+        dict: Populated with "seconds" when the block exits.
+
+    Example:
+        >>> with timer() as t:
+        ...     do_work()
+        >>> print(t["seconds"])
+    """
+    result = {"seconds": 0.0}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - start
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """
+    Return the `pct` percentile (0-100) of `values` using linear interpolation.
+
+    Args:
+        values (Sequence[float]): Samples; need not be sorted.
+        pct (float): Percentile between 0 and 100.
+
+    Returns:
+        float: The percentile, or 0.0 for an empty sequence.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(values: Sequence[float]) -> dict[str, float]:
+    """
+    Summarize samples as min / mean / p50 / p95 / max.
+
+    Args:
+        values (Sequence[float]): Samples.
+
+    Returns:
+        dict[str, float]: The summary statistics.
+    """
+    if not values:
+        return {"min": 0.0, "mean": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    return {
+        "min": min(values),
+        "mean": statistics.fmean(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "max": max(values),
+    }
+
+
+def print_table(headers: Sequence[str], rows: Iterable[Sequence[object]]) -> None:
+    """
+    Print rows as an aligned plain-text table.
+
+    Floats are shown with three decimals.
+
+    Args:
+        headers (Sequence[str]): Column titles.
+        rows (Iterable[Sequence[object]]): Table rows.
+    """
+    formatted = [
+        [f"{cell:.3f}" if isinstance(cell, float) else str(cell) for cell in row]
+        for row in rows
+    ]
+    widths = [len(header) for header in headers]
+    for row in formatted:
+        widths = [max(width, len(cell)) for width, cell in zip(widths, row)]
+    print("  ".join(header.ljust(width) for header, width in zip(headers, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in formatted:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Local HTTP server on a free port of 127.0.0.1, standing in for a remote API.
+
+    Args:
+        handler (type[StubHandler]): Request handler class.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, handler: type["StubHandler"]):
+        super().__init__(("127.0.0.1", 0), handler)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @contextmanager
+    def running(self) -> Iterator["StubServer"]:
+        """Serve from a background thread for the duration of the block."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        try:
+            yield self
+        finally:
+            self.shutdown()
+            self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Request handler base for `StubServer`s: keep-alive, no logging.
+
+    Subclasses implement `do_GET` / `do_POST`.
+    """
+
+    protocol_version = "HTTP/1.1"
+    # Without TCP_NODELAY, delayed ACKs add ~40 ms to every small response.
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # noqa: A002 - signature from the stdlib
+        pass
+
+    def reply(self, status: int, body: bytes = b"", headers: Optional[dict[str, str]] = None) -> None:
+        """Send a complete response with a Content-Length."""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
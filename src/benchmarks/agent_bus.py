@@ -0,0 +1,141 @@
+"""
+Tasks/minute of a multi-agent workflow: serial calls vs. the message bus.
+
+Workflow per task (a small "research crew"):
+    1. three researcher turns on sub-questions (LLM),
+    2. a CPU-heavy analysis tool over the notes,
+    3. a writer turn (LLM),
+    4. a reviewer turn (LLM).
+
+Modes:
+    - serial:       every agent is awaited one after the other and tasks run
+                    one at a time; the tool runs inline (how crews ran so far)
+    - bus-threads:  agents on the message bus, turns and tasks concurrent,
+                    tool in a thread (GIL-bound)
+    - bus-processes: as above, tool in the orchestrator's process pool
+
+All LLM turns use `FakeStreamingLLM`, so results measure orchestration only.
+
+Usage (from the repository root):
+    python -m src.benchmarks.agent_bus
+    python -m src.benchmarks.agent_bus --tasks 100 --tool-work 400000 --workers 8
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Optional
+
+from src.agents.orchestrator import AgentContext, FunctionAgent, LLMAgent, Orchestrator
+from src.benchmarks._common import print_table
+from src.utils.fake_llm import FakeStreamingLLM
+
+SUBQUESTIONS = ("background", "current options", "risks")
+
+
+def analyze_notes(notes: list[str], work: int) -> dict[str, Any]:
+    """
+    Stand-in for CPU-heavy tool work (parsing, scoring, statistics).
+
+    Pure Python on purpose: it holds the GIL like most tool code does.
+    """
+    words: dict[str, int] = {}
+    for note in notes:
+        for word in note.split():
+            words[word] = words.get(word, 0) + 1
+    checksum = 0
+    for i in range(work):
+        checksum = (checksum * 31 + i) % 1_000_003
+    return {"distinct_words": len(words), "checksum": checksum}
+
+
+def _llm(args: argparse.Namespace) -> FakeStreamingLLM:
+    return FakeStreamingLLM(
+        tokens=args.tokens,
+        first_token_latency=args.latency_ms / 1000,
+        token_delay=args.token_delay_ms / 1000,
+    )
+
+
+async def run_serial(tasks: list[str], args: argparse.Namespace) -> float:
+    """Run the workflow with plain sequential awaits; returns elapsed seconds."""
+    llm = _llm(args)
+
+    async def turn(prompt: str) -> str:
+        return "".join([delta async for delta in llm([{"role": "user", "content": prompt}])])
+
+    started = time.perf_counter()
+    for task in tasks:
+        notes = [await turn(f"{task}: {question}") for question in SUBQUESTIONS]
+        stats = analyze_notes(notes, args.tool_work)
+        draft = await turn(f"Write up {task} using {notes} and {stats}")
+        await turn(f"Review: {draft}")
+    return time.perf_counter() - started
+
+
+async def run_bus(tasks: list[str], args: argparse.Namespace, workers: int) -> float:
+    """Run the workflow on the orchestrator; returns elapsed seconds."""
+    llm = _llm(args)
+
+    async def plan(task: str, ctx: AgentContext) -> str:
+        notes = await ctx.gather("research", [f"{task}: {q}" for q in SUBQUESTIONS])
+        stats = await ctx.run_tool(analyze_notes, notes, args.tool_work)
+        draft = await ctx.request("write", f"Write up {task} using {notes} and {stats}")
+        return await ctx.request("review", f"Review: {draft}")
+
+    async with Orchestrator(max_workers=workers) as orchestrator:
+        orchestrator.register(FunctionAgent("planner", "task", plan, concurrency=len(tasks)))
+        orchestrator.register(LLMAgent("researcher", "research", llm, concurrency=args.llm_slots))
+        orchestrator.register(LLMAgent("writer", "write", llm, concurrency=args.llm_slots))
+        orchestrator.register(LLMAgent("reviewer", "review", llm, concurrency=args.llm_slots))
+        if orchestrator.executor is not None:
+            # Start the pool's processes before the clock runs.
+            await orchestrator.run_all("task", tasks[: orchestrator.max_workers])
+        started = time.perf_counter()
+        await orchestrator.run_all("task", tasks)
+        return time.perf_counter() - started
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the workflow in each mode and print tasks/minute.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tasks", type=int, default=40)
+    parser.add_argument("--serial-tasks", type=int, default=5, help="tasks for the slow serial mode")
+    parser.add_argument("--tool-work", type=int, default=300_000, help="tool loop iterations")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="tool processes")
+    parser.add_argument("--llm-slots", type=int, default=32, help="concurrent turns per LLM agent")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="fake model first-token latency")
+    parser.add_argument("--tokens", type=int, default=20)
+    parser.add_argument("--token-delay-ms", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    tasks = [f"task {i}" for i in range(args.tasks)]
+    modes = {
+        "serial": lambda: run_serial(tasks[: args.serial_tasks], args),
+        "bus-threads": lambda: run_bus(tasks, args, workers=0),
+        "bus-processes": lambda: run_bus(tasks, args, workers=args.workers),
+    }
+    rows = []
+    for name, run in modes.items():
+        count = args.serial_tasks if name == "serial" else args.tasks
+        print(f"Running {name} ({count} tasks) ...")
+        seconds = asyncio.run(run())
+        rows.append([name, count, seconds, count / seconds * 60])
+
+    print()
+    print_table(["mode", "tasks", "seconds", "tasks/min"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
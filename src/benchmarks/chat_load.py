@@ -0,0 +1,202 @@
+"""
+Load test for the multi-user chat service behind `gemini_gradio_chat.py`.
+
+Simulates hundreds of concurrent chat sessions, each sending a few messages
+with some think time in between, against `src.utils.chat_service.ChatService`
+and reports time-to-first-token (TTFT) and full-reply latency per
+concurrency limit.
+
+Backends:
+    - fake: `FakeStreamingLLM` in-process (no network, default)
+    - stub: the shared `google.genai` client talking to the local stub
+      Gemini server from `gemini_transports`, i.e. the real SDK and HTTP
+      path without API costs
+
+Usage (from the repository root):
+    python -m src.benchmarks.chat_load
+    python -m src.benchmarks.chat_load --sessions 500 --max-concurrency 16 64 256
+    python -m src.benchmarks.chat_load --backend stub --latency-ms 200
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from contextlib import ExitStack
+from typing import Optional
+
+from src.benchmarks._common import print_table, summarize
+from src.utils.chat_service import ChatBackend, ChatService, QueueFullError, gemini_chat_backend
+from src.utils.fake_llm import FakeStreamingLLM
+
+
+async def _session(
+    service: ChatService,
+    session_id: str,
+    turns: int,
+    think_seconds: float,
+    results: dict[str, list],
+) -> None:
+    """One simulated user: send `turns` messages, reading each reply to the end."""
+    rng = random.Random(session_id)
+    for turn in range(turns):
+        await asyncio.sleep(rng.uniform(0, 2 * think_seconds))
+        started = time.perf_counter()
+        first = None
+        try:
+            async for _ in service.stream_reply(session_id, f"Message {turn} from {session_id}"):
+                if first is None:
+                    first = time.perf_counter() - started
+        except QueueFullError:
+            results["rejected"].append(session_id)
+            continue
+        except Exception as e:
+            results["errors"].append(e)
+            continue
+        results["ttft"].append(first if first is not None else time.perf_counter() - started)
+        results["total"].append(time.perf_counter() - started)
+
+
+async def run_load(
+    backend: ChatBackend,
+    sessions: int,
+    turns: int,
+    think_seconds: float,
+    max_concurrency: int,
+    max_queue_per_user: int,
+) -> dict:
+    """
+    Run `sessions` simulated users concurrently against a fresh `ChatService`.
+
+    Returns:
+        dict: Latency samples, error counts and service statistics.
+    """
+    service = ChatService(
+        backend, max_concurrency=max_concurrency, max_queue_per_user=max_queue_per_user
+    )
+    results = {"ttft": [], "total": [], "rejected": [], "errors": []}
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(
+            _session(service, f"session-{i}", turns, think_seconds, results)
+            for i in range(sessions)
+        )
+    )
+    results["seconds"] = time.perf_counter() - started
+    results["stats"] = service.stats
+    return results
+
+
+async def _run_limits(backend: ChatBackend, args: argparse.Namespace) -> list[dict]:
+    """Run the load once per concurrency limit."""
+    runs = []
+    for limit in args.max_concurrency:
+        print(f"Running {args.sessions} sessions x {args.turns} turns, max concurrency {limit} ...")
+        runs.append(
+            await run_load(
+                backend,
+                args.sessions,
+                args.turns,
+                args.think_ms / 1000,
+                limit,
+                args.max_queue_per_user,
+            )
+        )
+    return runs
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the load test and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["fake", "stub"], default="fake")
+    parser.add_argument("--sessions", type=int, default=300, help="concurrent chat sessions")
+    parser.add_argument("--turns", type=int, default=3, help="messages per session")
+    parser.add_argument("--think-ms", type=float, default=500.0, help="mean pause between turns")
+    parser.add_argument("--max-concurrency", type=int, nargs="+", default=[32, 128, 512])
+    parser.add_argument("--max-queue-per-user", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="model time to first token")
+    parser.add_argument("--tokens", type=int, default=20, help="deltas per reply")
+    parser.add_argument("--token-delay-ms", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    with ExitStack() as stack:
+        if args.backend == "fake":
+            backend = FakeStreamingLLM(
+                tokens=args.tokens,
+                first_token_latency=args.latency_ms / 1000,
+                token_delay=args.token_delay_ms / 1000,
+            )
+        else:
+            from google import genai
+            from google.genai import types
+
+            from src.benchmarks.gemini_transports import MODEL, STUB_API_KEY, stub_server
+
+            server = stack.enter_context(
+                stub_server(
+                    latency=args.latency_ms / 1000,
+                    chunks=args.tokens,
+                    chunk_delay=args.token_delay_ms / 1000,
+                )
+            )
+            # One client shared by all sessions, like `get_genai_client()`.
+            client = genai.Client(
+                api_key=STUB_API_KEY,
+                http_options=types.HttpOptions(base_url=server.url, api_version="v1beta"),
+            )
+            backend = gemini_chat_backend(MODEL, client=client)
+
+        # A single event loop for all runs: the shared client's connection
+        # pool is bound to the loop it was first used on.
+        runs = asyncio.run(_run_limits(backend, args))
+
+    rows = []
+    for limit, results in zip(args.max_concurrency, runs):
+        ttft = summarize(results["ttft"])
+        total = summarize(results["total"])
+        stats = results["stats"]
+        rows.append(
+            [
+                limit,
+                len(results["ttft"]),
+                len(results["rejected"]),
+                len(results["errors"]),
+                ttft["p50"] * 1000,
+                ttft["p95"] * 1000,
+                total["p95"] * 1000,
+                stats.peak_active,
+                stats.peak_waiting,
+                len(results["ttft"]) / results["seconds"],
+            ]
+        )
+
+    print()
+    print_table(
+        [
+            "max concurrency",
+            "replies",
+            "rejected",
+            "errors",
+            "ttft p50 [ms]",
+            "ttft p95 [ms]",
+            "reply p95 [ms]",
+            "peak active",
+            "peak waiting",
+            "replies/s",
+        ],
+        rows,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""
+Benchmark the code-execution sandbox: cold vs. warm latency and throughput.
+
+    - cold: a new worker interpreter per snippet (`execute_cold`)
+    - warm: snippets sent to the pre-started `SandboxPool` workers
+    - throughput: executions/sec with several client threads per pool size
+
+The workload cycles through small generated-code style snippets, including
+`playground/gemini/responses/factorial_problem.py` (which raises).
+
+Usage (from the repository root):
+    python -m src.benchmarks.code_sandbox
+    python -m src.benchmarks.code_sandbox --runs 50 --pool-sizes 1 2 4 8 --seconds 5
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+from src.benchmarks._common import print_table, summarize
+from src.tools.code_sandbox import SandboxPool, execute_cold
+
+FACTORIAL_PATH = os.path.join("playground", "gemini", "responses", "factorial_problem.py")
+
+SNIPPETS = [
+    "print(sum(i * i for i in range(10_000)))",
+    "import json\nprint(json.dumps({'primes': [n for n in range(2, 200) "
+    "if all(n % d for d in range(2, n))]}))",
+    "import statistics\nprint(statistics.mean([3, 1, 4, 1, 5, 9, 2, 6]))",
+]
+
+
+def _snippets() -> list[str]:
+    if os.path.exists(FACTORIAL_PATH):
+        with open(FACTORIAL_PATH) as f:
+            return SNIPPETS + [f.read()]
+    return SNIPPETS
+
+
+def _throughput(pool: SandboxPool, snippets: list[str], threads: int, seconds: float) -> float:
+    """Executions per second with `threads` callers for `seconds`."""
+    count = [0] * threads
+    deadline = time.perf_counter() + seconds
+
+    def client(index: int) -> None:
+        i = index
+        while time.perf_counter() < deadline:
+            pool.execute(snippets[i % len(snippets)])
+            count[index] += 1
+            i += 1
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=client, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(count) / (time.perf_counter() - started)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=20, help="latency samples per mode")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--seconds", type=float, default=3.0, help="duration of each throughput run")
+    args = parser.parse_args(argv)
+    snippets = _snippets()
+
+    print("Measuring cold starts ...")
+    cold = [execute_cold(snippets[i % len(snippets)]).seconds for i in range(args.runs)]
+    print("Measuring warm executions ...")
+    with SandboxPool(size=1) as pool:
+        warm = []
+        for i in range(args.runs):
+            started = time.perf_counter()
+            pool.execute(snippets[i % len(snippets)])
+            warm.append(time.perf_counter() - started)
+
+    rows = []
+    for name, samples in (("cold", cold), ("warm", warm)):
+        stats = summarize(samples)
+        rows.append([name, stats["p50"] * 1000, stats["p95"] * 1000, 1 / stats["mean"]])
+    print()
+    print_table(["mode", "p50 [ms]", "p95 [ms]", "exec/s (serial)"], rows)
+
+    rows = []
+    for size in args.pool_sizes:
+        print(f"Measuring throughput with {size} workers ...")
+        with SandboxPool(size=size) as pool:
+            rows.append([size, size * 2, _throughput(pool, snippets, size * 2, args.seconds)])
+    print()
+    print_table(["workers", "client threads", "exec/s"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+"""
+Benchmark context compression: tokens saved vs. time spent compressing.
+
+Compresses synthetic inputs shaped like the ones in this repo:
+
+    - story: a long generated story with repeated passages, as passed from
+      `story_chain` to `analysis_chain` in `playground/lcel/ex_gemini_02.py`
+    - history: an agent chat history whose tool results repeat
+
+at several token budgets and prints tokens before/after, the compression
+time, and the net latency impact estimated from the target model's prefill
+throughput (`--prefill-tps`). With `--ollama-model` the summarize step uses
+that local model (requires a running Ollama server).
+
+Usage (from the repository root):
+    python -m src.benchmarks.context_compression
+    python -m src.benchmarks.context_compression --budgets 200 800 --prefill-tps 1000
+    python -m src.benchmarks.context_compression --ollama-model llama3.2:1b
+"""
+
+import argparse
+import functools
+import random
+import sys
+import time
+from typing import Callable, Optional
+
+from src.benchmarks._common import print_table, summarize
+from src.utils.context_compression import ContextCompressor, ollama_summarizer
+
+_SUBJECTS = ["The cat", "A robot", "The captain", "An old librarian", "The river", "Her brother"]
+_VERBS = ["watched", "remembered", "followed", "repaired", "feared", "described"]
+_OBJECTS = ["the silent harbour", "a broken compass", "the northern lights", "an unfinished letter", "the last train"]
+_TAILS = ["before dawn.", "without a word.", "as the rain began.", "for the first time.", "while the town slept."]
+
+
+def make_story(paragraphs: int = 40, seed: int = 0) -> str:
+    """A long story where about a quarter of the paragraphs repeat earlier ones."""
+    rng = random.Random(seed)
+    written: list[str] = []
+    for _ in range(paragraphs):
+        if written and rng.random() < 0.25:
+            written.append(rng.choice(written))
+            continue
+        sentences = [
+            f"{rng.choice(_SUBJECTS)} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_TAILS)}"
+            for _ in range(rng.randint(3, 7))
+        ]
+        written.append(" ".join(sentences))
+    return "\n\n".join(written)
+
+
+def make_history(turns: int = 30, seed: int = 0) -> list[dict]:
+    """An agent history whose tool results are often repeated verbatim."""
+    rng = random.Random(seed)
+    results = [make_story(2, seed=seed + i) for i in range(5)]
+    history = [{"role": "system", "content": "You are a research assistant. Use tools when needed."}]
+    for turn in range(turns):
+        history.append({"role": "user", "content": f"Question {turn}: what happened to {rng.choice(_OBJECTS)}?"})
+        history.append({"role": "tool", "content": rng.choice(results)})
+        history.append({"role": "assistant", "content": make_story(1, seed=seed + 100 + turn)})
+    return history
+
+
+def _measure(compressor: ContextCompressor, run: Callable[[], tuple], repeats: int) -> list:
+    """Time `run()` (a compress call returning `(result, report)`) and tabulate its report."""
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        _, report = run()
+        timings.append(time.perf_counter() - started)
+    report.seconds = summarize(timings)["p50"]
+    return [
+        report.tokens_before,
+        report.tokens_after,
+        100 * report.tokens_saved / max(1, report.tokens_before),
+        report.seconds * 1000,
+        report.tokens_saved / compressor.prefill_tokens_per_second * 1000,
+        report.latency_saved_seconds * 1000,
+        "+".join(report.steps) or "-",
+    ]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--budgets", type=int, nargs="+", default=[400, 1500])
+    parser.add_argument("--prefill-tps", type=float, default=2000.0, help="target model prefill tokens/s")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--model-name", help="Hugging Face tokenizer for counting (default: estimate)")
+    parser.add_argument("--ollama-model", help="summarize with this local Ollama model")
+    args = parser.parse_args(argv)
+
+    summarizer = ollama_summarizer(args.ollama_model) if args.ollama_model else None
+    repeats = 1 if summarizer else args.repeats
+    story = make_story()
+    history = make_history()
+    question = "What happened to the broken compass?"
+
+    rows = []
+    for budget in [None] + args.budgets:
+        compressor = ContextCompressor(
+            token_budget=budget,
+            summarizer=summarizer,
+            model_name=args.model_name,
+            prefill_tokens_per_second=args.prefill_tps,
+        )
+        label = "dedupe only" if budget is None else str(budget)
+        compress_story = functools.partial(compressor.compress, story, question)
+        compress_history = functools.partial(compressor.compress_messages, history)
+        rows.append(["story", label] + _measure(compressor, compress_story, repeats))
+        rows.append(["history", label] + _measure(compressor, compress_history, repeats))
+
+    print(f"Prefill assumed at {args.prefill_tps:.0f} tokens/s; compression time is the median of {repeats} runs")
+    print()
+    print_table(
+        ["input", "budget", "tokens in", "tokens out", "saved [%]", "compress [ms]", "prefill saved [ms]", "net [ms]", "steps"],
+        rows,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""
+Exercise the distributed agent runtime with worker processes on localhost.
+
+Starts an `AgentHost`, spawns worker processes, submits simulated agent
+turns (I/O wait plus some CPU) and reports throughput, per-worker
+placement and stealing. With `--kill-after` one worker is killed mid-run
+to check that heartbeat detection requeues its tasks and every task still
+completes.
+
+Usage (from the repository root):
+    python -m src.benchmarks.distributed_agents
+    python -m src.benchmarks.distributed_agents --workers 4 --tasks 400 --kill-after 1.0
+"""
+
+import argparse
+import sys
+import time
+from concurrent.futures import wait
+from typing import Any, Optional
+
+from src.agents.distributed import AgentHost, spawn_local_workers
+from src.benchmarks._common import print_table
+
+HANDLERS = {"turn": "src.benchmarks.distributed_agents:simulated_turn"}
+
+
+def simulated_turn(payload: dict[str, Any]) -> dict[str, Any]:
+    """A fake agent turn: wait for a "model" and do a little tool work."""
+    time.sleep(payload["io_ms"] / 1000)
+    checksum = 0
+    for i in range(payload["cpu_work"]):
+        checksum = (checksum * 31 + i) % 1_000_003
+    return {"task": payload["task"], "checksum": checksum}
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the workload and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: 0 if every task completed, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=3, help="worker processes")
+    parser.add_argument("--capacity", type=int, default=8, help="concurrent tasks per worker")
+    parser.add_argument("--tasks", type=int, default=300)
+    parser.add_argument("--io-ms", type=float, default=50.0, help="simulated model wait per task")
+    parser.add_argument("--cpu-work", type=int, default=20_000, help="tool loop iterations per task")
+    parser.add_argument("--kill-after", type=float, default=None, help="kill one worker after N seconds")
+    parser.add_argument("--heartbeat-timeout", type=float, default=2.0)
+    args = parser.parse_args(argv)
+
+    with AgentHost(heartbeat_timeout=args.heartbeat_timeout) as host:
+        processes = spawn_local_workers(
+            host.address,
+            HANDLERS,
+            count=args.workers,
+            capacity=args.capacity,
+            heartbeat_interval=args.heartbeat_timeout / 4,
+        )
+        try:
+            host.wait_for_workers(args.workers)
+            print(f"{args.workers} workers connected to {host.address}; submitting {args.tasks} tasks ...")
+            started = time.perf_counter()
+            futures = [
+                host.submit("turn", {"task": i, "io_ms": args.io_ms, "cpu_work": args.cpu_work})
+                for i in range(args.tasks)
+            ]
+            if args.kill_after is not None:
+                done, _ = wait(futures, timeout=args.kill_after)
+                print(f"Killing {processes[0].name} after {len(done)} tasks ...")
+                processes[0].kill()
+            wait(futures, timeout=args.tasks * (args.io_ms / 1000 + 1) + 30)
+            seconds = time.perf_counter() - started
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result(timeout=0))
+                except Exception as e:
+                    print(f"Task failed: {e}")
+            snapshot = host.workers()
+        finally:
+            for process in processes:
+                process.kill()
+
+    completed = {result["task"] for result in results}
+    print()
+    print_table(
+        ["worker", "completed", "stolen"],
+        [[w.id, w.completed, w.stolen] for w in snapshot],
+    )
+    print()
+    stats = host.stats
+    print_table(
+        ["tasks", "completed", "seconds", "tasks/s", "stolen", "requeued", "dead workers"],
+        [
+            [
+                args.tasks,
+                len(completed),
+                seconds,
+                len(completed) / seconds,
+                stats.stolen,
+                stats.requeued,
+                stats.dead_workers,
+            ]
+        ],
+    )
+    return 0 if len(completed) == args.tasks else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
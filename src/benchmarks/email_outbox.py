@@ -0,0 +1,179 @@
+"""
+Benchmark the email outbox against a local stub of the SendGrid API.
+
+    - sync: one `/v3/mail/send` request per message on the caller's thread
+      (what a direct SendGrid call inside an agent step costs)
+    - outbox: `EmailOutbox.enqueue()` on the caller's thread, delivery in
+      batches by the background sender
+
+Reports the caller-side latency per message, the time until every message
+was accepted, and the number of HTTP requests. `--fail-rate` makes the stub
+answer that share of requests with 429/503 to exercise retries.
+
+Usage (from the repository root):
+    python -m src.benchmarks.email_outbox
+    python -m src.benchmarks.email_outbox --messages 2000 --latency-ms 300 --fail-rate 0.2
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from contextlib import AbstractContextManager
+from typing import Optional
+
+import httpx
+
+from src.benchmarks._common import StubHandler, StubServer, print_table, summarize
+from src.tools.email_outbox import EmailOutbox
+
+STUB_API_KEY = "SG.stub"
+SENDER = "agents@example.com"
+ALERTS = [
+    ("Nightly summary", "All agents finished their runs."),
+    ("Price alert", "A watched ticker moved more than 5% today."),
+    ("Job failed", "A scheduled research job failed after 3 attempts."),
+]
+
+
+class StubSendGridServer(StubServer):
+    """Accepts `/v3/mail/send` with a fixed latency; optionally fails some requests."""
+
+    def __init__(self, latency: float, fail_rate: float = 0.0):
+        super().__init__(_StubHandler)
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = random.Random(0)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.delivered: list[str] = []
+
+
+class _StubHandler(StubHandler):
+    def do_POST(self):  # noqa: N802 - name required by BaseHTTPRequestHandler
+        stub = self.server
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        time.sleep(stub.latency)
+        if self.path != "/v3/mail/send" or self.headers.get("Authorization") != f"Bearer {STUB_API_KEY}":
+            return self.reply(401, b'{"errors": [{"message": "unauthorized"}]}')
+        with stub.lock:
+            stub.requests += 1
+            fail = stub.rng.random() < stub.fail_rate
+            if not fail:
+                stub.delivered.extend(
+                    p.get("custom_args", {}).get("outbox_id", "") for p in request["personalizations"]
+                )
+        if fail:
+            if stub.rng.random() < 0.5:
+                return self.reply(429, b'{"errors": []}', {"Retry-After": "0.2"})
+            return self.reply(503, b"Service Unavailable")
+        self.reply(202)
+
+
+def stub_server(**kwargs) -> AbstractContextManager[StubSendGridServer]:
+    """Run a `StubSendGridServer` in a background thread for the duration of the block."""
+    return StubSendGridServer(**kwargs).running()
+
+
+def _messages(count: int) -> list[tuple[str, str, str]]:
+    rng = random.Random(1)
+    return [
+        (f"user{rng.randrange(count)}@example.com", *ALERTS[i % len(ALERTS)]) for i in range(count)
+    ]
+
+
+def _run_sync(url: str, messages: list[tuple[str, str, str]]) -> tuple[list[float], float]:
+    latencies = []
+    started = time.perf_counter()
+    for to, subject, text in messages:
+        call_started = time.perf_counter()
+        # Like the SendGrid SDK, a new connection per call.
+        httpx.post(
+            f"{url}/v3/mail/send",
+            headers={"Authorization": f"Bearer {STUB_API_KEY}"},
+            json={
+                "from": {"email": SENDER},
+                "personalizations": [{"to": [{"email": to}], "subject": subject}],
+                "content": [{"type": "text/plain", "value": text}],
+            },
+        )
+        latencies.append(time.perf_counter() - call_started)
+    return latencies, time.perf_counter() - started
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=300)
+    parser.add_argument("--latency-ms", type=float, default=150.0, help="stub latency per request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of failed requests")
+    parser.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args(argv)
+    messages = _messages(args.messages)
+    rows = []
+
+    with stub_server(latency=args.latency_ms / 1000, fail_rate=args.fail_rate) as server:
+        latencies, total = _run_sync(server.url, messages)
+        stats = summarize(latencies)
+        rows.append(["sync", stats["p50"] * 1000, stats["p95"] * 1000, total, server.requests, len(server.delivered)])
+
+    directory = tempfile.mkdtemp(prefix="email-outbox-")
+    try:
+        with stub_server(latency=args.latency_ms / 1000, fail_rate=args.fail_rate) as server:
+            outbox = EmailOutbox(
+                os.path.join(directory, "outbox.sqlite3"),
+                api_key=STUB_API_KEY,
+                from_email=SENDER,
+                host=server.url,
+                batch_size=args.batch_size,
+                flush_interval=0.2,
+                base_backoff=0.2,
+            )
+            latencies = []
+            queued = 0
+            started = time.perf_counter()
+            for to, subject, text in messages:
+                call_started = time.perf_counter()
+                queued += outbox.enqueue(to, subject, text=text) is not None
+                latencies.append(time.perf_counter() - call_started)
+            # flush() returns early while retries are scheduled for later.
+            while sum(outbox.counts().get(status, 0) for status in ("sent", "failed")) < queued:
+                outbox.flush(timeout=60)
+                time.sleep(0.05)
+            total = time.perf_counter() - started
+            outbox.close()
+            stats = summarize(latencies)
+            rows.append(
+                ["outbox", stats["p50"] * 1000, stats["p95"] * 1000, total, server.requests, len(server.delivered)]
+            )
+            print(
+                f"Outbox: {outbox.counts()}, {outbox.stats.deduplicated} duplicates dropped,"
+                f" {outbox.stats.retried} retries"
+            )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print(f"{args.messages} messages, {args.latency_ms:.0f} ms per request, fail rate {args.fail_rate:.0%}")
+    print()
+    print_table(
+        ["mode", "caller p50 [ms]", "caller p95 [ms]", "all accepted [s]", "requests", "delivered"],
+        rows,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
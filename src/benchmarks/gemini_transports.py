@@ -0,0 +1,501 @@
+"""
+Compare the ways this repository reaches Gemini on an identical workload.
+
+Paths under test:
+    - raw-httpx:     hand-written HTTP call (lower bound, used as baseline)
+    - openai-compat: OpenAI SDK pointed at `.../v1beta/openai/`
+    - genai:         native `google.genai.Client`
+    - generativeai:  legacy `google.generativeai` (REST transport)
+    - langchain:     `ChatGoogleGenerativeAI` (REST transport)
+
+All paths talk to a local stub server that speaks both the native Gemini
+REST API and the OpenAI-compatible API with a fixed, configurable latency,
+so differences between paths are client-side costs only: SDK overhead,
+request serialization and response parsing.
+
+Measured per path:
+    - client creation time
+    - non-streaming latency and its overhead over raw-httpx
+    - CPU time per call (serialization + parsing; the stub's sleep is not CPU)
+    - Python memory allocated per call (tracemalloc peak)
+    - streaming time-to-first-chunk and total stream time
+
+Usage (from the repository root):
+    python -m src.benchmarks.gemini_transports
+    python -m src.benchmarks.gemini_transports --calls 200 --paths genai openai-compat
+    python -m src.benchmarks.gemini_transports --latency-ms 0 --chunk-delay-ms 0
+"""
+
+import argparse
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import AbstractContextManager
+from typing import Any, Callable, Iterator, Optional
+
+from src.benchmarks._common import StubHandler, StubServer, print_table, summarize, timer
+
+MODEL = "gemini-2.0-flash"
+PROMPT = "Tell a light-hearted joke for an audience of Data Scientists."
+STUB_API_KEY = "stub-key"
+
+
+# --- Stub Gemini server ---
+
+
+def _native_chunk(text: str, final: bool) -> dict[str, Any]:
+    """One native generateContent response (or stream chunk)."""
+    chunk = {
+        "candidates": [
+            {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+        ],
+        "modelVersion": MODEL,
+    }
+    if final:
+        chunk["candidates"][0]["finishReason"] = "STOP"
+        chunk["usageMetadata"] = {
+            "promptTokenCount": 12,
+            "candidatesTokenCount": 40,
+            "totalTokenCount": 52,
+        }
+    return chunk
+
+
+def _openai_completion(text: str) -> dict[str, Any]:
+    return {
+        "id": "stub",
+        "object": "chat.completion",
+        "created": 0,
+        "model": MODEL,
+        "choices": [
+            {
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }
+        ],
+        "usage": {"prompt_tokens": 12, "completion_tokens": 40, "total_tokens": 52},
+    }
+
+
+def _openai_chunk(text: Optional[str], final: bool) -> dict[str, Any]:
+    return {
+        "id": "stub",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": MODEL,
+        "choices": [
+            {
+                "index": 0,
+                "delta": {} if text is None else {"content": text},
+                "finish_reason": "stop" if final else None,
+            }
+        ],
+    }
+
+
+class StubGeminiServer(StubServer):
+    """
+    Local server emulating Gemini's native REST and OpenAI-compatible APIs.
+
+    Args:
+        latency (float): Seconds before the first byte of every response.
+        chunks (int): Number of chunks in streamed responses.
+        chunk_delay (float): Seconds between streamed chunks.
+    """
+
+    def __init__(self, latency: float = 0.02, chunks: int = 8, chunk_delay: float = 0.005):
+        super().__init__(_StubHandler)
+        self.latency = latency
+        self.chunks = chunks
+        self.chunk_delay = chunk_delay
+        self.words = [f"word{i} " for i in range(chunks)]
+
+
+class _StubHandler(StubHandler):
+    server: StubGeminiServer
+
+    def _send_json(self, payload: Any) -> None:
+        self.reply(200, json.dumps(payload).encode(), {"Content-Type": "application/json"})
+
+    def _start_stream(self, content_type: str) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def _end_stream(self) -> None:
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):  # noqa: N802 - name required by BaseHTTPRequestHandler
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        stub = self.server
+        time.sleep(stub.latency)
+        full_text = "".join(stub.words)
+
+        if self.path.startswith("/v1beta/openai/chat/completions"):
+            if not request.get("stream"):
+                return self._send_json(_openai_completion(full_text))
+            self._start_stream("text/event-stream")
+            for i, word in enumerate(stub.words):
+                if i:
+                    time.sleep(stub.chunk_delay)
+                self._write_chunk(f"data: {json.dumps(_openai_chunk(word, False))}\n\n".encode())
+            self._write_chunk(f"data: {json.dumps(_openai_chunk(None, True))}\n\n".encode())
+            self._write_chunk(b"data: [DONE]\n\n")
+            return self._end_stream()
+
+        if ":streamGenerateContent" in self.path:
+            last = len(stub.words) - 1
+            if "alt=sse" in self.path:
+                self._start_stream("text/event-stream")
+                for i, word in enumerate(stub.words):
+                    if i:
+                        time.sleep(stub.chunk_delay)
+                    chunk = json.dumps(_native_chunk(word, i == last))
+                    self._write_chunk(f"data: {chunk}\r\n\r\n".encode())
+            else:
+                # google-api-core's REST transport streams a JSON array.
+                self._start_stream("application/json")
+                for i, word in enumerate(stub.words):
+                    if i:
+                        time.sleep(stub.chunk_delay)
+                    prefix = "[" if i == 0 else ","
+                    suffix = "]" if i == last else ""
+                    chunk = json.dumps(_native_chunk(word, i == last))
+                    self._write_chunk(f"{prefix}{chunk}{suffix}".encode())
+            return self._end_stream()
+
+        if ":generateContent" in self.path:
+            return self._send_json(_native_chunk(full_text, True))
+
+        self.send_error(404)
+
+
+def stub_server(**kwargs: Any) -> AbstractContextManager[StubGeminiServer]:
+    """Run a `StubGeminiServer` in a background thread for the duration of the block."""
+    return StubGeminiServer(**kwargs).running()
+
+
+# --- Transport paths ---
+
+
+class TransportPath:
+    """
+    One way of calling Gemini. Subclasses create a client and run calls.
+
+    Attributes:
+        name (str): Name shown in the results table.
+        requires (str): Module that must be importable for the path to run.
+    """
+
+    name = ""
+    requires = ""
+
+    def create_client(self, base_url: str) -> Any:
+        raise NotImplementedError
+
+    def call(self, client: Any) -> str:
+        raise NotImplementedError
+
+    def stream(self, client: Any) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class RawHttpxPath(TransportPath):
+    name = "raw-httpx"
+    requires = "httpx"
+
+    def create_client(self, base_url):
+        import httpx
+
+        self._url = f"{base_url}/v1beta/models/{MODEL}"
+        return httpx.Client(headers={"x-goog-api-key": STUB_API_KEY})
+
+    def _body(self):
+        return {"contents": [{"role": "user", "parts": [{"text": PROMPT}]}]}
+
+    def call(self, client):
+        response = client.post(f"{self._url}:generateContent", json=self._body())
+        return response.json()["candidates"][0]["content"]["parts"][0]["text"]
+
+    def stream(self, client):
+        url = f"{self._url}:streamGenerateContent?alt=sse"
+        with client.stream("POST", url, json=self._body()) as response:
+            for line in response.iter_lines():
+                if line.startswith("data: "):
+                    yield json.loads(line[6:])["candidates"][0]["content"]["parts"][0]["text"]
+
+
+class OpenAICompatPath(TransportPath):
+    name = "openai-compat"
+    requires = "openai"
+
+    def create_client(self, base_url):
+        from openai import OpenAI
+
+        return OpenAI(api_key=STUB_API_KEY, base_url=f"{base_url}/v1beta/openai/")
+
+    def _messages(self):
+        return [{"role": "user", "content": PROMPT}]
+
+    def call(self, client):
+        response = client.chat.completions.create(model=MODEL, messages=self._messages())
+        return response.choices[0].message.content
+
+    def stream(self, client):
+        response = client.chat.completions.create(
+            model=MODEL, messages=self._messages(), stream=True
+        )
+        for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+class GenaiPath(TransportPath):
+    name = "genai"
+    requires = "google.genai"
+
+    def create_client(self, base_url):
+        from google import genai
+        from google.genai import types
+
+        return genai.Client(
+            api_key=STUB_API_KEY,
+            http_options=types.HttpOptions(base_url=base_url, api_version="v1beta"),
+        )
+
+    def call(self, client):
+        return client.models.generate_content(model=MODEL, contents=PROMPT).text
+
+    def stream(self, client):
+        for chunk in client.models.generate_content_stream(model=MODEL, contents=PROMPT):
+            if chunk.text:
+                yield chunk.text
+
+
+class GenerativeaiPath(TransportPath):
+    name = "generativeai"
+    requires = "google.generativeai"
+
+    def create_client(self, base_url):
+        import google.generativeai as generativeai
+
+        generativeai.configure(
+            api_key=STUB_API_KEY,
+            transport="rest",
+            client_options={"api_endpoint": base_url},
+        )
+        return generativeai.GenerativeModel(model_name=MODEL)
+
+    def call(self, client):
+        return client.generate_content(PROMPT).text
+
+    def stream(self, client):
+        for chunk in client.generate_content(PROMPT, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+
+class LangChainPath(TransportPath):
+    name = "langchain"
+    requires = "langchain_google_genai"
+
+    def create_client(self, base_url):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        return ChatGoogleGenerativeAI(
+            model=MODEL,
+            google_api_key=STUB_API_KEY,
+            transport="rest",
+            client_options={"api_endpoint": base_url},
+        )
+
+    def call(self, client):
+        return client.invoke(PROMPT).content
+
+    def stream(self, client):
+        for chunk in client.stream(PROMPT):
+            if chunk.content:
+                yield chunk.content
+
+
+PATHS: dict[str, TransportPath] = {
+    path.name: path
+    for path in (
+        RawHttpxPath(),
+        OpenAICompatPath(),
+        GenaiPath(),
+        GenerativeaiPath(),
+        LangChainPath(),
+    )
+}
+
+
+# --- Measurement ---
+
+
+def _importable(module: str) -> bool:
+    try:
+        __import__(module)
+    except ImportError:
+        return False
+    return True
+
+
+def _measure(fn: Callable[[], Any], calls: int) -> tuple[list[float], list[float]]:
+    """Run `fn` `calls` times and return (wall seconds, CPU seconds) per call."""
+    wall, cpu = [], []
+    for _ in range(calls):
+        cpu_start = time.process_time()
+        with timer() as elapsed:
+            fn()
+        wall.append(elapsed["seconds"])
+        cpu.append(time.process_time() - cpu_start)
+    return wall, cpu
+
+
+def _memory_per_call(fn: Callable[[], Any], calls: int) -> float:
+    """Average tracemalloc peak (bytes) of a call."""
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(calls):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            fn()
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+    finally:
+        tracemalloc.stop()
+    return sum(peaks) / len(peaks)
+
+
+def _stream_once(path: TransportPath, client: Any) -> tuple[float, float, int]:
+    """Return (time to first chunk, total time, chunk count) for one stream."""
+    started = time.perf_counter()
+    first = None
+    count = 0
+    for _ in path.stream(client):
+        if first is None:
+            first = time.perf_counter() - started
+        count += 1
+    return first or 0.0, time.perf_counter() - started, count
+
+
+def benchmark_path(path: TransportPath, base_url: str, calls: int, warmup: int) -> dict:
+    """
+    Benchmark one transport path against the stub server.
+
+    Args:
+        path (TransportPath): Path to measure.
+        base_url (str): Stub server URL.
+        calls (int): Measured calls per metric.
+        warmup (int): Unmeasured calls before measuring.
+
+    Returns:
+        dict: Metrics for the results table.
+    """
+    # The first client in a process also pays one-off costs (e.g. loading the
+    # CA bundle), so report the best of a few creations.
+    creations = []
+    for _ in range(3):
+        with timer() as created:
+            client = path.create_client(base_url)
+        creations.append(created["seconds"])
+    for _ in range(warmup):
+        path.call(client)
+        list(path.stream(client))
+
+    wall, cpu = _measure(lambda: path.call(client), calls)
+    memory = _memory_per_call(lambda: path.call(client), max(calls // 5, 1))
+    streams = [_stream_once(path, client) for _ in range(calls)]
+    return {
+        "create_s": min(creations),
+        "call": summarize(wall),
+        "cpu_ms": summarize(cpu)["mean"] * 1000,
+        "memory_kib": memory / 1024,
+        "ttfc": summarize([s[0] for s in streams]),
+        "stream": summarize([s[1] for s in streams]),
+        "chunks": streams[0][2] if streams else 0,
+    }
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the transport comparison and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--paths", nargs="*", default=list(PATHS), choices=list(PATHS))
+    parser.add_argument("--calls", type=int, default=50, help="measured calls per metric")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="stub time to first byte")
+    parser.add_argument("--chunks", type=int, default=8, help="chunks per streamed response")
+    parser.add_argument("--chunk-delay-ms", type=float, default=5.0)
+    args = parser.parse_args(argv)
+
+    results = {}
+    with stub_server(
+        latency=args.latency_ms / 1000,
+        chunks=args.chunks,
+        chunk_delay=args.chunk_delay_ms / 1000,
+    ) as server:
+        for name in args.paths:
+            path = PATHS[name]
+            if not _importable(path.requires):
+                print(f"Skipping {name}: {path.requires} is not installed")
+                continue
+            print(f"Benchmarking {name} ...")
+            results[name] = benchmark_path(path, server.url, args.calls, args.warmup)
+
+    if not results:
+        return 1
+    baseline = results.get("raw-httpx", {}).get("call", {}).get("p50")
+    rows = []
+    for name, metrics in results.items():
+        overhead = "" if baseline is None else (metrics["call"]["p50"] - baseline) * 1000
+        rows.append(
+            [
+                name,
+                metrics["create_s"] * 1000,
+                metrics["call"]["p50"] * 1000,
+                metrics["call"]["p95"] * 1000,
+                overhead,
+                metrics["cpu_ms"],
+                metrics["memory_kib"],
+                metrics["ttfc"]["p50"] * 1000,
+                metrics["stream"]["p50"] * 1000,
+            ]
+        )
+    print()
+    print_table(
+        [
+            "path",
+            "create [ms]",
+            "call p50 [ms]",
+            "call p95 [ms]",
+            "overhead [ms]",
+            "cpu/call [ms]",
+            "mem/call [KiB]",
+            "ttfc p50 [ms]",
+            "stream p50 [ms]",
+        ],
+        rows,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
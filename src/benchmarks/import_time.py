@@ -0,0 +1,175 @@
+"""
+Import-time benchmark for the provider SDKs and the shared `src` modules.
+
+Every module is imported in a fresh interpreter, so results are cold-start
+numbers: exactly what a CLI tool or short-lived worker pays. The interpreter
+start-up cost (`python -c pass`) is measured separately and subtracted.
+
+Usage (from the repository root):
+    python -m src.benchmarks.import_time
+    python -m src.benchmarks.import_time openai gradio --repeat 5 --top 10
+    python -m src.benchmarks.import_time --budget 1.0
+
+With `--budget`, the command exits with status 1 if any of the `src` modules
+takes longer than the budget (in seconds) to import.
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from typing import Optional
+
+from src.benchmarks._common import print_table, summarize, timer
+
+DEFAULT_MODULES = [
+    "src.utils.lazy_imports",
+    "src.utils.providers",
+    "dotenv",
+    "openai",
+    "anthropic",
+    "google.genai",
+    "google.generativeai",
+    "langchain_core",
+    "langchain_google_genai",
+    "langchain_openai",
+    "transformers",
+    "gradio",
+]
+
+# "import time:       self [us] |       cumulative | imported package"
+_IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _run(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    """Run `code` in a fresh interpreter and capture its output."""
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    cmd += ["-c", code]
+    return subprocess.run(cmd, capture_output=True, text=True)
+
+
+def interpreter_startup(repeat: int) -> float:
+    """
+    Measure the median start-up time of an empty interpreter.
+
+    Args:
+        repeat (int): Number of runs.
+
+    Returns:
+        float: Median seconds for `python -c pass`.
+    """
+    samples = []
+    for _ in range(repeat):
+        with timer() as elapsed:
+            _run("pass")
+        samples.append(elapsed["seconds"])
+    return summarize(samples)["p50"]
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[str, float]]:
+    """
+    List the sub-imports with the largest self time for `module`.
+
+    Args:
+        module (str): Module to import.
+        top (int): Number of entries to return.
+
+    Returns:
+        list[tuple[str, float]]: (module name, self seconds), slowest first.
+    """
+    result = _run(f"import {module}", importtime=True)
+    if result.returncode != 0:
+        return []
+    entries = []
+    for line in result.stderr.splitlines():
+        match = _IMPORTTIME_LINE.match(line)
+        if match:
+            entries.append((match.group(4), int(match.group(1)) / 1e6))
+    entries.sort(key=lambda entry: entry[1], reverse=True)
+    return entries[:top]
+
+
+def measure_module(module: str, repeat: int, baseline: float) -> Optional[dict]:
+    """
+    Measure the cold import time of `module`.
+
+    Args:
+        module (str): Module to import.
+        repeat (int): Number of fresh-interpreter runs.
+        baseline (float): Interpreter start-up seconds to subtract.
+
+    Returns:
+        Optional[dict]: Summary statistics in seconds, or None if the module
+        cannot be imported.
+    """
+    samples = []
+    for _ in range(repeat):
+        with timer() as elapsed:
+            result = _run(f"import {module}")
+        if result.returncode != 0:
+            return None
+        samples.append(max(elapsed["seconds"] - baseline, 0.0))
+    return summarize(samples)
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the import-time benchmark and print a table of results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per module")
+    parser.add_argument(
+        "--top", type=int, default=0, help="show the N slowest sub-imports per module"
+    )
+    parser.add_argument(
+        "--budget",
+        type=float,
+        default=None,
+        help="fail if a `src` module takes longer than this many seconds",
+    )
+    args = parser.parse_args(argv)
+
+    baseline = interpreter_startup(args.repeat)
+    print(f"Interpreter start-up (subtracted): {baseline:.3f}s\n")
+
+    rows = []
+    over_budget = []
+    for module in args.modules:
+        stats = measure_module(module, args.repeat, baseline)
+        if stats is None:
+            rows.append([module, "not installed", "", ""])
+            continue
+        rows.append([module, stats["p50"], stats["min"], stats["max"]])
+        if (
+            args.budget is not None
+            and module.startswith("src.")
+            and stats["p50"] > args.budget
+        ):
+            over_budget.append(module)
+    print_table(["module", "median [s]", "min [s]", "max [s]"], rows)
+
+    if args.top:
+        for module in args.modules:
+            entries = slowest_imports(module, args.top)
+            if not entries:
+                continue
+            print(f"\nSlowest sub-imports of {module}:")
+            print_table(["module", "self [s]"], entries)
+
+    if over_budget:
+        print(f"\nOver the {args.budget:.3f}s budget: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""
+Benchmark the durable job queue: enqueue and processing throughput.
+
+Enqueues `--jobs` jobs into a fresh SQLite queue (one transaction per job
+and batched), then drains the queue with `src.utils.job_queue.WorkerPool`
+for each combination of `--processes` and `--batch-sizes`, and prints
+jobs/s. Tasks are a no-op (pure queue overhead) or `--work-ms` of sleep
+(an I/O-bound agent step, e.g. waiting for a model).
+
+Usage (from the repository root):
+    python -m src.benchmarks.job_queue
+    python -m src.benchmarks.job_queue --jobs 5000 --processes 1 2 4 --batch-sizes 1 16 64
+    python -m src.benchmarks.job_queue --task sleep --work-ms 20 --jobs 400
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import Optional
+
+from src.benchmarks._common import print_table, timer
+from src.utils.job_queue import JobQueue, WorkerPool
+
+
+def noop(index: int) -> int:
+    """Task that does nothing (measures the queue itself)."""
+    return index
+
+
+def sleep(index: int, seconds: float) -> int:
+    """Task that waits like an I/O-bound agent step."""
+    time.sleep(seconds)
+    return index
+
+
+def _payloads(args: argparse.Namespace) -> list[dict]:
+    if args.task == "sleep":
+        return [{"index": i, "seconds": args.work_ms / 1000} for i in range(args.jobs)]
+    return [{"index": i} for i in range(args.jobs)]
+
+
+def _drain(path: str, processes: int, batch_size: int, jobs: int, timeout: float) -> float:
+    """Run a pool until `jobs` jobs are done; returns jobs/s (after worker start-up)."""
+    queue = JobQueue(path)
+    pool = WorkerPool(path, processes=processes, batch_size=batch_size, poll_interval=0.01)
+    with pool:
+        # Spawned workers take a while to import; time from the first finished job.
+        deadline = time.monotonic() + timeout
+        while queue.counts().get("done", 0) == 0:
+            if time.monotonic() > deadline:
+                raise TimeoutError("Workers did not start")
+            time.sleep(0.005)
+        started, done_at_start = time.perf_counter(), queue.counts().get("done", 0)
+        while (done := queue.counts().get("done", 0)) < jobs:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Only {done} of {jobs} jobs done after {timeout} s")
+            time.sleep(0.005)
+        elapsed = time.perf_counter() - started
+    return (jobs - done_at_start) / elapsed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 16])
+    parser.add_argument("--task", choices=["noop", "sleep"], default="noop")
+    parser.add_argument("--work-ms", type=float, default=5.0, help="sleep task: milliseconds of work per job")
+    parser.add_argument("--timeout", type=float, default=600.0)
+    args = parser.parse_args(argv)
+
+    task = f"src.benchmarks.job_queue:{args.task}"  # importable name, also when run with -m
+    payloads = _payloads(args)
+    with tempfile.TemporaryDirectory() as directory:
+        queue = JobQueue(os.path.join(directory, "enqueue.sqlite3"))
+        count = min(args.jobs, 500)
+        with timer() as single:
+            for payload in payloads[:count]:
+                queue.enqueue(task, payload)
+        with timer() as batched:
+            queue.enqueue_many(task, payloads)
+        print(f"enqueue: {count / single['seconds']:,.0f} jobs/s one by one, "
+              f"{args.jobs / batched['seconds']:,.0f} jobs/s with enqueue_many")
+
+        rows = []
+        for processes in args.processes:
+            for batch_size in args.batch_sizes:
+                print(f"  {processes} process(es), batch {batch_size} ...")
+                path = os.path.join(directory, f"run-{processes}-{batch_size}.sqlite3")
+                JobQueue(path).enqueue_many(task, payloads)
+                rows.append([processes, batch_size, _drain(path, processes, batch_size, args.jobs, args.timeout)])
+
+    print()
+    print(f"{args.jobs} {args.task} jobs" + (f" of {args.work_ms:g} ms" if args.task == "sleep" else "")
+          + f", {os.cpu_count()} CPU(s)")
+    print_table(["processes", "batch", "jobs/s"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Benchmark the dynamic-batching inference server: throughput vs. batch size.
+
+Sends `--requests` prompts of mixed length from `--concurrency` simultaneous
+clients through `src.utils.local_inference.DynamicBatcher` for each
+`--batch-sizes` limit (1 = no batching), and once more with a single
+length bucket to show what bucketing saves in padding. Prints requests/s,
+generated tokens/s, latency, the batch size actually reached and the share
+of padded prompt positions.
+
+Backends:
+    - transformers: a small Hugging Face model on the CPU (default
+      HuggingFaceTB/SmolLM2-135M-Instruct; needs `torch` and `transformers`)
+    - fake: sleeps according to a simple CPU cost model (a decode step
+      costs `--step-ms`, plus `--seq-ms` per sequence, plus attention over
+      every cached position including padding), for checking the
+      scheduler without a model
+
+Usage (from the repository root):
+    python -m src.benchmarks.local_inference
+    python -m src.benchmarks.local_inference --model sshleifer/tiny-gpt2 --batch-sizes 1 4 16
+    python -m src.benchmarks.local_inference --backend fake --requests 256 --concurrency 64
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+from typing import Optional
+
+from src.benchmarks._common import print_table, summarize
+from src.utils.local_inference import DEFAULT_BUCKETS, DynamicBatcher, Sampling, TransformersBackend
+
+_WORDS = "the model reads a prompt and writes an answer about cities rivers numbers and code".split()
+
+
+class FakeBackend:
+    """Backend that sleeps like a small CPU model instead of running one."""
+
+    eos_token_id = 0
+
+    def __init__(
+        self,
+        step_seconds: float,
+        seq_seconds: float,
+        prefill_token_seconds: float = 0.0002,
+        cached_token_seconds: float = 0.000002,
+    ):
+        self.step_seconds = step_seconds
+        self.seq_seconds = seq_seconds
+        self.prefill_token_seconds = prefill_token_seconds
+        self.cached_token_seconds = cached_token_seconds
+
+    def encode(self, text: str) -> list[int]:
+        return [hash(word) % 1000 + 1 for word in text.split()]
+
+    def encode_chat(self, messages: list) -> list[int]:
+        return self.encode(" ".join(m["content"] for m in messages))
+
+    def decode(self, token_ids: list[int]) -> str:
+        return " ".join(_WORDS[i % len(_WORDS)] for i in token_ids)
+
+    def generate(self, batch: list[list[int]], max_new_tokens: int, sampling: Sampling) -> list:
+        width = max(len(ids) for ids in batch)
+        prefill = self.prefill_token_seconds * width * len(batch)
+        step = self.step_seconds + len(batch) * (self.seq_seconds + self.cached_token_seconds * width)
+        time.sleep(prefill + max_new_tokens * step)
+        return [(list(range(1, max_new_tokens + 1)), "length") for _ in batch]
+
+
+def make_prompts(count: int, seed: int = 0) -> list[str]:
+    """Prompts of mixed length: mostly short questions, some long contexts."""
+    rng = random.Random(seed)
+    lengths = [rng.choice([8, 16, 24, 48, 96, 200, 400]) for _ in range(count)]
+    return [" ".join(rng.choice(_WORDS) for _ in range(length)) for length in lengths]
+
+
+async def _load(batcher: DynamicBatcher, prompts: list[list[int]], concurrency: int, max_new_tokens: int) -> list:
+    pending = list(prompts)
+    latencies: list[float] = []
+    tokens = 0
+
+    async def client() -> None:
+        nonlocal tokens
+        while pending:
+            prompt = pending.pop()
+            started = time.perf_counter()
+            completion = await batcher.agenerate(prompt, max_new_tokens=max_new_tokens)
+            latencies.append(time.perf_counter() - started)
+            tokens += completion.completion_tokens
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stats = summarize(latencies)
+    return [len(latencies) / elapsed, tokens / elapsed, stats["p50"] * 1000, stats["p95"] * 1000]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["transformers", "fake"], default="transformers")
+    parser.add_argument("--model", default="HuggingFaceTB/SmolLM2-135M-Instruct")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--max-new-tokens", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--step-ms", type=float, default=8.0, help="fake backend: cost of a decode step")
+    parser.add_argument("--seq-ms", type=float, default=0.8, help="fake backend: extra cost per sequence")
+    args = parser.parse_args(argv)
+
+    if args.backend == "fake":
+        backend = FakeBackend(args.step_ms / 1000, args.seq_ms / 1000)
+    else:
+        print(f"Loading {args.model} ...")
+        backend = TransformersBackend(args.model)
+    prompts = [backend.encode(prompt) for prompt in make_prompts(args.requests)]
+    # Warm up (first calls allocate buffers and load kernels).
+    warmup = DynamicBatcher(backend, max_batch_size=2, workers=args.workers)
+    warmup.submit(prompts[0], max_new_tokens=2).result()
+    warmup.close()
+
+    configurations = [(size, DEFAULT_BUCKETS) for size in args.batch_sizes]
+    configurations.append((max(args.batch_sizes), (sys.maxsize,)))  # pad everything to the longest
+    rows = []
+    for max_batch_size, buckets in configurations:
+        label = "one bucket" if len(buckets) == 1 else "buckets"
+        print(f"  max batch {max_batch_size}, {label} ...")
+        batcher = DynamicBatcher(
+            backend,
+            max_batch_size=max_batch_size,
+            max_wait=args.max_wait_ms / 1000,
+            buckets=buckets,
+            workers=args.workers,
+        )
+        try:
+            result = asyncio.run(_load(batcher, prompts, args.concurrency, args.max_new_tokens))
+        finally:
+            batcher.close()
+        stats = batcher.stats
+        rows.append([max_batch_size, label] + result + [stats.mean_batch_size, 100 * stats.padding_ratio])
+
+    print()
+    print(
+        f"{args.requests} requests, {args.concurrency} clients, {args.max_new_tokens} new tokens each, "
+        f"{args.workers} worker(s), backend {args.backend}"
+    )
+    print_table(
+        ["max batch", "grouping", "req/s", "tokens/s", "p50 [ms]", "p95 [ms]", "mean batch", "padding [%]"],
+        rows,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Benchmark the MCP tool server: tool calls/sec from simultaneous clients.
+
+Starts `src.tools.mcp_server` with streamable HTTP in a subprocess (once
+with the result cache, once without) and connects `--clients` MCP client
+sessions at the same time. Each session calls one tool in a loop for
+`--seconds`:
+
+    - ping: protocol round trip only (baseline)
+    - fetch: a page from a local stub web server with `--latency-ms`
+      latency (cached / uncached)
+    - run_python: a small snippet in the sandbox pool
+
+Usage (from the repository root):
+    python -m src.benchmarks.mcp_server
+    python -m src.benchmarks.mcp_server --clients 1 8 32 64 --seconds 5 --latency-ms 100
+"""
+
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+from src.benchmarks._common import StubHandler, StubServer, print_table, summarize
+
+PAGE = (
+    "<!DOCTYPE html><html><head><title>Stub article</title></head><body><article>"
+    + "<h1>Stub article</h1>"
+    + "<p>Model Context Protocol servers expose tools to agents.</p>" * 50
+    + "</article></body></html>"
+).encode()
+
+
+class _PageHandler(StubHandler):
+    def do_GET(self):  # noqa: N802 - name required by BaseHTTPRequestHandler
+        time.sleep(self.server.latency)
+        self.reply(200, PAGE, {"Content-Type": "text/html; charset=utf-8"})
+
+
+@contextmanager
+def page_server(latency: float) -> Iterator[str]:
+    """Serve `PAGE` with a fixed latency; yields the base URL."""
+    server = StubServer(_PageHandler)
+    server.latency = latency
+    with server.running():
+        yield server.url
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def mcp_server(cache_ttl: float, sandbox_size: int) -> Iterator[str]:
+    """Run the MCP server over streamable HTTP; yields its endpoint URL."""
+    port = _free_port()
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "src.tools.mcp_server",
+            "--transport", "streamable-http",
+            "--port", str(port),
+            "--cache-ttl", str(cache_ttl),
+            "--sandbox-size", str(sandbox_size),
+            # Startup errors and warnings still reach the terminal; per-request logs do not.
+            "--log-level", "WARNING",
+        ],
+    )
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=1).close()
+                break
+            except OSError:
+                if process.poll() is not None or time.monotonic() > deadline:
+                    raise RuntimeError("MCP server did not start") from None
+                time.sleep(0.1)
+        yield f"http://127.0.0.1:{port}/mcp"
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+async def _client(url: str, tool: str, arguments: dict, seconds: float, latencies: list, errors: list) -> None:
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            deadline = time.perf_counter() + seconds
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                if tool == "ping":
+                    await session.send_ping()
+                else:
+                    result = await session.call_tool(tool, arguments)
+                    if result.isError:
+                        errors.append(result.content)
+                latencies.append(time.perf_counter() - started)
+
+
+async def _run(url: str, tool: str, arguments: dict, clients: int, seconds: float) -> list:
+    latencies: list[float] = []
+    errors: list = []
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(_client(url, tool, arguments, seconds, latencies, errors) for _ in range(clients))
+    )
+    elapsed = time.perf_counter() - started
+    stats = summarize(latencies)
+    return [clients, len(latencies) / elapsed, stats["p50"] * 1000, stats["p95"] * 1000, len(errors)]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--latency-ms", type=float, default=100.0, help="stub web page latency")
+    parser.add_argument("--sandbox-size", type=int, default=2)
+    args = parser.parse_args(argv)
+
+    rows = []
+    with page_server(args.latency_ms / 1000) as page_url:
+        fetch = {"url": f"{page_url}/article", "max_length": 2000}
+        code = {"code": "print(sum(i * i for i in range(1000)))"}
+        for cache_ttl, label in ((300.0, "cached"), (0.0, "uncached")):
+            print(f"Starting the MCP server ({label}) ...")
+            with mcp_server(cache_ttl, args.sandbox_size) as url:
+                scenarios = [("fetch", fetch)]
+                if cache_ttl:
+                    scenarios = [("ping", {})] + scenarios + [("run_python", code)]
+                for tool, arguments in scenarios:
+                    name = f"{tool} ({label})" if tool == "fetch" else tool
+                    for clients in args.clients:
+                        print(f"  {name}, {clients} clients ...")
+                        rows.append([name] + asyncio.run(_run(url, tool, arguments, clients, args.seconds)))
+
+    print()
+    print_table(["tool", "clients", "calls/s", "p50 [ms]", "p95 [ms]", "errors"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
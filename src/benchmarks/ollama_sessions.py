@@ -0,0 +1,261 @@
+"""
+Benchmark Ollama context reuse: prompt evaluation per turn as chats grow.
+
+Runs the same `--turns`-turn conversation twice: once resending the full
+`messages` array to `/api/chat` every turn (as in
+`playground/ollama/ollama_ex_llama_3_2.py`), once through
+`src.utils.ollama_sessions.OllamaSessions`, which sends only the new
+message with the previous turn's `context`. Prints the prompt tokens the
+server evaluated and the time it took, per turn and in total, using the
+`prompt_eval_count` / `prompt_eval_duration` Ollama reports. Pick
+`--num-ctx` small enough that the chat outgrows it to see what happens
+past the window; `--sessions` interleaves several conversations.
+
+Backends:
+    - ollama: a running Ollama server (OLLAMA_HOST or localhost)
+    - fake: an in-process stand-in that models what the server does with
+      a prompt: a KV cache per slot (`--slots`) that reuses the longest
+      common token prefix, `/api/chat` dropping the oldest messages beyond
+      `num_ctx`, and `--prefill-ms` per evaluated token
+
+Usage (from the repository root):
+    python -m src.benchmarks.ollama_sessions --model llama3.2:1b
+    python -m src.benchmarks.ollama_sessions --model llama3.2:1b --num-ctx 2048 --turns 30
+    python -m src.benchmarks.ollama_sessions --backend fake --sessions 4 --slots 4
+"""
+
+import argparse
+import json
+import random
+import sys
+import zlib
+from typing import Optional
+
+import httpx
+
+from src.benchmarks._common import print_table
+from src.utils.ollama_sessions import OllamaSessions
+from src.utils.providers import ollama_host
+
+_WORDS = (
+    "river city model answer question history detail reason example summary compare "
+    "explain number longer shorter north south water bridge travel season market"
+).split()
+_HEADER, _END_OF_TURN = 1, 2
+_ROLES = {"system": 3, "user": 4, "assistant": 5}
+
+
+def _encode(text: str) -> list[int]:
+    """Fake tokenizer: one token per 4 characters (roughly English BPE)."""
+    return [zlib.crc32(text[i:i + 4].encode()) % 30000 + 10 for i in range(0, len(text), 4)]
+
+
+def _render(role: str, content: str) -> list[int]:
+    return [_HEADER, _ROLES[role]] + _encode(content) + [_END_OF_TURN]
+
+
+def _common_prefix(a: list[int], b: list[int]) -> int:
+    n = min(len(a), len(b))
+    for i in range(n):
+        if a[i] != b[i]:
+            return i
+    return n
+
+
+class FakeOllama:
+    """
+    In-process Ollama stand-in (an `httpx.MockTransport` handler).
+
+    Args:
+        num_ctx (int): Default context window.
+        slots (int): Parallel sequences, each with its own KV cache.
+        prefill_seconds (float): Cost of evaluating one prompt token.
+        decode_seconds (float): Cost of generating one token.
+    """
+
+    def __init__(self, num_ctx: int, slots: int, prefill_seconds: float, decode_seconds: float = 0.02):
+        self.num_ctx = num_ctx
+        self.prefill_seconds = prefill_seconds
+        self.decode_seconds = decode_seconds
+        self.slots: list[list[int]] = [[] for _ in range(slots)]
+        self.requests = 0
+
+    def _evaluate(self, tokens: list[int], num_predict: int) -> tuple[str, list[int], dict]:
+        """Run a prompt: reuse the best slot's cache, 'generate', update the slot."""
+        best = max(range(len(self.slots)), key=lambda i: _common_prefix(self.slots[i], tokens))
+        reused = _common_prefix(self.slots[best], tokens)
+        if reused == 0:  # nothing shared: take the least recently used slot
+            best = 0
+        self.slots.append(self.slots.pop(best))
+        evaluated = max(1, len(tokens) - reused)
+
+        rng = random.Random(self.requests)
+        self.requests += 1
+        text = ""
+        while len(_encode(text)) < num_predict:
+            text += rng.choice(_WORDS) + " "
+        text = text[: num_predict * 4].strip()
+        output = _encode(text) + [_END_OF_TURN]
+        self.slots[-1] = tokens + output
+        timings = {
+            "prompt_eval_count": evaluated,
+            "prompt_eval_duration": int(evaluated * self.prefill_seconds * 1e9),
+            "eval_count": len(output),
+            "eval_duration": int(len(output) * self.decode_seconds * 1e9),
+        }
+        timings["total_duration"] = timings["prompt_eval_duration"] + timings["eval_duration"]
+        return text, tokens + output, timings
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        options = body.get("options", {})
+        num_ctx = options.get("num_ctx", self.num_ctx)
+        num_predict = options.get("num_predict", 128)
+
+        if request.url.path == "/api/chat":
+            messages = body["messages"]
+            system = [m for m in messages if m["role"] == "system"]
+            rest = [m for m in messages if m["role"] != "system"]
+
+            def render(kept: list[dict]) -> list[int]:
+                return [t for m in system + kept for t in _render(m["role"], m["content"])] + [_HEADER, _ROLES["assistant"]]
+
+            # Like Ollama: drop the oldest messages until the prompt fits.
+            while len(rest) > 1 and len(render(rest)) > num_ctx:
+                rest = rest[1:]
+            text, _, timings = self._evaluate(render(rest), num_predict)
+            return httpx.Response(200, json={"message": {"role": "assistant", "content": text}, "done": True, **timings})
+
+        tokens = list(body.get("context") or [])
+        if not tokens and body.get("system"):
+            tokens += _render("system", body["system"])
+        tokens += _render("user", body["prompt"]) + [_HEADER, _ROLES["assistant"]]
+        if len(tokens) > num_ctx:  # context shift: keep the start, drop the oldest half
+            tokens = tokens[:4] + tokens[-(num_ctx // 2):]
+        text, context, timings = self._evaluate(tokens, num_predict)
+        final = {"response": text, "done": True, "context": context, **timings}
+        if not body.get("stream", True):
+            return httpx.Response(200, json=final)
+        words = text.split(" ")
+        lines = [json.dumps({"response": (" " if i else "") + word, "done": False}) for i, word in enumerate(words)]
+        lines.append(json.dumps({**final, "response": ""}))
+        return httpx.Response(200, content="\n".join(lines).encode())
+
+
+def make_messages(turns: int, tokens: int, seed: int = 0) -> list[str]:
+    """User messages of about `tokens` tokens each."""
+    rng = random.Random(seed)
+    messages = []
+    for turn in range(turns):
+        words = [rng.choice(_WORDS) for _ in range(tokens * 4 // 6)]
+        messages.append(f"Question {turn + 1}: " + " ".join(words) + "?")
+    return messages
+
+
+def run_full_history(client: httpx.Client, args: argparse.Namespace, conversations: list[list[str]]) -> list[list]:
+    """Resend every conversation's history to /api/chat each turn; (tokens, seconds) per turn and session."""
+    histories = [[{"role": "system", "content": args.system}] for _ in conversations]
+    results = []
+    for turn in range(args.turns):
+        row = []
+        for history, messages in zip(histories, conversations):
+            history.append({"role": "user", "content": messages[turn]})
+            response = client.post("/api/chat", json={
+                "model": args.model, "messages": history, "stream": False, "options": args.options,
+            })
+            response.raise_for_status()
+            data = response.json()
+            history.append(data["message"])
+            row.append((data.get("prompt_eval_count", 0), data.get("prompt_eval_duration", 0) / 1e9, None))
+        results.append(row)
+    return results
+
+
+def run_sessions(client: httpx.Client, args: argparse.Namespace, conversations: list[list[str]]) -> list[list]:
+    """Run the conversations through `OllamaSessions`; (tokens, seconds, rebuild reason) per turn and session."""
+    sessions = OllamaSessions(args.model, system=args.system, options=args.options, client=client)
+    results = []
+    for turn in range(args.turns):
+        row = []
+        for index, messages in enumerate(conversations):
+            result = sessions.chat(f"session-{index}", messages[turn])
+            row.append((result.prompt_eval_count, result.prompt_eval_seconds, result.rebuild_reason))
+        results.append(row)
+    return results
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--backend", choices=["ollama", "fake"], default="ollama")
+    parser.add_argument("--model", default="llama3.2:latest")
+    parser.add_argument("--turns", type=int, default=24)
+    parser.add_argument("--sessions", type=int, default=1, help="conversations interleaved turn by turn")
+    parser.add_argument("--num-ctx", type=int, default=2048)
+    parser.add_argument("--message-tokens", type=int, default=60)
+    parser.add_argument("--reply-tokens", type=int, default=80, help="num_predict")
+    parser.add_argument("--system", default="You are a helpful assistant. Answer briefly.")
+    parser.add_argument("--slots", type=int, default=1, help="fake backend: parallel KV cache slots")
+    parser.add_argument("--prefill-ms", type=float, default=5.0, help="fake backend: cost per prompt token")
+    args = parser.parse_args(argv)
+    args.options = {"num_ctx": args.num_ctx, "num_predict": args.reply_tokens, "temperature": 0, "seed": 1}
+
+    conversations = [make_messages(args.turns, args.message_tokens, seed=s) for s in range(args.sessions)]
+    results = {}
+    for mode, run in [("full history", run_full_history), ("context", run_sessions)]:
+        print(f"  {mode} ...")
+        if args.backend == "fake":
+            transport = httpx.MockTransport(FakeOllama(args.num_ctx, args.slots, args.prefill_ms / 1000))
+            client = httpx.Client(transport=transport, base_url="http://fake-ollama")
+        else:
+            client = httpx.Client(base_url=ollama_host(), timeout=600)
+        try:
+            results[mode] = run(client, args, conversations)
+        except httpx.ConnectError:
+            print(f"Could not connect to Ollama at {ollama_host()}; start it or use --backend fake")
+            return 1
+        finally:
+            client.close()
+
+    rows = []
+    for turn in range(args.turns):
+        row = [turn + 1]
+        for mode in results:
+            per_session = results[mode][turn]
+            row.append(sum(r[0] for r in per_session) / len(per_session))
+            row.append(sum(r[1] for r in per_session) / len(per_session) * 1000)
+        reasons = sorted({r[2] for r in results["context"][turn] if r[2]})
+        row.append(", ".join(reasons))
+        rows.append(row)
+    totals = ["total"]
+    for mode in results:
+        totals.append(sum(r[0] for row in results[mode] for r in row))
+        totals.append(sum(r[1] for row in results[mode] for r in row) * 1000)
+    rows.append(totals + [""])
+
+    print()
+    print(
+        f"{args.turns} turns x {args.sessions} session(s), num_ctx {args.num_ctx}, "
+        f"~{args.message_tokens} tokens per message, {args.reply_tokens} per reply, backend {args.backend}"
+        + (f" ({args.slots} slot(s))" if args.backend == "fake" else "")
+    )
+    print_table(
+        ["turn", "chat prompt tokens", "chat prompt [ms]", "context prompt tokens", "context prompt [ms]", "rebuilt"],
+        rows,
+    )
+    chat_seconds, context_seconds = totals[2], totals[4]
+    if context_seconds:
+        print(f"\nprompt evaluation: full history {chat_seconds / context_seconds:.2f}x the time of context reuse")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+Benchmark the Polygon market-data tool: cache hits, incremental fetches and
+concurrent ticker lists.
+
+A stub REST client generates minute bars for weekdays (390 per day) and
+sleeps `--latency-ms` per request, standing in for api.polygon.io. The
+workload is what finance agents do: ask for the same tickers again, then
+for a slightly longer range. Compared against the uncached baseline that
+downloads every request and builds the DataFrame from per-bar dicts.
+
+Usage (from the repository root):
+    python -m src.benchmarks.polygon_market_data
+    python -m src.benchmarks.polygon_market_data --tickers 20 --days 60 --workers 1 4 8
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from src.benchmarks._common import print_table
+from src.tools.polygon_market_data import MarketData, TIMESPAN_SECONDS
+
+START = date(2024, 3, 4)
+
+
+class _Response:
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+class StubRESTClient:
+    """Serves synthetic aggregates in Polygon's raw response format."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def get_aggs(self, ticker, multiplier, timespan, from_, to, raw=False, **kwargs):
+        time.sleep(self.latency)
+        step_ms = TIMESPAN_SECONDS[timespan] * multiplier * 1000
+        results = []
+        day = date.fromisoformat(from_)
+        price = 100.0 + sum(map(ord, ticker)) % 50
+        while day <= date.fromisoformat(to):
+            if day.weekday() < 5:
+                opening = datetime(day.year, day.month, day.day, 14, 30, tzinfo=timezone.utc)
+                t = int(opening.timestamp() * 1000)
+                for i in range(390 * 60_000 // step_ms if step_ms < 86_400_000 else 1):
+                    price += ((i * 7919) % 13 - 6) * 0.01
+                    results.append(
+                        {"v": 1000 + i, "vw": price, "o": price, "c": price + 0.01,
+                         "h": price + 0.05, "l": price - 0.05, "t": t + i * step_ms, "n": 10}
+                    )
+            day += timedelta(days=1)
+        return _Response(json.dumps({"ticker": ticker, "status": "OK", "results": results}).encode())
+
+
+def _uncached(client: StubRESTClient, ticker: str, start: date, end: date):
+    """What a tool without the cache does: download and build from dicts."""
+    import pandas as pd
+
+    body = client.get_aggs(ticker, 1, "minute", start.isoformat(), end.isoformat(), raw=True)
+    frame = pd.DataFrame(json.loads(body.data)["results"])
+    frame["t"] = pd.to_datetime(frame["t"], unit="ms", utc=True)
+    return frame.set_index("t")
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--tickers", type=int, default=8)
+    parser.add_argument("--days", type=int, default=20, help="calendar days per request")
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args(argv)
+
+    latency = args.latency_ms / 1000
+    tickers = [f"T{i:03d}" for i in range(args.tickers)]
+    end = START + timedelta(days=args.days - 1)
+    longer_end = end + timedelta(days=max(1, args.days // 4))
+    client = StubRESTClient(latency)
+
+    rows = []
+    started = time.perf_counter()
+    bars = sum(len(_uncached(client, ticker, START, end)) for ticker in tickers)
+    rows.append(["uncached, serial", time.perf_counter() - started, len(tickers), bars])
+
+    for workers in args.workers:
+        root = tempfile.mkdtemp(prefix="market-data-")
+        try:
+            data = MarketData(
+                cache_dir=root,
+                requests_per_minute=None,
+                max_workers=workers,
+                client_factory=lambda: StubRESTClient(latency),
+            )
+            for name, range_end in (("cold", end), ("warm", end), ("extended range", longer_end)):
+                requests = data.requests
+                started = time.perf_counter()
+                frames = data.get_bars_many(tickers, START, range_end, timespan="minute")
+                rows.append(
+                    [
+                        f"cache, {workers} workers, {name}",
+                        time.perf_counter() - started,
+                        data.requests - requests,
+                        sum(len(frame) for frame in frames.values()),
+                    ]
+                )
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print(f"{len(tickers)} tickers, minute bars, {args.days} days, {args.latency_ms:.0f} ms per request")
+    print()
+    print_table(["scenario", "time [s]", "requests", "bars"], rows)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
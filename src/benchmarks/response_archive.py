@@ -0,0 +1,170 @@
+"""
+Benchmark the Parquet response archive: write throughput and query latency.
+
+Writes synthetic responses for several models over several days through
+`ResponseArchive.append()` (background batched writes), then times:
+
+    - model + date query (partition pruning)
+    - prompt-hash lookup across the whole archive (row-group statistics)
+    - streaming aggregation of one column with `iter_batches()`
+    - the naive alternative: `pandas.read_parquet()` of everything, then filter
+
+and the resident memory each read path adds; the first three queries are
+repeated after `compact()` merged the small files.
+
+Usage (from the repository root):
+    python -m src.benchmarks.response_archive
+    python -m src.benchmarks.response_archive --records 1000000 --keep /tmp/archive
+"""
+
+import argparse
+import datetime as dt
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+from src.benchmarks._common import print_table
+from src.utils.response_archive import ResponseArchive, prompt_hash
+
+MODELS = ["gemini-1.5-flash", "gemini-2.0-flash", "gpt-4o-mini", "llama3.2"]
+
+
+def _rss_mib() -> float:
+    try:
+        import psutil
+    except ImportError:
+        return float("nan")
+    return psutil.Process().memory_info().rss / 2**20
+
+
+def _measure(fn: Callable[[], Any]) -> tuple[float, float, Any]:
+    """Return (seconds, RSS growth in MiB, result)."""
+    before = _rss_mib()
+    started = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - started
+    return seconds, _rss_mib() - before, result
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--records", type=int, default=200_000)
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--prompts", type=int, default=20_000, help="distinct prompts")
+    parser.add_argument("--response-chars", type=int, default=600)
+    parser.add_argument("--keep", help="write the archive here and keep it")
+    args = parser.parse_args(argv)
+
+    root = args.keep or tempfile.mkdtemp(prefix="response-archive-")
+    rng = random.Random(0)
+    start_day = dt.datetime(2025, 6, 1, tzinfo=dt.timezone.utc)
+    filler = "lorem ipsum dolor sit amet " * (args.response_chars // 27 + 1)
+    try:
+        archive = ResponseArchive(root)
+        print(f"Appending {args.records} records to {root} ...")
+        started = time.perf_counter()
+        for i in range(args.records):
+            archive.append(
+                f"Prompt number {rng.randrange(args.prompts)}",
+                f"Response {i}: {filler[: args.response_chars]}",
+                model=MODELS[i % len(MODELS)],
+                params={"temperature": 0.7, "max_output_tokens": 512},
+                latency_seconds=rng.uniform(0.2, 3.0),
+                prompt_tokens=rng.randrange(10, 200),
+                completion_tokens=rng.randrange(50, 500),
+                timestamp=start_day + dt.timedelta(seconds=i * args.days * 86400 / args.records),
+            )
+        append_seconds = time.perf_counter() - started
+        archive.flush()
+        total_seconds = time.perf_counter() - started
+        archive.close()
+        size_mib = sum(
+            os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(root) for f in files
+        ) / 2**20
+
+        print()
+        print_table(
+            ["records", "append [s]", "appends/s", "on disk [s]", "records/s", "files", "size [MiB]"],
+            [
+                [
+                    args.records,
+                    append_seconds,
+                    args.records / append_seconds,
+                    total_seconds,
+                    args.records / total_seconds,
+                    archive.files_written,
+                    size_mib,
+                ]
+            ],
+        )
+
+        day = (start_day + dt.timedelta(days=args.days // 2)).date()
+        digest = prompt_hash("Prompt number 42")
+        reads = [
+            (
+                "model+date",
+                lambda: archive.query(model=MODELS[0], date=day, columns=["prompt", "response"]),
+            ),
+            ("prompt hash", lambda: archive.query(prompt_hash=digest)),
+            (
+                "model+hash",
+                lambda: archive.query(model=MODELS[1], prompt_hash=digest, columns=["response"]),
+            ),
+            (
+                "mean latency (streamed)",
+                lambda: _mean_latency(archive),
+            ),
+            (
+                "pandas full load+filter",
+                lambda: _pandas_full_load(root, digest),
+            ),
+        ]
+        rows = []
+        for name, read in reads:
+            seconds, rss, result = _measure(read)
+            count = len(result) if hasattr(result, "__len__") else result
+            rows.append([name, seconds * 1000, rss, count])
+        compact_seconds, _, removed = _measure(archive.compact)
+        print(f"Compacted {removed} files away in {compact_seconds:.2f} s")
+        for name, read in reads[:3]:
+            seconds, rss, result = _measure(read)
+            rows.append([f"{name} (compacted)", seconds * 1000, rss, len(result)])
+        print()
+        print_table(["query", "time [ms]", "RSS growth [MiB]", "rows/result"], rows)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+    return 0
+
+
+def _mean_latency(archive: ResponseArchive) -> float:
+    total, count = 0.0, 0
+    for batch in archive.iter_batches(columns=["latency_seconds"]):
+        column = batch.column(0)
+        total += sum(column.to_pylist())
+        count += len(column)
+    return round(total / count, 4) if count else 0.0
+
+
+def _pandas_full_load(root: str, digest: str):
+    import pandas as pd
+
+    df = pd.read_parquet(root)
+    return df[df["prompt_hash"] == digest]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
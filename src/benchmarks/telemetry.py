@@ -0,0 +1,161 @@
+"""
+Benchmark the overhead of run telemetry and show what a profile reports.
+
+Runs a small LangChain agent step (prompt -> fake chat model -> parser,
+then some post-processing in our own code) repeatedly:
+
+    - off: no trace active (spans and callbacks are no-ops)
+    - trace: spans + LangChain callback + resource sampling
+    - trace+profile: plus stack sampling every `--interval-ms`
+
+and prints the time per run and the overhead, followed by the span totals
+and the hot paths found in the profiled run. Finally it times the
+per-request path of `TelemetryMiddleware` on a trivial ASGI app (no
+middleware, traced, traced with `X-Profile: 1`).
+
+Usage (from the repository root):
+    python -m src.benchmarks.telemetry
+    python -m src.benchmarks.telemetry --runs 500 --interval-ms 1 --out data/traces
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from typing import Optional
+
+from src.benchmarks._common import print_table
+from src.utils.telemetry import TelemetryMiddleware, langchain_callback, span, trace
+
+
+def _build_chain():
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+    from langchain_core.output_parsers import StrOutputParser
+    from langchain_core.prompts import ChatPromptTemplate
+
+    reply = json.dumps({"items": [{"id": i, "score": (i * 37) % 101} for i in range(200)]})
+    prompt = ChatPromptTemplate.from_messages(
+        [("system", "You rank search results."), ("user", "{question}")]
+    )
+    return prompt | FakeListChatModel(responses=[reply]) | StrOutputParser()
+
+
+def _rank(text: str) -> list[dict]:
+    """Post-processing in our own code: parse, score and sort."""
+    items = json.loads(text)["items"]
+    for item in items:
+        item["rank_score"] = sum((item["score"] * k) % 7 for k in range(50))
+    return sorted(items, key=lambda item: item["rank_score"], reverse=True)[:10]
+
+
+def _step(chain, callbacks: list) -> list[dict]:
+    text = chain.invoke({"question": "best results?"}, config={"callbacks": callbacks})
+    with span("rank", kind="tool"):
+        return _rank(text)
+
+
+async def _hello_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+async def _requests(app, count: int, headers: list) -> float:
+    """Seconds per request for `count` sequential requests through `app`."""
+    scope = {"type": "http", "method": "GET", "path": "/hello", "headers": headers}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await app(scope, receive, send)
+    return (time.perf_counter() - started) / count
+
+
+def _middleware_rows(count: int) -> list[list]:
+    # output_dir=None: profiled requests would otherwise each write a trace.
+    middleware = TelemetryMiddleware(_hello_app, output_dir=None)
+    cases = [
+        ("no middleware", _hello_app, []),
+        ("middleware", middleware, []),
+        ("middleware, X-Profile", middleware, [(b"x-profile", b"1")]),
+    ]
+    rows = []
+    for label, app, headers in cases:
+        per_request = asyncio.run(_requests(app, count, headers))
+        rows.append([label, count, per_request * 1000])
+    return rows
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--interval-ms", type=float, default=5.0, help="profiler sampling interval")
+    parser.add_argument("--out", help="write the profiled trace (.json, .folded) here")
+    parser.add_argument("--requests", type=int, default=500, help="requests through the ASGI middleware")
+    args = parser.parse_args(argv)
+    chain = _build_chain()
+    for _ in range(10):
+        _step(chain, [])
+
+    rows = []
+    baseline = None
+    profiled = None
+    for mode in ("off", "trace", "trace+profile"):
+        callbacks = [] if mode == "off" else [langchain_callback()]
+        started = time.perf_counter()
+        if mode == "off":
+            for _ in range(args.runs):
+                _step(chain, callbacks)
+        else:
+            with trace(
+                "agent-step",
+                profile=mode == "trace+profile",
+                profile_interval=args.interval_ms / 1000,
+                output_dir=args.out if mode == "trace+profile" else None,
+            ) as run:
+                for _ in range(args.runs):
+                    _step(chain, callbacks)
+            if mode == "trace+profile":
+                profiled = run
+        per_run = (time.perf_counter() - started) / args.runs
+        baseline = baseline or per_run
+        rows.append([mode, per_run * 1000, 100 * (per_run / baseline - 1)])
+
+    print(f"{args.runs} runs of one agent step")
+    print()
+    print_table(["mode", "ms/run", "overhead [%]"], rows)
+    print()
+    print_table(
+        ["span", "count", "wall [ms]", "cpu [ms]"],
+        [
+            [f"{s['kind']}:{s['name']}", s["count"], s["seconds"] * 1000, s["cpu_seconds"] * 1000]
+            for s in profiled.span_totals()[:8]
+        ],
+    )
+    print()
+    print(f"Profile: {profiled.profiler.samples} samples, {profiled.profiler.waiting_samples} waiting")
+    print_table(
+        ["hot path (own code)", "samples", "% busy", "self"],
+        [[h["function"], h["samples"], h["percent"], h["self_samples"]] for h in profiled.profiler.hot_paths(8)],
+    )
+    print()
+    print_table(["ASGI path", "requests", "ms/request"], _middleware_rows(args.requests))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""
+Benchmark Wikipedia lookups: online API vs. the local FTS5 index.
+
+Builds an index from a dump (by default a generated XML dump of
+`--articles` synthetic articles; or `--dump` for a real one) and times:
+
+    - local search / local page: queries answered by the index
+    - online search / online page: lookups through the online fallback,
+      first uncached, then again from the fallback cache
+
+Online lookups go to a stub with `--latency-ms` latency per call by
+default, or to the real Wikipedia API with `--live` (needs the
+`wikipedia` package and network access).
+
+Usage (from the repository root):
+    python -m src.benchmarks.wikipedia_offline
+    python -m src.benchmarks.wikipedia_offline --articles 100000 --queries 500
+    python -m src.benchmarks.wikipedia_offline --live --dump simplewiki-latest-pages-articles.xml.bz2
+"""
+
+import argparse
+import bz2
+import os
+import random
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Callable, Optional
+from xml.sax.saxutils import escape
+
+from src.benchmarks._common import print_table, summarize
+from src.tools.wikipedia_offline import WikipediaIndex
+
+_WORDS = (
+    "algorithm river empire theorem protein galaxy language symphony railway volcano "
+    "parliament bacteria novel harbour satellite cathedral equation mineral dynasty "
+    "telescope glacier treaty enzyme orchestra reactor desert monastery compiler "
+    "archipelago manuscript"
+).split()
+_SYLLABLES = "ka lo mi ra te su no vi de pa ri gu ze ol an ber cor fin tal wen".split()
+
+
+class StubWikipedia:
+    """Stand-in for the `wikipedia` package with a fixed latency per call."""
+
+    class PageError(LookupError):
+        pass
+
+    exceptions = SimpleNamespace(PageError=PageError)
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    def search(self, query: str, results: int = 10) -> list[str]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return [f"Online {query} {i}" for i in range(results)]
+
+    def page(self, title: str, auto_suggest: bool = True):
+        self.calls += 1
+        time.sleep(self.latency)
+        return SimpleNamespace(
+            title=title,
+            content=f"{title} is an article fetched online. It has a few sentences. " * 20,
+            url=f"https://en.wikipedia.org/wiki/{title.replace(' ', '_')}",
+        )
+
+
+def write_dump(path: str, articles: int, seed: int = 0) -> list[str]:
+    """Write a bz2 MediaWiki XML dump of synthetic articles; returns their titles."""
+    rng = random.Random(seed)
+    # Zipf-distributed vocabulary, so common words match many articles and
+    # rare words few, as in real text.
+    vocabulary = _WORDS + sorted(
+        {"".join(rng.choices(_SYLLABLES, k=rng.randint(2, 4))) for _ in range(5000)} - set(_WORDS)
+    )
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    titles = []
+    with bz2.open(path, "wt", encoding="utf-8") as dump:
+        dump.write('<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">\n')
+        for i in range(articles):
+            title = f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS)} {i}"
+            titles.append(title)
+            paragraphs = []
+            for _ in range(rng.randint(3, 8)):
+                sentences = [
+                    " ".join(rng.choices(vocabulary, weights, k=rng.randint(6, 14))).capitalize()
+                    + f" [[{rng.choice(_WORDS).title()}|{rng.choice(_WORDS)}]]{{{{cite web|url=x}}}}."
+                    for _ in range(rng.randint(2, 6))
+                ]
+                paragraphs.append(" ".join(sentences))
+            text = f"'''{title}''' is a topic.\n\n== History ==\n" + "\n\n".join(paragraphs)
+            dump.write(
+                f"<page><title>{escape(title)}</title><ns>0</ns><revision><text>"
+                f"{escape(text)}</text></revision></page>\n"
+            )
+            if i % 50 == 0:
+                dump.write(
+                    f"<page><title>Alias {i}</title><ns>0</ns><redirect title=\"{escape(title)}\" />"
+                    f"<revision><text>#REDIRECT [[{escape(title)}]]</text></revision></page>\n"
+                )
+        dump.write("</mediawiki>\n")
+    return titles
+
+
+def _time(calls: list[Callable[[], object]]) -> list:
+    latencies = []
+    for call in calls:
+        started = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - started)
+    stats = summarize(latencies)
+    return [len(latencies), stats["p50"] * 1000, stats["p95"] * 1000, stats["mean"] * 1000]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the benchmark and print the results.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--articles", type=int, default=20000, help="size of the generated dump")
+    parser.add_argument("--dump", help="use this dump instead of a generated one")
+    parser.add_argument("--queries", type=int, default=200, help="local queries per kind")
+    parser.add_argument("--online-queries", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="stub API latency")
+    parser.add_argument("--live", action="store_true", help="use the real Wikipedia API")
+    args = parser.parse_args(argv)
+    rng = random.Random(1)
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = None if args.live else StubWikipedia(args.latency_ms / 1000)
+        index = WikipediaIndex(os.path.join(directory, "wikipedia.sqlite"), client=client)
+        dump = args.dump
+        titles: list[str] = []
+        if dump is None:
+            dump = os.path.join(directory, "dump.xml.bz2")
+            print(f"Writing a dump of {args.articles} articles ...")
+            titles = write_dump(dump, args.articles)
+        print("Building the index ...")
+        started = time.perf_counter()
+        loaded = index.build(dump)
+        build_seconds = time.perf_counter() - started
+        if not titles:
+            titles = [row[0] for row in index._connection().execute("SELECT title FROM articles LIMIT 10000")]
+        size = os.path.getsize(index.path) / 1e6
+        print(f"Indexed {loaded} articles in {build_seconds:.1f} s ({loaded / build_seconds:.0f}/s, {size:.0f} MB)")
+
+        searches = [" ".join(rng.sample(_WORDS, 2)) for _ in range(args.queries)]
+        pages = [rng.choice(titles) for _ in range(args.queries)]
+        unknown = [f"Qzx{i} Unindexed" for i in range(args.online_queries)]
+        if args.live:
+            unknown = ["Alan Turing", "Photosynthesis", "Byzantine Empire", "Large language model",
+                       "Mount Etna", "Johann Sebastian Bach", "Compiler", "Great Barrier Reef",
+                       "Higgs boson", "Silk Road"][: args.online_queries]
+
+        rows = [
+            ["local search"] + _time([lambda q=q: index.search(q) for q in searches]),
+            ["local page"] + _time([lambda t=t: index.page(t) for t in pages]),
+        ]
+        for label in ("uncached", "cached"):
+            rows.append([f"online search ({label})"] + _time([lambda q=q: index.search(q) for q in unknown]))
+            rows.append([f"online page ({label})"] + _time([lambda t=t: index.page(t) for t in unknown]))
+
+    print()
+    print_table(["lookup", "queries", "p50 [ms]", "p95 [ms]", "mean [ms]"], rows)
+    if client is not None:
+        print(f"\nStub API calls: {client.calls} ({args.latency_ms:.0f} ms each)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+"""
+Tools that agents can call: code execution and integrations with external
+services.
+
+Submodules are intentionally not imported here; import the tool you need
+directly, e.g. ``from src.tools.code_sandbox import run_python``.
+"""
@@ -0,0 +1,186 @@
+"""
+Sandbox worker process ("zygote") used by `src.tools.code_sandbox`.
+
+Started once per pool slot with the modules to preload as JSON in argv[1].
+It reads one JSON request per line on stdin and, for each, forks a child
+that applies the resource limits, runs the snippet with fresh globals and
+sends its result back through a pipe. The zygote enforces the wall-clock
+limit, reaps the child and answers with one JSON line on the original
+stdout. Forking from a warm interpreter skips interpreter start-up and
+imports, and a crashing or runaway snippet only takes its child down.
+
+This file is executed as a script (not imported), so it only uses the
+standard library.
+"""
+
+import io
+import json
+import linecache
+import os
+import resource
+import select
+import signal
+import sys
+import time
+import traceback
+
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+# Descriptor of the channel back to the pool; closed in snippet children.
+_protocol_fd = None
+
+
+def _address_space_bytes() -> int:
+    """Current virtual memory size, so limits apply on top of the zygote's own."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[0]) * PAGE_SIZE
+    except OSError:
+        return 0
+
+
+def _apply_limits(limits: dict) -> None:
+    cpu = int(limits["cpu_seconds"])
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu + 1))
+    memory = _address_space_bytes() + int(limits["memory_mb"]) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    output = int(limits["max_file_mb"]) * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_FSIZE, (output, output))
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit] + f"\n... [truncated {len(text) - limit} characters]"
+
+
+def _run_child(code: str, limits: dict, write_fd: int) -> None:
+    """Body of the forked child; never returns."""
+    stdout, stderr = io.StringIO(), io.StringIO()
+    result = {"exit_reason": "ok", "error": None, "traceback": None}
+    try:
+        devnull = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(devnull, 0)
+        _apply_limits(limits)
+        sys.stdout, sys.stderr = stdout, stderr
+        # Lets tracebacks show the snippet's source lines.
+        linecache.cache["<snippet>"] = (len(code), None, code.splitlines(True), "<snippet>")
+        compiled = compile(code, "<snippet>", "exec")
+        exec(compiled, {"__name__": "__main__", "__builtins__": __builtins__})
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            result.update(exit_reason="error", error=f"SystemExit: {e.code}")
+    except MemoryError:
+        result.update(exit_reason="memory", error="MemoryError: memory limit exceeded")
+    except BaseException as e:
+        # Drop the sandbox's own frames; keep those of the snippet.
+        frames = [f for f in traceback.extract_tb(e.__traceback__) if f.filename == "<snippet>"]
+        result.update(
+            exit_reason="error",
+            error=f"{type(e).__name__}: {e}",
+            traceback="".join(
+                ["Traceback (most recent call last):\n"]
+                + traceback.format_list(frames)
+                + traceback.format_exception_only(type(e), e)
+            ),
+        )
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+    limit = int(limits["max_output_chars"])
+    result["stdout"] = _truncate(stdout.getvalue(), limit)
+    result["stderr"] = _truncate(stderr.getvalue(), limit)
+    data = json.dumps(result).encode("utf-8")
+    with os.fdopen(write_fd, "wb") as pipe:
+        pipe.write(data)
+    os._exit(0)
+
+
+def _hit_cpu_limit(signum: int, usage: resource.struct_rusage, limits: dict) -> bool:
+    """True if the child was killed by RLIMIT_CPU (SIGXCPU, or SIGKILL at the hard limit)."""
+    if signum == signal.SIGXCPU:
+        return True
+    cpu = usage.ru_utime + usage.ru_stime
+    return signum == signal.SIGKILL and cpu >= int(limits["cpu_seconds"])
+
+
+def _execute(request: dict) -> dict:
+    limits = request["limits"]
+    read_fd, write_fd = os.pipe()
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        if _protocol_fd is not None:
+            os.close(_protocol_fd)
+        try:
+            _run_child(request["code"], limits, write_fd)
+        finally:
+            os._exit(1)
+    os.close(write_fd)
+
+    chunks = []
+    timed_out = False
+    deadline = started + float(limits["wall_seconds"])
+    with os.fdopen(read_fd, "rb") as pipe:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                timed_out = True
+                break
+            ready, _, _ = select.select([pipe], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(pipe.fileno(), 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    if timed_out:
+        os.kill(pid, signal.SIGKILL)
+    _, status, usage = os.wait4(pid, 0)
+    seconds = time.perf_counter() - started
+
+    if timed_out:
+        result = {"exit_reason": "timeout", "error": "Wall-clock time limit exceeded"}
+    elif chunks:
+        result = json.loads(b"".join(chunks))
+    elif os.WIFSIGNALED(status) and _hit_cpu_limit(os.WTERMSIG(status), usage, limits):
+        result = {"exit_reason": "cpu", "error": "CPU time limit exceeded"}
+    elif os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGKILL:
+        # Below the CPU limit, a SIGKILL nobody here sent is the OOM killer's.
+        result = {"exit_reason": "memory", "error": "Killed by SIGKILL (out of memory)"}
+    elif os.WIFSIGNALED(status):
+        name = signal.Signals(os.WTERMSIG(status)).name
+        result = {"exit_reason": "crashed", "error": f"Killed by {name}"}
+    else:
+        result = {"exit_reason": "crashed", "error": "Worker exited without a result"}
+    result.setdefault("stdout", "")
+    result.setdefault("stderr", "")
+    result.setdefault("traceback", None)
+    result["seconds"] = seconds
+    result["pid"] = pid
+    return result
+
+
+def main() -> None:
+    global _protocol_fd
+    for module in json.loads(sys.argv[1]) if len(sys.argv) > 1 else []:
+        try:
+            __import__(module)
+        except ImportError:
+            pass
+    # Keep the protocol channel private: snippets' output is captured in the
+    # child, and stray writes to fd 1 must not corrupt the JSON stream.
+    _protocol_fd = os.dup(1)
+    protocol = os.fdopen(_protocol_fd, "w", encoding="utf-8")
+    os.dup2(os.open(os.devnull, os.O_WRONLY), 1)
+    protocol.write(json.dumps({"ready": os.getpid()}) + "\n")
+    protocol.flush()
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        protocol.write(json.dumps(_execute(json.loads(line))) + "\n")
+        protocol.flush()
+
+
+if __name__ == "__main__":
+    main()
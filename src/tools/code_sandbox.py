@@ -0,0 +1,381 @@
+"""
+Code-execution tool: run model-generated Python in a pool of warm,
+resource-limited worker processes.
+
+Generated code such as `playground/gemini/responses/factorial_problem.py`
+should be run and checked automatically, not pasted into a file by hand.
+Starting a fresh interpreter per snippet costs tens of milliseconds before
+the first line runs, so `SandboxPool` keeps `size` pre-started worker
+processes with common modules already imported. Every snippet runs in a
+child forked from a warm worker, under:
+
+    - a CPU time limit (RLIMIT_CPU),
+    - an address-space limit on top of the worker's own (RLIMIT_AS),
+    - a file-size limit for anything it writes (RLIMIT_FSIZE),
+    - a wall-clock limit enforced by the worker (the child is killed).
+
+Each snippet gets fresh globals and cannot affect later snippets, and a
+crash only takes down its child. Workers that stop responding are replaced.
+
+This isolates resources, not privileges: snippets can still read files and
+use the network with the permissions of this process. Run the pool inside a
+container or as an unprivileged user for untrusted code. POSIX only.
+
+Example:
+    >>> with SandboxPool(size=2) as pool:
+    ...     result = pool.execute("print(sum(range(10)))")
+    >>> result.ok, result.stdout
+    (True, '45\\n')
+
+Agents can call `run_python(code)`, which uses a shared default pool and
+returns a text report suitable as a tool result.
+"""
+
+import asyncio
+import atexit
+import json
+import os
+import queue
+import select
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Iterable, Optional
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "_sandbox_worker.py")
+
+# Imported by every worker before it accepts snippets.
+DEFAULT_PRELOAD = (
+    "collections",
+    "datetime",
+    "decimal",
+    "fractions",
+    "functools",
+    "itertools",
+    "json",
+    "math",
+    "random",
+    "re",
+    "statistics",
+    "string",
+)
+
+
+class SandboxError(RuntimeError):
+    """The sandbox itself failed (as opposed to the snippet)."""
+
+
+@dataclass(frozen=True)
+class SandboxLimits:
+    """
+    Resource limits applied to every snippet.
+
+    Attributes:
+        cpu_seconds (int): CPU time limit.
+        wall_seconds (float): Wall-clock limit (catches sleeping/blocked code).
+        memory_mb (int): Extra address space the snippet may allocate.
+        max_file_mb (int): Largest file the snippet may write.
+        max_output_chars (int): Captured stdout/stderr are truncated to this.
+    """
+
+    cpu_seconds: int = 5
+    wall_seconds: float = 10.0
+    memory_mb: int = 256
+    max_file_mb: int = 16
+    max_output_chars: int = 20_000
+
+
+@dataclass
+class ExecutionResult:
+    """
+    Outcome of running a snippet.
+
+    Attributes:
+        exit_reason (str): "ok", "error" (an exception), "timeout", "cpu",
+            "memory" or "crashed".
+        stdout (str): Captured standard output.
+        stderr (str): Captured standard error.
+        error (Optional[str]): "ExceptionType: message" if the snippet failed.
+        traceback (Optional[str]): Traceback limited to the snippet's frames.
+        seconds (float): Time from fork to result.
+        pid (int): Process id of the child that ran the snippet.
+        cold (bool): True if a worker had to be started for this snippet.
+    """
+
+    exit_reason: str
+    stdout: str = ""
+    stderr: str = ""
+    error: Optional[str] = None
+    traceback: Optional[str] = None
+    seconds: float = 0.0
+    pid: int = 0
+    cold: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_reason == "ok"
+
+
+class _Worker:
+    """One warm worker process."""
+
+    def __init__(self, preload: Iterable[str], startup_timeout: float = 30.0):
+        if os.name != "posix":
+            raise SandboxError("The code sandbox requires a POSIX system (fork and rlimits)")
+        self.process = subprocess.Popen(
+            # -I: ignore PYTHON* variables, user site-packages and the cwd.
+            [sys.executable, "-I", WORKER_SCRIPT, json.dumps(list(preload))],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+        )
+        self._read_line(startup_timeout)
+
+    @property
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def _read_line(self, timeout: float) -> dict:
+        ready, _, _ = select.select([self.process.stdout], [], [], timeout)
+        if not ready:
+            raise SandboxError("Sandbox worker did not answer in time")
+        line = self.process.stdout.readline()
+        if not line:
+            raise SandboxError("Sandbox worker exited")
+        return json.loads(line)
+
+    def execute(self, code: str, limits: SandboxLimits) -> dict:
+        self.process.stdin.write(json.dumps({"code": code, "limits": asdict(limits)}) + "\n")
+        self.process.stdin.flush()
+        # The worker enforces wall_seconds itself; allow for fork/reap overhead.
+        return self._read_line(limits.wall_seconds + 5.0)
+
+    def close(self) -> None:
+        if self.alive:
+            self.process.kill()
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+
+class SandboxPool:
+    """
+    Pool of warm sandbox workers.
+
+    Thread-safe: up to `size` snippets run in parallel; further calls wait
+    for a free worker.
+
+    Args:
+        size (int): Number of worker processes.
+        limits (Optional[SandboxLimits]): Default limits for `execute()`;
+            `SandboxLimits()` if omitted.
+        preload (Iterable[str]): Modules imported by workers up front.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        limits: Optional[SandboxLimits] = None,
+        preload: Iterable[str] = DEFAULT_PRELOAD,
+    ):
+        self.size = size
+        self.limits = limits or SandboxLimits()
+        self.preload = tuple(preload)
+        self._idle: queue.Queue[_Worker] = queue.Queue()
+        self._workers: list[_Worker] = []
+        # Workers started or starting; at most `size`.
+        self._slots = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self) -> "SandboxPool":
+        """Start all workers (in parallel) so the first snippets run warm."""
+        with self._lock:
+            missing = self.size - self._slots
+            self._slots += max(missing, 0)
+        threads = [threading.Thread(target=self._add_worker) for _ in range(missing)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self
+
+    def _start_worker(self) -> _Worker:
+        """Start a worker for a reserved slot; releases the slot on failure."""
+        try:
+            worker = _Worker(self.preload)
+        except BaseException:
+            with self._lock:
+                self._slots -= 1
+            raise
+        with self._lock:
+            self._workers.append(worker)
+        return worker
+
+    def _add_worker(self) -> None:
+        self._idle.put(self._start_worker())
+
+    def close(self) -> None:
+        """Stop all workers."""
+        with self._lock:
+            self._closed = True
+            workers, self._workers = self._workers, []
+        for worker in workers:
+            worker.close()
+
+    def __enter__(self) -> "SandboxPool":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _acquire(self) -> tuple[_Worker, bool]:
+        """Take an idle worker, starting one if the pool is not full."""
+        while True:
+            try:
+                return self._idle.get_nowait(), False
+            except queue.Empty:
+                pass
+            with self._lock:
+                if self._closed:
+                    raise SandboxError("Sandbox pool is closed")
+                grow = self._slots < self.size
+                if grow:
+                    # Reserve the slot before the slow start-up.
+                    self._slots += 1
+            if grow:
+                return self._start_worker(), True
+            try:
+                # Time out now and then: a discarded worker frees a slot
+                # without putting anything on the idle queue.
+                return self._idle.get(timeout=0.5), False
+            except queue.Empty:
+                continue
+
+    def _discard(self, worker: _Worker) -> None:
+        with self._lock:
+            if worker in self._workers:
+                self._workers.remove(worker)
+                self._slots -= 1
+        worker.close()
+
+    def execute(self, code: str, limits: Optional[SandboxLimits] = None) -> ExecutionResult:
+        """
+        Run a snippet in a warm worker.
+
+        Args:
+            code (str): Python source to run as `__main__`.
+            limits (Optional[SandboxLimits]): Overrides the pool's limits.
+
+        Returns:
+            ExecutionResult: Output and outcome.
+
+        Raises:
+            SandboxError: If no worker could run the snippet.
+        """
+        limits = limits or self.limits
+        worker, cold = self._acquire()
+        while not worker.alive:
+            self._discard(worker)
+            worker, cold = self._acquire()
+        try:
+            response = worker.execute(code, limits)
+        except (SandboxError, OSError, ValueError) as e:
+            self._discard(worker)
+            raise SandboxError(f"Sandbox worker failed: {e}") from e
+        if self._closed:
+            worker.close()
+        else:
+            self._idle.put(worker)
+        return ExecutionResult(cold=cold, **response)
+
+    async def aexecute(self, code: str, limits: Optional[SandboxLimits] = None) -> ExecutionResult:
+        """Async counterpart of `execute()` (runs in a thread)."""
+        return await asyncio.to_thread(self.execute, code, limits)
+
+
+def execute_cold(
+    code: str,
+    limits: Optional[SandboxLimits] = None,
+    preload: Iterable[str] = DEFAULT_PRELOAD,
+) -> ExecutionResult:
+    """
+    Run a snippet in a freshly started worker (what every call cost before
+    the pool; used as the benchmark baseline).
+
+    Args:
+        code (str): Python source.
+        limits (Optional[SandboxLimits]): Resource limits; defaults apply if omitted.
+        preload (Iterable[str]): Modules the new worker imports first.
+
+    Returns:
+        ExecutionResult: Output and outcome; `seconds` includes start-up.
+    """
+    started = time.perf_counter()
+    worker = _Worker(preload)
+    try:
+        response = worker.execute(code, limits or SandboxLimits())
+    finally:
+        worker.close()
+    response["seconds"] = time.perf_counter() - started
+    return ExecutionResult(cold=True, **response)
+
+
+# --- Agent tool ---
+
+_default_pool: Optional[SandboxPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_default_pool() -> SandboxPool:
+    """Return the shared pool used by `run_python()`, starting it on first use."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SandboxPool(size=min(os.cpu_count() or 1, 4)).start()
+            atexit.register(_default_pool.close)
+        return _default_pool
+
+
+def format_result(result: ExecutionResult) -> str:
+    """
+    Render a result as text for a model to read.
+
+    Args:
+        result (ExecutionResult): The execution result.
+
+    Returns:
+        str: Status line, then stdout, stderr and the traceback if present.
+    """
+    status = "succeeded" if result.ok else f"failed ({result.exit_reason}): {result.error}"
+    parts = [f"Execution {status} in {result.seconds * 1000:.0f} ms."]
+    if result.stdout:
+        parts.append(f"stdout:\n{result.stdout}")
+    if result.stderr:
+        parts.append(f"stderr:\n{result.stderr}")
+    if result.traceback:
+        parts.append(result.traceback)
+    return "\n".join(parts)
+
+
+def run_python(code: str) -> str:
+    """
+    Run Python code in a sandbox and report its output.
+
+    Use this to check generated code: the report contains stdout, stderr
+    and, if the code raised, the exception and traceback.
+
+    Args:
+        code (str): Python source code to execute.
+
+    Returns:
+        str: Execution report.
+    """
+    return format_result(get_default_pool().execute(code))
@@ -0,0 +1,588 @@
+"""
+Email tool: a durable local outbox delivered to SendGrid in the background.
+
+A synchronous SendGrid call inside an agent step puts a few hundred
+milliseconds of HTTPS round trip on the agent's critical path, and an
+outage or rate limit turns into a failed step. `EmailOutbox.enqueue()`
+only writes the message to a SQLite outbox (WAL mode, well under a
+millisecond) and returns. A background sender thread then:
+
+    - batches due messages that share sender, content and template into one
+      `/v3/mail/send` request with one personalization per message (up to
+      `batch_size`), over a keep-alive connection,
+    - retries 429, 5xx and network errors with exponential backoff and
+      jitter, honouring Retry-After / X-RateLimit-Reset,
+    - re-sends a rejected (4xx) batch message by message, so one bad address
+      only fails its own message,
+    - leases claimed messages, so messages of a crashed sender are picked
+      up again; delivery is therefore at least once. An expired lease
+      counts as an attempt, so a message that keeps crashing its sender is
+      eventually given up on like any other.
+
+`enqueue()` drops a message if one with the same dedupe key (by default:
+the hash of sender, recipients, subject and content) was enqueued within
+`dedupe_window` seconds, so an agent retrying a step does not send an
+alert twice.
+
+The API host is configurable (SENDGRID_HOST), so tests and benchmarks can
+point the outbox at a local stub server.
+
+Example:
+    >>> with EmailOutbox("data/email_outbox.sqlite3", from_email="agents@example.com") as outbox:
+    ...     outbox.enqueue("ops@example.com", "Nightly summary", text=summary)
+    ...     outbox.flush(timeout=30)
+
+Agents can call `send_email(to, subject, body)`, which uses a shared outbox
+configured from SENDGRID_API_KEY and SENDGRID_FROM_EMAIL.
+"""
+
+import atexit
+import email.utils
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Optional, Sequence, Union
+
+import httpx
+
+from src.utils.providers import load_environment
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = "https://api.sendgrid.com"
+DEFAULT_PATH = os.path.join("data", "email_outbox.sqlite3")
+# SendGrid accepts at most 1000 personalizations per request.
+MAX_PERSONALIZATIONS = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY,
+    dedupe_key TEXT NOT NULL,
+    group_key TEXT NOT NULL,
+    message TEXT NOT NULL,
+    personalization TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    created_at REAL NOT NULL,
+    sent_at REAL,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS outbox_dedupe ON outbox (dedupe_key, created_at);
+"""
+
+Recipients = Union[str, Sequence[str]]
+
+
+class EmailError(RuntimeError):
+    """A message could not be queued or the outbox is misconfigured."""
+
+
+@dataclass
+class OutboxStats:
+    """
+    Counters of the background sender.
+
+    Attributes:
+        requests (int): `/v3/mail/send` requests made.
+        sent (int): Messages accepted by SendGrid.
+        retried (int): Message deliveries scheduled for another attempt.
+        failed (int): Messages given up on.
+        deduplicated (int): `enqueue()` calls dropped as duplicates.
+        batch_sizes (list[int]): Personalizations per request.
+    """
+
+    requests: int = 0
+    sent: int = 0
+    retried: int = 0
+    failed: int = 0
+    deduplicated: int = 0
+    batch_sizes: list[int] = field(default_factory=list)
+
+
+@dataclass
+class _Row:
+    id: int
+    group_key: str
+    message: dict[str, Any]
+    personalization: dict[str, Any]
+    attempts: int
+
+
+def _addresses(recipients: Optional[Recipients]) -> list[dict[str, str]]:
+    if not recipients:
+        return []
+    if isinstance(recipients, str):
+        recipients = [recipients]
+    result = []
+    for recipient in recipients:
+        name, address = email.utils.parseaddr(recipient)
+        if "@" not in address:
+            raise EmailError(f"Invalid email address: {recipient!r}")
+        result.append({"email": address, "name": name} if name else {"email": address})
+    return result
+
+
+def _hash(*parts: Any) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def _retry_after(response: httpx.Response) -> Optional[float]:
+    """Seconds to wait according to the response headers, if they say."""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            pass
+    reset = response.headers.get("X-RateLimit-Reset")
+    if reset:
+        try:
+            return max(0.0, float(reset) - time.time())
+        except ValueError:
+            pass
+    return None
+
+
+class EmailOutbox:
+    """
+    SQLite outbox with a background SendGrid sender.
+
+    Thread-safe; several processes may share one outbox file (each claims
+    messages under a lease).
+
+    Args:
+        path (str): SQLite database file.
+        api_key (Optional[str]): SendGrid API key (default: SENDGRID_API_KEY).
+        from_email (Optional[str]): Default sender (default: SENDGRID_FROM_EMAIL).
+        host (Optional[str]): API base URL (default: SENDGRID_HOST or
+            https://api.sendgrid.com).
+        batch_size (int): Maximum personalizations per request.
+        flush_interval (float): Longest time a message waits for its batch
+            to fill up.
+        max_attempts (int): Attempts before a message is marked failed.
+        base_backoff (float): Delay before the first retry; doubles per attempt.
+        max_backoff (float): Upper bound for retry delays.
+        dedupe_window (float): Seconds during which an identical message is
+            dropped; 0 disables de-duplication.
+        lease_seconds (float): How long a claimed message belongs to this
+            sender before another sender may retry it.
+        timeout (float): HTTP timeout per request.
+        start (bool): Start the sender thread (False: only enqueue, e.g. in
+            processes that leave delivery to another one).
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        api_key: Optional[str] = None,
+        from_email: Optional[str] = None,
+        host: Optional[str] = None,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_attempts: int = 8,
+        base_backoff: float = 2.0,
+        max_backoff: float = 600.0,
+        dedupe_window: float = 3600.0,
+        lease_seconds: float = 120.0,
+        timeout: float = 30.0,
+        start: bool = True,
+    ):
+        load_environment()
+        self.path = path
+        self.api_key = api_key or os.getenv("SENDGRID_API_KEY")
+        if not self.api_key and start:
+            raise EmailError("SENDGRID_API_KEY not set. Please set it in your environment or .env file.")
+        self.from_email = from_email or os.getenv("SENDGRID_FROM_EMAIL")
+        self.host = (host or os.getenv("SENDGRID_HOST") or DEFAULT_HOST).rstrip("/")
+        self.batch_size = min(batch_size, MAX_PERSONALIZATIONS)
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.dedupe_window = dedupe_window
+        self.lease_seconds = lease_seconds
+        self.timeout = timeout
+        self.stats = OutboxStats()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._enqueued_since_wake = 0
+        self._sender: Optional[threading.Thread] = None
+        if start:
+            self._sender = threading.Thread(target=self._send_loop, name="email-outbox", daemon=True)
+            self._sender.start()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection in autocommit mode (transactions are explicit)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # --- Enqueueing ---
+
+    def enqueue(
+        self,
+        to: Recipients,
+        subject: str,
+        text: Optional[str] = None,
+        html: Optional[str] = None,
+        *,
+        from_email: Optional[str] = None,
+        cc: Optional[Recipients] = None,
+        bcc: Optional[Recipients] = None,
+        reply_to: Optional[str] = None,
+        template_id: Optional[str] = None,
+        template_data: Optional[dict[str, Any]] = None,
+        categories: Optional[Sequence[str]] = None,
+        dedupe_key: Optional[str] = None,
+    ) -> Optional[int]:
+        """
+        Add a message to the outbox.
+
+        Messages with the same sender, content, template and categories are
+        sent together; subject, recipients and template data are per message.
+
+        Args:
+            to (Recipients): Address(es), e.g. "Ops <ops@example.com>".
+            subject (str): Subject line.
+            text (Optional[str]): Plain-text body.
+            html (Optional[str]): HTML body.
+            from_email (Optional[str]): Sender; defaults to the outbox's.
+            cc (Optional[Recipients]): Cc address(es).
+            bcc (Optional[Recipients]): Bcc address(es).
+            reply_to (Optional[str]): Reply-To address.
+            template_id (Optional[str]): SendGrid dynamic template id.
+            template_data (Optional[dict[str, Any]]): Data for the template.
+            categories (Optional[Sequence[str]]): SendGrid categories.
+            dedupe_key (Optional[str]): Key for de-duplication; defaults to a
+                hash of the whole message.
+
+        Returns:
+            Optional[int]: Outbox id, or None if the message was a duplicate.
+
+        Raises:
+            EmailError: If the message has no sender, recipient or content,
+                or an address is invalid.
+        """
+        sender = from_email or self.from_email
+        if not sender:
+            raise EmailError("No sender: pass from_email or set SENDGRID_FROM_EMAIL")
+        if not (text or html or template_id):
+            raise EmailError("A message needs text, html or a template_id")
+        message: dict[str, Any] = {"from": _addresses(sender)[0]}
+        content = []
+        if text:
+            content.append({"type": "text/plain", "value": text})
+        if html:
+            content.append({"type": "text/html", "value": html})
+        if content:
+            message["content"] = content
+        if template_id:
+            message["template_id"] = template_id
+        if reply_to:
+            message["reply_to"] = _addresses(reply_to)[0]
+        if categories:
+            message["categories"] = list(categories)
+
+        personalization: dict[str, Any] = {"to": _addresses(to), "subject": subject}
+        if not personalization["to"]:
+            raise EmailError("A message needs at least one recipient")
+        if cc:
+            personalization["cc"] = _addresses(cc)
+        if bcc:
+            personalization["bcc"] = _addresses(bcc)
+        if template_data:
+            personalization["dynamic_template_data"] = template_data
+
+        group_key = _hash(message)
+        dedupe_key = dedupe_key or _hash(group_key, personalization)
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if self.dedupe_window > 0:
+                duplicate = connection.execute(
+                    "SELECT 1 FROM outbox WHERE dedupe_key = ? AND created_at > ? AND status != 'failed'",
+                    (dedupe_key, now - self.dedupe_window),
+                ).fetchone()
+                if duplicate:
+                    connection.execute("COMMIT")
+                    self.stats.deduplicated += 1
+                    return None
+            cursor = connection.execute(
+                "INSERT INTO outbox (dedupe_key, group_key, message, personalization,"
+                " next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (dedupe_key, group_key, json.dumps(message), json.dumps(personalization), now, now),
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        self._enqueued_since_wake += 1
+        if self._enqueued_since_wake >= self.batch_size:
+            self._wake.set()
+        return cursor.lastrowid
+
+    # --- Status ---
+
+    def counts(self) -> dict[str, int]:
+        """Number of messages per status ("pending", "sending", "sent", "failed")."""
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM outbox GROUP BY status")
+        return dict(rows.fetchall())
+
+    def status(self, message_id: int) -> Optional[dict[str, Any]]:
+        """Status, attempts and last error of one message (None if unknown)."""
+        row = self._connection().execute(
+            "SELECT status, attempts, last_error, sent_at FROM outbox WHERE id = ?", (message_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("status", "attempts", "last_error", "sent_at"), row))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Send what is due now and wait until it is sent, failed or scheduled
+        for a later retry.
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait.
+
+        Returns:
+            bool: True if nothing due is left.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.time()
+            (due,) = self._connection().execute(
+                "SELECT COUNT(*) FROM outbox WHERE (status = 'pending' AND next_attempt_at <= ?)"
+                " OR status = 'sending'",
+                (now,),
+            ).fetchone()
+            if not due:
+                return True
+            if self._sender is None or not self._sender.is_alive():
+                return False
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            self._wake.set()
+            time.sleep(0.01)
+
+    def purge(self, older_than: float = 7 * 86400) -> int:
+        """Delete sent messages older than `older_than` seconds; return how many."""
+        cursor = self._connection().execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?", (time.time() - older_than,)
+        )
+        return cursor.rowcount
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Flush (up to `timeout` seconds) and stop the sender."""
+        if self._sender is not None and self._sender.is_alive():
+            self.flush(timeout)
+            self._stop.set()
+            self._wake.set()
+            self._sender.join()
+
+    def __enter__(self) -> "EmailOutbox":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    # --- Sending ---
+
+    def _claim(self) -> list[_Row]:
+        """Lease due messages, oldest first."""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            rows = connection.execute(
+                "SELECT id, group_key, message, personalization, attempts, status FROM outbox"
+                " WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?"
+                " ORDER BY id LIMIT ?",
+                (now, self.batch_size * 4),
+            ).fetchall()
+            claimed, exhausted = [], []
+            for id, group_key, message, personalization, attempts, status in rows:
+                if status == "sending":
+                    # The lease expired: the sender that held it crashed or gave up mid-attempt.
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        exhausted.append((attempts, id))
+                        continue
+                claimed.append(_Row(id, group_key, json.loads(message), json.loads(personalization), attempts))
+            connection.executemany(
+                "UPDATE outbox SET status = 'sending', attempts = ?, next_attempt_at = ? WHERE id = ?",
+                [(row.attempts, now + self.lease_seconds, row.id) for row in claimed],
+            )
+            connection.executemany(
+                "UPDATE outbox SET status = 'failed', attempts = ?, last_error = 'Lease expired' WHERE id = ?",
+                exhausted,
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if exhausted:
+            logger.warning("Giving up on %d email(s): lease expired", len(exhausted))
+            self.stats.failed += len(exhausted)
+        return claimed
+
+    def _next_due_in(self) -> Optional[float]:
+        row = self._connection().execute(
+            "SELECT MIN(next_attempt_at) FROM outbox WHERE status IN ('pending', 'sending')"
+        ).fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def _send_loop(self) -> None:
+        with httpx.Client(
+            base_url=self.host,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=self.timeout,
+        ) as client:
+            while not self._stop.is_set():
+                rows = self._claim()
+                if not rows:
+                    self._enqueued_since_wake = 0
+                    next_due = self._next_due_in()
+                    wait = self.flush_interval if next_due is None else min(next_due, self.flush_interval)
+                    self._wake.wait(wait)
+                    self._wake.clear()
+                    continue
+                groups: dict[str, list[_Row]] = defaultdict(list)
+                for row in rows:
+                    groups[row.group_key].append(row)
+                for group in groups.values():
+                    for i in range(0, len(group), self.batch_size):
+                        batch = group[i : i + self.batch_size]
+                        try:
+                            self._send_batch(client, batch)
+                        except Exception as e:
+                            logger.exception("Email outbox sender failed")
+                            try:
+                                self._retry(batch, f"{type(e).__name__}: {e}")
+                            except Exception:
+                                # The rows stay leased; the lease expiry retries them.
+                                logger.exception("Rescheduling %d email(s) failed", len(batch))
+
+    def _send_batch(self, client: httpx.Client, rows: list[_Row]) -> None:
+        body = dict(rows[0].message)
+        body["personalizations"] = [
+            {**row.personalization, "custom_args": {"outbox_id": str(row.id)}} for row in rows
+        ]
+        self.stats.requests += 1
+        self.stats.batch_sizes.append(len(rows))
+        try:
+            response = client.post("/v3/mail/send", json=body)
+        except httpx.TransportError as e:
+            self._retry(rows, f"{type(e).__name__}: {e}")
+            return
+        if response.is_success:
+            self._mark_sent(rows)
+        elif response.status_code == 429 or response.status_code >= 500:
+            self._retry(rows, f"HTTP {response.status_code}: {response.text[:500]}", _retry_after(response))
+        elif len(rows) > 1 and response.status_code not in (401, 403):
+            # Find the offending message(s) instead of failing the batch.
+            for row in rows:
+                self._send_batch(client, [row])
+        else:
+            self._mark_failed(rows, f"HTTP {response.status_code}: {response.text[:500]}")
+
+    # Each update only applies to rows still leased as 'sending', so a failed
+    # batch is not rescheduled over the messages it already settled.
+
+    def _mark_sent(self, rows: list[_Row]) -> None:
+        now = time.time()
+        cursor = self._connection().executemany(
+            "UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1,"
+            " last_error = NULL WHERE id = ? AND status = 'sending'",
+            [(now, row.id) for row in rows],
+        )
+        self.stats.sent += cursor.rowcount
+
+    def _mark_failed(self, rows: list[_Row], error: str) -> None:
+        logger.warning("Giving up on %d email(s): %s", len(rows), error)
+        cursor = self._connection().executemany(
+            "UPDATE outbox SET status = 'failed', attempts = attempts + 1, last_error = ?"
+            " WHERE id = ? AND status = 'sending'",
+            [(error, row.id) for row in rows],
+        )
+        self.stats.failed += cursor.rowcount
+
+    def _retry(self, rows: list[_Row], error: str, delay: Optional[float] = None) -> None:
+        exhausted = [row for row in rows if row.attempts + 1 >= self.max_attempts]
+        if exhausted:
+            self._mark_failed(exhausted, error)
+        updates = []
+        for row in rows:
+            if row.attempts + 1 >= self.max_attempts:
+                continue
+            wait = delay
+            if wait is None:
+                # Exponential backoff with jitter, so senders do not retry in lockstep.
+                wait = min(self.max_backoff, self.base_backoff * 2**row.attempts)
+                wait *= random.uniform(0.5, 1.0)
+            updates.append((time.time() + wait, error, row.id))
+        if not updates:
+            return
+        logger.info("Retrying %d email(s): %s", len(updates), error)
+        cursor = self._connection().executemany(
+            "UPDATE outbox SET status = 'pending', attempts = attempts + 1, next_attempt_at = ?,"
+            " last_error = ? WHERE id = ? AND status = 'sending'",
+            updates,
+        )
+        self.stats.retried += cursor.rowcount
+
+
+# --- Agent tool ---
+
+_default_outbox: Optional[EmailOutbox] = None
+_default_outbox_lock = threading.Lock()
+
+
+def get_default_outbox() -> EmailOutbox:
+    """Return the shared outbox used by `send_email()`, starting its sender on first use."""
+    global _default_outbox
+    with _default_outbox_lock:
+        if _default_outbox is None:
+            _default_outbox = EmailOutbox()
+            atexit.register(_default_outbox.close)
+        return _default_outbox
+
+
+def send_email(to: str, subject: str, body: str) -> str:
+    """
+    Send a plain-text email. Delivery happens in the background.
+
+    Args:
+        to (str): Recipient address(es), comma-separated.
+        subject (str): Subject line.
+        body (str): Message text.
+
+    Returns:
+        str: Confirmation with the outbox id, or a note that an identical
+            message was already sent recently.
+    """
+    recipients = [address.strip() for address in to.split(",") if address.strip()]
+    message_id = get_default_outbox().enqueue(recipients, subject, text=body)
+    if message_id is None:
+        return f"An identical email to {to} was already queued recently; not sending it again."
+    return f"Email to {to} queued for delivery (outbox id {message_id})."
@@ -0,0 +1,431 @@
+"""
+MCP server exposing this project's tools to any MCP client (Claude
+Desktop, AutoGen's McpWorkbench, other agents) over stdio or streamable
+HTTP.
+
+Tools:
+    - fetch: download a URL and return it as Markdown (like
+      `mcp-server-fetch`, whose HTML extraction is reused)
+    - search_responses: retrieve archived prompts/responses
+      (`src.utils.response_archive`)
+    - run_python: run code in the warm sandbox pool (`src.tools.code_sandbox`)
+    - stock_bars: Polygon bars through the local cache
+      (`src.tools.polygon_market_data`)
+
+Handler model: the MCP server runs every incoming request as its own task,
+so tool calls from one or many sessions execute concurrently. All tools are
+coroutines; blocking work (sandbox, Parquet, Polygon) runs in threads, so a
+slow call never stalls the event loop. Shared resources are created once in
+the server lifespan. Each session gets its own keep-alive HTTP client for
+`fetch` (connections and cookies are reused within a session and never
+shared across sessions); it is closed when the session goes away.
+
+Idempotent tools (fetch, search_responses, stock_bars) are cached for
+`cache_ttl` seconds, keyed by their arguments; concurrent identical calls
+share one execution. `fetch` results are also keyed by session, since a
+page may depend on the session's cookies. Failures are not cached.
+`run_python` is never cached.
+
+Usage (from the repository root):
+    python -m src.tools.mcp_server                                  # stdio
+    python -m src.tools.mcp_server --transport streamable-http --port 8765
+"""
+
+import argparse
+import asyncio
+import functools
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+import httpx
+
+from src.tools.code_sandbox import SandboxPool, format_result
+from src.utils.response_archive import ResponseArchive, prompt_hash
+
+logger = logging.getLogger(__name__)
+
+SERVER_NAME = "ai-agents-tools"
+DEFAULT_ARCHIVE_DIR = os.path.join("data", "responses")
+USER_AGENT = "ai-agents-mcp/1.0 (+https://modelcontextprotocol.io)"
+
+
+class FetchError(RuntimeError):
+    """A URL could not be fetched (network error or HTTP error status)."""
+
+
+class ToolCache:
+    """
+    TTL + LRU cache for idempotent tool results with single-flight calls.
+
+    Args:
+        ttl (float): Seconds a result stays valid; 0 disables caching.
+        max_entries (int): Entries kept before the least recently used go.
+    """
+
+    def __init__(self, ttl: float = 300.0, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_call(self, key: tuple, call: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the cached result for `key`, or await `call()` and cache it.
+
+        The call runs in its own task that every caller awaits shielded, so
+        a caller that is cancelled does not cancel it for the others. Errors
+        are not cached.
+        """
+        if self.ttl <= 0:
+            return await call()
+        cache_key = json.dumps(key, sort_keys=True, default=str)
+        entry = self._entries.get(cache_key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(cache_key)
+            self.hits += 1
+            return entry[1]
+        task = self._inflight.get(cache_key)
+        if task is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(call())
+            self._inflight[cache_key] = task
+            task.add_done_callback(functools.partial(self._finish, cache_key))
+        return await asyncio.shield(task)
+
+    def _finish(self, cache_key: str, task: asyncio.Task) -> None:
+        del self._inflight[cache_key]
+        # exception() also marks an error as retrieved when nobody waits anymore.
+        if task.cancelled() or task.exception() is not None:
+            return
+        self._entries[cache_key] = (time.monotonic() + self.ttl, task.result())
+        self._entries.move_to_end(cache_key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+
+class SessionClients:
+    """
+    One keep-alive `httpx.AsyncClient` per MCP session.
+
+    Clients are closed when their session object is garbage collected, or
+    all at once by `aclose()`.
+    """
+
+    def __init__(self, **client_kwargs: Any):
+        self._client_kwargs = client_kwargs
+        self._clients: "weakref.WeakKeyDictionary[Any, tuple[int, httpx.AsyncClient]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._all: set[httpx.AsyncClient] = set()
+        self._ids = itertools.count(1)
+
+    def _entry(self, session: Any) -> tuple[int, httpx.AsyncClient]:
+        entry = self._clients.get(session)
+        if entry is None:
+            client = httpx.AsyncClient(**self._client_kwargs)
+            entry = self._clients[session] = (next(self._ids), client)
+            self._all.add(client)
+            loop = asyncio.get_running_loop()
+            weakref.finalize(session, self._close_soon, loop, client)
+        return entry
+
+    def get(self, session: Any) -> httpx.AsyncClient:
+        """The session's client, created on first use."""
+        return self._entry(session)[1]
+
+    def session_key(self, session: Any) -> int:
+        """A number identifying the session, never reused (unlike `id()`)."""
+        return self._entry(session)[0]
+
+    def _close_soon(self, loop: asyncio.AbstractEventLoop, client: httpx.AsyncClient) -> None:
+        self._all.discard(client)
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(lambda: loop.create_task(client.aclose()))
+
+    def __len__(self) -> int:
+        return len(self._all)
+
+    async def aclose(self) -> None:
+        clients, self._all = list(self._all), set()
+        for client in clients:
+            await client.aclose()
+
+
+@dataclass
+class ToolResources:
+    """
+    Resources shared by all sessions, created in the server lifespan.
+
+    Attributes:
+        cache (ToolCache): Results of idempotent tools.
+        http (SessionClients): Per-session HTTP clients for `fetch`.
+        sandbox (SandboxPool): Warm workers for `run_python`.
+        archive_dir (str): Response archive root for `search_responses`.
+    """
+
+    cache: ToolCache
+    http: SessionClients
+    sandbox: SandboxPool
+    archive_dir: str
+    _market_data: Any = field(default=None, repr=False)
+    _archive: Optional[ResponseArchive] = field(default=None, repr=False)
+
+    @property
+    def market_data(self):
+        if self._market_data is None:
+            from src.tools.polygon_market_data import MarketData
+
+            self._market_data = MarketData()
+        return self._market_data
+
+    @property
+    def archive(self) -> ResponseArchive:
+        if self._archive is None:
+            self._archive = ResponseArchive(self.archive_dir)
+        return self._archive
+
+
+def _html_to_markdown(html: str) -> str:
+    try:
+        from mcp_server_fetch.server import extract_content_from_html
+    except ImportError:
+        return html
+    return extract_content_from_html(html)
+
+
+async def _fetch(client: httpx.AsyncClient, url: str, max_length: int, start_index: int, raw: bool) -> str:
+    """
+    Fetch `url` and return the requested slice of its text (HTML as Markdown).
+
+    Raises:
+        FetchError: On network errors and HTTP error statuses (reported to
+            the client as a tool error, and not cached).
+    """
+    try:
+        response = await client.get(url)
+    except httpx.HTTPError as e:
+        raise FetchError(f"Failed to fetch {url}: {type(e).__name__}: {e}") from e
+    if response.status_code >= 400:
+        raise FetchError(f"Failed to fetch {url}: HTTP {response.status_code}")
+    content_type = response.headers.get("content-type", "")
+    text = response.text
+    if not raw and ("text/html" in content_type or text.lstrip()[:100].lower().startswith("<!doctype html")):
+        text = _html_to_markdown(text)
+    chunk = text[start_index : start_index + max_length]
+    if not chunk:
+        return f"No more content (length {len(text)})."
+    remaining = len(text) - start_index - len(chunk)
+    if remaining > 0:
+        chunk += f"\n\n[Content truncated: call again with start_index={start_index + len(chunk)}]"
+    return chunk
+
+
+def build_server(
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    cache_ttl: float = 300.0,
+    sandbox_size: int = 2,
+    archive_dir: str = DEFAULT_ARCHIVE_DIR,
+    max_connections_per_session: int = 10,
+    log_level: str = "INFO",
+):
+    """
+    Create the FastMCP server with all tools registered.
+
+    Args:
+        host (str): Bind address for streamable HTTP.
+        port (int): Port for streamable HTTP.
+        cache_ttl (float): Cache lifetime of idempotent tool results; 0 disables it.
+        sandbox_size (int): Warm sandbox workers.
+        archive_dir (str): Root of the response archive.
+        max_connections_per_session (int): HTTP connections per session client.
+        log_level (str): Level of the server's own (and uvicorn's) logs.
+
+    Returns:
+        mcp.server.fastmcp.FastMCP: The server; call `.run(transport)`.
+    """
+    from mcp.server.fastmcp import Context, FastMCP
+
+    @asynccontextmanager
+    async def lifespan(_server: FastMCP) -> AsyncIterator[ToolResources]:
+        resources = ToolResources(
+            cache=ToolCache(ttl=cache_ttl),
+            http=SessionClients(
+                headers={"User-Agent": USER_AGENT},
+                follow_redirects=True,
+                timeout=30.0,
+                limits=httpx.Limits(max_connections=max_connections_per_session),
+            ),
+            sandbox=SandboxPool(size=sandbox_size),
+            archive_dir=archive_dir,
+        )
+        # Start the sandbox workers off the event loop, so the server
+        # answers immediately and the first run_python call is warm.
+        starting = asyncio.create_task(asyncio.to_thread(resources.sandbox.start))
+        try:
+            yield resources
+        finally:
+            await asyncio.gather(starting, return_exceptions=True)
+            await resources.http.aclose()
+            resources.sandbox.close()
+            if resources._archive is not None:
+                resources._archive.close()
+
+    server = FastMCP(
+        SERVER_NAME,
+        instructions="Tools of the ai-agents project: web fetch, archived responses, "
+        "sandboxed Python execution and stock market data.",
+        lifespan=lifespan,
+        host=host,
+        port=port,
+        log_level=log_level,
+    )
+
+    def resources_of(ctx: Context) -> ToolResources:
+        return ctx.request_context.lifespan_context
+
+    @server.tool()
+    async def fetch(
+        url: str, ctx: Context, max_length: int = 5000, start_index: int = 0, raw: bool = False
+    ) -> str:
+        """
+        Fetch a URL and return its content, HTML converted to Markdown.
+
+        Args:
+            url: URL to fetch.
+            max_length: Maximum number of characters to return.
+            start_index: Character offset to start from (for long pages).
+            raw: Return the raw content instead of Markdown.
+        """
+        resources = resources_of(ctx)
+        client = resources.http.get(ctx.session)
+        session_key = resources.http.session_key(ctx.session)
+        return await resources.cache.get_or_call(
+            ("fetch", session_key, url, max_length, start_index, raw),
+            lambda: _fetch(client, url, max_length, start_index, raw),
+        )
+
+    @server.tool()
+    async def search_responses(
+        ctx: Context,
+        prompt: Optional[str] = None,
+        model: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        limit: int = 5,
+    ) -> str:
+        """
+        Retrieve archived model responses.
+
+        Args:
+            prompt: Exact prompt whose earlier responses to return.
+            model: Model name, e.g. "gemini-2.0-flash".
+            start_date: First day, YYYY-MM-DD.
+            end_date: Last day, YYYY-MM-DD.
+            limit: Maximum number of responses.
+        """
+        resources = resources_of(ctx)
+
+        def query() -> str:
+            frame = resources.archive.query(
+                model=model,
+                start_date=start_date,
+                end_date=end_date,
+                prompt_hash=prompt_hash(prompt) if prompt else None,
+                columns=["timestamp", "model", "prompt", "response", "latency_seconds"],
+            )
+            if frame.empty:
+                return "No archived responses match."
+            frame = frame.sort_values("timestamp", ascending=False).head(limit)
+            return json.dumps(frame.astype({"timestamp": str}).to_dict("records"), indent=1)
+
+        return await resources.cache.get_or_call(
+            ("search_responses", prompt, model, start_date, end_date, limit),
+            lambda: asyncio.to_thread(query),
+        )
+
+    @server.tool()
+    async def run_python(code: str, ctx: Context) -> str:
+        """
+        Run Python code in a sandbox and report stdout, stderr and errors.
+
+        Args:
+            code: Python source code to execute.
+        """
+        result = await resources_of(ctx).sandbox.aexecute(code)
+        return format_result(result)
+
+    @server.tool()
+    async def stock_bars(ticker: str, start: str, end: str, ctx: Context, timespan: str = "day") -> str:
+        """
+        Get price bars for a stock ticker (Polygon.io, cached locally).
+
+        Args:
+            ticker: Ticker symbol, e.g. "AAPL".
+            start: First day, YYYY-MM-DD.
+            end: Last day, YYYY-MM-DD.
+            timespan: Bar size: "minute", "hour", "day" or "week".
+        """
+        from src.tools.polygon_market_data import summarize_bars
+
+        resources = resources_of(ctx)
+
+        def bars() -> str:
+            table = resources.market_data.get_table(ticker, start, end, timespan=timespan)
+            return summarize_bars(table, ticker, start, end, timespan)
+
+        return await resources.cache.get_or_call(
+            ("stock_bars", ticker.upper(), start, end, timespan), lambda: asyncio.to_thread(bars)
+        )
+
+    return server
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run the MCP server.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description="Serve the project's tools over MCP.")
+    parser.add_argument("--transport", choices=["stdio", "streamable-http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="0 disables the cache")
+    parser.add_argument("--sandbox-size", type=int, default=2)
+    parser.add_argument("--archive-dir", default=DEFAULT_ARCHIVE_DIR)
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"])
+    args = parser.parse_args(argv)
+    # stdout carries the protocol in stdio mode; logs go to stderr.
+    logging.basicConfig(level=args.log_level, stream=sys.stderr)
+    server = build_server(
+        host=args.host,
+        port=args.port,
+        cache_ttl=args.cache_ttl,
+        sandbox_size=args.sandbox_size,
+        archive_dir=args.archive_dir,
+        log_level=args.log_level,
+    )
+    server.run(transport=args.transport)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,603 @@
+"""
+Market-data tool: Polygon.io aggregate bars with a local columnar cache.
+
+Finance agents keep asking for the same tickers and date ranges, and the
+Polygon free tier allows only a few requests per minute. `MarketData`
+keeps every bar it downloads in one Parquet file per ticker and bar size:
+
+    <cache_dir>/<multiplier><timespan>[-unadjusted]/<TICKER>.parquet
+
+Each file records which date ranges it covers (in the Parquet metadata,
+written atomically with the bars), so a request only fetches the missing
+parts of its range; days without trading inside a covered range are not
+fetched again. Bars of the current day are never marked as covered.
+
+Days are trading days in New York time (Polygon's convention for US
+markets), so a day's pre-market and after-hours bars belong to it even
+when they fall on another UTC date; crypto ("X:") and forex ("C:") days
+are UTC days.
+
+    - Responses are requested raw and decoded straight into Arrow columns
+      (`pyarrow.json`), so neither the download nor the result holds
+      per-bar Python objects. Results are `pandas.DataFrame`s or dicts of
+      NumPy arrays.
+    - `get_bars_many()` fetches ticker lists concurrently; all requests
+      share one `RateLimiter`, and each thread has its own REST client
+      (and keep-alive connection).
+
+The API key is read from POLYGON_API_KEY (or the .env file).
+
+Example:
+    >>> data = MarketData()
+    >>> df = data.get_bars("AAPL", "2024-01-01", "2024-06-30")
+    >>> frames = data.get_bars_many(["AAPL", "MSFT", "NVDA"], "2024-01-01", "2024-06-30")
+    >>> arrays = data.get_bars("AAPL", "2024-06-03", "2024-06-07", timespan="minute",
+    ...                        as_frame=False)
+    >>> arrays["close"].mean()
+
+Agents can call `get_stock_bars(ticker, start, end)`, which uses a shared
+default instance and returns a text summary.
+"""
+
+import io
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date as Date
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Iterable, Optional, Union
+from urllib.parse import quote
+from zoneinfo import ZoneInfo
+
+from src.utils.lazy_imports import lazy_import
+from src.utils.providers import load_environment
+
+logger = logging.getLogger(__name__)
+
+_pa = lazy_import("pyarrow")
+_pc = lazy_import("pyarrow.compute")
+_pj = lazy_import("pyarrow.json")
+_pq = lazy_import("pyarrow.parquet")
+_polygon = lazy_import("polygon")
+
+DateLike = Union[str, Date, datetime]
+
+DEFAULT_CACHE_DIR = os.path.join("data", "market_data")
+# Polygon's maximum number of base aggregates per request.
+MAX_LIMIT = 50_000
+# Free tier: 5 requests per minute.
+DEFAULT_REQUESTS_PER_MINUTE = 5
+
+TIMESPAN_SECONDS = {
+    "second": 1,
+    "minute": 60,
+    "hour": 3_600,
+    "day": 86_400,
+    "week": 7 * 86_400,
+    "month": 28 * 86_400,
+    "quarter": 90 * 86_400,
+    "year": 365 * 86_400,
+}
+
+# Polygon's short field names -> column names.
+_FIELDS = {
+    "t": "timestamp",
+    "o": "open",
+    "h": "high",
+    "l": "low",
+    "c": "close",
+    "v": "volume",
+    "vw": "vwap",
+    "n": "transactions",
+}
+_COVERAGE_KEY = b"coverage"
+MARKET_TIMEZONE = ZoneInfo("America/New_York")
+
+
+class MarketDataError(RuntimeError):
+    """Market data could not be fetched (missing key, bad response)."""
+
+
+def _bar_schema():
+    """Schema of the cached files and returned tables."""
+    return _pa.schema(
+        [
+            ("timestamp", _pa.timestamp("ms", tz="UTC")),
+            ("open", _pa.float64()),
+            ("high", _pa.float64()),
+            ("low", _pa.float64()),
+            ("close", _pa.float64()),
+            ("volume", _pa.float64()),
+            ("vwap", _pa.float64()),
+            ("transactions", _pa.int64()),
+        ]
+    )
+
+
+def _response_parse_options():
+    """Decode only `results` of an aggregates response, as a list of structs."""
+    bar = _pa.struct(
+        [("t", _pa.int64())] + [(short, _pa.float64()) for short in ("o", "h", "l", "c", "v", "vw")]
+        + [("n", _pa.int64())]
+    )
+    return _pj.ParseOptions(
+        explicit_schema=_pa.schema([("results", _pa.list_(bar))]),
+        unexpected_field_behavior="ignore",
+        newlines_in_values=True,
+    )
+
+
+def parse_aggregates(body: bytes):
+    """
+    Decode a raw `/v2/aggs` response body into a bar table.
+
+    Args:
+        body (bytes): JSON response body.
+
+    Returns:
+        pyarrow.Table: Bars with the `_bar_schema()` columns (possibly empty).
+
+    Raises:
+        MarketDataError: If the body is not a valid aggregates response.
+    """
+    try:
+        table = _pj.read_json(io.BytesIO(body), parse_options=_response_parse_options())
+    except _pa.ArrowInvalid as e:
+        raise MarketDataError(f"Unexpected Polygon response: {body[:200]!r}") from e
+    results = table.column("results").combine_chunks()
+    if results.null_count == len(results):
+        return _bar_schema().empty_table()
+    bars = results.flatten()
+    columns = {_FIELDS[field.name]: bars.field(i) for i, field in enumerate(bars.type)}
+    columns["timestamp"] = columns["timestamp"].cast(_pa.timestamp("ms", tz="UTC"))
+    return _pa.table(columns, schema=_bar_schema())
+
+
+def _market_timezone(ticker: str):
+    """Time zone whose calendar days delimit the ticker's trading days."""
+    return timezone.utc if ticker.upper().startswith(("X:", "C:")) else MARKET_TIMEZONE
+
+
+def _to_date(value: DateLike, tz=timezone.utc) -> Date:
+    if isinstance(value, datetime):
+        return value.astimezone(tz).date() if value.tzinfo else value.date()
+    if isinstance(value, Date):
+        return value
+    return Date.fromisoformat(value)
+
+
+def _day_bounds(start: Date, end: Date, tz=timezone.utc):
+    """UTC timestamp scalars for [start 00:00, end + 1 day 00:00) in `tz`."""
+    low = datetime.combine(start, datetime.min.time(), tz).astimezone(timezone.utc)
+    high = datetime.combine(end + timedelta(days=1), datetime.min.time(), tz).astimezone(timezone.utc)
+    unit = _pa.timestamp("ms", tz="UTC")
+    return _pa.scalar(low, unit), _pa.scalar(high, unit)
+
+
+# --- Date ranges ---
+
+Range = tuple[Date, Date]  # inclusive
+
+
+def _merge_ranges(ranges: Iterable[Range]) -> list[Range]:
+    """Sort and merge overlapping or adjacent ranges."""
+    merged: list[Range] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _missing_ranges(start: Date, end: Date, covered: list[Range]) -> list[Range]:
+    """Parts of [start, end] not inside any of the (merged) `covered` ranges."""
+    missing = []
+    cursor = start
+    for covered_start, covered_end in covered:
+        if covered_end < cursor:
+            continue
+        if covered_start > end:
+            break
+        if covered_start > cursor:
+            missing.append((cursor, covered_start - timedelta(days=1)))
+        cursor = max(cursor, covered_end + timedelta(days=1))
+        if cursor > end:
+            break
+    if cursor <= end:
+        missing.append((cursor, end))
+    return missing
+
+
+def _split_range(start: Date, end: Date, days: int) -> list[Range]:
+    """Split [start, end] into windows of at most `days` days."""
+    windows = []
+    while start <= end:
+        window_end = min(end, start + timedelta(days=days - 1))
+        windows.append((start, window_end))
+        start = window_end + timedelta(days=1)
+    return windows
+
+
+class RateLimiter:
+    """
+    Sliding-window rate limiter shared by threads.
+
+    Args:
+        calls (int): Calls allowed per `period`.
+        period (float): Window length in seconds.
+    """
+
+    def __init__(self, calls: int, period: float = 60.0):
+        self.calls = calls
+        self.period = period
+        self._times: deque[float] = deque()
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def acquire(self) -> None:
+        """Block until another call is allowed."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._times and now - self._times[0] >= self.period:
+                    self._times.popleft()
+                if len(self._times) < self.calls:
+                    self._times.append(now)
+                    return
+                delay = self.period - (now - self._times[0])
+                self.waited += delay
+            time.sleep(delay)
+
+
+class MarketData:
+    """
+    Polygon aggregate bars, cached per ticker and bar size.
+
+    Thread-safe. Concurrent requests for the same ticker and bar size are
+    serialized, so each missing range is downloaded once.
+
+    Args:
+        api_key (Optional[str]): Polygon API key (default: POLYGON_API_KEY).
+        cache_dir (str): Root directory of the Parquet cache.
+        requests_per_minute (Optional[int]): Rate limit shared by all
+            fetches; None disables it (paid plans).
+        max_workers (int): Concurrent fetches in `get_bars_many()`.
+        client_factory (Optional[Callable[[], Any]]): Creates a REST client
+            (one per thread); defaults to `polygon.RESTClient`. Anything
+            with `get_aggs(..., raw=True)` returning a response with `.data`
+            works, e.g. a stub for tests and benchmarks.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        cache_dir: str = DEFAULT_CACHE_DIR,
+        requests_per_minute: Optional[int] = DEFAULT_REQUESTS_PER_MINUTE,
+        max_workers: int = 4,
+        client_factory: Optional[Callable[[], Any]] = None,
+    ):
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+        self.rate_limiter = RateLimiter(requests_per_minute) if requests_per_minute else None
+        self._client_factory = client_factory or self._polygon_client_factory(api_key)
+        self._local = threading.local()
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._key_locks_lock = threading.Lock()
+        self.requests = 0
+        self.bars_fetched = 0
+
+    @staticmethod
+    def _polygon_client_factory(api_key: Optional[str]) -> Callable[[], Any]:
+        if not api_key:
+            load_environment()
+            api_key = os.getenv("POLYGON_API_KEY")
+
+        def factory():
+            if not api_key:
+                raise MarketDataError(
+                    "POLYGON_API_KEY not set. Please set it in your environment or .env file."
+                )
+            return _polygon.RESTClient(api_key=api_key)
+
+        return factory
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._local.client = self._client_factory()
+        return client
+
+    # --- Cache files ---
+
+    def cache_path(self, ticker: str, multiplier: int = 1, timespan: str = "day", adjusted: bool = True) -> str:
+        """Path of the Parquet file holding one ticker's bars of one size."""
+        series = f"{multiplier}{timespan}" + ("" if adjusted else "-unadjusted")
+        return os.path.join(self.cache_dir, series, quote(ticker.upper(), safe="") + ".parquet")
+
+    def _key_lock(self, path: str) -> threading.Lock:
+        with self._key_locks_lock:
+            return self._key_locks.setdefault(path, threading.Lock())
+
+    @staticmethod
+    def _read_coverage(path: str) -> list[Range]:
+        if not os.path.exists(path):
+            return []
+        metadata = _pq.read_schema(path).metadata or {}
+        return [
+            (Date.fromisoformat(start), Date.fromisoformat(end))
+            for start, end in json.loads(metadata.get(_COVERAGE_KEY, b"[]"))
+        ]
+
+    @staticmethod
+    def _write(path: str, table, coverage: list[Range]) -> None:
+        """Replace the cache file atomically (bars and coverage together)."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        encoded = json.dumps([[start.isoformat(), end.isoformat()] for start, end in coverage])
+        table = table.replace_schema_metadata({_COVERAGE_KEY: encoded.encode()})
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        _pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, path)
+
+    # --- Fetching ---
+
+    def _fetch(self, ticker: str, multiplier: int, timespan: str, adjusted: bool, start: Date, end: Date):
+        """Download [start, end] in windows small enough for one request each."""
+        bar_seconds = TIMESPAN_SECONDS[timespan] * multiplier
+        window_days = max(1, MAX_LIMIT * bar_seconds // 86_400)
+        tables = []
+        for window_start, window_end in _split_range(start, end, window_days):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = self._client().get_aggs(
+                    ticker,
+                    multiplier,
+                    timespan,
+                    window_start.isoformat(),
+                    window_end.isoformat(),
+                    adjusted=adjusted,
+                    sort="asc",
+                    limit=MAX_LIMIT,
+                    raw=True,
+                )
+            except MarketDataError:
+                raise
+            except Exception as e:
+                raise MarketDataError(f"Fetching {ticker} bars failed: {e}") from e
+            table = parse_aggregates(response.data)
+            with self._key_locks_lock:
+                self.requests += 1
+                self.bars_fetched += table.num_rows
+            if table.num_rows >= MAX_LIMIT:
+                logger.warning("%s: %s-%s hit the %d bar limit", ticker, window_start, window_end, MAX_LIMIT)
+            tables.append(table)
+        return tables
+
+    def _update(self, ticker: str, multiplier: int, timespan: str, adjusted: bool, start: Date, end: Date) -> str:
+        """Fetch whatever part of [start, end] the cache lacks; return the file path."""
+        path = self.cache_path(ticker, multiplier, timespan, adjusted)
+        with self._key_lock(path):
+            coverage = self._read_coverage(path)
+            missing = _missing_ranges(start, end, coverage)
+            if not missing:
+                return path
+            tables = []
+            if os.path.exists(path):
+                # Keep cached bars outside the missing ranges (inside them
+                # there are at most the incomplete bars of a past "today").
+                cached = _pq.read_table(path, memory_map=True).replace_schema_metadata(None)
+                keep = None
+                for missing_start, missing_end in missing:
+                    low, high = _day_bounds(missing_start, missing_end, _market_timezone(ticker))
+                    timestamp = cached.column("timestamp")
+                    outside = _pc.or_(_pc.less(timestamp, low), _pc.greater_equal(timestamp, high))
+                    keep = outside if keep is None else _pc.and_(keep, outside)
+                tables.append(cached.filter(keep))
+            for missing_start, missing_end in missing:
+                tables.extend(self._fetch(ticker, multiplier, timespan, adjusted, missing_start, missing_end))
+            table = _pa.concat_tables(tables).sort_by("timestamp")
+            # Today's bars are still incomplete: fetch them again next time.
+            last_complete = datetime.now(_market_timezone(ticker)).date() - timedelta(days=1)
+            new_coverage = [(s, min(e, last_complete)) for s, e in missing if s <= last_complete]
+            self._write(path, table, _merge_ranges(coverage + new_coverage))
+            return path
+
+    # --- Public API ---
+
+    def get_table(
+        self,
+        ticker: str,
+        start: DateLike,
+        end: DateLike,
+        multiplier: int = 1,
+        timespan: str = "day",
+        adjusted: bool = True,
+    ):
+        """
+        Return bars between `start` and `end` (inclusive) as a `pyarrow.Table`.
+
+        Args:
+            ticker (str): Ticker symbol, e.g. "AAPL" or "X:BTCUSD".
+            start (DateLike): First trading day (a New York date for US
+                markets, a UTC date for crypto and forex).
+            end (DateLike): Last trading day.
+            multiplier (int): Bar size in units of `timespan`.
+            timespan (str): "second", "minute", "hour", "day", "week",
+                "month", "quarter" or "year".
+            adjusted (bool): Whether bars are split-adjusted.
+
+        Returns:
+            pyarrow.Table: Bars sorted by timestamp.
+
+        Raises:
+            ValueError: If the timespan is unknown or start is after end.
+            MarketDataError: If a missing range could not be fetched.
+        """
+        if timespan not in TIMESPAN_SECONDS:
+            raise ValueError(f"Unknown timespan '{timespan}'. Known: {', '.join(TIMESPAN_SECONDS)}")
+        tz = _market_timezone(ticker)
+        start_date, end_date = _to_date(start, tz), _to_date(end, tz)
+        if start_date > end_date:
+            raise ValueError(f"start ({start_date}) is after end ({end_date})")
+        path = self._update(ticker, multiplier, timespan, adjusted, start_date, end_date)
+        if not os.path.exists(path):
+            return _bar_schema().empty_table()
+        low, high = _day_bounds(start_date, end_date, tz)
+        timestamp = _pc.field("timestamp")
+        table = _pq.read_table(path, memory_map=True, filters=(timestamp >= low) & (timestamp < high))
+        return table.replace_schema_metadata(None)
+
+    def get_bars(
+        self,
+        ticker: str,
+        start: DateLike,
+        end: DateLike,
+        multiplier: int = 1,
+        timespan: str = "day",
+        adjusted: bool = True,
+        as_frame: bool = True,
+    ):
+        """
+        Return bars as a DataFrame or as NumPy arrays (see `get_table()`).
+
+        Args:
+            ticker (str): Ticker symbol.
+            start (DateLike): First day.
+            end (DateLike): Last day.
+            multiplier (int): Bar size in units of `timespan`.
+            timespan (str): Bar unit, e.g. "minute" or "day".
+            adjusted (bool): Whether bars are split-adjusted.
+            as_frame (bool): Return a `pandas.DataFrame` indexed by
+                timestamp; otherwise a dict of column name -> `numpy.ndarray`.
+
+        Returns:
+            pandas.DataFrame | dict[str, numpy.ndarray]: The bars.
+        """
+        table = self.get_table(ticker, start, end, multiplier, timespan, adjusted)
+        return table_to_output(table, as_frame)
+
+    def get_bars_many(
+        self,
+        tickers: Iterable[str],
+        start: DateLike,
+        end: DateLike,
+        multiplier: int = 1,
+        timespan: str = "day",
+        adjusted: bool = True,
+        as_frame: bool = True,
+    ) -> dict[str, Any]:
+        """
+        Fetch several tickers concurrently (see `get_bars()`).
+
+        Requests share the rate limit, so with a small limit this mostly
+        overlaps network latency; cached tickers return immediately.
+
+        Returns:
+            dict[str, Any]: Ticker -> bars, in the order of `tickers`.
+
+        Raises:
+            MarketDataError: If any ticker could not be fetched.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_workers, len(tickers)))) as pool:
+            futures = {
+                ticker: pool.submit(
+                    self.get_bars, ticker, start, end, multiplier, timespan, adjusted, as_frame
+                )
+                for ticker in tickers
+            }
+            return {ticker: future.result() for ticker, future in futures.items()}
+
+
+def table_to_output(table, as_frame: bool = True):
+    """
+    Convert a bar table to a DataFrame or a dict of NumPy arrays.
+
+    Args:
+        table (pyarrow.Table): Bars.
+        as_frame (bool): Return a `pandas.DataFrame` indexed by timestamp.
+
+    Returns:
+        pandas.DataFrame | dict[str, numpy.ndarray]: The bars.
+    """
+    if as_frame:
+        return table.to_pandas().set_index("timestamp")
+    arrays = {}
+    for name in table.column_names:
+        column = table.column(name)
+        if name == "transactions":
+            column = column.fill_null(0)
+        elif name == "vwap":
+            column = column.fill_null(float("nan"))
+        arrays[name] = column.to_numpy()
+    return arrays
+
+
+# --- Agent tool ---
+
+_default: Optional[MarketData] = None
+_default_lock = threading.Lock()
+
+
+def get_default_market_data() -> MarketData:
+    """Return the shared instance used by `get_stock_bars()`."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = MarketData()
+        return _default
+
+
+def summarize_bars(table, ticker: str, start: str, end: str, timespan: str) -> str:
+    """
+    Render bars as text for a model to read.
+
+    Args:
+        table (pyarrow.Table): Bars from `MarketData.get_table()`.
+        ticker (str): Ticker symbol.
+        start (str): First day of the request.
+        end (str): Last day of the request.
+        timespan (str): Bar unit.
+
+    Returns:
+        str: Summary (first/last close, high, low, total volume) followed by
+            up to the last 10 bars as CSV.
+    """
+    if table.num_rows == 0:
+        return f"No {timespan} bars for {ticker} between {start} and {end}."
+    close = table.column("close")
+    summary = (
+        f"{ticker} {timespan} bars {start}..{end}: {table.num_rows} bars, "
+        f"first close {close[0].as_py():.2f}, last close {close[-1].as_py():.2f}, "
+        f"high {_pc.max(table.column('high')).as_py():.2f}, "
+        f"low {_pc.min(table.column('low')).as_py():.2f}, "
+        f"volume {_pc.sum(table.column('volume')).as_py():,.0f}."
+    )
+    tail = table.slice(max(0, table.num_rows - 10)).select(
+        ["timestamp", "open", "high", "low", "close", "volume"]
+    )
+    return summary + "\n" + tail.to_pandas().to_csv(index=False)
+
+
+def get_stock_bars(ticker: str, start: str, end: str, timespan: str = "day") -> str:
+    """
+    Get price bars for a stock ticker from Polygon.io.
+
+    Args:
+        ticker (str): Ticker symbol, e.g. "AAPL".
+        start (str): First day, YYYY-MM-DD.
+        end (str): Last day, YYYY-MM-DD.
+        timespan (str): Bar size: "minute", "hour", "day" or "week".
+
+    Returns:
+        str: Summary (first/last close, high, low, total volume) followed by
+            up to the last 10 bars as CSV.
+    """
+    table = get_default_market_data().get_table(ticker, start, end, timespan=timespan)
+    return summarize_bars(table, ticker, start, end, timespan)
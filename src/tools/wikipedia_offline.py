@@ -0,0 +1,608 @@
+"""
+Wikipedia tool backed by a local SQLite FTS5 index.
+
+The `wikipedia` package makes one or more HTTP round trips per lookup;
+research agents issue hundreds. `WikipediaIndex` answers from a local
+SQLite database instead:
+
+    - `build()` streams a Wikipedia dump (`pages-articles*.xml[.bz2]` from
+      dumps.wikimedia.org, or JSON lines with "title"/"text" such as
+      WikiExtractor output) into an `articles` table, strips the wiki
+      markup, records redirects, and builds an FTS5 full-text index
+      (Porter stemming, BM25 ranking with title matches weighted up).
+      Memory use is constant; rows are inserted in large transactions and
+      the full-text index is built once at the end.
+    - `search()` and `page()` are SQLite queries taking milliseconds.
+      Each thread has its own connection (WAL mode), so agents can look
+      things up concurrently.
+    - When the index has no answer, the online API is used as a fallback
+      (if `online=True`); fetched pages and search results are stored in
+      the same database, so each query goes to the network at most once
+      per `cache_ttl`. Articles that do not exist are remembered too.
+
+Build an index once (takes a while for the full English Wikipedia; a
+subset dump such as simplewiki builds in minutes):
+
+    python -m src.tools.wikipedia_offline build enwiki-latest-pages-articles.xml.bz2
+    python -m src.tools.wikipedia_offline search "turing machine"
+
+Example:
+    >>> index = WikipediaIndex("data/wikipedia.sqlite")
+    >>> [hit["title"] for hit in index.search("turing machine", limit=3)]
+    >>> index.page("Alan Turing")["summary"]
+
+Agents can call `search_wikipedia(query)`, which uses a shared default
+instance (WIKIPEDIA_INDEX, default data/wikipedia.sqlite) and returns text.
+"""
+
+import argparse
+import bz2
+import gzip
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from typing import Any, Iterator, Optional
+
+from src.utils.lazy_imports import lazy_import
+from src.utils.providers import load_environment
+
+logger = logging.getLogger(__name__)
+
+_wikipedia = lazy_import("wikipedia")
+
+DEFAULT_PATH = "data/wikipedia.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    title TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    text TEXT NOT NULL,
+    url TEXT,
+    source TEXT NOT NULL DEFAULT 'dump',
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS redirects (
+    title TEXT PRIMARY KEY COLLATE NOCASE,
+    target TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS online_searches (
+    query TEXT PRIMARY KEY,
+    titles TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS online_misses (
+    title TEXT PRIMARY KEY COLLATE NOCASE,
+    fetched_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, text, content='articles', content_rowid='id',
+    tokenize='porter unicode61 remove_diacritics 2'
+);
+"""
+
+# Keep the full-text index in sync with `articles`; dropped during bulk builds.
+_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+    INSERT INTO articles_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+END;
+CREATE TRIGGER IF NOT EXISTS articles_au AFTER UPDATE ON articles BEGIN
+    INSERT INTO articles_fts(articles_fts, rowid, title, text) VALUES ('delete', old.id, old.title, old.text);
+    INSERT INTO articles_fts(rowid, title, text) VALUES (new.id, new.title, new.text);
+END;
+"""
+_DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS articles_ai;
+DROP TRIGGER IF EXISTS articles_ad;
+DROP TRIGGER IF EXISTS articles_au;
+"""
+
+# --- Wiki markup ---
+
+_COMMENT = re.compile(r"<!--.*?-->", re.S)
+_REF = re.compile(r"<ref[^>/]*/>|<ref[^>]*>.*?</ref>", re.S | re.I)
+_TEMPLATE = re.compile(r"\{\{[^{}]*\}\}")
+_TABLE = re.compile(r"\{\|.*?\|\}", re.S)
+_FILE_LINK = re.compile(r"\[\[(?:File|Image|Category):[^\[\]]*(?:\[\[[^\]]*\]\][^\[\]]*)*\]\]", re.I)
+_LINK = re.compile(r"\[\[(?:[^|\]]*\|)?([^\]]*)\]\]")
+_EXTERNAL_LINK = re.compile(r"\[https?://[^\s\]]+\s?([^\]]*)\]")
+_HEADING = re.compile(r"^=+\s*(.*?)\s*=+\s*$", re.M)
+_TAG = re.compile(r"</?[a-z][^>]*>", re.I)
+_EMPHASIS = re.compile(r"'{2,}")
+_BLANK_LINES = re.compile(r"\n{3,}")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9\"(])")
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+
+def strip_wikitext(markup: str) -> str:
+    """
+    Reduce MediaWiki markup to plain text.
+
+    Removes comments, references, templates, tables, files and categories;
+    keeps link labels, headings and paragraph breaks. Not a full parser, but
+    good enough for search and summaries.
+
+    Args:
+        markup (str): Article source.
+
+    Returns:
+        str: Plain text.
+    """
+    text = _COMMENT.sub("", markup)
+    text = _REF.sub("", text)
+    previous = None
+    while previous != text:  # templates nest; remove innermost first
+        previous = text
+        text = _TEMPLATE.sub("", text)
+    text = _TABLE.sub("", text)
+    text = _FILE_LINK.sub("", text)
+    text = _LINK.sub(r"\1", text)
+    text = _EXTERNAL_LINK.sub(r"\1", text)
+    text = _HEADING.sub(r"\1", text)
+    text = _TAG.sub("", text)
+    text = _EMPHASIS.sub("", text)
+    lines = [line.strip() for line in text.splitlines()]
+    text = "\n".join(line for line in lines if not line.startswith(("|", "!", "*[[", "{|", "|}")))
+    return _BLANK_LINES.sub("\n\n", text).strip()
+
+
+def summarize_text(text: str, sentences: int = 3) -> str:
+    """The first `sentences` sentences of the first paragraph."""
+    first = next((p for p in text.split("\n\n") if p.strip()), "")
+    return " ".join(_SENTENCE_END.split(first.strip())[:sentences])
+
+
+def fts_query(text: str, any_term: bool = False) -> str:
+    """
+    Turn free text into an FTS5 query (each word quoted, so no syntax errors).
+
+    Args:
+        text (str): User query.
+        any_term (bool): Match any word instead of all words.
+
+    Returns:
+        str: FTS5 MATCH expression ("" if the query has no words).
+    """
+    words = [f'"{word}"' for word in _WORD.findall(text)]
+    return (" OR " if any_term else " ").join(words)
+
+
+# --- Dump reading ---
+
+
+def _open_dump(path: str):
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_dump(path: str) -> Iterator[tuple[str, Optional[str], str]]:
+    """
+    Stream articles from a dump.
+
+    Args:
+        path (str): MediaWiki XML export (`.xml`, `.xml.bz2`, `.xml.gz`) or
+            JSON lines with "title" and "text" (`.jsonl`, `.json`, also
+            compressed).
+
+    Yields:
+        tuple[str, Optional[str], str]: (title, redirect target or None,
+            wiki markup or plain text). Only main-namespace pages.
+    """
+    base = path.removesuffix(".bz2").removesuffix(".gz")
+    with _open_dump(path) as stream:
+        if base.endswith((".jsonl", ".json")):
+            for line in stream:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record["title"], record.get("redirect"), record.get("text", "")
+            return
+
+        title = redirect = None
+        namespace = "0"
+        text = ""
+        for _, element in ElementTree.iterparse(stream, events=("end",)):
+            tag = element.tag.rsplit("}", 1)[-1]
+            if tag == "title":
+                title = element.text
+            elif tag == "ns":
+                namespace = element.text
+            elif tag == "redirect":
+                redirect = element.get("title")
+            elif tag == "text":
+                text = element.text or ""
+            elif tag == "page":
+                if namespace == "0" and title:
+                    yield title, redirect, text
+                title = redirect = None
+                namespace = "0"
+                text = ""
+                element.clear()  # keep memory constant on multi-GB dumps
+
+
+class WikipediaIndex:
+    """
+    Local Wikipedia search with an online fallback.
+
+    Thread-safe; each thread uses its own SQLite connection.
+
+    Args:
+        path (str): SQLite database file (created if missing).
+        online (bool): Ask the Wikipedia API when the index has no answer.
+        cache_ttl (float): Seconds an online page or search result is
+            reused before it is fetched again.
+        language (str): Wikipedia language for the online API.
+        client (Any): Online API client with the `wikipedia` package's
+            interface (`search()`, `page()`, `exceptions`); default: the
+            `wikipedia` package.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        online: bool = True,
+        cache_ttl: float = 30 * 86400.0,
+        language: str = "en",
+        client: Any = None,
+    ):
+        self.path = path
+        self.online = online
+        self.cache_ttl = cache_ttl
+        self.language = language
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        connection = self._connection()
+        connection.executescript(_SCHEMA)
+        connection.executescript(_TRIGGERS)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection in autocommit mode (transactions are explicit)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA mmap_size=268435456")
+            self._local.connection = connection
+        return connection
+
+    def _online_client(self):
+        with self._client_lock:
+            if self._client is None:
+                _wikipedia.set_lang(self.language)
+                self._client = _wikipedia
+            return self._client
+
+    def _not_found_errors(self, client) -> tuple:
+        exceptions = getattr(client, "exceptions", None)
+        return (LookupError,) + tuple(
+            getattr(exceptions, name) for name in ("PageError", "DisambiguationError") if hasattr(exceptions, name)
+        )
+
+    # --- Building ---
+
+    def build(self, dump_path: str, batch_size: int = 5000, limit: Optional[int] = None) -> int:
+        """
+        Load a dump into the index (replacing articles with the same title).
+
+        Args:
+            dump_path (str): Dump file, see `iter_dump()`.
+            batch_size (int): Rows per transaction.
+            limit (Optional[int]): Stop after this many articles.
+
+        Returns:
+            int: Articles loaded.
+        """
+        connection = self._connection()
+        connection.execute("PRAGMA synchronous=OFF")
+        # Bulk-load without per-row index maintenance, then index everything once.
+        connection.executescript(_DROP_TRIGGERS)
+        articles: list[tuple] = []
+        redirects: list[tuple] = []
+        loaded = 0
+        started = time.monotonic()
+
+        def flush() -> None:
+            connection.execute("BEGIN")
+            connection.executemany(
+                "INSERT INTO articles (title, text, url, source) VALUES (?, ?, ?, 'dump') "
+                "ON CONFLICT(title) DO UPDATE SET text = excluded.text, url = excluded.url, "
+                "source = 'dump', fetched_at = NULL",
+                articles,
+            )
+            connection.executemany("INSERT OR REPLACE INTO redirects (title, target) VALUES (?, ?)", redirects)
+            connection.execute("COMMIT")
+            articles.clear()
+            redirects.clear()
+
+        try:
+            for title, redirect, markup in iter_dump(dump_path):
+                if redirect:
+                    redirects.append((title, redirect))
+                else:
+                    text = strip_wikitext(markup)
+                    if not text:
+                        continue
+                    articles.append((title, text, self._url(title)))
+                    loaded += 1
+                if len(articles) + len(redirects) >= batch_size:
+                    flush()
+                    logger.info("Loaded %d articles (%.0f/s)", loaded, loaded / (time.monotonic() - started))
+                if limit is not None and loaded >= limit:
+                    break
+            flush()
+            logger.info("Building the full-text index ...")
+            connection.execute("INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')")
+            connection.execute("INSERT INTO articles_fts(articles_fts) VALUES ('optimize')")
+        finally:
+            connection.executescript(_TRIGGERS)
+            connection.execute("PRAGMA synchronous=NORMAL")
+        connection.execute("ANALYZE")
+        return loaded
+
+    def _url(self, title: str) -> str:
+        return f"https://{self.language}.wikipedia.org/wiki/{title.replace(' ', '_')}"
+
+    # --- Queries ---
+
+    def search(
+        self, query: str, limit: int = 10, online: Optional[bool] = None, all_terms: bool = False
+    ) -> list[dict]:
+        """
+        Find articles matching a query.
+
+        All words must match; if nothing does, any word may (unless
+        `all_terms`). Falls back to the online search when the index has no
+        match.
+
+        Args:
+            query (str): Free-text query.
+            limit (int): Maximum results.
+            online (Optional[bool]): Allow the online fallback; None uses
+                the index's setting.
+            all_terms (bool): Only count articles matching every word as
+                local matches.
+
+        Returns:
+            list[dict]: `{"title", "snippet", "source"}` ordered by relevance
+                ("source" is "local" or "online"; online results have no
+                snippet).
+        """
+        if not fts_query(query):
+            return []
+        ids: list[int] = []
+        expression = ""
+        # Title matches rank first anyway (weight 10) and are far fewer than
+        # body matches, so ranking them alone is much cheaper.
+        passes = [(False, "title"), (False, None)] + ([] if all_terms else [(True, None)])
+        for any_term, column in passes:
+            expression = fts_query(query, any_term)
+            if column:
+                expression = f"{column} : ({expression})"
+            ids = self._ranked_ids(expression, limit)
+            if len(ids) >= limit or (ids and column is None):
+                break
+        if ids:
+            return self._hits(expression, ids)
+        if not (self.online if online is None else online):
+            return []
+        return [{"title": title, "snippet": "", "source": "online"} for title in self._search_online(query, limit)]
+
+    def _ranked_ids(self, expression: str, limit: int) -> list[int]:
+        rows = self._connection().execute(
+            "SELECT rowid FROM articles_fts WHERE articles_fts MATCH ? "
+            "ORDER BY bm25(articles_fts, 10.0, 1.0) LIMIT ?",
+            (expression, limit),
+        )
+        return [row[0] for row in rows]
+
+    def _hits(self, expression: str, ids: list[int]) -> list[dict]:
+        """Titles and snippets of the ranked ids (snippets only for these rows)."""
+        placeholders = ",".join("?" * len(ids))
+        rows = self._connection().execute(
+            "SELECT rowid, title, snippet(articles_fts, 1, '', '', ' ... ', 24) AS snippet "
+            f"FROM articles_fts WHERE articles_fts MATCH ? AND rowid IN ({placeholders})",
+            (expression, *ids),
+        )
+        by_id = {row["rowid"]: row for row in rows}
+        return [
+            {"title": by_id[i]["title"], "snippet": by_id[i]["snippet"], "source": "local"} for i in ids if i in by_id
+        ]
+
+    def page(self, title: str, sentences: int = 3, online: Optional[bool] = None) -> Optional[dict]:
+        """
+        Get an article by title (case-insensitive, redirects followed).
+
+        Falls back to the online API when the article is not in the index.
+
+        Args:
+            title (str): Article title.
+            sentences (int): Sentences in the summary.
+            online (Optional[bool]): Allow the online fallback (and refreshing
+                expired online pages); None uses the index's setting.
+
+        Returns:
+            Optional[dict]: `{"title", "summary", "text", "url", "source"}`,
+                or None if the article does not exist.
+        """
+        online = self.online if online is None else online
+        connection = self._connection()
+        target = connection.execute("SELECT target FROM redirects WHERE title = ?", (title,)).fetchone()
+        if target is not None:
+            title = target["target"]
+        row = connection.execute(
+            "SELECT title, text, url, source, fetched_at FROM articles WHERE title = ?", (title,)
+        ).fetchone()
+        if row is not None and (row["source"] == "dump" or not online or not self._expired(row["fetched_at"])):
+            return {
+                "title": row["title"],
+                "summary": summarize_text(row["text"], sentences),
+                "text": row["text"],
+                "url": row["url"],
+                "source": "local" if row["source"] == "dump" else "online",
+            }
+        if not online:
+            return None
+        return self._page_online(title, sentences)
+
+    def count(self) -> int:
+        """Number of articles in the index (dump and cached)."""
+        return self._connection().execute("SELECT count(*) FROM articles").fetchone()[0]
+
+    # --- Online fallback ---
+
+    def _expired(self, fetched_at: Optional[float]) -> bool:
+        return fetched_at is None or time.time() - fetched_at > self.cache_ttl
+
+    def _search_online(self, query: str, limit: int) -> list[str]:
+        connection = self._connection()
+        key = f"{limit}:{query.strip().lower()}"
+        row = connection.execute("SELECT titles, fetched_at FROM online_searches WHERE query = ?", (key,)).fetchone()
+        if row is not None and not self._expired(row["fetched_at"]):
+            return json.loads(row["titles"])
+        try:
+            titles = list(self._online_client().search(query, results=limit))
+        except Exception as e:
+            logger.warning("Online Wikipedia search failed for %r: %s", query, e)
+            return json.loads(row["titles"]) if row is not None else []
+        connection.execute(
+            "INSERT OR REPLACE INTO online_searches (query, titles, fetched_at) VALUES (?, ?, ?)",
+            (key, json.dumps(titles), time.time()),
+        )
+        return titles
+
+    def _page_online(self, title: str, sentences: int) -> Optional[dict]:
+        connection = self._connection()
+        miss = connection.execute("SELECT fetched_at FROM online_misses WHERE title = ?", (title,)).fetchone()
+        if miss is not None and not self._expired(miss["fetched_at"]):
+            return None
+        client = self._online_client()
+        try:
+            page = client.page(title, auto_suggest=False)
+            text = page.content
+        except self._not_found_errors(client):
+            connection.execute(
+                "INSERT OR REPLACE INTO online_misses (title, fetched_at) VALUES (?, ?)", (title, time.time())
+            )
+            return None
+        except Exception as e:
+            logger.warning("Online Wikipedia lookup failed for %r: %s", title, e)
+            return None
+        now = time.time()
+        connection.execute("BEGIN")
+        connection.execute(
+            "INSERT INTO articles (title, text, url, source, fetched_at) VALUES (?, ?, ?, 'online', ?) "
+            "ON CONFLICT(title) DO UPDATE SET text = excluded.text, url = excluded.url, "
+            "source = 'online', fetched_at = excluded.fetched_at",
+            (page.title, text, page.url, now),
+        )
+        if page.title.lower() != title.lower():
+            connection.execute(
+                "INSERT OR REPLACE INTO redirects (title, target) VALUES (?, ?)", (title, page.title)
+            )
+        connection.execute("COMMIT")
+        return {
+            "title": page.title,
+            "summary": summarize_text(text, sentences),
+            "text": text,
+            "url": page.url,
+            "source": "online",
+        }
+
+
+_default: Optional[WikipediaIndex] = None
+_default_lock = threading.Lock()
+
+
+def get_default_index() -> WikipediaIndex:
+    """Return the shared instance used by `search_wikipedia()`."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            load_environment()
+            _default = WikipediaIndex(os.getenv("WIKIPEDIA_INDEX", DEFAULT_PATH))
+        return _default
+
+
+def search_wikipedia(query: str, sentences: int = 5) -> str:
+    """
+    Look something up on Wikipedia.
+
+    Args:
+        query (str): Article title or search terms.
+        sentences (int): Length of the summary of the best match.
+
+    Returns:
+        str: Title, URL and summary of the best matching article, followed
+            by the titles of other matches.
+    """
+    index = get_default_index()
+    # Local title/redirect lookup and full-text search first: page() would
+    # go online for any query that is not an exact title. Articles sharing
+    # only some of the words ("Alan Smith" for "Alan Turing") are no answer.
+    page = index.page(query, sentences, online=False)
+    hits = index.search(query, limit=6, online=False, all_terms=page is None)
+    if page is None and not hits:
+        page = index.page(query, sentences)
+        hits = index.search(query, limit=6, all_terms=True)
+    if page is None and hits:
+        page = index.page(hits[0]["title"], sentences)
+    if page is None:
+        return f"No Wikipedia article found for {query!r}."
+    others = [hit["title"] for hit in hits if hit["title"].lower() != page["title"].lower()][:5]
+    text = f"{page['title']} ({page['url']})\n{page['summary']}"
+    if others:
+        text += "\n\nOther matches: " + "; ".join(others)
+    return text
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Build or query the index from the command line.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description="Build or query the offline Wikipedia index.")
+    parser.add_argument("--index", default=os.getenv("WIKIPEDIA_INDEX", DEFAULT_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="load a dump into the index")
+    build.add_argument("dump")
+    build.add_argument("--limit", type=int)
+    search = commands.add_parser("search", help="search the index")
+    search.add_argument("query")
+    search.add_argument("--offline", action="store_true", help="do not fall back to the online API")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "build":
+        index = WikipediaIndex(args.index, online=False)
+        started = time.monotonic()
+        loaded = index.build(args.dump, limit=args.limit)
+        print(f"Loaded {loaded} articles into {args.index} in {time.monotonic() - started:.1f} s")
+        return 0
+
+    index = WikipediaIndex(args.index, online=not args.offline)
+    for hit in index.search(args.query):
+        print(f"{hit['title']} [{hit['source']}]: {hit['snippet']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,8 @@
+"""
+Shared utilities: provider clients, lazy SDK loading and helpers used by the
+agents, tools and playground scripts.
+
+Submodules are intentionally not imported here so that ``import src.utils``
+stays cheap; import the submodule you need directly, e.g.
+``from src.utils.providers import get_openai_client``.
+"""
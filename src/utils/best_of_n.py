@@ -0,0 +1,252 @@
+"""
+Concurrent best-of-n generation with early cancellation.
+
+Gemini's OpenAI-compatible endpoint and Ollama do not reliably honour the
+`n` parameter, so instead of asking for N choices in one request we start N
+streaming generations concurrently, score each finished candidate with a
+pluggable scorer and, as soon as one reaches the acceptance threshold,
+cancel the others. Cancelling closes their HTTP streams, so the provider
+stops generating and we stop paying for tokens nobody will read.
+
+Example:
+    >>> from src.utils.best_of_n import best_of_n, openai_stream_factory
+    >>> from src.utils.providers import get_async_openai_client
+    >>> factory = openai_stream_factory(
+    ...     get_async_openai_client("gemini"),
+    ...     model="gemini-2.0-flash",
+    ...     messages=[{"role": "user", "content": "Write a haiku about tests."}],
+    ...     temperature=0.9,
+    ... )
+    >>> result = asyncio.run(best_of_n(factory, n=4, scorer=my_scorer, threshold=0.8))
+    >>> print(result.best.text, result.cancelled)
+"""
+
+import asyncio
+import inspect
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional, Union
+
+# A stream factory receives the candidate index and returns an async stream of text deltas.
+StreamFactory = Callable[[int], AsyncIterator[str]]
+# A scorer maps a finished candidate text to a score (higher is better).
+Scorer = Callable[[str], Union[float, Awaitable[float]]]
+
+
+@dataclass
+class Candidate:
+    """
+    One generation attempt.
+
+    Attributes:
+        index (int): Position among the N candidates.
+        text (str): Text received so far (complete unless cancelled).
+        chunks (int): Number of stream deltas received.
+        score (Optional[float]): Score, once the candidate finished (None if
+            the scorer failed).
+        finished (bool): True if the stream ran to completion.
+        cancelled (bool): True if the candidate was cancelled as a loser.
+        error (Optional[BaseException]): Error raised by the stream or the
+            scorer, if any.
+        first_chunk_seconds (Optional[float]): Time to the first delta.
+        seconds (float): Time until the candidate finished or was cancelled.
+    """
+
+    index: int
+    text: str = ""
+    chunks: int = 0
+    score: Optional[float] = None
+    finished: bool = False
+    cancelled: bool = False
+    error: Optional[BaseException] = None
+    first_chunk_seconds: Optional[float] = None
+    seconds: float = 0.0
+
+
+@dataclass
+class BestOfNResult:
+    """
+    Outcome of a best-of-n run.
+
+    Attributes:
+        best (Optional[Candidate]): Highest-scoring finished candidate.
+        candidates (list[Candidate]): All candidates, in index order.
+        accepted (bool): True if `best` met the acceptance threshold.
+        seconds (float): Total wall-clock time.
+    """
+
+    best: Optional[Candidate]
+    candidates: list[Candidate] = field(default_factory=list)
+    accepted: bool = False
+    seconds: float = 0.0
+
+    @property
+    def cancelled(self) -> int:
+        """Number of candidates cancelled before finishing."""
+        return sum(candidate.cancelled for candidate in self.candidates)
+
+    @property
+    def wasted_chunks(self) -> int:
+        """Deltas received by candidates that were not selected."""
+        best_index = self.best.index if self.best else None
+        return sum(c.chunks for c in self.candidates if c.index != best_index)
+
+
+async def _score(scorer: Scorer, text: str) -> float:
+    """Call a sync or async scorer."""
+    score = scorer(text)
+    if inspect.isawaitable(score):
+        score = await score
+    return float(score)
+
+
+async def _consume(
+    candidate: Candidate,
+    stream_factory: StreamFactory,
+    scorer: Scorer,
+    started: float,
+) -> Candidate:
+    """Read one candidate stream to the end, then score it."""
+    stream = stream_factory(candidate.index)
+    parts = []
+    try:
+        async for delta in stream:
+            if candidate.first_chunk_seconds is None:
+                candidate.first_chunk_seconds = time.perf_counter() - started
+            parts.append(delta)
+            candidate.chunks += 1
+        candidate.finished = True
+    except asyncio.CancelledError:
+        candidate.cancelled = True
+        raise
+    except Exception as e:
+        # A failed candidate must not take the other generations down with it.
+        candidate.error = e
+    finally:
+        candidate.text = "".join(parts)
+        candidate.seconds = time.perf_counter() - started
+        # Closing the generator closes the underlying HTTP stream right away.
+        aclose = getattr(stream, "aclose", None)
+        if aclose is not None:
+            await aclose()
+    if candidate.finished:
+        try:
+            candidate.score = await _score(scorer, candidate.text)
+        except Exception as e:
+            # A scorer failure disqualifies this candidate only.
+            candidate.error = e
+    return candidate
+
+
+async def best_of_n(
+    stream_factory: StreamFactory,
+    n: int,
+    scorer: Scorer,
+    threshold: Optional[float] = None,
+    timeout: Optional[float] = None,
+) -> BestOfNResult:
+    """
+    Run `n` streaming generations concurrently and keep the best one.
+
+    Args:
+        stream_factory (StreamFactory): Creates the stream for a candidate index.
+        n (int): Number of candidates to generate.
+        scorer (Scorer): Scores a finished candidate's text (sync or async).
+        threshold (Optional[float]): Accept the first candidate scoring at
+            least this much and cancel the rest. Without a threshold all
+            candidates run to completion.
+        timeout (Optional[float]): Cancel whatever is still running after
+            this many seconds and pick the best finished candidate.
+
+    Returns:
+        BestOfNResult: The selected candidate and per-candidate statistics.
+
+    Raises:
+        ValueError: If `n` is smaller than 1.
+    """
+    if n < 1:
+        raise ValueError("n must be at least 1")
+    started = time.perf_counter()
+    candidates = [Candidate(index=i) for i in range(n)]
+    tasks = {
+        asyncio.create_task(_consume(candidate, stream_factory, scorer, started))
+        for candidate in candidates
+    }
+    deadline = None if timeout is None else started + timeout
+    accepted = None
+
+    try:
+        pending = tasks
+        while pending:
+            remaining = None if deadline is None else deadline - time.perf_counter()
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                candidate = task.result()
+                if candidate.score is None:
+                    continue
+                if threshold is not None and candidate.score >= threshold:
+                    if accepted is None or candidate.score > accepted.score:
+                        accepted = candidate
+            if accepted is not None:
+                break
+    finally:
+        # Cancel losers (or everything, on timeout/error) and wait for their
+        # streams to close before returning.
+        leftovers = [task for task in tasks if not task.done()]
+        for task in leftovers:
+            task.cancel()
+        if leftovers:
+            await asyncio.gather(*leftovers, return_exceptions=True)
+
+    finished = [c for c in candidates if c.finished and c.score is not None]
+    best = accepted or max(finished, key=lambda c: c.score, default=None)
+    return BestOfNResult(
+        best=best,
+        candidates=candidates,
+        accepted=accepted is not None,
+        seconds=time.perf_counter() - started,
+    )
+
+
+def openai_stream_factory(
+    client: Any,
+    model: str,
+    messages: list[dict[str, Any]],
+    seed: Optional[int] = None,
+    **params: Any,
+) -> StreamFactory:
+    """
+    Build a stream factory for an `openai.AsyncOpenAI`-compatible client.
+
+    Works for OpenAI, Gemini's OpenAI-compatible endpoint and Ollama's `/v1`
+    API (see `src.utils.providers.get_async_openai_client`).
+
+    Args:
+        client (openai.AsyncOpenAI): The async client.
+        model (str): Model name.
+        messages (list[dict[str, Any]]): Chat messages.
+        seed (Optional[int]): Base seed; candidate `i` uses `seed + i` so the
+            candidates differ even at low temperature.
+        **params: Extra `chat.completions.create` parameters.
+
+    Returns:
+        StreamFactory: Factory yielding text deltas per candidate.
+    """
+
+    async def stream(index: int) -> AsyncIterator[str]:
+        extra = {} if seed is None else {"seed": seed + index}
+        response = await client.chat.completions.create(
+            model=model, messages=messages, stream=True, **params, **extra
+        )
+        try:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await response.close()
+
+    return stream
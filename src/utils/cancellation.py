@@ -0,0 +1,397 @@
+"""
+Cancellation propagation from UI/HTTP clients down to provider streams.
+
+When a user closes the Gradio tab (or an HTTP client disconnects, or a
+timeout fires) while a response is streaming, the upstream Gemini/OpenAI/
+Ollama stream must be closed immediately. Otherwise the provider keeps
+generating tokens nobody will read and the worker thread stays busy until
+the model finishes.
+
+Building blocks:
+    - `CancellationToken`: thread-safe cancel signal with callbacks and an
+      optional deadline.
+    - `close_upstream()`: closes any of the SDK stream objects we use
+      (OpenAI `Stream`, google-genai/Ollama/LangChain generators, legacy
+      `google.generativeai` responses, `requests`/`httpx` responses).
+    - `cancellable_stream()` / `acancellable_stream()`: wrap an upstream
+      stream so that consumer disconnects (generator close or task
+      cancellation), token cancellation and timeouts all close it, and
+      count the tokens saved.
+    - `wait_cancellable()`: awaits e.g. a queue slot unless the token is
+      cancelled or times out first.
+    - `watch_disconnect()`: cancels a token when a Starlette/FastAPI
+      client goes away. Queued Gradio handlers need no watcher: Gradio
+      cancels or closes them itself.
+
+Example:
+    >>> token = CancellationToken(timeout=60)
+    >>> stream = client.chat.completions.create(..., stream=True, max_tokens=500)
+    >>> for chunk in cancellable_stream(stream, token, max_tokens=500, text_of=delta_text):
+    ...     yield chunk
+"""
+
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Iterator, Optional
+
+from src.utils.tokens import approximate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class StreamCancelled(Exception):
+    """Raised inside a wrapped stream when its token is cancelled or times out."""
+
+
+class CancellationToken:
+    """
+    Thread-safe cancellation signal.
+
+    Args:
+        timeout (Optional[float]): Cancel automatically after this many seconds.
+    """
+
+    def __init__(self, timeout: Optional[float] = None):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: list[Callable[[], None]] = []
+        self.reason: Optional[str] = None
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+
+    @property
+    def cancelled(self) -> bool:
+        """True once cancelled or past the deadline."""
+        if not self._event.is_set() and self.deadline is not None:
+            if time.monotonic() >= self.deadline:
+                self.cancel("timeout")
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """
+        Cancel the token and run its callbacks (once).
+
+        Args:
+            reason (str): Why the work was cancelled, e.g. "disconnect".
+        """
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                logger.exception("Cancellation callback failed")
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Run `callback` on cancellation (immediately if already cancelled)."""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self) -> None:
+        """
+        Raises:
+            StreamCancelled: If the token has been cancelled.
+        """
+        if self.cancelled:
+            raise StreamCancelled(self.reason)
+
+
+@dataclass
+class CancellationStats:
+    """
+    Process-wide counters for cancelled streams.
+
+    Attributes:
+        streams (int): Streams wrapped.
+        cancelled (int): Streams closed before the provider finished.
+        tokens_delivered (int): Tokens passed to consumers (estimated).
+        tokens_saved (int): For cancelled streams with a known `max_tokens`,
+            the estimated tokens the provider did not have to generate.
+    """
+
+    streams: int = 0
+    cancelled: int = 0
+    tokens_delivered: int = 0
+    tokens_saved: int = 0
+
+    def __post_init__(self):
+        self._lock = threading.Lock()
+
+    def record(self, delivered: int, cancelled: bool, max_tokens: Optional[int]) -> None:
+        with self._lock:
+            self.streams += 1
+            self.tokens_delivered += delivered
+            if cancelled:
+                self.cancelled += 1
+                if max_tokens is not None:
+                    self.tokens_saved += max(max_tokens - delivered, 0)
+
+
+stats = CancellationStats()
+
+
+def close_upstream(stream: Any) -> None:
+    """
+    Close a provider stream so the HTTP/gRPC request is aborted.
+
+    Handles OpenAI/Anthropic `Stream` objects, generators (google-genai,
+    Ollama, LangChain `.stream()`), `requests`/`httpx` responses and legacy
+    `google.generativeai` streaming responses (whose gRPC iterator is
+    cancelled).
+
+    Args:
+        stream (Any): The upstream stream object.
+    """
+    iterator = getattr(stream, "_iterator", None)
+    for target in (stream, iterator):
+        if target is None:
+            continue
+        for method in ("close", "cancel"):
+            closer = getattr(target, method, None)
+            if closer is None or inspect.iscoroutinefunction(closer):
+                continue
+            try:
+                closer()
+            except Exception as e:
+                # Closing from another thread can race with the reader.
+                logger.debug("Error closing upstream stream: %s", e)
+            break
+
+
+async def aclose_upstream(stream: Any) -> None:
+    """Async counterpart of `close_upstream()` for async SDK streams."""
+    for method in ("aclose", "close"):
+        closer = getattr(stream, method, None)
+        if closer is None:
+            continue
+        try:
+            result = closer()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            logger.debug("Error closing upstream stream: %s", e)
+        return
+    close_upstream(stream)
+
+
+def cancellable_stream(
+    stream: Iterable[Any],
+    token: Optional[CancellationToken] = None,
+    text_of: Callable[[Any], Optional[str]] = lambda chunk: chunk,
+    max_tokens: Optional[int] = None,
+    stats: CancellationStats = stats,
+) -> Iterator[Any]:
+    """
+    Yield from an upstream stream, closing it as soon as nobody is listening.
+
+    The upstream is closed when:
+        - the consumer closes this generator (Gradio/`StreamingResponse`
+          stop iterating, `break`, garbage collection),
+        - `token` is cancelled (also from another thread: the close callback
+          aborts a read that is blocked waiting for the next chunk),
+        - the token's deadline passes.
+
+    Args:
+        stream (Iterable[Any]): Upstream provider stream.
+        token (Optional[CancellationToken]): External cancellation signal.
+        text_of (Callable[[Any], Optional[str]]): Extracts text from a chunk,
+            for token accounting.
+        max_tokens (Optional[int]): The request's output budget, used to
+            estimate the tokens saved by cancelling.
+        stats (CancellationStats): Where to record the outcome.
+
+    Yields:
+        Any: Upstream chunks, unchanged.
+
+    Raises:
+        StreamCancelled: If the token was cancelled or timed out.
+    """
+    token = token or CancellationToken()
+    token.add_callback(lambda: close_upstream(stream))
+    watchdog = None
+    if token.deadline is not None:
+        # Fire the deadline even while a read is blocked waiting for a chunk.
+        watchdog = threading.Timer(
+            max(token.deadline - time.monotonic(), 0), token.cancel, args=("timeout",)
+        )
+        watchdog.daemon = True
+        watchdog.start()
+    delivered = 0
+    finished = False
+    try:
+        for chunk in stream:
+            token.raise_if_cancelled()
+            delivered += approximate_tokens(text_of(chunk) or "")
+            yield chunk
+        finished = True
+    except Exception:
+        # A read aborted by the cancel callback surfaces as an SDK error.
+        if token.cancelled:
+            raise StreamCancelled(token.reason) from None
+        raise
+    finally:
+        if watchdog is not None:
+            watchdog.cancel()
+        if not finished:
+            close_upstream(stream)
+        stats.record(delivered, cancelled=not finished, max_tokens=max_tokens)
+
+
+async def acancellable_stream(
+    stream: Any,
+    token: Optional[CancellationToken] = None,
+    text_of: Callable[[Any], Optional[str]] = lambda chunk: chunk,
+    max_tokens: Optional[int] = None,
+    stats: CancellationStats = stats,
+) -> AsyncIterator[Any]:
+    """
+    Async counterpart of `cancellable_stream()`.
+
+    Task cancellation (e.g. an async Gradio handler whose client went away)
+    raises `CancelledError` at the pending `await`, which closes the upstream.
+    Cancelling `token` (from any thread) or reaching its deadline interrupts
+    a read that is still waiting for the next chunk.
+
+    Args:
+        stream (Any): Async upstream stream (e.g. `AsyncStream`, async generator).
+        token (Optional[CancellationToken]): External cancellation signal.
+        text_of (Callable[[Any], Optional[str]]): Extracts text from a chunk.
+        max_tokens (Optional[int]): The request's output budget.
+        stats (CancellationStats): Where to record the outcome.
+
+    Yields:
+        Any: Upstream chunks, unchanged.
+
+    Raises:
+        StreamCancelled: If the token was cancelled or timed out.
+    """
+    token = token or CancellationToken()
+    loop = asyncio.get_running_loop()
+    # Resolved by the token callback, so a cancel from any thread (e.g.
+    # `watch_disconnect`) interrupts a read that is waiting for a chunk.
+    interrupted = loop.create_future()
+
+    def interrupt() -> None:
+        try:
+            loop.call_soon_threadsafe(_resolve, interrupted)
+        except RuntimeError:
+            pass  # The loop is gone; nothing is reading anymore.
+
+    token.add_callback(interrupt)
+    delivered = 0
+    finished = False
+    iterator = stream.__aiter__()
+    try:
+        while True:
+            remaining = None
+            if token.deadline is not None:
+                remaining = max(token.deadline - time.monotonic(), 0)
+            read = asyncio.ensure_future(iterator.__anext__())
+            try:
+                await asyncio.wait(
+                    (read, interrupted), timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                if not read.done():
+                    read.cancel()
+                    await asyncio.gather(read, return_exceptions=True)
+            if read.cancelled():
+                if not token.cancelled:
+                    token.cancel("timeout")
+                raise StreamCancelled(token.reason)
+            try:
+                chunk = read.result()
+            except StopAsyncIteration:
+                break
+            except Exception:
+                if token.cancelled:
+                    raise StreamCancelled(token.reason) from None
+                raise
+            token.raise_if_cancelled()
+            delivered += approximate_tokens(text_of(chunk) or "")
+            yield chunk
+        finished = True
+    finally:
+        if not finished:
+            await aclose_upstream(stream)
+        stats.record(delivered, cancelled=not finished, max_tokens=max_tokens)
+
+
+async def wait_cancellable(awaitable: Awaitable[Any], token: CancellationToken) -> Any:
+    """
+    Await `awaitable` unless `token` is cancelled or times out first.
+
+    Meant for waits such as acquiring a lock or semaphore: if the token
+    wins, the wait is cancelled, so nothing is acquired.
+
+    Args:
+        awaitable (Awaitable[Any]): What to wait for.
+        token (CancellationToken): Cancellation signal and deadline.
+
+    Returns:
+        Any: The result of `awaitable`.
+
+    Raises:
+        StreamCancelled: If the token was cancelled or timed out first.
+    """
+    loop = asyncio.get_running_loop()
+    interrupted = loop.create_future()
+
+    def interrupt() -> None:
+        try:
+            loop.call_soon_threadsafe(_resolve, interrupted)
+        except RuntimeError:
+            pass
+
+    token.add_callback(interrupt)
+    task = asyncio.ensure_future(awaitable)
+    remaining = None if token.deadline is None else max(token.deadline - time.monotonic(), 0)
+    try:
+        await asyncio.wait((task, interrupted), timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        if not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+    if task.cancelled():
+        if not token.cancelled:
+            token.cancel("timeout")
+        raise StreamCancelled(token.reason)
+    return task.result()
+
+
+def _resolve(future: "asyncio.Future[None]") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+async def watch_disconnect(
+    request: Any, token: CancellationToken, poll_interval: float = 0.5
+) -> None:
+    """
+    Cancel `token` when the HTTP client behind `request` disconnects.
+
+    Run it as a background task next to the streaming work; it returns once
+    the token is cancelled for any reason. Do not use it with the
+    `gr.Request` of a queued Gradio handler: that wraps the /queue/join
+    request, which is answered (disconnected) before the handler runs.
+
+    Args:
+        request (Any): A Starlette/FastAPI `Request` of a streaming response.
+        token (CancellationToken): Token to cancel on disconnect.
+        poll_interval (float): Seconds between checks.
+    """
+    while not token.cancelled:
+        if await request.is_disconnected():
+            token.cancel("disconnect")
+            return
+        await asyncio.sleep(poll_interval)
@@ -0,0 +1,633 @@
+"""
+Record/replay ("cassette") transport for provider HTTP traffic.
+
+The OpenAI, google-genai, Anthropic and Ollama SDKs (and the LangChain
+integrations built on them) all talk HTTP through `httpx`; the raw Ollama
+playground script uses `requests`. `use_cassette()` hooks both libraries so
+that every request is either recorded to, or replayed from, a cassette file:
+
+    >>> from src.utils.cassettes import use_cassette
+    >>> with use_cassette("tests/cassettes/story_chain.json.gz", mode="auto"):
+    ...     result = story_with_analysis.invoke({"topic": "a lonely astronaut"})
+
+Streamed responses are stored chunk by chunk together with the time offset of
+each chunk, so replay can reproduce the original time-to-first-token and
+inter-chunk timing (`speed=1.0`), run faster or slower (`speed=4.0`,
+`speed=0.5`) or skip all delays (`speed=None`, the default) for fast offline
+regression tests and benchmarks.
+
+`ChatGoogleGenerativeAI` and legacy `google.generativeai` default to gRPC,
+which cannot be intercepted; create them with `transport="rest"` (served
+through `requests`) when they need to run from a cassette.
+
+Only complete, non-5xx responses are recorded: a stream the client stopped
+reading early, or a server error, is passed through and requested again
+next time instead of being replayed forever.
+
+Cassettes are gzip-compressed JSON. API keys are never written: request
+headers are not stored and key-like query parameters are stripped before
+matching.
+
+Modes:
+    - "replay": only serve recorded responses; unknown requests raise
+      `CassetteMissError`. No network access.
+    - "record": always hit the network and (re)record every interaction.
+    - "auto": replay what is recorded, record what is missing.
+    - "off": pass everything through untouched.
+
+The mode can also be set through the CASSETTE_MODE environment variable.
+"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
+
+CASSETTE_FORMAT_VERSION = 1
+MODES = ("replay", "record", "auto", "off")
+
+# Query parameters that carry credentials and must never be stored or matched on.
+_SECRET_QUERY_PARAMS = {"key", "api_key", "apikey", "access_token"}
+# Response headers that are meaningless (or harmful) when replayed.
+_DROPPED_RESPONSE_HEADERS = {"set-cookie", "date", "server-timing", "alt-svc"}
+
+
+class CassetteMissError(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+# --- Request matching ---
+
+
+def _scrub_url(url: str) -> str:
+    """Remove credential query parameters from a URL."""
+    parts = urlsplit(url)
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if name.lower() not in _SECRET_QUERY_PARAMS
+    ]
+    return urlunsplit(parts._replace(query=urlencode(sorted(query))))
+
+
+def _canonical_body(body: bytes) -> bytes:
+    """Normalize JSON bodies so key order does not affect matching."""
+    if not body:
+        return b""
+    try:
+        return json.dumps(json.loads(body), sort_keys=True).encode()
+    except (ValueError, UnicodeDecodeError):
+        return body
+
+
+def request_key(method: str, url: str, body: bytes) -> str:
+    """
+    Build the key used to match a request against recorded interactions.
+
+    Args:
+        method (str): HTTP method.
+        url (str): Full request URL.
+        body (bytes): Request body.
+
+    Returns:
+        str: "<METHOD> <scrubbed url> <sha256 of the canonical body>".
+    """
+    digest = hashlib.sha256(_canonical_body(body)).hexdigest()[:32]
+    return f"{method.upper()} {_scrub_url(url)} {digest}"
+
+
+def _encode(data: bytes) -> dict[str, str]:
+    """Store bytes as text when possible (smaller, diffable) and base64 otherwise."""
+    try:
+        return {"s": data.decode("utf-8")}
+    except UnicodeDecodeError:
+        return {"b": base64.b64encode(data).decode("ascii")}
+
+
+def _decode(value: dict[str, str]) -> bytes:
+    """Inverse of `_encode()`."""
+    if "s" in value:
+        return value["s"].encode("utf-8")
+    return base64.b64decode(value["b"])
+
+
+# --- Cassette storage ---
+
+
+class Cassette:
+    """
+    A set of recorded HTTP interactions backed by a gzip-compressed JSON file.
+
+    Identical requests are replayed in the order they were recorded; once a
+    request's recordings are exhausted the last one is served again.
+
+    Args:
+        path (str | Path): Cassette file, conventionally `*.json.gz`.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._interactions: list[dict[str, Any]] = []
+        self._by_key: dict[str, list[dict[str, Any]]] = defaultdict(list)
+        self._play_counts: dict[str, int] = defaultdict(int)
+        self.dirty = False
+        if self.path.exists():
+            self._load()
+
+    def _load(self) -> None:
+        """Read the cassette file into memory."""
+        with gzip.open(self.path, "rt", encoding="utf-8") as handle:
+            data = json.load(handle)
+        if data.get("version") != CASSETTE_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported cassette version {data.get('version')} in {self.path}"
+            )
+        for interaction in data["interactions"]:
+            self._add(interaction)
+
+    def _add(self, interaction: dict[str, Any]) -> None:
+        self._interactions.append(interaction)
+        self._by_key[interaction["key"]].append(interaction)
+
+    def __len__(self) -> int:
+        return len(self._interactions)
+
+    def reset(self) -> None:
+        """Forget all interactions (used by "record" mode before re-recording)."""
+        with self._lock:
+            self._interactions.clear()
+            self._by_key.clear()
+            self._play_counts.clear()
+            self.dirty = True
+
+    def find(self, key: str) -> Optional[dict[str, Any]]:
+        """
+        Return the next recorded interaction for `key`.
+
+        Args:
+            key (str): Request key from `request_key()`.
+
+        Returns:
+            Optional[dict[str, Any]]: The interaction, or None if not recorded.
+        """
+        with self._lock:
+            # Cassettes written before incomplete streams were discarded may hold some.
+            recorded = [i for i in self._by_key.get(key, ()) if i["response"].get("complete", True)]
+            if not recorded:
+                return None
+            index = min(self._play_counts[key], len(recorded) - 1)
+            self._play_counts[key] += 1
+            return recorded[index]
+
+    def record(
+        self,
+        key: str,
+        method: str,
+        url: str,
+        body: bytes,
+        status: int,
+        headers: list[tuple[str, str]],
+        chunks: list[tuple[float, bytes]],
+        complete: bool = True,
+    ) -> None:
+        """
+        Add an interaction.
+
+        Args:
+            key (str): Request key from `request_key()`.
+            method (str): HTTP method.
+            url (str): Request URL (credentials are scrubbed before storing).
+            body (bytes): Request body.
+            status (int): Response status code.
+            headers (list[tuple[str, str]]): Response headers.
+            chunks (list[tuple[float, bytes]]): (seconds since the request was
+                sent, data) for every response chunk.
+            complete (bool): False if the client stopped reading early.
+        """
+        interaction = {
+            "key": key,
+            "request": {"method": method, "url": _scrub_url(url), **_encode(body)},
+            "response": {
+                "status": status,
+                "headers": [
+                    [name, value]
+                    for name, value in headers
+                    if name.lower() not in _DROPPED_RESPONSE_HEADERS
+                ],
+                "chunks": [
+                    {"t": round(offset, 6), **_encode(data)} for offset, data in chunks
+                ],
+                "complete": complete,
+            },
+        }
+        with self._lock:
+            self._add(interaction)
+            self.dirty = True
+
+    def save(self) -> None:
+        """Write the cassette to disk if it changed."""
+        with self._lock:
+            if not self.dirty:
+                return
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            data = {
+                "version": CASSETTE_FORMAT_VERSION,
+                "interactions": self._interactions,
+            }
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=9) as handle:
+                json.dump(data, handle, separators=(",", ":"))
+            os.replace(tmp_path, self.path)
+            self.dirty = False
+
+
+# --- Streams ---
+
+
+class _ReplayStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Yield recorded chunks, optionally reproducing their original timing."""
+
+    def __init__(self, chunks: list[dict[str, Any]], speed: Optional[float]):
+        self._chunks = chunks
+        self._speed = speed
+
+    def _delays(self) -> Iterator[tuple[float, bytes]]:
+        """Yield (seconds to wait before the chunk, data)."""
+        previous = 0.0
+        for chunk in self._chunks:
+            delay = 0.0
+            if self._speed:
+                delay = max(chunk["t"] - previous, 0.0) / self._speed
+            previous = chunk["t"]
+            yield delay, _decode(chunk)
+
+    def __iter__(self) -> Iterator[bytes]:
+        for delay, data in self._delays():
+            if delay:
+                time.sleep(delay)
+            yield data
+
+    async def __aiter__(self):
+        for delay, data in self._delays():
+            if delay:
+                await asyncio.sleep(delay)
+            yield data
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Pass chunks through while recording them with their time offsets."""
+
+    def __init__(self, stream, started: float, on_close):
+        self._stream = stream
+        self._started = started
+        self._on_close = on_close
+        self._chunks: list[tuple[float, bytes]] = []
+        self._complete = False
+        self._closed = False
+
+    def _note(self, chunk: bytes) -> None:
+        self._chunks.append((time.perf_counter() - self._started, chunk))
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._note(chunk)
+            yield chunk
+        self._complete = True
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._note(chunk)
+            yield chunk
+        self._complete = True
+
+    def _finish(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._on_close(self._chunks, self._complete)
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._finish()
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            self._finish()
+
+
+# --- Recorder ---
+
+
+class CassetteRecorder:
+    """
+    Decides, per request, whether to replay from or record to a cassette.
+
+    Args:
+        cassette (Cassette): Where interactions are stored.
+        mode (str): One of "replay", "record", "auto" or "off".
+        speed (Optional[float]): Replay speed relative to the recording
+            (1.0 = original timing); None or 0 replays without delays.
+    """
+
+    def __init__(self, cassette: Cassette, mode: str = "auto", speed: Optional[float] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}'. Use one of {MODES}.")
+        self.cassette = cassette
+        self.mode = mode
+        self.speed = speed
+        self.stats = {"replayed": 0, "recorded": 0, "discarded": 0, "passed_through": 0}
+        if mode == "record":
+            cassette.reset()
+
+    def _keep(self, status: int, complete: bool) -> bool:
+        """Whether a live response is worth recording (else it is counted as discarded)."""
+        if complete and status < 500:
+            return True
+        self.stats["discarded"] += 1
+        return False
+
+    def _replay(self, request: httpx.Request) -> Optional[httpx.Response]:
+        """Build a response from the cassette, or None if it must be recorded."""
+        key = request_key(request.method, str(request.url), request.content)
+        interaction = None if self.mode == "record" else self.cassette.find(key)
+        if interaction is None:
+            if self.mode == "replay":
+                raise CassetteMissError(
+                    f"No recording for {key} in {self.cassette.path}. "
+                    "Re-run with CASSETTE_MODE=auto or record to create it."
+                )
+            return None
+        self.stats["replayed"] += 1
+        recorded = interaction["response"]
+        return httpx.Response(
+            status_code=recorded["status"],
+            headers=recorded["headers"],
+            stream=_ReplayStream(recorded["chunks"], self.speed),
+            request=request,
+        )
+
+    def _wrap(self, request: httpx.Request, response: httpx.Response, started: float):
+        """Wrap a live response so its body is recorded as it is read."""
+        key = request_key(request.method, str(request.url), request.content)
+
+        def on_close(chunks, complete):
+            if not self._keep(response.status_code, complete):
+                return
+            self.cassette.record(
+                key,
+                request.method,
+                str(request.url),
+                request.content,
+                response.status_code,
+                list(response.headers.multi_items()),
+                chunks,
+                complete,
+            )
+            self.stats["recorded"] += 1
+
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, started, on_close),
+            extensions=response.extensions,
+            request=request,
+        )
+
+    def handle(self, request: httpx.Request, send) -> httpx.Response:
+        """
+        Serve a sync httpx request.
+
+        Args:
+            request (httpx.Request): The outgoing request.
+            send: Callable performing the real request.
+
+        Returns:
+            httpx.Response: A replayed or recorded response.
+        """
+        if self.mode == "off":
+            self.stats["passed_through"] += 1
+            return send(request)
+        request.read()
+        replayed = self._replay(request)
+        if replayed is not None:
+            return replayed
+        started = time.perf_counter()
+        return self._wrap(request, send(request), started)
+
+    async def handle_async(self, request: httpx.Request, send) -> httpx.Response:
+        """Async counterpart of `handle()`."""
+        if self.mode == "off":
+            self.stats["passed_through"] += 1
+            return await send(request)
+        await request.aread()
+        replayed = self._replay(request)
+        if replayed is not None:
+            return replayed
+        started = time.perf_counter()
+        return self._wrap(request, await send(request), started)
+
+    # --- requests support (used by the raw Ollama REST examples) ---
+
+    def handle_requests(self, prepared, send):
+        """
+        Serve a `requests` PreparedRequest.
+
+        `requests` bodies are read eagerly, so chunk timing is recorded but
+        replay delivers the whole body at once after the recorded duration.
+
+        Args:
+            prepared (requests.PreparedRequest): The outgoing request.
+            send: Callable performing the real request.
+
+        Returns:
+            requests.Response: A replayed or recorded response.
+        """
+        import requests
+
+        if self.mode == "off":
+            self.stats["passed_through"] += 1
+            return send(prepared)
+        body = prepared.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        key = request_key(prepared.method, prepared.url, body)
+        interaction = None if self.mode == "record" else self.cassette.find(key)
+        if interaction is None and self.mode == "replay":
+            raise CassetteMissError(f"No recording for {key} in {self.cassette.path}.")
+
+        if interaction is not None:
+            self.stats["replayed"] += 1
+            recorded = interaction["response"]
+            if self.speed and recorded["chunks"]:
+                time.sleep(recorded["chunks"][-1]["t"] / self.speed)
+            response = requests.Response()
+            response.status_code = recorded["status"]
+            response.headers = requests.structures.CaseInsensitiveDict(
+                recorded["headers"]
+            )
+            response._content = b"".join(_decode(c) for c in recorded["chunks"])
+            response._content_consumed = True
+            response.url = prepared.url
+            response.request = prepared
+            response.encoding = requests.utils.get_encoding_from_headers(
+                response.headers
+            )
+            return response
+
+        started = time.perf_counter()
+        response = send(prepared)
+        chunks = [
+            (time.perf_counter() - started, chunk)
+            for chunk in response.iter_content(chunk_size=None)
+        ]
+        response._content = b"".join(data for _, data in chunks)
+        response._content_consumed = True
+        if not self._keep(response.status_code, complete=True):
+            return response
+        self.cassette.record(
+            key,
+            prepared.method,
+            prepared.url,
+            body,
+            response.status_code,
+            list(response.headers.items()),
+            chunks,
+        )
+        self.stats["recorded"] += 1
+        return response
+
+
+class CassetteTransport(httpx.BaseTransport, httpx.AsyncBaseTransport):
+    """
+    httpx transport that records to / replays from a cassette.
+
+    Use it when you want to scope a cassette to a single client instead of
+    patching every client with `use_cassette()`:
+
+        >>> recorder = CassetteRecorder(Cassette("chat.json.gz"), mode="replay")
+        >>> http_client = httpx.Client(transport=CassetteTransport(recorder))
+        >>> client = get_openai_client("gemini", http_client=http_client)
+
+    The same instance works for both `httpx.Client` and `httpx.AsyncClient`
+    (e.g. `ChatOllama(client_kwargs={"transport": transport})`).
+
+    Args:
+        recorder (CassetteRecorder): Replay/record policy and storage.
+        inner (Optional[httpx.BaseTransport]): Sync transport for live requests.
+        async_inner (Optional[httpx.AsyncBaseTransport]): Async transport for
+            live requests.
+    """
+
+    def __init__(
+        self,
+        recorder: CassetteRecorder,
+        inner: Optional[httpx.BaseTransport] = None,
+        async_inner: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.recorder = recorder
+        self._inner = inner
+        self._async_inner = async_inner
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if self._inner is None:
+            self._inner = httpx.HTTPTransport()
+        return self.recorder.handle(request, self._inner.handle_request)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if self._async_inner is None:
+            self._async_inner = httpx.AsyncHTTPTransport()
+        return await self.recorder.handle_async(
+            request, self._async_inner.handle_async_request
+        )
+
+    def close(self) -> None:
+        if self._inner is not None:
+            self._inner.close()
+        self.recorder.cassette.save()
+
+    async def aclose(self) -> None:
+        if self._async_inner is not None:
+            await self._async_inner.aclose()
+        self.recorder.cassette.save()
+
+
+def cassette_mode_from_env(default: str = "auto") -> str:
+    """Return the cassette mode from CASSETTE_MODE (or `default`)."""
+    return os.getenv("CASSETTE_MODE", default).strip().lower()
+
+
+@contextmanager
+def use_cassette(
+    path: str | Path,
+    mode: Optional[str] = None,
+    speed: Optional[float] = None,
+) -> Iterator[CassetteRecorder]:
+    """
+    Record or replay all `httpx` and `requests` traffic inside the block.
+
+    This patches the default httpx transports and `requests`' HTTP adapter,
+    so it covers SDK clients created before or inside the block.
+
+    Args:
+        path (str | Path): Cassette file.
+        mode (Optional[str]): "replay", "record", "auto" or "off"; defaults
+            to CASSETTE_MODE or "auto".
+        speed (Optional[float]): Replay speed (1.0 = original timing, None =
+            as fast as possible).
+
+    Yields:
+        CassetteRecorder: The recorder, e.g. to inspect `recorder.stats`.
+    """
+    recorder = CassetteRecorder(Cassette(path), mode or cassette_mode_from_env(), speed)
+    original_sync = httpx.HTTPTransport.handle_request
+    original_async = httpx.AsyncHTTPTransport.handle_async_request
+
+    def handle_request(transport, request):
+        return recorder.handle(request, lambda r: original_sync(transport, r))
+
+    async def handle_async_request(transport, request):
+        return await recorder.handle_async(
+            request, lambda r: original_async(transport, r)
+        )
+
+    httpx.HTTPTransport.handle_request = handle_request
+    httpx.AsyncHTTPTransport.handle_async_request = handle_async_request
+
+    requests_adapter = None
+    try:
+        from requests.adapters import HTTPAdapter as requests_adapter
+    except ImportError:
+        pass
+    if requests_adapter is not None:
+        original_send = requests_adapter.send
+
+        def send(adapter, prepared, **kwargs):
+            return recorder.handle_requests(
+                prepared, lambda p: original_send(adapter, p, **kwargs)
+            )
+
+        requests_adapter.send = send
+
+    try:
+        yield recorder
+    finally:
+        httpx.HTTPTransport.handle_request = original_sync
+        httpx.AsyncHTTPTransport.handle_async_request = original_async
+        if requests_adapter is not None:
+            requests_adapter.send = original_send
+        recorder.cassette.save()
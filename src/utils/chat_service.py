@@ -0,0 +1,240 @@
+"""
+Async multi-user chat service with explicit concurrency limits.
+
+The Gradio chat used to run one blocking generator thread per user and let
+every request hit the provider at once. `ChatService` instead runs chats as
+coroutines on one event loop and applies two limits:
+
+    - at most `max_concurrency` upstream model streams run at the same time
+      (further requests wait their turn, first come first served);
+    - each session may have at most `max_queue_per_user` requests running or
+      waiting. Requests beyond that fail fast with `QueueFullError`, so one
+      user hammering "send" cannot fill the queue for everybody else.
+
+Requests of the same session are processed in order, since each turn needs
+the previous answer in its history. Histories live in a `SessionStore`;
+the model is any async "chat backend" callable, e.g. `gemini_chat_backend()`
+(backed by the shared `google.genai` client) or
+`src.utils.fake_llm.FakeStreamingLLM` for load tests. Streams are wrapped
+with `acancellable_stream`, so a disconnected client or a timeout closes the
+upstream stream and frees the slot right away; a request cancelled while it
+waits for a slot leaves the queue at once.
+
+Example:
+    >>> service = ChatService(gemini_chat_backend("gemini-2.0-flash"))
+    >>> async for delta in service.stream_reply("session-1", "Hello!"):
+    ...     print(delta, end="")
+"""
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Optional
+
+from src.utils.cancellation import CancellationToken, acancellable_stream, aclose_upstream, wait_cancellable
+from src.utils.chat_sessions import Message, SessionStore
+
+# A chat backend receives the full conversation and streams the reply's text deltas.
+ChatBackend = Callable[[list[Message]], AsyncIterator[str]]
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a session already has `max_queue_per_user` requests pending."""
+
+
+@dataclass
+class ChatServiceStats:
+    """
+    Counters describing the service's load.
+
+    Attributes:
+        active (int): Upstream streams currently running.
+        waiting (int): Requests waiting for a free stream slot.
+        peak_active (int): Highest `active` value seen.
+        peak_waiting (int): Highest `waiting` value seen.
+        completed (int): Replies streamed to the end.
+        rejected (int): Requests refused with `QueueFullError`.
+        failed (int): Requests that raised (including cancellations).
+        total_wait_seconds (float): Time spent waiting for a slot, summed.
+    """
+
+    active: int = 0
+    waiting: int = 0
+    peak_active: int = 0
+    peak_waiting: int = 0
+    completed: int = 0
+    rejected: int = 0
+    failed: int = 0
+    total_wait_seconds: float = 0.0
+
+
+class ChatService:
+    """
+    Stream chat replies for many sessions with bounded concurrency.
+
+    Must be used from a single event loop.
+
+    Args:
+        backend (ChatBackend): Produces the reply stream for a conversation.
+        sessions (Optional[SessionStore]): History store; a new one by default.
+        max_concurrency (int): Upstream streams allowed at the same time.
+        max_queue_per_user (int): Requests a session may have running or
+            waiting at once.
+        timeout (Optional[float]): Seconds after which a reply (including its
+            wait for a slot) is cancelled.
+    """
+
+    def __init__(
+        self,
+        backend: ChatBackend,
+        sessions: Optional[SessionStore] = None,
+        max_concurrency: int = 16,
+        max_queue_per_user: int = 2,
+        timeout: Optional[float] = 120.0,
+    ):
+        if max_concurrency < 1 or max_queue_per_user < 1:
+            raise ValueError("max_concurrency and max_queue_per_user must be at least 1")
+        self.backend = backend
+        self.sessions = sessions or SessionStore()
+        self.max_concurrency = max_concurrency
+        self.max_queue_per_user = max_queue_per_user
+        self.timeout = timeout
+        self.stats = ChatServiceStats()
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._pending: dict[str, int] = {}
+        self._session_locks: dict[str, asyncio.Lock] = {}
+
+    def pending(self, session_id: str) -> int:
+        """Number of requests the session has running or waiting."""
+        return self._pending.get(session_id, 0)
+
+    async def stream_reply(
+        self,
+        session_id: str,
+        message: str,
+        token: Optional[CancellationToken] = None,
+        max_tokens: Optional[int] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream the reply to `message` and record the turn in the session history.
+
+        The turn is only added to the history once the reply is complete.
+
+        Args:
+            session_id (str): Session identifier (e.g. `gr.Request.session_hash`).
+            message (str): The user's message.
+            token (Optional[CancellationToken]): Caller's cancellation signal,
+                e.g. cancelled by `watch_disconnect`; the service's timeout
+                applies as well.
+            max_tokens (Optional[int]): The backend's output budget, used to
+                count the tokens saved by cancelling.
+
+        Yields:
+            str: Text deltas of the reply.
+
+        Raises:
+            QueueFullError: If the session already has too many pending requests.
+            StreamCancelled: If the reply timed out or `token` was cancelled;
+                its argument is the token's reason ("timeout", "disconnect", ...).
+        """
+        if self.pending(session_id) >= self.max_queue_per_user:
+            self.stats.rejected += 1
+            raise QueueFullError(
+                f"Session already has {self.max_queue_per_user} requests in progress"
+            )
+        self._pending[session_id] = self.pending(session_id) + 1
+        lock = self._session_locks.setdefault(session_id, asyncio.Lock())
+        caller, token = token, CancellationToken(timeout=self.timeout)
+        if caller is not None:
+            caller.add_callback(lambda: token.cancel(caller.reason or "cancelled"))
+        completed = False
+        try:
+            # Waiting for the session's previous turn or for a slot ends as
+            # soon as the caller cancels, not only at the timeout.
+            await wait_cancellable(lock.acquire(), token)
+            try:
+                waited = time.perf_counter()
+                self.stats.waiting += 1
+                self.stats.peak_waiting = max(self.stats.peak_waiting, self.stats.waiting)
+                try:
+                    await wait_cancellable(self._slots.acquire(), token)
+                finally:
+                    self.stats.waiting -= 1
+                    self.stats.total_wait_seconds += time.perf_counter() - waited
+                try:
+                    self.stats.active += 1
+                    self.stats.peak_active = max(self.stats.peak_active, self.stats.active)
+                    user_message = {"role": "user", "content": message}
+                    messages = self.sessions.history(session_id) + [user_message]
+                    parts = []
+                    stream = self.backend(messages)
+                    async for delta in acancellable_stream(
+                        stream, token, max_tokens=max_tokens
+                    ):
+                        parts.append(delta)
+                        yield delta
+                    self.sessions.append(
+                        session_id,
+                        user_message,
+                        {"role": "assistant", "content": "".join(parts)},
+                    )
+                    completed = True
+                finally:
+                    self.stats.active -= 1
+                    self._slots.release()
+            finally:
+                lock.release()
+        finally:
+            if completed:
+                self.stats.completed += 1
+            else:
+                self.stats.failed += 1
+            self._pending[session_id] -= 1
+            if not self._pending[session_id]:
+                del self._pending[session_id]
+                self._session_locks.pop(session_id, None)
+
+
+def gemini_chat_backend(
+    model: str,
+    config: Optional[dict[str, Any]] = None,
+    client: Any = None,
+) -> ChatBackend:
+    """
+    Build a chat backend on top of the shared native `google.genai` client.
+
+    Args:
+        model (str): Gemini model name.
+        config (Optional[dict[str, Any]]): `GenerateContentConfig` fields,
+            e.g. `system_instruction` or `safety_settings`.
+        client (Any): A `google.genai.Client`; defaults to
+            `src.utils.providers.get_genai_client()`.
+
+    Returns:
+        ChatBackend: Backend streaming text deltas via `client.aio`.
+    """
+
+    async def backend(messages: list[Message]) -> AsyncIterator[str]:
+        nonlocal client
+        if client is None:
+            from src.utils.providers import get_genai_client
+
+            client = get_genai_client()
+        contents = [
+            {
+                "role": "model" if m["role"] == "assistant" else "user",
+                "parts": [{"text": m["content"]}],
+            }
+            for m in messages
+        ]
+        stream = await client.aio.models.generate_content_stream(
+            model=model, contents=contents, config=config
+        )
+        try:
+            async for chunk in stream:
+                if chunk.text:
+                    yield chunk.text
+        finally:
+            await aclose_upstream(stream)
+
+    return backend
@@ -0,0 +1,141 @@
+"""
+In-memory chat session store.
+
+Holds the conversation history of every chat session (e.g. one per Gradio
+browser tab, keyed by `request.session_hash`) so handlers do not have to
+rebuild it from the UI's history on every message. Idle sessions expire,
+the number of sessions is capped (least recently used are evicted first)
+and each history is trimmed to its most recent messages.
+
+Messages use the provider-neutral `{"role": ..., "content": ...}` format
+with "user" and "assistant" roles.
+
+Example:
+    >>> sessions = SessionStore(ttl_seconds=3600)
+    >>> sessions.append("tab-1", {"role": "user", "content": "Hi"})
+    >>> sessions.history("tab-1")
+    [{'role': 'user', 'content': 'Hi'}]
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Optional
+
+Message = dict[str, str]
+
+
+@dataclass
+class _Session:
+    messages: list[Message] = field(default_factory=list)
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class SessionStore:
+    """
+    Thread-safe, bounded store of chat histories.
+
+    Args:
+        max_sessions (int): Sessions kept at most; the least recently used
+            session is evicted beyond that.
+        ttl_seconds (Optional[float]): Drop sessions idle for longer than
+            this. None keeps them until evicted.
+        max_messages (Optional[int]): Keep only the most recent messages of
+            each history. None keeps everything.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = 10_000,
+        ttl_seconds: Optional[float] = 3600.0,
+        max_messages: Optional[int] = 100,
+    ):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire(time.monotonic())
+            return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            self._expire(time.monotonic())
+            return session_id in self._sessions
+
+    def _expire(self, now: float) -> None:
+        """Drop idle sessions; the oldest are at the front. Caller holds the lock."""
+        if self.ttl_seconds is None:
+            return
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session.last_used <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+    def _get(self, session_id: str, create: bool) -> Optional[_Session]:
+        """Look up (and touch) a session. Caller holds the lock."""
+        now = time.monotonic()
+        self._expire(now)
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = self._sessions[session_id] = _Session()
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        session.last_used = now
+        return session
+
+    def history(self, session_id: str) -> list[Message]:
+        """
+        Return a copy of a session's messages.
+
+        Args:
+            session_id (str): Session identifier.
+
+        Returns:
+            list[Message]: The messages, oldest first (empty for unknown sessions).
+        """
+        with self._lock:
+            session = self._get(session_id, create=False)
+            return [] if session is None else list(session.messages)
+
+    def append(self, session_id: str, *messages: Message) -> None:
+        """
+        Append messages to a session, creating it if needed.
+
+        Args:
+            session_id (str): Session identifier.
+            *messages (Message): Messages to add.
+        """
+        with self._lock:
+            session = self._get(session_id, create=True)
+            session.messages.extend(messages)
+            if self.max_messages is not None and len(session.messages) > self.max_messages:
+                del session.messages[: -self.max_messages]
+
+    def replace(self, session_id: str, messages: list[Message]) -> None:
+        """
+        Replace a session's history, e.g. after the UI retried or edited a turn.
+
+        Args:
+            session_id (str): Session identifier.
+            messages (list[Message]): The new history, oldest first.
+        """
+        with self._lock:
+            session = self._get(session_id, create=True)
+            session.messages = list(messages)
+            if self.max_messages is not None and len(session.messages) > self.max_messages:
+                del session.messages[: -self.max_messages]
+
+    def reset(self, session_id: str) -> None:
+        """Forget a session's history."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
@@ -0,0 +1,493 @@
+"""
+Context compression: cut prompt tokens before they are sent to a model.
+
+Chains such as `analysis_chain` in `playground/lcel/ex_gemini_02.py` paste
+a whole generated story into the next prompt, and agent histories grow
+without bound. `ContextCompressor` shrinks text (or a message history) in
+up to three steps:
+
+    1. dedupe: drop paragraphs and sentences that already appeared
+       (whitespace- and case-insensitive), a common failure of generated
+       text and of histories that repeat tool outputs.
+    2. summarize (optional): if the text is still over `token_budget`, ask a
+       cheap local model (e.g. a small Ollama model, `ollama_summarizer()`)
+       for a summary within the budget.
+    3. trim: otherwise (or if the summary is still too long), keep the
+       highest-scoring sentences until the budget is reached, in their
+       original order. Sentences are scored by term frequency, overlap with
+       an optional query, and position (opening and closing sentences).
+       Token counts come from the cached tokenizer (`src.utils.tokens`).
+
+Every call produces a `CompressionReport` with tokens before/after, the
+time compression took, and the estimated prefill time saved at the target
+model, so the net latency impact is visible per call and in total
+(`ContextCompressor.stats`).
+
+In LCEL, insert `compressor.as_runnable()` in front of a prompt:
+
+    >>> compressor = ContextCompressor(token_budget=400)
+    >>> analysis_chain = (
+    ...     {"story": itemgetter("story") | compressor.as_runnable()}
+    ...     | analysis_prompt | chat | StrOutputParser()
+    ... )
+
+or compress selected keys of a dict input with
+`compressor.as_runnable(keys=["story"])`, and histories with
+`compress_messages()`.
+"""
+
+import asyncio
+import logging
+import math
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional, Sequence
+
+from src.utils.tokens import count_tokens
+
+logger = logging.getLogger(__name__)
+
+# Median prefill throughput of hosted models, used to estimate time saved.
+DEFAULT_PREFILL_TOKENS_PER_SECOND = 2000.0
+
+_SENTENCE_END = re.compile(r"(?<=[.!?…])[\"'”’)\]]*\s+(?=[\"'“‘(\[]?[A-Z0-9])")
+_PARAGRAPH = re.compile(r"\n\s*\n")
+_WORD = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from had has have he her his i in is it its of on or "
+    "she so that the their them they this to was were with you your we our not no".split()
+)
+
+Summarizer = Callable[[str, int], str]
+
+
+@dataclass
+class CompressionReport:
+    """
+    Outcome of one compression.
+
+    Attributes:
+        tokens_before (int): Tokens of the input.
+        tokens_after (int): Tokens of the output.
+        seconds (float): Time spent compressing (including summarization).
+        steps (list[str]): Steps that changed the text ("dedupe",
+            "summarize", "trim").
+        prefill_tokens_per_second (float): Assumed prefill throughput of
+            the target model.
+    """
+
+    tokens_before: int = 0
+    tokens_after: int = 0
+    seconds: float = 0.0
+    steps: list[str] = field(default_factory=list)
+    prefill_tokens_per_second: float = DEFAULT_PREFILL_TOKENS_PER_SECOND
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+    @property
+    def ratio(self) -> float:
+        """Output tokens / input tokens (1.0 = unchanged)."""
+        return self.tokens_after / self.tokens_before if self.tokens_before else 1.0
+
+    @property
+    def latency_saved_seconds(self) -> float:
+        """Estimated prefill time saved minus the time spent compressing."""
+        return self.tokens_saved / self.prefill_tokens_per_second - self.seconds
+
+
+@dataclass
+class CompressionStats:
+    """
+    Running totals over many compressions.
+
+    Attributes:
+        calls (int): Compressions performed.
+        tokens_before (int): Input tokens.
+        tokens_after (int): Output tokens.
+        seconds (float): Time spent compressing.
+        latency_saved_seconds (float): Net estimated latency saved.
+    """
+
+    calls: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+    seconds: float = 0.0
+    latency_saved_seconds: float = 0.0
+
+    def add(self, report: CompressionReport) -> None:
+        self.calls += 1
+        self.tokens_before += report.tokens_before
+        self.tokens_after += report.tokens_after
+        self.seconds += report.seconds
+        self.latency_saved_seconds += report.latency_saved_seconds
+
+    @property
+    def tokens_saved(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split a paragraph into sentences (punctuation followed by a capital)."""
+    return [s for s in _SENTENCE_END.split(text.strip()) if s.strip()]
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _content_words(text: str) -> list[str]:
+    return [w for w in _WORD.findall(text.lower()) if w not in _STOPWORDS and len(w) > 2]
+
+
+def dedupe_text(text: str) -> str:
+    """
+    Remove repeated paragraphs and sentences, keeping first occurrences.
+
+    Args:
+        text (str): Text to clean.
+
+    Returns:
+        str: Text without repeats; paragraph breaks are kept.
+    """
+    seen: set[str] = set()
+    paragraphs = []
+    for paragraph in _PARAGRAPH.split(text):
+        key = _normalize(paragraph)
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        sentences = []
+        for sentence in split_sentences(paragraph):
+            sentence_key = _normalize(sentence)
+            # Very short sentences ("Yes.") legitimately repeat.
+            if len(sentence_key) > 20 and sentence_key in seen:
+                continue
+            seen.add(sentence_key)
+            sentences.append(sentence)
+        if sentences:
+            paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+class ContextCompressor:
+    """
+    Dedupe, summarize and trim text to a token budget.
+
+    Args:
+        token_budget (Optional[int]): Target size; None only dedupes.
+        dedupe (bool): Drop repeated paragraphs and sentences.
+        summarizer (Optional[Summarizer]): `summarizer(text, max_tokens)`
+            returning a summary, e.g. `ollama_summarizer()`; used when the
+            text is over budget after deduplication.
+        model_name (Optional[str]): Hugging Face tokenizer for counting
+            (default: the ~4 characters/token estimate).
+        keep_head (int): Opening sentences always kept when trimming.
+        keep_tail (int): Closing sentences always kept when trimming.
+        prefill_tokens_per_second (float): Target model prefill speed for
+            the latency estimate.
+    """
+
+    def __init__(
+        self,
+        token_budget: Optional[int] = None,
+        dedupe: bool = True,
+        summarizer: Optional[Summarizer] = None,
+        model_name: Optional[str] = None,
+        keep_head: int = 1,
+        keep_tail: int = 1,
+        prefill_tokens_per_second: float = DEFAULT_PREFILL_TOKENS_PER_SECOND,
+    ):
+        self.token_budget = token_budget
+        self.dedupe = dedupe
+        self.summarizer = summarizer
+        self.model_name = model_name
+        self.keep_head = keep_head
+        self.keep_tail = keep_tail
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.stats = CompressionStats()
+        self.last_report: Optional[CompressionReport] = None
+
+    def count(self, text: str) -> int:
+        return count_tokens(text, self.model_name)
+
+    # --- Text ---
+
+    def compress(self, text: str, query: Optional[str] = None) -> tuple[str, CompressionReport]:
+        """
+        Compress text.
+
+        Args:
+            text (str): Text to compress.
+            query (Optional[str]): What the text will be used for (e.g. the
+                question); sentences sharing its words are preferred.
+
+        Returns:
+            tuple[str, CompressionReport]: The compressed text and its report.
+        """
+        started = time.perf_counter()
+        report = CompressionReport(prefill_tokens_per_second=self.prefill_tokens_per_second)
+        report.tokens_before = tokens = self.count(text)
+        budget = self.token_budget
+
+        if self.dedupe:
+            deduped = dedupe_text(text)
+            if deduped != text:
+                text, tokens = deduped, self.count(deduped)
+                report.steps.append("dedupe")
+
+        if budget is not None and tokens > budget and self.summarizer is not None:
+            try:
+                summary = self.summarizer(text, budget)
+            except Exception as e:
+                logger.warning("Summarizer failed (%s); trimming instead", e)
+            else:
+                summary_tokens = self.count(summary)
+                if 0 < summary_tokens < tokens:
+                    text, tokens = summary, summary_tokens
+                    report.steps.append("summarize")
+
+        if budget is not None and tokens > budget:
+            text = self.trim(text, budget, query)
+            tokens = self.count(text)
+            report.steps.append("trim")
+
+        report.tokens_after = tokens
+        report.seconds = time.perf_counter() - started
+        self.stats.add(report)
+        self.last_report = report
+        logger.debug(
+            "Compressed %d -> %d tokens (%s) in %.1f ms",
+            report.tokens_before,
+            report.tokens_after,
+            "+".join(report.steps) or "unchanged",
+            report.seconds * 1000,
+        )
+        return text, report
+
+    def trim(self, text: str, budget: int, query: Optional[str] = None) -> str:
+        """
+        Keep the highest-scoring sentences that fit in `budget` tokens.
+
+        Args:
+            text (str): Text to trim.
+            budget (int): Maximum tokens.
+            query (Optional[str]): Words to prefer.
+
+        Returns:
+            str: Selected sentences in original order, paragraphs kept.
+        """
+        units = []  # (paragraph index, sentence)
+        for p, paragraph in enumerate(_PARAGRAPH.split(text)):
+            units.extend((p, sentence) for sentence in split_sentences(paragraph))
+        if not units:
+            return text
+        costs = [self.count(sentence) + 1 for _, sentence in units]
+
+        frequencies = Counter(w for _, sentence in units for w in _content_words(sentence))
+        top = max(frequencies.values(), default=1)
+        query_words = set(_content_words(query or ""))
+        scores = []
+        for _, sentence in units:
+            words = _content_words(sentence)
+            score = sum(frequencies[w] / top for w in words) / math.sqrt(len(words) or 1)
+            if query_words:
+                score += 2.0 * len(query_words.intersection(words)) / len(query_words)
+            scores.append(score)
+
+        n = len(units)
+        pinned = set(range(min(self.keep_head, n))) | set(range(max(0, n - self.keep_tail), n))
+        order = sorted(pinned) + sorted(set(range(n)) - pinned, key=lambda i: scores[i], reverse=True)
+        chosen: set[int] = set()
+        used = 0
+        for i in order:
+            if used + costs[i] <= budget:
+                chosen.add(i)
+                used += costs[i]
+        if not chosen:
+            # Not even one sentence fits: cut the best one by characters.
+            best = max(range(n), key=lambda i: scores[i])
+            sentence = units[best][1]
+            return sentence[: max(1, len(sentence) * budget // costs[best])]
+
+        paragraphs: list[list[str]] = []
+        last_paragraph = None
+        for i in sorted(chosen):
+            paragraph, sentence = units[i]
+            if paragraph != last_paragraph:
+                paragraphs.append([])
+                last_paragraph = paragraph
+            paragraphs[-1].append(sentence)
+        return "\n\n".join(" ".join(sentences) for sentences in paragraphs)
+
+    # --- Message histories ---
+
+    def compress_messages(
+        self, messages: Sequence[Any], keep_last: int = 4
+    ) -> tuple[list[Any], CompressionReport]:
+        """
+        Fit a chat history into the token budget.
+
+        System messages and the last `keep_last` messages are kept verbatim.
+        Older messages are deduplicated; if the history is still over
+        budget they are replaced by one summary (with a summarizer) or
+        trimmed, oldest first.
+
+        Args:
+            messages (Sequence[Any]): `{"role", "content"}` dicts or
+                LangChain `BaseMessage`s.
+            keep_last (int): Most recent messages never touched.
+
+        Returns:
+            tuple[list[Any], CompressionReport]: The new history and report.
+        """
+        started = time.perf_counter()
+        report = CompressionReport(prefill_tokens_per_second=self.prefill_tokens_per_second)
+        contents = [_message_content(m) for m in messages]
+        costs = [self.count(c) for c in contents]
+        report.tokens_before = sum(costs)
+
+        recent_start = max(0, len(messages) - keep_last)
+        fixed = {i for i in range(recent_start, len(messages))}
+        fixed |= {i for i, m in enumerate(messages) if _message_role(m) == "system"}
+        older = [i for i in range(len(messages)) if i not in fixed]
+
+        result = list(messages)
+        if self.dedupe:
+            seen: set[str] = set()
+            for i in range(len(messages)):
+                key = _normalize(contents[i])
+                if i in older and key in seen and len(key) > 20:
+                    result[i] = None
+                    costs[i] = 0
+                    if "dedupe" not in report.steps:
+                        report.steps.append("dedupe")
+                seen.add(key)
+
+        budget = self.token_budget
+        older = [i for i in older if result[i] is not None]
+        if budget is not None and sum(costs) > budget and older:
+            available = budget - sum(costs[i] for i in range(len(messages)) if i not in older and result[i] is not None)
+            summary = None
+            if self.summarizer is not None and available > 0:
+                transcript = "\n".join(f"{_message_role(messages[i])}: {contents[i]}" for i in older)
+                try:
+                    summary = self.summarizer(transcript, available)
+                except Exception as e:
+                    logger.warning("Summarizer failed (%s); dropping old messages instead", e)
+            if summary:
+                for i in older:
+                    result[i] = None
+                    costs[i] = 0
+                result[older[0]] = _make_message(messages[older[0]], "system", f"Summary of the earlier conversation: {summary}")
+                costs[older[0]] = self.count(summary)
+                report.steps.append("summarize")
+            else:
+                # Drop the oldest messages until the history fits.
+                for i in older:
+                    if sum(costs) <= budget:
+                        break
+                    result[i] = None
+                    costs[i] = 0
+                report.steps.append("trim")
+
+        compressed = [m for m in result if m is not None]
+        report.tokens_after = sum(costs)
+        report.seconds = time.perf_counter() - started
+        self.stats.add(report)
+        self.last_report = report
+        return compressed, report
+
+    # --- LCEL ---
+
+    def as_runnable(self, keys: Optional[Sequence[str]] = None, query_key: Optional[str] = None):
+        """
+        Wrap the compressor as an LCEL runnable.
+
+        Input may be a string, a list of messages, or (with `keys`) a dict
+        whose listed string values are compressed; other values pass
+        through. `self.last_report` / `self.stats` hold the results.
+
+        Args:
+            keys (Optional[Sequence[str]]): Dict keys to compress.
+            query_key (Optional[str]): Dict key whose value is the query for
+                trimming (e.g. "question").
+
+        Returns:
+            langchain_core.runnables.RunnableLambda: The stage.
+        """
+        from langchain_core.runnables import RunnableLambda
+
+        def run(value: Any) -> Any:
+            if isinstance(value, str):
+                return self.compress(value)[0]
+            if isinstance(value, dict) and keys:
+                query = value.get(query_key) if query_key else None
+                result = dict(value)
+                for key in keys:
+                    if isinstance(result.get(key), str):
+                        result[key] = self.compress(result[key], query)[0]
+                return result
+            if isinstance(value, (list, tuple)):
+                return self.compress_messages(value)[0]
+            return value
+
+        async def arun(value: Any) -> Any:
+            # Summarizers make blocking model calls; keep them off the loop.
+            return await asyncio.to_thread(run, value)
+
+        return RunnableLambda(run, afunc=arun, name="ContextCompressor")
+
+
+def _message_content(message: Any) -> str:
+    content = message.get("content", "") if isinstance(message, dict) else getattr(message, "content", "")
+    if isinstance(content, list):
+        return " ".join(part.get("text", "") if isinstance(part, dict) else str(part) for part in content)
+    return str(content)
+
+
+def _message_role(message: Any) -> str:
+    if isinstance(message, dict):
+        return message.get("role", "")
+    return {"human": "user", "ai": "assistant"}.get(getattr(message, "type", ""), getattr(message, "type", ""))
+
+
+def _make_message(like: Any, role: str, content: str) -> Any:
+    """A message of the same flavour (dict or LangChain) as `like`."""
+    if isinstance(like, dict):
+        return {"role": role, "content": content}
+    from langchain_core.messages import SystemMessage
+
+    return SystemMessage(content=content)
+
+
+def ollama_summarizer(model: str = "llama3.2:1b", **model_kwargs: Any) -> Summarizer:
+    """
+    Summarizer backed by a small local Ollama model.
+
+    Args:
+        model (str): Ollama model name.
+        **model_kwargs: Extra `ChatOllama` arguments.
+
+    Returns:
+        Summarizer: `summarizer(text, max_tokens) -> summary`.
+    """
+    from src.utils.providers import get_chat_model
+
+    chat = get_chat_model("ollama", model, temperature=0, **model_kwargs)
+
+    def summarize(text: str, max_tokens: int) -> str:
+        words = max(20, int(max_tokens * 0.7))
+        prompt = (
+            f"Summarize the following text in at most {words} words. Keep names, numbers, "
+            f"decisions and open questions. Reply with the summary only.\n\n{text}"
+        )
+        # num_predict is a ChatOllama field, not a per-call argument of the
+        # Ollama client; the copy shares the client and its connections.
+        limited = chat.model_copy(update={"num_predict": max_tokens})
+        return limited.invoke(prompt).content.strip()
+
+    return summarize
@@ -0,0 +1,83 @@
+"""
+Fake streaming model for load tests and benchmarks.
+
+`playground/fake_llm/fake_llm.py` shows LangChain's `FakeListLLM`, which
+answers instantly. Load tests need the timing profile of a real provider
+instead: a delay before the first token, then tokens at a steady rate.
+`FakeStreamingLLM` reproduces that without network access or API keys, in
+both sync and async flavours, and can be used wherever a chat backend
+(`Callable[[list[Message]], AsyncIterator[str]]`) is expected.
+
+Example:
+    >>> llm = FakeStreamingLLM(first_token_latency=0.3, token_delay=0.02)
+    >>> async for delta in llm.astream([{"role": "user", "content": "Hi"}]):
+    ...     print(delta, end="")
+"""
+
+import asyncio
+import time
+from typing import AsyncIterator, Iterator, Optional
+
+from src.utils.chat_sessions import Message
+
+
+class FakeStreamingLLM:
+    """
+    Deterministic model that streams a canned reply with realistic timing.
+
+    Args:
+        reply (Optional[str]): Text to stream. By default the reply echoes
+            the last user message.
+        tokens (int): Number of deltas in the default reply.
+        first_token_latency (float): Seconds before the first delta.
+        token_delay (float): Seconds between deltas.
+    """
+
+    def __init__(
+        self,
+        reply: Optional[str] = None,
+        tokens: int = 20,
+        first_token_latency: float = 0.3,
+        token_delay: float = 0.02,
+    ):
+        self.reply = reply
+        self.tokens = tokens
+        self.first_token_latency = first_token_latency
+        self.token_delay = token_delay
+        self.calls = 0
+
+    def _deltas(self, messages: list[Message]) -> list[str]:
+        if self.reply is not None:
+            return [f"{word} " for word in self.reply.split(" ")]
+        last = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        words = [f"echo({last[:20]})"] + [f"token{i}" for i in range(1, self.tokens)]
+        return [f"{word} " for word in words]
+
+    def stream(self, messages: list[Message]) -> Iterator[str]:
+        """
+        Stream the reply, blocking the calling thread while "generating".
+
+        Args:
+            messages (list[Message]): Conversation so far.
+
+        Yields:
+            str: Text deltas.
+        """
+        self.calls += 1
+        time.sleep(self.first_token_latency)
+        for i, delta in enumerate(self._deltas(messages)):
+            if i:
+                time.sleep(self.token_delay)
+            yield delta
+
+    async def astream(self, messages: list[Message]) -> AsyncIterator[str]:
+        """Async counterpart of `stream()`; waits without blocking the event loop."""
+        self.calls += 1
+        await asyncio.sleep(self.first_token_latency)
+        for i, delta in enumerate(self._deltas(messages)):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield delta
+
+    def __call__(self, messages: list[Message]) -> AsyncIterator[str]:
+        return self.astream(messages)
@@ -0,0 +1,671 @@
+"""
+Durable job queue for long-running agent tasks, with worker processes.
+
+Scripts such as those in `playground/gemini` do their work inline; a long
+agent run started from a web handler ties up the handler and is lost if
+the process restarts. `JobQueue` stores jobs in SQLite (WAL mode) instead,
+and `WorkerPool` runs them in separate processes:
+
+    - A job names its task as an importable "module:function" and carries
+      JSON keyword arguments, so any process can run it. Coroutine
+      functions are run with `asyncio.run()`.
+    - Workers claim jobs in batches (one write transaction per batch),
+      highest `priority` first, then oldest. A claim is a lease: the job is
+      invisible to other workers until `lease_seconds` (the visibility
+      timeout) pass. Workers renew the leases of the jobs they hold while
+      they run, so only jobs of a crashed worker become visible again and
+      are retried. A hung job keeps its lease until it has run for
+      `run_timeout` seconds (if set); then its worker stops renewing the
+      leases of its batch, and the jobs are retried by another worker or
+      fail once they used all their attempts.
+    - Results are acknowledged in batches too. A failed job is retried
+      with exponential backoff until `max_attempts`; attempts are counted
+      at claim time, so a job that keeps crashing its worker also ends up
+      "failed" instead of looping forever.
+
+Delivery is at least once: a job whose worker died after finishing it but
+before acknowledging it runs again, so tasks should be idempotent.
+
+Example:
+    >>> queue = JobQueue("data/jobs.sqlite3")
+    >>> job_id = queue.enqueue("src.agents.research:run", {"topic": "fusion"}, priority=5)
+    >>> with WorkerPool("data/jobs.sqlite3", processes=4):
+    ...     print(queue.wait(job_id, timeout=600)["result"])
+
+Workers can also run on their own (e.g. as a service next to a web app):
+
+    python -m src.utils.job_queue --processes 4 --batch-size 8
+"""
+
+import argparse
+import asyncio
+import functools
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import traceback
+import uuid
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join("data", "jobs.sqlite3")
+DEFAULT_QUEUE = "default"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    queue TEXT NOT NULL,
+    task TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (queue, priority DESC, id)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (finished_at) WHERE finished_at IS NOT NULL;
+"""
+
+
+class JobError(RuntimeError):
+    """A job's task name cannot be resolved to a function."""
+
+
+@dataclass
+class Job:
+    """
+    A claimed job.
+
+    Attributes:
+        id (int): Job id.
+        task (str): "module:function" to call.
+        payload (dict): Keyword arguments for the task.
+        priority (int): Higher runs first.
+        attempts (int): Attempts including this one.
+        max_attempts (int): Attempts before the job fails for good.
+    """
+
+    id: int
+    task: str
+    payload: dict
+    priority: int
+    attempts: int
+    max_attempts: int
+
+
+@functools.lru_cache(maxsize=256)
+def resolve_task(task: str) -> Callable[..., Any]:
+    """
+    Import the function named by "package.module:function".
+
+    Args:
+        task (str): Task name; the attribute part may be dotted
+            ("module:Class.method").
+
+    Returns:
+        Callable[..., Any]: The function.
+
+    Raises:
+        JobError: If the name is malformed or cannot be imported.
+    """
+    module_name, _, attribute = task.partition(":")
+    if not module_name or not attribute:
+        raise JobError(f"Task {task!r} must look like 'package.module:function'")
+    try:
+        target: Any = importlib.import_module(module_name)
+        for part in attribute.split("."):
+            target = getattr(target, part)
+    except (ImportError, AttributeError) as e:
+        raise JobError(f"Cannot resolve task {task!r}: {e}") from e
+    return target
+
+
+def run_task(job: Job) -> Any:
+    """Call a job's task with its payload (coroutines are run to completion)."""
+    result = resolve_task(job.task)(**job.payload)
+    if asyncio.iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+class JobQueue:
+    """
+    SQLite-backed job queue.
+
+    Thread-safe; any number of processes may share one database file.
+
+    Args:
+        path (str): SQLite database file (created if missing).
+        lease_seconds (float): Visibility timeout of claimed jobs.
+        base_backoff (float): Delay before the first retry; doubles per attempt.
+        max_backoff (float): Upper bound for retry delays.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        lease_seconds: float = 60.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 300.0,
+    ):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._connection().executescript(_SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Per-thread connection in autocommit mode (transactions are explicit)."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    # --- Producers ---
+
+    def enqueue(
+        self,
+        task: str,
+        payload: Optional[dict] = None,
+        priority: int = 0,
+        delay: float = 0.0,
+        max_attempts: int = 3,
+        queue: str = DEFAULT_QUEUE,
+    ) -> int:
+        """
+        Add a job.
+
+        Args:
+            task (str): "module:function" to call with `**payload`.
+            payload (Optional[dict]): JSON-serializable keyword arguments.
+            priority (int): Higher runs first.
+            delay (float): Seconds before the job may run.
+            max_attempts (int): Attempts before the job fails for good.
+            queue (str): Queue name; workers choose the queues they serve.
+
+        Returns:
+            int: The job id.
+        """
+        return self.enqueue_many(task, [payload or {}], priority, delay, max_attempts, queue)[0]
+
+    def enqueue_many(
+        self,
+        task: str,
+        payloads: Iterable[dict],
+        priority: int = 0,
+        delay: float = 0.0,
+        max_attempts: int = 3,
+        queue: str = DEFAULT_QUEUE,
+    ) -> list[int]:
+        """Add one job per payload in a single transaction; see `enqueue()`."""
+        now = time.time()
+        connection = self._connection()
+        ids = []
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for payload in payloads:
+                cursor = connection.execute(
+                    "INSERT INTO jobs (queue, task, payload, priority, max_attempts, available_at, created_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (queue, task, json.dumps(payload), priority, max_attempts, now + delay, now),
+                )
+                ids.append(cursor.lastrowid)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return ids
+
+    def get(self, job_id: int) -> Optional[dict]:
+        """
+        Look up a job.
+
+        Args:
+            job_id (int): Job id.
+
+        Returns:
+            Optional[dict]: id, task, status ("queued", "running", "done" or
+                "failed"), attempts, result (decoded), error, created_at,
+                finished_at; None if there is no such job.
+        """
+        row = self._connection().execute(
+            "SELECT id, task, status, attempts, result, error, created_at, finished_at FROM jobs WHERE id = ?",
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "task", "status", "attempts", "result", "error", "created_at", "finished_at")
+        job = dict(zip(keys, row))
+        job["result"] = None if job["result"] is None else json.loads(job["result"])
+        return job
+
+    def wait(self, job_id: int, timeout: Optional[float] = None, poll_interval: float = 0.05) -> dict:
+        """
+        Wait until a job is done or failed.
+
+        Args:
+            job_id (int): Job id.
+            timeout (Optional[float]): Seconds to wait at most.
+            poll_interval (float): Seconds between checks.
+
+        Returns:
+            dict: The finished job, see `get()`.
+
+        Raises:
+            KeyError: If there is no such job.
+            TimeoutError: If the job is still queued or running after `timeout`.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None:
+                raise KeyError(job_id)
+            if job["status"] in ("done", "failed"):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} is still {job['status']} after {timeout} s")
+            time.sleep(poll_interval)
+
+    def counts(self, queue: Optional[str] = None) -> dict[str, int]:
+        """Number of jobs per status (in one queue, or all)."""
+        if queue is None:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        else:
+            rows = self._connection().execute(
+                "SELECT status, COUNT(*) FROM jobs WHERE queue = ? GROUP BY status", (queue,)
+            )
+        return dict(rows.fetchall())
+
+    def purge(self, older_than: float = 7 * 86400.0) -> int:
+        """Delete jobs that finished more than `older_than` seconds ago; returns the count."""
+        cursor = self._connection().execute(
+            "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (time.time() - older_than,)
+        )
+        return cursor.rowcount
+
+    # --- Workers ---
+
+    def claim(self, owner: str, limit: int = 1, queues: Sequence[str] = (DEFAULT_QUEUE,)) -> list[Job]:
+        """
+        Lease up to `limit` runnable jobs for `owner`.
+
+        Runnable are queued jobs that are due and running jobs whose lease
+        expired. Jobs that already used all their attempts are marked
+        failed instead of being returned.
+
+        Args:
+            owner (str): Worker id; needed to acknowledge the jobs.
+            limit (int): Jobs to claim at most.
+            queues (Sequence[str]): Queues to take jobs from.
+
+        Returns:
+            list[Job]: Claimed jobs, highest priority first.
+        """
+        now = time.time()
+        placeholders = ",".join("?" * len(queues))
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            # Jobs whose worker died on the last allowed attempt.
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', finished_at = ?, lease_owner = NULL,"
+                " error = 'Lease expired on the last attempt (worker crashed or hung)'"
+                f" WHERE queue IN ({placeholders}) AND status = 'running' AND available_at <= ?"
+                " AND attempts >= max_attempts",
+                (now, *queues, now),
+            )
+            rows = connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_owner = ?,"
+                " available_at = ?, started_at = ?"
+                " WHERE id IN ("
+                f"  SELECT id FROM jobs WHERE queue IN ({placeholders})"
+                "   AND status IN ('queued', 'running') AND available_at <= ?"
+                "   ORDER BY priority DESC, id LIMIT ?"
+                ") RETURNING id, task, payload, priority, attempts, max_attempts",
+                (owner, now + self.lease_seconds, now, *queues, now, limit),
+            ).fetchall()
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        jobs = [Job(id, task, json.loads(payload), priority, attempts, max_attempts)
+                for id, task, payload, priority, attempts, max_attempts in rows]
+        jobs.sort(key=lambda job: (-job.priority, job.id))
+        return jobs
+
+    def extend_leases(self, job_ids: Sequence[int], owner: str) -> int:
+        """Renew the leases `owner` holds on `job_ids`; returns how many it still holds."""
+        if not job_ids:
+            return 0
+        cursor = self._connection().execute(
+            f"UPDATE jobs SET available_at = ? WHERE id IN ({','.join('?' * len(job_ids))})"
+            " AND lease_owner = ? AND status = 'running'",
+            (time.time() + self.lease_seconds, *job_ids, owner),
+        )
+        return cursor.rowcount
+
+    def complete(self, results: Sequence[tuple[int, Any]], owner: str) -> int:
+        """
+        Acknowledge finished jobs.
+
+        Args:
+            results (Sequence[tuple[int, Any]]): (job id, JSON-serializable result).
+            owner (str): Worker id that claimed the jobs.
+
+        Returns:
+            int: Jobs acknowledged; jobs whose lease moved to another worker
+                meanwhile are left alone.
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            acknowledged = 0
+            for job_id, result in results:
+                cursor = connection.execute(
+                    "UPDATE jobs SET status = 'done', result = ?, error = NULL, finished_at = ?,"
+                    " lease_owner = NULL WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                    (json.dumps(result, default=str), now, job_id, owner),
+                )
+                acknowledged += cursor.rowcount
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        if acknowledged < len(results):
+            logger.warning("%d job(s) finished after their lease moved to another worker", len(results) - acknowledged)
+        return acknowledged
+
+    def fail(self, job_id: int, owner: str, error: str) -> None:
+        """Record a failed attempt: retry with backoff, or fail for good after `max_attempts`."""
+        now = time.time()
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ? AND status = 'running'",
+            (job_id, owner),
+        ).fetchone()
+        if row is None:
+            return
+        attempts, max_attempts = row
+        if attempts >= max_attempts:
+            connection.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ?, lease_owner = NULL"
+                " WHERE id = ? AND lease_owner = ?",
+                (error, now, job_id, owner),
+            )
+            logger.error("Job %d failed after %d attempts: %s", job_id, attempts, error.strip().splitlines()[-1])
+            return
+        delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+        connection.execute(
+            "UPDATE jobs SET status = 'queued', error = ?, available_at = ?, lease_owner = NULL"
+            " WHERE id = ? AND lease_owner = ?",
+            (error, now + delay, job_id, owner),
+        )
+
+    def release(self, job_ids: Sequence[int], owner: str) -> None:
+        """Give claimed jobs back without counting the attempt (e.g. on shutdown)."""
+        if not job_ids:
+            return
+        self._connection().execute(
+            "UPDATE jobs SET status = 'queued', attempts = attempts - 1, available_at = ?, lease_owner = NULL"
+            f" WHERE id IN ({','.join('?' * len(job_ids))}) AND lease_owner = ? AND status = 'running'",
+            (time.time(), *job_ids, owner),
+        )
+
+
+class _Worker:
+    """Claims, runs and acknowledges jobs in one process."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        queues: Sequence[str],
+        batch_size: int,
+        poll_interval: float,
+        ack_interval: float,
+        run_timeout: Optional[float] = None,
+    ):
+        self.queue = queue
+        self.queues = tuple(queues)
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.ack_interval = ack_interval
+        self.run_timeout = run_timeout
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._held: set[int] = set()
+        self._held_lock = threading.Lock()
+        self._running: Optional[tuple[int, float]] = None  # job id, monotonic start
+
+    def _heartbeat(self, stop: threading.Event) -> None:
+        while not stop.wait(self.queue.lease_seconds / 3):
+            with self._held_lock:
+                if self._overran():
+                    # Let the leases expire so other workers take over the batch.
+                    logger.warning(
+                        "Job %d ran longer than %s s; giving up %d lease(s)",
+                        self._running[0], self.run_timeout, len(self._held),
+                    )
+                    self._held.clear()
+                held = list(self._held)
+            try:
+                self.queue.extend_leases(held, self.owner)
+            except sqlite3.Error as e:
+                logger.warning("Could not renew leases: %s", e)
+
+    def _overran(self) -> bool:
+        if self.run_timeout is None or self._running is None or not self._held:
+            return False
+        return time.monotonic() - self._running[1] > self.run_timeout
+
+    def run(self, stop: Any) -> None:
+        heartbeat_stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(heartbeat_stop,), daemon=True)
+        heartbeat.start()
+        try:
+            while not stop.is_set():
+                jobs = self.queue.claim(self.owner, self.batch_size, self.queues)
+                if not jobs:
+                    stop.wait(self.poll_interval)
+                    continue
+                with self._held_lock:
+                    self._held.update(job.id for job in jobs)
+                self._run_batch(jobs, stop)
+        finally:
+            heartbeat_stop.set()
+
+    def _run_batch(self, jobs: list[Job], stop: Any) -> None:
+        finished: list[tuple[int, Any]] = []
+        last_ack = time.monotonic()
+        for index, job in enumerate(jobs):
+            if stop.is_set():
+                self.queue.release([j.id for j in jobs[index:]], self.owner)
+                self._drop([j.id for j in jobs[index:]])
+                break
+            with self._held_lock:
+                if job.id not in self._held:  # given up after a job of the batch overran
+                    continue
+                self._running = (job.id, time.monotonic())
+            try:
+                finished.append((job.id, run_task(job)))
+            except Exception:
+                self.queue.fail(job.id, self.owner, traceback.format_exc())
+                self._drop([job.id])
+            finally:
+                with self._held_lock:
+                    self._running = None
+            if finished and time.monotonic() - last_ack >= self.ack_interval:
+                self._acknowledge(finished)
+                finished = []
+                last_ack = time.monotonic()
+        self._acknowledge(finished)
+
+    def _acknowledge(self, finished: list[tuple[int, Any]]) -> None:
+        if finished:
+            self.queue.complete(finished, self.owner)
+            self._drop([job_id for job_id, _ in finished])
+
+    def _drop(self, job_ids: list[int]) -> None:
+        with self._held_lock:
+            self._held.difference_update(job_ids)
+
+
+def _worker_main(path: str, options: dict, stop: Any) -> None:
+    """Entry point of a worker process."""
+    # The pool stops workers through `stop`; Ctrl+C in the terminal must not
+    # interrupt a job halfway.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=options.pop("log_level", logging.INFO))
+    queue = JobQueue(path, lease_seconds=options.pop("lease_seconds"))
+    _Worker(queue, **options).run(stop)
+
+
+class WorkerPool:
+    """
+    Processes that run jobs from a `JobQueue` database.
+
+    Args:
+        path (str): SQLite database file of the queue.
+        processes (Optional[int]): Worker processes (default: CPU count).
+        batch_size (int): Jobs claimed per transaction. Claimed jobs run one
+            after another in the claiming worker; use 1 for long jobs so
+            they spread over all workers.
+        queues (Sequence[str]): Queues to serve.
+        lease_seconds (float): Visibility timeout; jobs of a crashed worker
+            run again after this long.
+        poll_interval (float): Seconds an idle worker waits between claims.
+        ack_interval (float): Seconds a finished job may wait to be
+            acknowledged together with later jobs of its batch.
+        run_timeout (Optional[float]): Seconds a job may run before its
+            worker stops renewing the leases of its batch, so a hung job is
+            retried elsewhere (or fails on its last attempt). None renews
+            them for as long as the job runs.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        processes: Optional[int] = None,
+        batch_size: int = 8,
+        queues: Sequence[str] = (DEFAULT_QUEUE,),
+        lease_seconds: float = 60.0,
+        poll_interval: float = 0.2,
+        ack_interval: float = 0.1,
+        run_timeout: Optional[float] = None,
+    ):
+        self.path = path
+        self.size = processes or os.cpu_count() or 1
+        self.options = {
+            "queues": tuple(queues),
+            "batch_size": batch_size,
+            "poll_interval": poll_interval,
+            "ack_interval": ack_interval,
+            "run_timeout": run_timeout,
+            "lease_seconds": lease_seconds,
+            "log_level": logging.getLogger().getEffectiveLevel(),
+        }
+        JobQueue(path)  # create the schema before the workers race to do so
+        self._context = multiprocessing.get_context("spawn")
+        self._stop = self._context.Event()
+        self.processes: list[multiprocessing.process.BaseProcess] = []
+
+    def start(self) -> "WorkerPool":
+        """Start the worker processes."""
+        for index in range(self.size):
+            process = self._context.Process(
+                target=_worker_main,
+                args=(self.path, dict(self.options), self._stop),
+                name=f"job-worker-{index}",
+                daemon=True,
+            )
+            process.start()
+            self.processes.append(process)
+        return self
+
+    def stop(self, timeout: float = 30.0) -> None:
+        """
+        Stop the workers after their current job.
+
+        Jobs claimed but not started are released; workers still running
+        after `timeout` are terminated (their jobs run again after the lease).
+        """
+        self._stop.set()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                logger.warning("Terminating %s", process.name)
+                process.terminate()
+                process.join()
+        self.processes = []
+
+    def __enter__(self) -> "WorkerPool":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Run a worker pool until interrupted.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description="Run job queue workers.")
+    parser.add_argument("--path", default=DEFAULT_PATH)
+    parser.add_argument("--processes", type=int)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--queues", nargs="+", default=[DEFAULT_QUEUE])
+    parser.add_argument("--lease-seconds", type=float, default=60.0)
+    parser.add_argument("--run-timeout", type=float, help="seconds before a running job is given up")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    pool = WorkerPool(
+        args.path,
+        processes=args.processes,
+        batch_size=args.batch_size,
+        queues=args.queues,
+        lease_seconds=args.lease_seconds,
+        run_timeout=args.run_timeout,
+    ).start()
+    logger.info("%d workers serving %s from %s", pool.size, ", ".join(args.queues), args.path)
+    try:
+        while any(process.is_alive() for process in pool.processes):
+            time.sleep(1)
+    except KeyboardInterrupt:
+        logger.info("Stopping workers ...")
+    finally:
+        pool.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Lazy import helpers for heavy third-party SDKs.
+
+Provider SDKs such as `google.generativeai`, `langchain_google_genai`,
+`transformers` and `gradio` each take seconds to import. Modules in `src`
+reference them through `lazy_import()` so the real import only happens the
+first time an attribute is accessed, i.e. when a provider is actually used.
+
+Example:
+    >>> from src.utils.lazy_imports import lazy_import
+    >>> openai = lazy_import("openai")  # nothing imported yet
+    >>> client = openai.OpenAI()         # `openai` is imported here
+"""
+
+import importlib
+import logging
+import os
+import sys
+import threading
+from types import ModuleType
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_registry: dict[str, "LazyModule"] = {}
+_registry_lock = threading.Lock()
+
+
+def quiet_native_logging() -> None:
+    """
+    Silence the TensorFlow/gRPC/absl start-up noise emitted by Google SDKs.
+
+    The environment variables only take effect if they are set before the
+    native libraries are loaded, so this is used as a `before_load` hook.
+    """
+    os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+    os.environ.setdefault("GRPC_VERBOSITY", "ERROR")
+    os.environ.setdefault("GLOG_minloglevel", "2")
+
+
+def _quiet_absl(_module: ModuleType) -> None:
+    """Lower absl verbosity once a Google SDK has pulled it in."""
+    absl_logging = sys.modules.get("absl.logging")
+    if absl_logging is not None:
+        absl_logging.set_verbosity(absl_logging.ERROR)
+
+
+class LazyModule(ModuleType):
+    """
+    Module proxy that imports the target module on first attribute access.
+
+    Args:
+        name (str): Fully qualified module name, e.g. "google.genai".
+        before_load (Optional[Callable[[], None]]): Called right before the
+            real import, e.g. to set environment variables.
+        after_load (Optional[Callable[[ModuleType], None]]): Called with the
+            imported module, e.g. to configure its logging.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        before_load: Optional[Callable[[], None]] = None,
+        after_load: Optional[Callable[[ModuleType], None]] = None,
+    ):
+        super().__init__(name)
+        # Stored through __dict__ so __getattr__ is never triggered for them.
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_before_load"] = before_load
+        self.__dict__["_lazy_after_load"] = after_load
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        """Import the target module (once) and return it."""
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+        with self.__dict__["_lazy_lock"]:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                before_load = self.__dict__["_lazy_before_load"]
+                if before_load is not None:
+                    before_load()
+                logger.debug("Lazily importing %s", self.__name__)
+                module = importlib.import_module(self.__name__)
+                after_load = self.__dict__["_lazy_after_load"]
+                if after_load is not None:
+                    after_load(module)
+                self.__dict__["_lazy_module"] = module
+        return module
+
+    @property
+    def is_loaded(self) -> bool:
+        """True once the underlying module has been imported."""
+        return self.__dict__["_lazy_module"] is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self) -> list[str]:
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.is_loaded else "not loaded"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_import(
+    name: str,
+    before_load: Optional[Callable[[], None]] = None,
+    after_load: Optional[Callable[[ModuleType], None]] = None,
+) -> LazyModule:
+    """
+    Return a shared lazy proxy for the module `name`.
+
+    Repeated calls with the same name return the same proxy, so hooks are
+    only registered by the first caller.
+
+    Args:
+        name (str): Fully qualified module name.
+        before_load (Optional[Callable[[], None]]): Hook run before importing.
+        after_load (Optional[Callable[[ModuleType], None]]): Hook run after importing.
+
+    Returns:
+        LazyModule: A proxy that behaves like the module once used.
+    """
+    with _registry_lock:
+        proxy = _registry.get(name)
+        if proxy is None:
+            proxy = LazyModule(name, before_load=before_load, after_load=after_load)
+            _registry[name] = proxy
+        return proxy
+
+
+def lazy_google_import(name: str) -> LazyModule:
+    """
+    `lazy_import()` preset for Google SDKs that also silences their native
+    TensorFlow/gRPC/absl logging.
+
+    Args:
+        name (str): Module name, e.g. "google.generativeai".
+
+    Returns:
+        LazyModule: The lazy proxy.
+    """
+    return lazy_import(name, before_load=quiet_native_logging, after_load=_quiet_absl)
+
+
+def is_imported(name: str) -> bool:
+    """
+    Check whether a module has really been imported (not just proxied).
+
+    Args:
+        name (str): Fully qualified module name.
+
+    Returns:
+        bool: True if the module is present in `sys.modules`.
+    """
+    return name in sys.modules
@@ -0,0 +1,660 @@
+"""
+Local inference server for Hugging Face `transformers` models on CPU.
+
+Calling `model.generate()` once per request wastes most of the CPU: a
+decode step for one sequence costs nearly as much as for eight, because
+the weights are streamed from memory either way. `DynamicBatcher` queues
+incoming requests and runs them in batches:
+
+    - Requests are grouped by prompt length bucket (`buckets`), sampling
+      settings and `max_new_tokens` (rounded up to a power of two, since a
+      batch decodes until its largest limit), so a batch pads its prompts
+      (on the left) only up to the longest prompt of similar length instead
+      of the longest overall, and a short request never waits for a long
+      one's tokens. A batch that its own bucket cannot fill takes requests
+      from the nearest prompt length buckets as long as at most
+      `max_padding` of its prompt positions are padding.
+    - A batch is dispatched when it is full (`max_batch_size` requests or
+      `max_batch_tokens` padded prompt tokens) or when its oldest request
+      has waited `max_wait` seconds. While all workers are busy, requests
+      keep accumulating, so batches grow with load on their own.
+    - Batches run on a pool of `workers` threads (PyTorch releases the GIL);
+      the CPU cores are divided between them (`torch.set_num_threads`).
+
+`build_app()` exposes a batcher as an OpenAI-compatible HTTP API
+(`/v1/chat/completions`, `/v1/completions`, `/v1/models`), so any OpenAI
+client (or `ChatOpenAI(base_url=...)`) can use the local model:
+
+    python -m src.utils.local_inference --model HuggingFaceTB/SmolLM2-135M-Instruct --port 8000
+
+Example:
+    >>> batcher = DynamicBatcher(TransformersBackend("HuggingFaceTB/SmolLM2-135M-Instruct"))
+    >>> completion = batcher.generate_chat([{"role": "user", "content": "Hi!"}], max_new_tokens=32)
+    >>> completion.text
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from src.utils.chat_sessions import Message
+from src.utils.lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+_torch = lazy_import("torch")
+_transformers = lazy_import("transformers")
+
+# Upper bounds (in tokens) of the prompt length buckets.
+DEFAULT_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048)
+
+
+class InferenceOverloadedError(RuntimeError):
+    """Raised when the request queue is full."""
+
+
+@dataclass(frozen=True)
+class Sampling:
+    """
+    Sampling settings; only requests with equal settings share a batch.
+
+    Attributes:
+        temperature (float): 0 means greedy decoding.
+        top_p (float): Nucleus sampling threshold.
+    """
+
+    temperature: float = 0.0
+    top_p: float = 1.0
+
+
+@dataclass
+class Completion:
+    """
+    Result of one request.
+
+    Attributes:
+        text (str): Generated text.
+        prompt_tokens (int): Prompt length.
+        completion_tokens (int): Generated tokens.
+        finish_reason (str): "stop" (end of sequence or stop string) or
+            "length" (`max_new_tokens` reached).
+        queue_seconds (float): Time spent waiting for a batch.
+        batch_size (int): Requests in the batch that produced this result.
+    """
+
+    text: str
+    prompt_tokens: int
+    completion_tokens: int
+    finish_reason: str
+    queue_seconds: float
+    batch_size: int
+
+
+@dataclass
+class BatcherStats:
+    """
+    Counters describing the batcher's work.
+
+    Attributes:
+        requests (int): Requests completed.
+        batches (int): Batches run.
+        prompt_tokens (int): Real prompt tokens processed.
+        padded_tokens (int): Prompt tokens including padding.
+        generated_tokens (int): Tokens generated (before truncation).
+        busy_seconds (float): Time workers spent generating, summed.
+        queue_seconds (float): Time requests waited for a batch, summed.
+        batch_sizes (dict[int, int]): Number of batches per batch size.
+    """
+
+    requests: int = 0
+    batches: int = 0
+    prompt_tokens: int = 0
+    padded_tokens: int = 0
+    generated_tokens: int = 0
+    busy_seconds: float = 0.0
+    queue_seconds: float = 0.0
+    batch_sizes: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.requests / self.batches if self.batches else 0.0
+
+    @property
+    def padding_ratio(self) -> float:
+        """Share of prompt positions that were padding."""
+        return 1 - self.prompt_tokens / self.padded_tokens if self.padded_tokens else 0.0
+
+
+@dataclass
+class _Request:
+    prompt_ids: list[int]
+    max_new_tokens: int
+    sampling: Sampling
+    stop: tuple[str, ...]
+    future: Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class TransformersBackend:
+    """
+    Batched generation with a Hugging Face causal language model on CPU.
+
+    Args:
+        model_name (str): Hugging Face model name, e.g.
+            "HuggingFaceTB/SmolLM2-135M-Instruct".
+        threads (Optional[int]): PyTorch intra-op threads (default: all
+            cores divided among the batcher's workers, see `configure()`).
+        dtype (str): Weight dtype, "float32" or "bfloat16".
+    """
+
+    def __init__(self, model_name: str, threads: Optional[int] = None, dtype: str = "float32"):
+        from src.utils.providers import get_hf_tokenizer
+
+        self.model_name = model_name
+        self.threads = threads
+        self.tokenizer = get_hf_tokenizer(model_name)
+        self.model = _transformers.AutoModelForCausalLM.from_pretrained(
+            model_name, torch_dtype=getattr(_torch, dtype)
+        )
+        self.model.eval()
+        self.eos_token_id = self.tokenizer.eos_token_id
+        self.pad_token_id = self.tokenizer.pad_token_id
+        if self.pad_token_id is None:
+            self.pad_token_id = self.eos_token_id
+
+    def configure(self, workers: int) -> None:
+        """Split the CPU cores between `workers` concurrent batches."""
+        threads = self.threads or max(1, (os.cpu_count() or 1) // workers)
+        _torch.set_num_threads(threads)
+        logger.info("PyTorch uses %d threads per batch, %d workers", threads, workers)
+
+    def encode(self, text: str) -> list[int]:
+        return self.tokenizer.encode(text, add_special_tokens=True)
+
+    def encode_chat(self, messages: list[Message]) -> list[int]:
+        if getattr(self.tokenizer, "chat_template", None):
+            return list(self.tokenizer.apply_chat_template(messages, add_generation_prompt=True, tokenize=True))
+        prompt = "".join(f"{m['role']}: {m['content']}\n" for m in messages) + "assistant:"
+        return self.encode(prompt)
+
+    def decode(self, token_ids: list[int]) -> str:
+        return self.tokenizer.decode(token_ids, skip_special_tokens=True)
+
+    def generate(
+        self, batch: list[list[int]], max_new_tokens: int, sampling: Sampling
+    ) -> list[tuple[list[int], str]]:
+        """
+        Generate continuations for a batch of prompts.
+
+        Args:
+            batch (list[list[int]]): Prompt token ids.
+            max_new_tokens (int): Tokens to generate at most.
+            sampling (Sampling): Sampling settings.
+
+        Returns:
+            list[tuple[list[int], str]]: Generated ids (without the end of
+                sequence token) and finish reason, per prompt.
+        """
+        width = max(len(ids) for ids in batch)
+        input_ids = _torch.full((len(batch), width), self.pad_token_id, dtype=_torch.long)
+        attention_mask = _torch.zeros((len(batch), width), dtype=_torch.long)
+        for row, ids in enumerate(batch):
+            # Left padding: every sequence ends where generation starts.
+            input_ids[row, width - len(ids):] = _torch.tensor(ids, dtype=_torch.long)
+            attention_mask[row, width - len(ids):] = 1
+        options: dict[str, Any] = {"do_sample": sampling.temperature > 0}
+        if sampling.temperature > 0:
+            options.update(temperature=sampling.temperature, top_p=sampling.top_p)
+        with _torch.inference_mode():
+            output = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=max_new_tokens,
+                pad_token_id=self.pad_token_id,
+                **options,
+            )
+        results = []
+        for ids in output[:, width:].tolist():
+            if self.eos_token_id in ids:
+                results.append((ids[: ids.index(self.eos_token_id)], "stop"))
+            else:
+                results.append((ids, "length"))
+        return results
+
+
+class DynamicBatcher:
+    """
+    Queue requests and run them in dynamic, length-bucketed batches.
+
+    Thread-safe. The backend needs `encode(text)`, `encode_chat(messages)`,
+    `decode(ids)` and `generate(batch, max_new_tokens, sampling)` as in
+    `TransformersBackend`; `configure(workers)` is called if present.
+
+    Args:
+        backend (Any): Model backend.
+        max_batch_size (int): Requests per batch at most.
+        max_wait (float): Seconds the oldest request of a bucket waits for
+            the batch to fill before it runs anyway.
+        max_batch_tokens (int): Padded prompt tokens per batch at most.
+        max_padding (float): Share of padded prompt positions up to which a
+            batch is filled from neighbouring buckets (0 disables).
+        buckets (tuple[int, ...]): Upper bounds of the prompt length buckets.
+        workers (int): Batches run at the same time.
+        max_queue (int): Waiting requests at most; more raise
+            `InferenceOverloadedError`.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        max_batch_size: int = 8,
+        max_wait: float = 0.02,
+        max_batch_tokens: int = 8192,
+        max_padding: float = 0.3,
+        buckets: tuple[int, ...] = DEFAULT_BUCKETS,
+        workers: int = 1,
+        max_queue: int = 1024,
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_batch_tokens = max_batch_tokens
+        self.max_padding = max_padding
+        self.buckets = tuple(sorted(buckets))
+        self.workers = workers
+        self.max_queue = max_queue
+        self.stats = BatcherStats()
+        if hasattr(backend, "configure"):
+            backend.configure(workers)
+
+        # (prompt length bucket, max_new_tokens bucket, sampling) -> requests.
+        self._queues: dict[tuple[int, int, Sampling], deque[_Request]] = {}
+        self._waiting = 0
+        self._free_workers = workers
+        self._closed = False
+        self._condition = threading.Condition()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="inference")
+        self._scheduler = threading.Thread(target=self._schedule, name="inference-batcher", daemon=True)
+        self._scheduler.start()
+
+    # --- Submitting ---
+
+    def submit(
+        self,
+        prompt_ids: list[int],
+        max_new_tokens: int = 128,
+        sampling: Optional[Sampling] = None,
+        stop: tuple[str, ...] = (),
+    ) -> "Future[Completion]":
+        """
+        Queue a tokenized prompt.
+
+        Args:
+            prompt_ids (list[int]): Prompt token ids.
+            max_new_tokens (int): Tokens to generate at most.
+            sampling (Optional[Sampling]): Sampling settings; greedy by default.
+            stop (tuple[str, ...]): Cut the text at the first of these strings.
+
+        Returns:
+            Future[Completion]: Resolves when the request's batch finishes.
+
+        Raises:
+            InferenceOverloadedError: If `max_queue` requests are waiting.
+        """
+        sampling = sampling or Sampling()
+        request = _Request(list(prompt_ids), max_new_tokens, sampling, tuple(stop), Future())
+        # Batches generate up to their largest max_new_tokens; keep those within 2x.
+        key = (
+            bisect.bisect_left(self.buckets, len(request.prompt_ids)),
+            max(max_new_tokens - 1, 0).bit_length(),
+            sampling,
+        )
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("DynamicBatcher is closed")
+            if self._waiting >= self.max_queue:
+                raise InferenceOverloadedError(f"{self._waiting} requests waiting; try again later")
+            self._queues.setdefault(key, deque()).append(request)
+            self._waiting += 1
+            self._condition.notify()
+        return request.future
+
+    def generate(self, prompt: str, **kwargs: Any) -> Completion:
+        """Complete a text prompt (blocking); see `submit()` for arguments."""
+        return self.submit(self.backend.encode(prompt), **kwargs).result()
+
+    def generate_chat(self, messages: list[Message], **kwargs: Any) -> Completion:
+        """Answer a conversation (blocking); see `submit()` for arguments."""
+        return self.submit(self.backend.encode_chat(messages), **kwargs).result()
+
+    async def agenerate(self, prompt_ids: list[int], **kwargs: Any) -> Completion:
+        """`submit()` for coroutines."""
+        return await asyncio.wrap_future(self.submit(prompt_ids, **kwargs))
+
+    def close(self) -> None:
+        """Stop accepting requests, finish the queued ones and stop the workers."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._scheduler.join()
+        self._pool.shutdown(wait=True)
+
+    # --- Scheduling ---
+
+    def _next_batch(self, now: float) -> tuple[Optional[list[_Request]], Optional[float]]:
+        """The batch to run now, or None and the time until one is due."""
+        due = None
+        next_deadline = None
+        for key, queue in self._queues.items():
+            if not queue:
+                continue
+            if len(queue) >= self.max_batch_size or self._closed:
+                due = key
+                break
+            deadline = queue[0].enqueued_at + self.max_wait
+            if deadline <= now and (due is None or queue[0].enqueued_at < self._queues[due][0].enqueued_at):
+                due = key
+            elif deadline > now:
+                next_deadline = deadline if next_deadline is None else min(next_deadline, deadline)
+        if due is None:
+            return None, None if next_deadline is None else next_deadline - now
+
+        batch: list[_Request] = []
+        width = real = 0
+        bucket = due[0]
+        # The due bucket first, then its prompt length neighbours, nearest first.
+        neighbours = sorted(
+            (key for key, queue in self._queues.items() if queue and key != due and key[1:] == due[1:]),
+            key=lambda key: abs(key[0] - bucket),
+        )
+        for key in [due] + neighbours:
+            queue = self._queues[key]
+            while queue and len(batch) < self.max_batch_size:
+                length = len(queue[0].prompt_ids)
+                new_width = max(width, length)
+                padded = new_width * (len(batch) + 1)
+                if batch and (
+                    padded > self.max_batch_tokens
+                    or (key != due and 1 - (real + length) / padded > self.max_padding)
+                ):
+                    break
+                batch.append(queue.popleft())
+                width, real = new_width, real + length
+        self._waiting -= len(batch)
+        return batch, None
+
+    def _schedule(self) -> None:
+        with self._condition:
+            while True:
+                if self._closed and not self._waiting:
+                    return
+                if self._free_workers == 0 or not self._waiting:
+                    self._condition.wait()
+                    continue
+                batch, timeout = self._next_batch(time.monotonic())
+                if batch is None:
+                    self._condition.wait(timeout)
+                    continue
+                self._free_workers -= 1
+                self._pool.submit(self._run, batch)
+
+    def _run(self, batch: list[_Request]) -> None:
+        started = time.monotonic()
+        completions: list[Completion] = []
+        error: Optional[BaseException] = None
+        try:
+            completions = self._complete(batch, started)
+        except Exception as e:
+            logger.exception("Batch of %d requests failed", len(batch))
+            error = e
+        finally:
+            # Whatever happened, the worker is free again.
+            with self._condition:
+                self._free_workers += 1
+                self._condition.notify()
+        for request, completion in zip(batch, completions):
+            _settle(request.future, result=completion)
+        for request in batch:
+            if not request.future.done():
+                _settle(request.future, error=error or RuntimeError("The batch produced no result"))
+
+    def _complete(self, batch: list[_Request], started: float) -> list[Completion]:
+        """Generate a batch, post-process every completion and count it."""
+        prompts = [request.prompt_ids for request in batch]
+        results = self.backend.generate(
+            prompts, max(request.max_new_tokens for request in batch), batch[0].sampling
+        )
+        if len(results) != len(batch):
+            raise RuntimeError(f"Backend returned {len(results)} results for {len(batch)} prompts")
+
+        completions = []
+        for request, (ids, finish_reason) in zip(batch, results):
+            if len(ids) > request.max_new_tokens:
+                ids, finish_reason = ids[: request.max_new_tokens], "length"
+            text = self.backend.decode(ids)
+            for stop in request.stop:
+                cut = text.find(stop)
+                if cut != -1:
+                    text, finish_reason = text[:cut], "stop"
+            completions.append(
+                Completion(
+                    text=text,
+                    prompt_tokens=len(request.prompt_ids),
+                    completion_tokens=len(ids),
+                    finish_reason=finish_reason,
+                    queue_seconds=started - request.enqueued_at,
+                    batch_size=len(batch),
+                )
+            )
+        with self._condition:
+            stats = self.stats
+            stats.requests += len(batch)
+            stats.batches += 1
+            stats.prompt_tokens += sum(len(ids) for ids in prompts)
+            stats.padded_tokens += len(batch) * max(len(ids) for ids in prompts)
+            stats.generated_tokens += sum(len(ids) for ids, _ in results)
+            stats.busy_seconds += time.monotonic() - started
+            stats.queue_seconds += sum(c.queue_seconds for c in completions)
+            stats.batch_sizes[len(batch)] = stats.batch_sizes.get(len(batch), 0) + 1
+        return completions
+
+
+def _settle(future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+    """Resolve a request's future unless its caller cancelled it meanwhile."""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+# --- OpenAI-compatible HTTP API ---
+
+
+def _error(status: int, message: str, kind: str = "invalid_request_error"):
+    from fastapi.responses import JSONResponse
+
+    return JSONResponse({"error": {"message": message, "type": kind, "code": status}}, status_code=status)
+
+
+def _number(body: dict, name: str, valid: Callable[[float], bool], requirement: str) -> Optional[float]:
+    """`body[name]` if it is a valid number, None if missing or null; ValueError otherwise."""
+    value = body.get(name)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not valid(value):
+        raise ValueError(f"'{name}' must be {requirement}.")
+    return value
+
+
+def _positive_integer(value: float) -> bool:
+    return float(value).is_integer() and value > 0
+
+
+def build_app(batcher: DynamicBatcher, model_name: str):
+    """
+    Expose a batcher as an OpenAI-compatible API.
+
+    Supports `/v1/chat/completions` and `/v1/completions` (with `max_tokens`,
+    `temperature`, `top_p`, `stop`, `stream`; `n` must be 1; null means the
+    default, out-of-range values are a 400), `/v1/models` and `/stats`
+    (batcher counters). Streaming responses send the whole
+    completion as one chunk, since batches finish all at once.
+
+    Args:
+        batcher (DynamicBatcher): Runs the requests.
+        model_name (str): Model id reported to clients.
+
+    Returns:
+        fastapi.FastAPI: The application.
+    """
+    from fastapi import Body, FastAPI
+    from fastapi.responses import StreamingResponse
+
+    app = FastAPI(title="Local inference", version="1.0")
+    created = int(time.time())
+
+    async def complete(body: dict, chat: bool):
+        if body.get("n", 1) != 1:
+            return _error(400, "Only n=1 is supported.")
+        stop = body.get("stop") or ()
+        try:
+            # Null means "use the default", as in the OpenAI API.
+            max_tokens = _number(body, "max_tokens", _positive_integer, "a positive integer")
+            if max_tokens is None:
+                max_tokens = _number(body, "max_completion_tokens", _positive_integer, "a positive integer")
+            temperature = _number(body, "temperature", lambda v: 0 <= v <= 2, "a number between 0 and 2")
+            top_p = _number(body, "top_p", lambda v: 0 < v <= 1, "a number in (0, 1]")
+        except ValueError as e:
+            return _error(400, str(e))
+        try:
+            if chat:
+                prompt_ids = batcher.backend.encode_chat(body["messages"])
+            else:
+                prompt_ids = batcher.backend.encode(body["prompt"])
+            completion = await batcher.agenerate(
+                prompt_ids,
+                max_new_tokens=128 if max_tokens is None else int(max_tokens),
+                sampling=Sampling(
+                    0.0 if temperature is None else float(temperature), 1.0 if top_p is None else float(top_p)
+                ),
+                stop=(stop,) if isinstance(stop, str) else tuple(stop),
+            )
+        except KeyError as e:
+            return _error(400, f"Missing field {e}.")
+        except InferenceOverloadedError as e:
+            return _error(503, str(e), "server_overloaded")
+
+        prefix = "chatcmpl" if chat else "cmpl"
+        response: dict[str, Any] = {
+            "id": f"{prefix}-{uuid.uuid4().hex}",
+            "object": "chat.completion" if chat else "text_completion",
+            "created": int(time.time()),
+            "model": model_name,
+            "usage": {
+                "prompt_tokens": completion.prompt_tokens,
+                "completion_tokens": completion.completion_tokens,
+                "total_tokens": completion.prompt_tokens + completion.completion_tokens,
+            },
+        }
+        if not body.get("stream"):
+            if chat:
+                choice = {"message": {"role": "assistant", "content": completion.text}}
+            else:
+                choice = {"text": completion.text}
+            response["choices"] = [{"index": 0, **choice, "finish_reason": completion.finish_reason}]
+            return response
+
+        def chunk(delta: dict, finish_reason: Optional[str]) -> str:
+            if chat:
+                choice = {"index": 0, "delta": delta, "finish_reason": finish_reason}
+            else:
+                choice = {"index": 0, "text": delta.get("content", ""), "finish_reason": finish_reason}
+            payload = {k: v for k, v in response.items() if k != "usage"}
+            payload["object"] = "chat.completion.chunk" if chat else "text_completion"
+            return f"data: {json.dumps({**payload, 'choices': [choice]})}\n\n"
+
+        def events():
+            yield chunk({"role": "assistant", "content": completion.text}, None)
+            yield chunk({}, completion.finish_reason)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: dict = Body(...)):
+        return await complete(body, chat=True)
+
+    @app.post("/v1/completions")
+    async def completions(body: dict = Body(...)):
+        return await complete(body, chat=False)
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": model_name, "object": "model", "created": created, "owned_by": "local"}]}
+
+    @app.get("/stats")
+    async def stats():
+        s = batcher.stats
+        return {
+            "requests": s.requests,
+            "batches": s.batches,
+            "mean_batch_size": s.mean_batch_size,
+            "padding_ratio": s.padding_ratio,
+            "generated_tokens": s.generated_tokens,
+            "batch_sizes": s.batch_sizes,
+        }
+
+    return app
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Serve a local model over the OpenAI-compatible API.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description="Serve a local transformers model with dynamic batching.")
+    parser.add_argument("--model", default="HuggingFaceTB/SmolLM2-135M-Instruct")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=1, help="batches run at the same time")
+    parser.add_argument("--threads", type=int, help="PyTorch threads per batch")
+    parser.add_argument("--dtype", default="float32", choices=["float32", "bfloat16"])
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+
+    import uvicorn
+
+    backend = TransformersBackend(args.model, threads=args.threads, dtype=args.dtype)
+    batcher = DynamicBatcher(
+        backend, max_batch_size=args.max_batch_size, max_wait=args.max_wait_ms / 1000, workers=args.workers
+    )
+    try:
+        uvicorn.run(build_app(batcher, args.model), host=args.host, port=args.port)
+    finally:
+        batcher.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+"""
+Multi-turn Ollama conversations that reuse the model's context between turns.
+
+`playground/ollama/ollama_ex_llama_3_2.py` sends the whole `messages` array
+to `/api/chat` on every turn. `OllamaSessions` uses `/api/generate` instead:
+each response carries a `context` (the token ids of the conversation so
+far, prompt and answer), which is kept per session and sent back with the
+next turn, so only the new message is templated and tokenized and the
+server can continue from the KV cache of the previous turn.
+
+Once a long chat no longer fits into the context window (`num_ctx`),
+`/api/chat` drops its oldest messages on every turn; the prompt prefix then
+changes each time and the whole prompt is evaluated again. Sessions instead
+rebuild their context from the most recent messages filling half the
+window, so that full evaluation happens once per half window, not per turn.
+
+The context is rebuilt from the stored history (a transcript of the recent
+turns followed by the new message) when it is invalidated:
+
+    - "new": no context yet for a session that has history (e.g. after
+      the session expired, or a caller's history was imported)
+    - "settings": model, system prompt or options changed
+    - "overflow": the next turn would not fit into `num_ctx`
+    - "history": the caller's history differs from the session's (an
+      edited or regenerated message in a chat UI)
+    - "rejected": the server returned an error for the request with context
+
+Example:
+    >>> sessions = OllamaSessions("llama3.2:latest", system="Be brief.", options={"num_ctx": 4096})
+    >>> first = sessions.chat("tab-1", "Name three rivers in Europe.")
+    >>> turn = sessions.chat("tab-1", "Which is the longest?")
+    >>> turn.prompt_eval_count, turn.mode
+    (18, 'context')
+
+Usage (from the repository root; a terminal chat printing per-turn costs):
+    python -m src.utils.ollama_sessions --model llama3.2:latest --num-ctx 4096
+"""
+
+import argparse
+import json
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+import httpx
+
+from src.utils.providers import ollama_host
+from src.utils.tokens import approximate_tokens
+
+logger = logging.getLogger(__name__)
+
+Message = dict[str, str]
+
+DEFAULT_MODEL = "llama3.2:latest"
+# Ollama's default context window when `num_ctx` is not set.
+DEFAULT_NUM_CTX = 4096
+# Template tokens around a message (role header, end-of-turn marker).
+_MESSAGE_OVERHEAD_TOKENS = 8
+
+
+@dataclass
+class OllamaTurn:
+    """
+    One answered message and what it cost the server.
+
+    Attributes:
+        text (str): The answer.
+        mode (str): "context" (only the new message was sent) or
+            "full_history" (the context was rebuilt from the history).
+        rebuild_reason (Optional[str]): Why the context was rebuilt.
+        prompt_eval_count (int): Prompt tokens the server evaluated.
+        prompt_eval_seconds (float): Time spent evaluating them.
+        eval_count (int): Generated tokens.
+        eval_seconds (float): Time spent generating.
+        total_seconds (float): Server-side duration of the request.
+        context_tokens (int): Length of the session's context afterwards.
+    """
+
+    text: str
+    mode: str
+    rebuild_reason: Optional[str] = None
+    prompt_eval_count: int = 0
+    prompt_eval_seconds: float = 0.0
+    eval_count: int = 0
+    eval_seconds: float = 0.0
+    total_seconds: float = 0.0
+    context_tokens: int = 0
+
+
+@dataclass
+class SessionStats:
+    """Totals over all turns of an `OllamaSessions`."""
+
+    turns: int = 0
+    context_turns: int = 0
+    rebuilds: dict[str, int] = field(default_factory=dict)
+    prompt_eval_tokens: int = 0
+    prompt_eval_seconds: float = 0.0
+
+
+@dataclass
+class _Session:
+    messages: list[Message] = field(default_factory=list)
+    context: Optional[list[int]] = None
+    settings: Optional[str] = None
+    last_turn: Optional[OllamaTurn] = None
+    last_used: float = field(default_factory=time.monotonic)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+def _transcript(messages: list[Message], message: str) -> str:
+    """Prompt that replays earlier turns before the new message."""
+    if not messages:
+        return message
+    lines = [f"{m['role'].capitalize()}: {m['content']}" for m in messages if m["role"] != "system"]
+    return "Earlier in this conversation:\n\n" + "\n\n".join(lines) + "\n\n---\n\n" + message
+
+
+def _turn_from_response(data: dict, text: str, mode: str, reason: Optional[str]) -> OllamaTurn:
+    return OllamaTurn(
+        text=text,
+        mode=mode,
+        rebuild_reason=reason,
+        prompt_eval_count=data.get("prompt_eval_count", 0),
+        prompt_eval_seconds=data.get("prompt_eval_duration", 0) / 1e9,
+        eval_count=data.get("eval_count", 0),
+        eval_seconds=data.get("eval_duration", 0) / 1e9,
+        total_seconds=data.get("total_duration", 0) / 1e9,
+        context_tokens=len(data.get("context") or ()),
+    )
+
+
+class OllamaSessions:
+    """
+    Conversations with one Ollama model, keyed by session id.
+
+    Thread-safe; turns of the same session are serialized. Idle sessions
+    expire and the number of sessions is capped like in
+    `src.utils.chat_sessions.SessionStore`.
+
+    Args:
+        model (str): Ollama model name.
+        system (Optional[str]): System prompt.
+        options (Optional[dict]): Ollama options, e.g. {"num_ctx": 8192,
+            "temperature": 0.6}.
+        host (Optional[str]): Server URL (default: OLLAMA_HOST or localhost).
+        keep_alive (str): How long the server keeps the model loaded; an
+            unloaded model loses its KV cache.
+        max_sessions (int): Sessions kept at most (least recently used are
+            evicted).
+        ttl_seconds (Optional[float]): Drop sessions idle for longer.
+        max_messages (int): Messages of history kept per session for rebuilds.
+        timeout (float): Request timeout in seconds.
+        client (Optional[httpx.Client]): HTTP client to use (e.g. with a
+            mock transport); by default one is created for `host`.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        system: Optional[str] = None,
+        options: Optional[dict] = None,
+        host: Optional[str] = None,
+        keep_alive: str = "30m",
+        max_sessions: int = 1000,
+        ttl_seconds: Optional[float] = 3600.0,
+        max_messages: int = 200,
+        timeout: float = 300.0,
+        client: Optional[httpx.Client] = None,
+    ):
+        self.model = model
+        self.system = system
+        self.options = dict(options or {})
+        self.keep_alive = keep_alive
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_messages = max_messages
+        self.stats = SessionStats()
+        self._client = client or httpx.Client(base_url=host or ollama_host(), timeout=timeout)
+        self._sessions: OrderedDict[str, _Session] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def num_ctx(self) -> int:
+        """Context window in tokens."""
+        return int(self.options.get("num_ctx", DEFAULT_NUM_CTX))
+
+    def _settings(self) -> str:
+        return json.dumps([self.model, self.system, self.options], sort_keys=True)
+
+    def _get(self, session_id: str) -> _Session:
+        """Look up (and touch) a session, creating it if needed."""
+        with self._lock:
+            now = time.monotonic()
+            while self.ttl_seconds is not None and self._sessions:
+                oldest_id, oldest = next(iter(self._sessions.items()))
+                if now - oldest.last_used <= self.ttl_seconds:
+                    break
+                del self._sessions[oldest_id]
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = _Session()
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            session.last_used = now
+            return session
+
+    def history(self, session_id: str) -> list[Message]:
+        """Return a copy of a session's messages."""
+        return list(self._get(session_id).messages)
+
+    def last_turn(self, session_id: str) -> Optional[OllamaTurn]:
+        """The most recent turn of a session (e.g. after consuming `stream()`)."""
+        return self._get(session_id).last_turn
+
+    def reset(self, session_id: str) -> None:
+        """Forget a session's history and context."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _reserve_tokens(self) -> int:
+        num_predict = int(self.options.get("num_predict", -1))
+        return num_predict if num_predict > 0 else min(512, self.num_ctx // 4)
+
+    def _rebuild_reason(self, session: _Session, message: str, history: Optional[list[Message]]) -> Optional[str]:
+        """Why the session's context cannot be continued (None if it can); adopts a differing `history`."""
+        if history is not None:
+            # The session keeps only the last `max_messages`; compare like with like.
+            history = history[max(0, len(history) - self.max_messages):]
+            if history != session.messages:
+                # The old context encodes the old history: drop it now, so a
+                # failed request is not retried from it.
+                session.messages = list(history)
+                session.context = None
+                return "history"
+        if session.settings != self._settings():
+            return "settings" if session.settings is not None else ("new" if session.messages else None)
+        if session.context is None:
+            return "new" if session.messages else None
+        needed = len(session.context) + approximate_tokens(message) + _MESSAGE_OVERHEAD_TOKENS
+        if needed + self._reserve_tokens() > self.num_ctx:
+            return "overflow"
+        return None
+
+    def _recent_messages(self, messages: list[Message], message: str) -> list[Message]:
+        """The most recent messages that, with the new one, fill at most half the window."""
+        budget = self.num_ctx // 2 - self._reserve_tokens() - approximate_tokens(message)
+        kept: list[Message] = []
+        for m in reversed(messages):
+            budget -= approximate_tokens(m["content"]) + _MESSAGE_OVERHEAD_TOKENS
+            if budget < 0:
+                break
+            kept.append(m)
+        kept.reverse()
+        # Start with a user message so the transcript reads naturally.
+        while kept and kept[0]["role"] != "user":
+            kept.pop(0)
+        return kept
+
+    def _payload(self, session: _Session, message: str, reason: Optional[str], stream: bool) -> dict:
+        payload: dict[str, Any] = {"model": self.model, "stream": stream, "keep_alive": self.keep_alive}
+        if self.options:
+            payload["options"] = self.options
+        if session.context is not None and reason is None:
+            payload["prompt"] = message
+            payload["context"] = session.context
+        else:
+            payload["prompt"] = _transcript(self._recent_messages(session.messages, message), message)
+            if self.system:
+                payload["system"] = self.system
+        return payload
+
+    def _request(self, payload: dict) -> Iterator[dict]:
+        """POST to /api/generate and yield the response objects (one unless streaming)."""
+        if not payload["stream"]:
+            response = self._client.post("/api/generate", json=payload)
+            response.raise_for_status()
+            yield response.json()
+            return
+        with self._client.stream("POST", "/api/generate", json=payload) as response:
+            if response.is_error:
+                response.read()
+                response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    data = json.loads(line)
+                    if "error" in data:
+                        raise RuntimeError(f"Ollama error: {data['error']}")
+                    yield data
+
+    def _turn(self, session_id: str, message: str, history: Optional[list[Message]], stream: bool) -> Iterator[str]:
+        session = self._get(session_id)
+        with session.lock:
+            reason = self._rebuild_reason(session, message, history)
+            payload = self._payload(session, message, reason, stream)
+            parts: list[str] = []
+            final: dict = {}
+
+            def consume(payload: dict) -> Iterator[str]:
+                nonlocal final
+                for data in self._request(payload):
+                    parts.append(data.get("response", ""))
+                    if stream and data.get("response"):
+                        yield data["response"]
+                    if data.get("done"):
+                        final = data
+
+            try:
+                yield from consume(payload)
+            except httpx.HTTPStatusError as e:
+                # A context the server no longer accepts (e.g. after a model
+                # update); retry once from the history if nothing was yielded.
+                if "context" not in payload or parts:
+                    raise
+                logger.warning("Ollama rejected the session context (%s); rebuilding", e.response.status_code)
+                reason = "rejected"
+                payload = self._payload(session, message, reason, stream)
+                yield from consume(payload)
+
+            text = "".join(parts)
+            mode = "context" if "context" in payload else "full_history"
+            turn = _turn_from_response(final, text, mode, reason)
+            session.context = final.get("context")
+            session.settings = self._settings()
+            session.messages.extend([{"role": "user", "content": message}, {"role": "assistant", "content": text}])
+            del session.messages[: -self.max_messages]
+            session.last_turn = turn
+            with self._lock:
+                self.stats.turns += 1
+                self.stats.context_turns += mode == "context"
+                if reason is not None:
+                    self.stats.rebuilds[reason] = self.stats.rebuilds.get(reason, 0) + 1
+                self.stats.prompt_eval_tokens += turn.prompt_eval_count
+                self.stats.prompt_eval_seconds += turn.prompt_eval_seconds
+        if not stream:
+            yield text
+
+    def chat(self, session_id: str, message: str, history: Optional[list[Message]] = None) -> OllamaTurn:
+        """
+        Send a message and wait for the answer.
+
+        Args:
+            session_id (str): Session identifier, e.g. a Gradio `session_hash`.
+            message (str): The user's message.
+            history (Optional[list[Message]]): The caller's view of the
+                conversation before `message` (e.g. a chat UI's history). If
+                it differs from the session's, the session adopts it and
+                rebuilds its context. None trusts the session.
+
+        Returns:
+            OllamaTurn: The answer and its cost.
+        """
+        for _ in self._turn(session_id, message, history, stream=False):
+            pass
+        return self._get(session_id).last_turn
+
+    def stream(self, session_id: str, message: str, history: Optional[list[Message]] = None) -> Iterator[str]:
+        """Like `chat()`, but yield the answer as it is generated; see `last_turn()`."""
+        return self._turn(session_id, message, history, stream=True)
+
+    def close(self) -> None:
+        """Close the HTTP client."""
+        self._client.close()
+
+    def __enter__(self) -> "OllamaSessions":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """
+    Chat in the terminal, printing the prompt evaluation cost of each turn.
+
+    Args:
+        argv (Optional[list[str]]): Command-line arguments.
+
+    Returns:
+        int: Process exit status.
+    """
+    parser = argparse.ArgumentParser(description="Chat with an Ollama model, reusing the context between turns.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--system")
+    parser.add_argument("--num-ctx", type=int, default=DEFAULT_NUM_CTX)
+    args = parser.parse_args(argv)
+
+    with OllamaSessions(args.model, system=args.system, options={"num_ctx": args.num_ctx}) as sessions:
+        while True:
+            try:
+                message = input("> ").strip()
+            except (EOFError, KeyboardInterrupt):
+                print()
+                return 0
+            if not message:
+                continue
+            try:
+                for text in sessions.stream("terminal", message):
+                    print(text, end="", flush=True)
+            except httpx.HTTPError as e:
+                print(f"\nError talking to Ollama: {e}")
+                continue
+            turn = sessions.last_turn("terminal")
+            rebuilt = f", rebuilt: {turn.rebuild_reason}" if turn.rebuild_reason else ""
+            print(
+                f"\n[{turn.mode}{rebuilt}; prompt {turn.prompt_eval_count} tokens in "
+                f"{turn.prompt_eval_seconds * 1000:.0f} ms; context {turn.context_tokens} tokens]"
+            )
+
+
+if __name__ == "__main__":
+    sys.exit(main())
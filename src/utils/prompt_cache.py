@@ -0,0 +1,512 @@
+"""
+Opt-in provider-side prompt prefix caching for Gemini and Anthropic.
+
+Scripts such as `gemini_parameters.py` and `gemini_gradio_chat.py` resend the
+same (long) `system_instruction` with every call. Both providers can cache a
+stable prompt prefix server-side and bill the cached tokens at a reduced
+rate, which also lowers time-to-first-token:
+
+- Gemini: an explicit `CachedContent` object holds the system instruction
+  (and optionally leading contents); requests reference it by name.
+- Anthropic: `cache_control` breakpoints mark the end of the cacheable prefix.
+
+`PrefixTracker` decides when a prefix is worth caching: it has to be seen
+`min_repeats` times and be at least `min_tokens` long (providers reject or
+ignore smaller caches). Every call returns a `CacheReport` with the cached
+token count and the estimated token and latency savings.
+
+Example:
+    >>> from src.utils.prompt_cache import GeminiContextCache
+    >>> from src.utils.providers import get_genai_client
+    >>> cache = GeminiContextCache(get_genai_client())
+    >>> response, report = cache.generate(
+    ...     "gemini-2.0-flash-001",
+    ...     contents="Tell a joke for data scientists.",
+    ...     system_instruction=LONG_SYSTEM_PROMPT,
+    ... )
+    >>> print(report.cached_tokens, report.latency_saved_seconds)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional
+
+from src.utils.lazy_imports import lazy_google_import
+from src.utils.tokens import approximate_tokens
+
+logger = logging.getLogger(__name__)
+
+_genai_types = lazy_google_import("google.genai.types")
+_genai_errors = lazy_google_import("google.genai.errors")
+
+
+def prefix_hash(*parts: Any) -> str:
+    """
+    Hash the parts of a prompt prefix into a stable cache key.
+
+    Args:
+        *parts: JSON-serializable prompt parts (strings, message dicts, ...).
+
+    Returns:
+        str: A hex digest.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+@dataclass
+class CacheReport:
+    """
+    Cache outcome of a single request.
+
+    Attributes:
+        provider (str): "gemini" or "anthropic".
+        model (str): Model name.
+        cache_used (bool): True if the request referenced a cache.
+        cache_created (bool): True if this request created (or wrote) the cache.
+        prompt_tokens (int): Total input tokens reported by the provider.
+        cached_tokens (int): Input tokens served from the cache.
+        latency_seconds (float): Wall-clock time of the request.
+        latency_saved_seconds (float): Average uncached latency for the model
+            minus this request's latency (0 until a baseline exists).
+    """
+
+    provider: str
+    model: str
+    cache_used: bool = False
+    cache_created: bool = False
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    latency_seconds: float = 0.0
+    latency_saved_seconds: float = 0.0
+
+    @property
+    def saved_tokens(self) -> int:
+        """Input tokens that did not have to be processed (and billed) in full."""
+        return self.cached_tokens
+
+
+@dataclass
+class CacheTotals:
+    """Running totals across all requests of a cache wrapper."""
+
+    requests: int = 0
+    cache_hits: int = 0
+    caches_created: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    latency_saved_seconds: float = 0.0
+
+    def add(self, report: CacheReport) -> None:
+        self.requests += 1
+        self.cache_hits += int(report.cache_used and not report.cache_created)
+        self.caches_created += int(report.cache_created)
+        self.prompt_tokens += report.prompt_tokens
+        self.cached_tokens += report.cached_tokens
+        self.latency_saved_seconds += report.latency_saved_seconds
+
+
+class PrefixTracker:
+    """
+    Detect stable prompt prefixes and keep uncached latency baselines.
+
+    Args:
+        min_repeats (int): Times a prefix must be seen before it is cached.
+            1 caches on first use.
+        min_tokens (int): Minimum prefix size worth caching.
+        count_tokens (Optional[Callable[[str], int]]): Token counter; defaults
+            to `approximate_tokens`.
+        max_prefixes (int): Prefixes whose use counts are kept; the least
+            recently seen are forgotten beyond that.
+    """
+
+    def __init__(
+        self,
+        min_repeats: int = 2,
+        min_tokens: int = 1024,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        max_prefixes: int = 4096,
+    ):
+        self.min_repeats = min_repeats
+        self.min_tokens = min_tokens
+        self.count_tokens = count_tokens or approximate_tokens
+        self.max_prefixes = max_prefixes
+        self._seen: OrderedDict[str, int] = OrderedDict()
+        self._baselines: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, key: str, prefix_text: str) -> bool:
+        """
+        Record one use of a prefix.
+
+        Args:
+            key (str): Prefix hash.
+            prefix_text (str): Prefix text, used for the size check.
+
+        Returns:
+            bool: True if the prefix should be served from a cache.
+        """
+        with self._lock:
+            count = self._seen.pop(key, 0) + 1
+            self._seen[key] = count
+            while len(self._seen) > self.max_prefixes:
+                self._seen.popitem(last=False)
+        if count < self.min_repeats:
+            return False
+        return self.count_tokens(prefix_text) >= self.min_tokens
+
+    def record_latency(self, model: str, seconds: float, cached: bool) -> float:
+        """
+        Update the uncached baseline for `model` and return the latency saved.
+
+        Args:
+            model (str): Model name.
+            seconds (float): Request latency.
+            cached (bool): Whether the request used a cache.
+
+        Returns:
+            float: Estimated seconds saved (0 for uncached requests).
+        """
+        with self._lock:
+            baseline = self._baselines.get(model)
+            if not cached:
+                # Exponential moving average of uncached latency.
+                self._baselines[model] = (
+                    seconds if baseline is None else 0.8 * baseline + 0.2 * seconds
+                )
+                return 0.0
+        return 0.0 if baseline is None else baseline - seconds
+
+
+# --- Gemini ---
+
+
+@dataclass
+class _GeminiCacheEntry:
+    name: str
+    expires_at: float
+    created_at: float = field(default_factory=time.time)
+
+
+def _expiry_timestamp(cached_content: Any, ttl_seconds: int) -> float:
+    """Read `expire_time` from a CachedContent, falling back to now + ttl."""
+    expire_time = getattr(cached_content, "expire_time", None)
+    if isinstance(expire_time, datetime):
+        if expire_time.tzinfo is None:
+            expire_time = expire_time.replace(tzinfo=timezone.utc)
+        return expire_time.timestamp()
+    return time.time() + ttl_seconds
+
+
+def _cache_missing(error: Exception) -> bool:
+    """True if a Gemini error says the cached content no longer exists."""
+    if getattr(error, "code", None) == 404 or getattr(error, "status", None) == "NOT_FOUND":
+        return True
+    message = str(getattr(error, "message", None) or error).lower()
+    # Expired or deleted caches are also reported as 400/403 "CachedContent not found"
+    # or "... expired"; other expiries ("API key expired") are not about the cache.
+    if "cachedcontent" not in message.replace(" ", ""):
+        return False
+    return "not found" in message or "expired" in message
+
+
+class GeminiContextCache:
+    """
+    Serve Gemini requests through explicit `CachedContent` objects.
+
+    Caches are created lazily for stable prefixes, extended when a request
+    arrives shortly before they expire and recreated if the server has
+    already dropped them.
+
+    Args:
+        client (google.genai.Client): Native Gemini client.
+        ttl_seconds (int): Cache lifetime requested on create/refresh.
+        refresh_margin_seconds (int): Extend the TTL when less than this is left.
+        tracker (Optional[PrefixTracker]): Stability/size policy.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        ttl_seconds: int = 600,
+        refresh_margin_seconds: int = 60,
+        tracker: Optional[PrefixTracker] = None,
+    ):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.tracker = tracker or PrefixTracker()
+        self.totals = CacheTotals()
+        self._entries: dict[str, _GeminiCacheEntry] = {}
+        self._key_locks: dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        """Lock serializing cache creation for one prefix (not for all of them)."""
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _create(self, key: str, model: str, system_instruction, cached_contents):
+        """Create a cache for `key`; caller holds the key's lock."""
+        config = _genai_types.CreateCachedContentConfig(
+            system_instruction=system_instruction,
+            contents=cached_contents or None,
+            ttl=f"{self.ttl_seconds}s",
+            display_name=f"prefix-{key[:16]}",
+        )
+        cached = self.client.caches.create(model=model, config=config)
+        entry = _GeminiCacheEntry(
+            name=cached.name, expires_at=_expiry_timestamp(cached, self.ttl_seconds)
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._evict_expired(time.time())
+        logger.debug("Created Gemini cache %s for %s", entry.name, model)
+        return entry
+
+    def _evict_expired(self, now: float) -> None:
+        """Forget expired caches and the idle locks of their prefixes; caller holds `_lock`."""
+        for key in [key for key, entry in self._entries.items() if entry.expires_at <= now]:
+            del self._entries[key]
+        for key in [key for key, lock in self._key_locks.items() if key not in self._entries and not lock.locked()]:
+            del self._key_locks[key]
+
+    def _refresh(self, entry: _GeminiCacheEntry) -> None:
+        config = _genai_types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s")
+        updated = self.client.caches.update(name=entry.name, config=config)
+        entry.expires_at = _expiry_timestamp(updated, self.ttl_seconds)
+
+    def _delete(self, name: str) -> None:
+        """Delete a cache server-side, ignoring caches that are already gone."""
+        try:
+            self.client.caches.delete(name=name)
+        except _genai_errors.ClientError as e:
+            logger.debug("Could not delete Gemini cache %s: %s", name, e)
+
+    def _entry_for(self, key, model, system_instruction, cached_contents):
+        """Return (entry, created) for a stable prefix, creating/refreshing as needed."""
+        # Network calls happen under the prefix's own lock only, so requests
+        # for other prefixes (and cache hits) are not serialized behind them.
+        with self._key_lock(key):
+            with self._lock:
+                entry = self._entries.get(key)
+            now = time.time()
+            if entry is None or entry.expires_at <= now:
+                return self._create(key, model, system_instruction, cached_contents), True
+            if entry.expires_at - now < self.refresh_margin_seconds:
+                try:
+                    self._refresh(entry)
+                except _genai_errors.ClientError as e:
+                    if not _cache_missing(e):
+                        # Rate limited or similar: the cache is still valid for now.
+                        logger.warning("Could not extend Gemini cache %s: %s", entry.name, e)
+                        return entry, False
+                    return self._create(key, model, system_instruction, cached_contents), True
+            return entry, False
+
+    def _recreate(self, key, stale: _GeminiCacheEntry, model, system_instruction, cached_contents):
+        """Replace a cache the server no longer serves (unless another request already did)."""
+        with self._key_lock(key):
+            with self._lock:
+                current = self._entries.get(key)
+            if current is not None and current.name != stale.name:
+                return current
+            self._delete(stale.name)
+            return self._create(key, model, system_instruction, cached_contents)
+
+    def generate(
+        self,
+        model: str,
+        contents: Any,
+        system_instruction: Optional[str] = None,
+        cached_contents: Optional[list] = None,
+        config: Optional[dict[str, Any]] = None,
+    ):
+        """
+        Call `models.generate_content`, using a context cache when worthwhile.
+
+        Args:
+            model (str): Model name. Explicit caching needs a versioned model,
+                e.g. "gemini-2.0-flash-001".
+            contents (Any): The per-request contents.
+            system_instruction (Optional[str]): The (long, stable) system prompt.
+            cached_contents (Optional[list]): Stable leading contents, e.g.
+                few-shot examples, cached together with the system prompt.
+            config (Optional[dict[str, Any]]): Other `GenerateContentConfig`
+                fields (temperature, max_output_tokens, ...).
+
+        Returns:
+            tuple: (GenerateContentResponse, CacheReport).
+        """
+        config = dict(config or {})
+        prefix_text = (system_instruction or "") + json.dumps(cached_contents or [], default=str)
+        key = prefix_hash(model, system_instruction, cached_contents)
+        report = CacheReport(provider="gemini", model=model)
+
+        entry = None
+        if self.tracker.observe(key, prefix_text):
+            entry, report.cache_created = self._entry_for(
+                key, model, system_instruction, cached_contents
+            )
+
+        if entry is not None:
+            try:
+                response, report.latency_seconds = self._call(
+                    model, contents, config, cached_content=entry.name
+                )
+            except _genai_errors.ClientError as e:
+                # Only a cache deleted or expired server-side is recreated (once);
+                # rate limits and invalid requests are the caller's to handle.
+                if not _cache_missing(e):
+                    raise
+                logger.info("Gemini cache %s unusable (%s); recreating", entry.name, e)
+                entry = self._recreate(key, entry, model, system_instruction, cached_contents)
+                report.cache_created = True
+                response, report.latency_seconds = self._call(
+                    model, contents, config, cached_content=entry.name
+                )
+        else:
+            request_contents = list(cached_contents or [])
+            request_contents += contents if isinstance(contents, list) else [contents]
+            if system_instruction:
+                config["system_instruction"] = system_instruction
+            response, report.latency_seconds = self._call(model, request_contents, config)
+
+        report.cache_used = entry is not None
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            report.prompt_tokens = usage.prompt_token_count or 0
+            report.cached_tokens = usage.cached_content_token_count or 0
+        report.latency_saved_seconds = self.tracker.record_latency(
+            model, report.latency_seconds, report.cache_used
+        )
+        self.totals.add(report)
+        return response, report
+
+    def _call(self, model, contents, config, cached_content=None):
+        """Run one generate_content call and return (response, latency seconds)."""
+        if cached_content is not None:
+            config = {**config, "cached_content": cached_content}
+        generate_config = _genai_types.GenerateContentConfig(**config)
+        started = time.perf_counter()
+        response = self.client.models.generate_content(
+            model=model, contents=contents, config=generate_config
+        )
+        return response, time.perf_counter() - started
+
+    def clear(self) -> None:
+        """Delete all caches created by this wrapper."""
+        with self._lock:
+            entries, self._entries = self._entries, {}
+        for entry in entries.values():
+            self._delete(entry.name)
+
+
+# --- Anthropic ---
+
+
+class AnthropicPromptCache:
+    """
+    Add Anthropic prompt-cache breakpoints to stable prompt prefixes.
+
+    Anthropic caches are implicit: marking the last system block (and,
+    optionally, the last stable message) with `cache_control` writes the
+    prefix on first use and reads it on later requests within the cache TTL
+    (5 minutes, refreshed on every hit). No objects need to be managed, so
+    expiry only shows up as a new cache write in the usage report.
+
+    Args:
+        client (anthropic.Anthropic): Anthropic client.
+        tracker (Optional[PrefixTracker]): Stability/size policy.
+    """
+
+    def __init__(self, client: Any, tracker: Optional[PrefixTracker] = None):
+        self.client = client
+        self.tracker = tracker or PrefixTracker()
+        self.totals = CacheTotals()
+
+    @staticmethod
+    def with_breakpoints(
+        system: str, messages: list[dict[str, Any]], stable_messages: int = 0
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """
+        Return `system` and `messages` with `cache_control` breakpoints set.
+
+        Args:
+            system (str): System prompt.
+            messages (list[dict[str, Any]]): Conversation messages.
+            stable_messages (int): Number of leading messages that belong to
+                the cacheable prefix (at most all of them).
+
+        Returns:
+            tuple: (system blocks, messages) ready for `messages.create`.
+        """
+        system_blocks = [
+            {"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}
+        ]
+        messages = [dict(message) for message in messages]
+        stable_messages = min(stable_messages, len(messages))
+        if stable_messages > 0:
+            last = messages[stable_messages - 1]
+            content = last["content"]
+            if isinstance(content, str):
+                content = [{"type": "text", "text": content}]
+            content = [dict(block) for block in content]
+            content[-1]["cache_control"] = {"type": "ephemeral"}
+            last["content"] = content
+        return system_blocks, messages
+
+    def create(
+        self,
+        model: str,
+        system: str,
+        messages: list[dict[str, Any]],
+        stable_messages: int = 0,
+        **params: Any,
+    ):
+        """
+        Call `messages.create`, adding cache breakpoints for stable prefixes.
+
+        Args:
+            model (str): Model name.
+            system (str): System prompt.
+            messages (list[dict[str, Any]]): Conversation messages.
+            stable_messages (int): Leading messages to include in the prefix.
+            **params: Other `messages.create` parameters (max_tokens, ...).
+
+        Returns:
+            tuple: (Message, CacheReport).
+        """
+        prefix = [system, messages[:stable_messages]]
+        key = prefix_hash(model, *prefix)
+        report = CacheReport(provider="anthropic", model=model)
+        use_cache = self.tracker.observe(key, json.dumps(prefix, default=str))
+        if use_cache:
+            system_arg, messages = self.with_breakpoints(system, messages, stable_messages)
+        else:
+            system_arg = system
+
+        started = time.perf_counter()
+        response = self.client.messages.create(
+            model=model, system=system_arg, messages=messages, **params
+        )
+        report.latency_seconds = time.perf_counter() - started
+
+        usage = response.usage
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+        report.cache_used = use_cache
+        report.cache_created = cache_write > 0
+        report.cached_tokens = cache_read
+        report.prompt_tokens = usage.input_tokens + cache_read + cache_write
+        report.latency_saved_seconds = self.tracker.record_latency(
+            model, report.latency_seconds, cache_read > 0
+        )
+        self.totals.add(report)
+        return response, report
@@ -0,0 +1,378 @@
+"""
+Shared provider layer for the LLM SDKs used across the project.
+
+Every SDK is imported lazily (see `src.utils.lazy_imports`), so importing
+this module costs a few milliseconds; the multi-second import of e.g.
+`google.generativeai` or `langchain_google_genai` is only paid the first
+time a client for that provider is requested.
+
+Clients are cached per (provider, api key, base url), so repeated calls
+reuse the same underlying HTTP connection pool instead of creating a new
+client per request, as the playground scripts do.
+
+Example:
+    >>> from src.utils.providers import get_openai_client
+    >>> gemini = get_openai_client("gemini")
+    >>> gemini.chat.completions.create(model="gemini-2.0-flash", messages=[...])
+"""
+
+import functools
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from src.utils.lazy_imports import lazy_google_import, lazy_import
+
+# --- Lazily imported SDKs ---
+
+_openai = lazy_import("openai")
+_genai = lazy_google_import("google.genai")
+_generativeai = lazy_google_import("google.generativeai")
+_anthropic = lazy_import("anthropic")
+_transformers = lazy_import("transformers")
+
+
+# --- Provider configuration ---
+
+
+@dataclass(frozen=True)
+class ProviderSpec:
+    """
+    Static configuration for an LLM provider.
+
+    Attributes:
+        name (str): Short provider name used throughout `src`.
+        api_key_env (Optional[str]): Environment variable holding the API key.
+        openai_base_url (Optional[str]): OpenAI-compatible endpoint, if any.
+        langchain_class (str): Dotted path of the LangChain chat model class.
+        requires_key (bool): Whether a missing API key is an error.
+    """
+
+    name: str
+    api_key_env: Optional[str]
+    openai_base_url: Optional[str]
+    langchain_class: str
+    requires_key: bool = True
+
+
+GEMINI_OPENAI_BASE_URL = "https://generativelanguage.googleapis.com/v1beta/openai/"
+DEFAULT_OLLAMA_HOST = "http://localhost:11434"
+
+PROVIDERS: dict[str, ProviderSpec] = {
+    "openai": ProviderSpec(
+        name="openai",
+        api_key_env="OPENAI_API_KEY",
+        openai_base_url=None,
+        langchain_class="langchain_openai.ChatOpenAI",
+    ),
+    "gemini": ProviderSpec(
+        name="gemini",
+        api_key_env="GOOGLE_API_KEY",
+        openai_base_url=GEMINI_OPENAI_BASE_URL,
+        langchain_class="langchain_google_genai.ChatGoogleGenerativeAI",
+    ),
+    "anthropic": ProviderSpec(
+        name="anthropic",
+        api_key_env="ANTHROPIC_API_KEY",
+        openai_base_url=None,
+        langchain_class="langchain_anthropic.ChatAnthropic",
+    ),
+    "ollama": ProviderSpec(
+        name="ollama",
+        api_key_env=None,
+        openai_base_url=None,  # Derived from OLLAMA_HOST, see `ollama_host()`.
+        langchain_class="langchain_ollama.ChatOllama",
+        requires_key=False,
+    ),
+}
+
+_clients: dict[tuple, Any] = {}
+_clients_lock = threading.Lock()
+# `google.generativeai.configure()` is process-global: the key it was last called with.
+_generativeai_key: Optional[str] = None
+
+
+@functools.cache
+def load_environment() -> None:
+    """Load the project's .env file once per process."""
+    from dotenv import load_dotenv
+
+    load_dotenv(override=True)
+
+
+def get_provider(name: str) -> ProviderSpec:
+    """
+    Look up a provider by name.
+
+    Args:
+        name (str): Provider name, e.g. "gemini".
+
+    Returns:
+        ProviderSpec: The provider configuration.
+
+    Raises:
+        ValueError: If the provider is unknown.
+    """
+    try:
+        return PROVIDERS[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown provider '{name}'. Known providers: {', '.join(PROVIDERS)}"
+        ) from None
+
+
+def ollama_host() -> str:
+    """Return the Ollama server URL from OLLAMA_HOST (or the local default)."""
+    load_environment()
+    return os.getenv("OLLAMA_HOST", DEFAULT_OLLAMA_HOST).rstrip("/")
+
+
+def get_api_key(provider: str, api_key: Optional[str] = None) -> Optional[str]:
+    """
+    Resolve the API key for a provider.
+
+    Args:
+        provider (str): Provider name.
+        api_key (Optional[str]): Explicit key; takes precedence over the environment.
+
+    Returns:
+        Optional[str]: The API key, or None for providers that do not need one.
+
+    Raises:
+        ValueError: If the provider requires a key and none is configured.
+    """
+    spec = get_provider(provider)
+    if api_key:
+        return api_key
+    if spec.api_key_env is None:
+        return None
+    load_environment()
+    api_key = os.getenv(spec.api_key_env)
+    if not api_key and spec.requires_key:
+        raise ValueError(
+            f"{spec.api_key_env} not set. Please set it in your environment or .env file."
+        )
+    return api_key
+
+
+def _cached_client(key: tuple, factory):
+    """Return the client cached under `key`, creating it with `factory` once."""
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = factory()
+            _clients[key] = client
+    return client
+
+
+def clear_client_cache() -> None:
+    """Drop all cached clients (mainly useful in tests and benchmarks)."""
+    global _generativeai_key
+    with _clients_lock:
+        _clients.clear()
+        _generativeai_key = None
+
+
+# --- Client factories ---
+
+
+def openai_base_url(provider: str) -> Optional[str]:
+    """
+    Return the OpenAI-compatible base URL for a provider.
+
+    Args:
+        provider (str): Provider name.
+
+    Returns:
+        Optional[str]: The base URL, or None for the default OpenAI endpoint.
+    """
+    if provider == "ollama":
+        return f"{ollama_host()}/v1"
+    return get_provider(provider).openai_base_url
+
+
+def get_openai_client(
+    provider: str = "openai",
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    **client_kwargs: Any,
+):
+    """
+    Get a shared `openai.OpenAI` client for an OpenAI-compatible provider.
+
+    Gemini is reached through its OpenAI-compatible endpoint and Ollama
+    through its local `/v1` API.
+
+    Args:
+        provider (str): "openai", "gemini" or "ollama".
+        api_key (Optional[str]): Explicit API key.
+        base_url (Optional[str]): Override the provider's base URL.
+        **client_kwargs: Extra `OpenAI(...)` arguments. Passing any disables
+            caching, since they may not be hashable.
+
+    Returns:
+        openai.OpenAI: The client.
+    """
+    return _build_openai_client(
+        client_class_name="OpenAI",
+        provider=provider,
+        api_key=api_key,
+        base_url=base_url,
+        client_kwargs=client_kwargs,
+    )
+
+
+def get_async_openai_client(
+    provider: str = "openai",
+    api_key: Optional[str] = None,
+    base_url: Optional[str] = None,
+    **client_kwargs: Any,
+):
+    """
+    Get a shared `openai.AsyncOpenAI` client for an OpenAI-compatible provider.
+
+    Args:
+        provider (str): "openai", "gemini" or "ollama".
+        api_key (Optional[str]): Explicit API key.
+        base_url (Optional[str]): Override the provider's base URL.
+        **client_kwargs: Extra `AsyncOpenAI(...)` arguments (disables caching).
+
+    Returns:
+        openai.AsyncOpenAI: The client.
+    """
+    return _build_openai_client(
+        client_class_name="AsyncOpenAI",
+        provider=provider,
+        api_key=api_key,
+        base_url=base_url,
+        client_kwargs=client_kwargs,
+    )
+
+
+def _build_openai_client(
+    client_class_name: str,
+    provider: str,
+    api_key: Optional[str],
+    base_url: Optional[str],
+    client_kwargs: dict[str, Any],
+):
+    """Shared implementation of the sync/async OpenAI client factories."""
+    # The OpenAI client insists on a key, Ollama ignores it.
+    api_key = get_api_key(provider, api_key) or provider
+    base_url = base_url or openai_base_url(provider)
+
+    def factory():
+        client_class = getattr(_openai, client_class_name)
+        return client_class(api_key=api_key, base_url=base_url, **client_kwargs)
+
+    if client_kwargs:
+        return factory()
+    return _cached_client((client_class_name, provider, api_key, base_url), factory)
+
+
+def get_genai_client(api_key: Optional[str] = None, **client_kwargs: Any):
+    """
+    Get a shared native `google.genai.Client`.
+
+    Args:
+        api_key (Optional[str]): Explicit Google API key.
+        **client_kwargs: Extra `genai.Client(...)` arguments (disables caching).
+
+    Returns:
+        google.genai.Client: The client.
+    """
+    api_key = get_api_key("gemini", api_key)
+
+    def factory():
+        return _genai.Client(api_key=api_key, **client_kwargs)
+
+    if client_kwargs:
+        return factory()
+    return _cached_client(("genai", api_key), factory)
+
+
+def get_generativeai(api_key: Optional[str] = None):
+    """
+    Return the legacy `google.generativeai` module, configured with an API key.
+
+    The module holds a single process-wide configuration, so it is
+    reconfigured whenever the key differs from the one it was last
+    configured with.
+
+    Args:
+        api_key (Optional[str]): Explicit Google API key.
+
+    Returns:
+        module: The configured `google.generativeai` module.
+    """
+    global _generativeai_key
+    api_key = get_api_key("gemini", api_key)
+    with _clients_lock:
+        if _generativeai_key != api_key:
+            _generativeai.configure(api_key=api_key)
+            _generativeai_key = api_key
+    return _generativeai
+
+
+def get_anthropic_client(api_key: Optional[str] = None, **client_kwargs: Any):
+    """
+    Get a shared `anthropic.Anthropic` client.
+
+    Args:
+        api_key (Optional[str]): Explicit Anthropic API key.
+        **client_kwargs: Extra `Anthropic(...)` arguments (disables caching).
+
+    Returns:
+        anthropic.Anthropic: The client.
+    """
+    api_key = get_api_key("anthropic", api_key)
+
+    def factory():
+        return _anthropic.Anthropic(api_key=api_key, **client_kwargs)
+
+    if client_kwargs:
+        return factory()
+    return _cached_client(("anthropic", api_key), factory)
+
+
+def get_chat_model(provider: str, model: str, **model_kwargs: Any):
+    """
+    Create a LangChain chat model for a provider.
+
+    The LangChain integration package is only imported on first use.
+
+    Args:
+        provider (str): Provider name, e.g. "gemini" or "ollama".
+        model (str): Model name, e.g. "gemini-1.5-flash-latest".
+        **model_kwargs: Extra arguments for the chat model class
+            (temperature, max_tokens, ...).
+
+    Returns:
+        BaseChatModel: The LangChain chat model.
+    """
+    spec = get_provider(provider)
+    module_name, class_name = spec.langchain_class.rsplit(".", 1)
+    chat_class = getattr(lazy_import(module_name), class_name)
+    if provider == "ollama":
+        model_kwargs.setdefault("base_url", ollama_host())
+    elif "api_key" not in model_kwargs:
+        model_kwargs["api_key"] = get_api_key(provider)
+    return chat_class(model=model, **model_kwargs)
+
+
+@functools.lru_cache(maxsize=8)
+def get_hf_tokenizer(model_name: str):
+    """
+    Load (and cache) a Hugging Face tokenizer.
+
+    Args:
+        model_name (str): Hugging Face model name, e.g. "meta-llama/Llama-3-8B-Instruct".
+
+    Returns:
+        PreTrainedTokenizerBase: The tokenizer.
+    """
+    return _transformers.AutoTokenizer.from_pretrained(model_name)
@@ -0,0 +1,474 @@
+"""
+Columnar archive of prompts, responses, parameters and metrics.
+
+Generated outputs used to be printed and lost, or pasted into files such
+as `playground/gemini/responses/`. `ResponseArchive` appends them to a
+Parquet dataset instead:
+
+    <root>/model=<model>/date=<YYYY-MM-DD>/part-<id>.parquet
+
+    - Writes are batched: `append()` only enqueues a record; a background
+      thread writes one file per (model, date) every `batch_size` records
+      or `flush_interval` seconds. Files appear atomically.
+    - Queries by model and date only open the matching partition
+      directories. Rows inside each file are sorted by `prompt_hash` and
+      written in row groups with min/max statistics, so hash lookups skip
+      row groups (and files) that cannot contain the hash.
+    - Reads memory-map the files and project only the requested columns;
+      `iter_batches()` streams record batches for aggregations over data
+      larger than RAM.
+    - `compact()` merges the many small files of busy partitions.
+
+Columns: timestamp, provider, prompt_hash, prompt, response, params (JSON),
+metrics (JSON), latency_seconds, prompt_tokens, completion_tokens, plus the
+`model` and `date` partition keys.
+
+Example:
+    >>> archive = ResponseArchive("data/responses")
+    >>> archive.append(prompt, response.text, model="gemini-1.5-flash",
+    ...                params={"temperature": 0.7}, latency_seconds=0.82)
+    >>> archive.flush()
+    >>> df = archive.query(model="gemini-1.5-flash", start_date="2025-06-01",
+    ...                    columns=["prompt", "response"])
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import date as Date
+from datetime import datetime, timezone
+from typing import Any, Iterator, Optional, Sequence, Union
+from urllib.parse import quote, unquote
+
+from src.utils.lazy_imports import lazy_import
+from src.utils.prompt_cache import prefix_hash
+
+logger = logging.getLogger(__name__)
+
+_pa = lazy_import("pyarrow")
+_pq = lazy_import("pyarrow.parquet")
+_ds = lazy_import("pyarrow.dataset")
+_fs = lazy_import("pyarrow.fs")
+
+DateLike = Union[str, Date, datetime]
+
+
+def prompt_hash(prompt: Any, system_instruction: Optional[str] = None) -> str:
+    """
+    Hash a prompt (and optional system instruction) for grouping and lookups.
+
+    Args:
+        prompt (Any): Prompt text or JSON-serializable messages.
+        system_instruction (Optional[str]): System instruction, if any.
+
+    Returns:
+        str: Hex digest (same scheme as `prompt_cache.prefix_hash`).
+    """
+    return prefix_hash(system_instruction, prompt)
+
+
+def _file_schema():
+    """Schema of the data files (partition keys live in the directory names)."""
+    return _pa.schema(
+        [
+            ("timestamp", _pa.timestamp("us", tz="UTC")),
+            ("provider", _pa.string()),
+            ("prompt_hash", _pa.string()),
+            ("prompt", _pa.string()),
+            ("response", _pa.string()),
+            ("params", _pa.string()),
+            ("metrics", _pa.string()),
+            ("latency_seconds", _pa.float64()),
+            ("prompt_tokens", _pa.int64()),
+            ("completion_tokens", _pa.int64()),
+        ]
+    )
+
+
+def _partitioning():
+    return _ds.partitioning(
+        _pa.schema([("model", _pa.string()), ("date", _pa.string())]), flavor="hive"
+    )
+
+
+def _date_string(value: DateLike) -> str:
+    if isinstance(value, datetime):
+        return value.astimezone(timezone.utc).date().isoformat()
+    if isinstance(value, Date):
+        return value.isoformat()
+    return str(value)
+
+
+@dataclass
+class _Flush:
+    done: threading.Event
+
+
+class ResponseArchive:
+    """
+    Append-only Parquet archive with a background batch writer.
+
+    Args:
+        root (str): Dataset directory (created if missing).
+        batch_size (int): Records buffered before a write.
+        flush_interval (float): Seconds after which buffered records are
+            written even if the batch is not full.
+        row_group_size (int): Rows per Parquet row group; smaller groups
+            make hash lookups skip more data, larger ones compress better.
+        max_pending (int): Records queued at most; `append()` blocks beyond.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        batch_size: int = 5000,
+        flush_interval: float = 5.0,
+        row_group_size: int = 16_384,
+        max_pending: int = 100_000,
+    ):
+        self.root = root
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.row_group_size = row_group_size
+        self.files_written = 0
+        self.records_written = 0
+        self._queue: queue.Queue = queue.Queue(max_pending)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    # --- Writing ---
+
+    def append(
+        self,
+        prompt: Any,
+        response: str,
+        model: str,
+        params: Optional[dict[str, Any]] = None,
+        metrics: Optional[dict[str, Any]] = None,
+        provider: Optional[str] = None,
+        latency_seconds: Optional[float] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        system_instruction: Optional[str] = None,
+        timestamp: Optional[datetime] = None,
+    ) -> str:
+        """
+        Queue one prompt/response pair for writing.
+
+        Args:
+            prompt (Any): Prompt text or messages (stored as JSON if not a string).
+            response (str): Generated text.
+            model (str): Model name (partition key).
+            params (Optional[dict[str, Any]]): Generation parameters.
+            metrics (Optional[dict[str, Any]]): Any further measurements.
+            provider (Optional[str]): Provider name.
+            latency_seconds (Optional[float]): Request latency.
+            prompt_tokens (Optional[int]): Prompt token count.
+            completion_tokens (Optional[int]): Response token count.
+            system_instruction (Optional[str]): Included in the prompt hash.
+            timestamp (Optional[datetime]): Defaults to now (UTC).
+
+        Returns:
+            str: The record's prompt hash.
+
+        Raises:
+            RuntimeError: If the archive is closed.
+        """
+        if self._closed:
+            raise RuntimeError("ResponseArchive is closed")
+        self._ensure_writer()
+        timestamp = timestamp or datetime.now(timezone.utc)
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        digest = prompt_hash(prompt, system_instruction)
+        self._queue.put(
+            {
+                "model": model,
+                "date": _date_string(timestamp),
+                "timestamp": timestamp,
+                "provider": provider,
+                "prompt_hash": digest,
+                "prompt": prompt if isinstance(prompt, str) else json.dumps(prompt, default=str),
+                "response": response,
+                "params": None if params is None else json.dumps(params, default=str),
+                "metrics": None if metrics is None else json.dumps(metrics, default=str),
+                "latency_seconds": latency_seconds,
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+            }
+        )
+        return digest
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """
+        Wait until everything appended so far is on disk.
+
+        Raises:
+            RuntimeError: If the background writer failed.
+        """
+        if self._writer is not None and self._writer.is_alive():
+            marker = _Flush(threading.Event())
+            self._queue.put(marker)
+            marker.done.wait(timeout)
+        if self._error is not None:
+            raise RuntimeError("ResponseArchive writer failed") from self._error
+
+    def close(self) -> None:
+        """Flush and stop the background writer."""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join()
+
+    def __enter__(self) -> "ResponseArchive":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _ensure_writer(self) -> None:
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._write_loop, name="response-archive-writer", daemon=True
+                    )
+                    self._writer.start()
+
+    def _write_loop(self) -> None:
+        batch: list[dict[str, Any]] = []
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = _Flush(threading.Event())
+            if isinstance(item, dict):
+                batch.append(item)
+                if len(batch) < self.batch_size:
+                    continue
+                item = _Flush(threading.Event())
+            if batch:
+                try:
+                    self._write_batch(batch)
+                except Exception as e:
+                    logger.exception("Writing %d archive records failed", len(batch))
+                    self._error = e
+                batch = []
+            if item is None:
+                return
+            item.done.set()
+
+    def _write_batch(self, records: list[dict[str, Any]]) -> None:
+        partitions: dict[tuple[str, str], list[dict[str, Any]]] = {}
+        for record in records:
+            partitions.setdefault((record["model"], record["date"]), []).append(record)
+        schema = _file_schema()
+        for (model, day), rows in partitions.items():
+            table = _pa.Table.from_pylist(rows, schema=schema)
+            self._write_file(model, day, table)
+        self.records_written += len(records)
+
+    def _partition_dir(self, model: str, day: str) -> str:
+        # URI-encode so names like "models/gemini-1.5-flash" stay one segment.
+        return os.path.join(self.root, f"model={quote(model, safe='')}", f"date={day}")
+
+    def _write_file(self, model: str, day: str, table) -> str:
+        table = table.sort_by("prompt_hash")
+        directory = self._partition_dir(model, day)
+        os.makedirs(directory, exist_ok=True)
+        name = f"part-{uuid.uuid4().hex}.parquet"
+        # Dataset discovery ignores dot-files, so readers never see partial files.
+        tmp_path = os.path.join(directory, f".{name}.tmp")
+        _pq.write_table(
+            table,
+            tmp_path,
+            row_group_size=self.row_group_size,
+            compression="zstd",
+            write_statistics=True,
+        )
+        path = os.path.join(directory, name)
+        os.replace(tmp_path, path)
+        self.files_written += 1
+        return path
+
+    # --- Reading ---
+
+    def dataset(self):
+        """
+        Open the archive as a memory-mapped `pyarrow.dataset.Dataset`.
+
+        Returns:
+            pyarrow.dataset.Dataset: Hive-partitioned by model and date.
+        """
+        return _ds.dataset(
+            self.root,
+            format="parquet",
+            partitioning=_partitioning(),
+            filesystem=_fs.LocalFileSystem(use_mmap=True),
+        )
+
+    @staticmethod
+    def _filter(
+        model: Optional[Union[str, Sequence[str]]],
+        date: Optional[DateLike],
+        start_date: Optional[DateLike],
+        end_date: Optional[DateLike],
+        prompt_hash: Optional[Union[str, Sequence[str]]],
+    ):
+        conditions = []
+        if model is not None:
+            models = [model] if isinstance(model, str) else list(model)
+            conditions.append(_ds.field("model").isin(models))
+        if date is not None:
+            conditions.append(_ds.field("date") == _date_string(date))
+        if start_date is not None:
+            conditions.append(_ds.field("date") >= _date_string(start_date))
+        if end_date is not None:
+            conditions.append(_ds.field("date") <= _date_string(end_date))
+        if prompt_hash is not None:
+            if isinstance(prompt_hash, str):
+                conditions.append(_ds.field("prompt_hash") == prompt_hash)
+            else:
+                conditions.append(_ds.field("prompt_hash").isin(list(prompt_hash)))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def scanner(
+        self,
+        model: Optional[Union[str, Sequence[str]]] = None,
+        date: Optional[DateLike] = None,
+        start_date: Optional[DateLike] = None,
+        end_date: Optional[DateLike] = None,
+        prompt_hash: Optional[Union[str, Sequence[str]]] = None,
+        columns: Optional[Sequence[str]] = None,
+        batch_size: int = 65_536,
+    ):
+        """
+        Build a scanner over the matching rows.
+
+        Model and date filters prune partition directories; prompt hash
+        filters use row-group statistics. Only `columns` are read.
+
+        Args:
+            model (Optional[Union[str, Sequence[str]]]): Model name(s).
+            date (Optional[DateLike]): Exact day.
+            start_date (Optional[DateLike]): First day, inclusive.
+            end_date (Optional[DateLike]): Last day, inclusive.
+            prompt_hash (Optional[Union[str, Sequence[str]]]): Prompt hash(es).
+            columns (Optional[Sequence[str]]): Columns to read (default: all).
+            batch_size (int): Maximum rows per record batch.
+
+        Returns:
+            pyarrow.dataset.Scanner: The scanner.
+        """
+        if not any(entry.name.startswith("model=") for entry in os.scandir(self.root)):
+            raise LookupError(f"No archived responses under {self.root}")
+        return self.dataset().scanner(
+            columns=None if columns is None else list(columns),
+            filter=self._filter(model, date, start_date, end_date, prompt_hash),
+            batch_size=batch_size,
+        )
+
+    def query(self, *, as_pandas: bool = True, **filters: Any):
+        """
+        Return the matching rows (see `scanner()` for the filters).
+
+        Args:
+            as_pandas (bool): Return a `pandas.DataFrame` instead of a
+                `pyarrow.Table`.
+            **filters: `scanner()` arguments.
+
+        Returns:
+            pandas.DataFrame | pyarrow.Table: The rows; empty if none match.
+        """
+        try:
+            table = self.scanner(**filters).to_table()
+        except LookupError:
+            columns = filters.get("columns")
+            schema = _file_schema()
+            schema = schema.append(_pa.field("model", _pa.string()))
+            schema = schema.append(_pa.field("date", _pa.string()))
+            if columns is not None:
+                schema = _pa.schema([schema.field(name) for name in columns])
+            table = schema.empty_table()
+        return table.to_pandas() if as_pandas else table
+
+    def iter_batches(self, **filters: Any) -> Iterator[Any]:
+        """
+        Stream the matching rows as `pyarrow.RecordBatch`es.
+
+        Keeps memory bounded for aggregations over the whole archive.
+
+        Args:
+            **filters: `scanner()` arguments.
+
+        Yields:
+            pyarrow.RecordBatch: Batches of rows.
+        """
+        try:
+            scanner = self.scanner(**filters)
+        except LookupError:
+            return
+        yield from scanner.to_batches()
+
+    def count(self, **filters: Any) -> int:
+        """Number of matching rows (reads no string columns)."""
+        try:
+            return self.scanner(**filters).count_rows()
+        except LookupError:
+            return 0
+
+    # --- Maintenance ---
+
+    def compact(self, model: Optional[str] = None, date: Optional[DateLike] = None) -> int:
+        """
+        Merge each partition's files into one file sorted by prompt hash.
+
+        Do not run concurrently with queries on the same partitions.
+
+        Args:
+            model (Optional[str]): Only this model's partitions.
+            date (Optional[DateLike]): Only this day's partitions.
+
+        Returns:
+            int: Number of files removed.
+        """
+        self.flush()
+        removed = 0
+        for model_dir in sorted(os.scandir(self.root), key=lambda e: e.name):
+            if not model_dir.name.startswith("model="):
+                continue
+            if model is not None and model_dir.name != f"model={quote(model, safe='')}":
+                continue
+            for date_dir in sorted(os.scandir(model_dir.path), key=lambda e: e.name):
+                if date is not None and date_dir.name != f"date={_date_string(date)}":
+                    continue
+                files = sorted(
+                    entry.path
+                    for entry in os.scandir(date_dir.path)
+                    if entry.name.startswith("part-") and entry.name.endswith(".parquet")
+                )
+                if len(files) < 2:
+                    continue
+                table = _pa.concat_tables(
+                    _pq.read_table(path, schema=_file_schema()) for path in files
+                )
+                model_name = model_dir.name.split("=", 1)[1]
+                day = date_dir.name.split("=", 1)[1]
+                self._write_file(unquote(model_name), day, table)
+                for path in files:
+                    os.remove(path)
+                removed += len(files) - 1
+        return removed
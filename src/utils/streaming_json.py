@@ -0,0 +1,388 @@
+"""
+Incremental JSON parsing for streamed structured outputs.
+
+With `response_mime_type="application/json"` (see `gemini_parameters.py`)
+the model streams a JSON document token by token, but `json.loads` can only
+run once `response.text` is complete. `IncrementalJSONParser` consumes the
+raw deltas and emits every value as soon as it closes, e.g. each top-level
+field and each element of a top-level array, so downstream agent steps can
+start working before generation finishes.
+
+`StructuredStreamParser` adds Pydantic validation on top: completed fields
+are validated against the schema's field types and list elements against
+the list's item type, and a partial model is available at every step.
+
+Example:
+    >>> class Step(BaseModel):
+    ...     title: str
+    ...     minutes: int
+    >>> class Plan(BaseModel):
+    ...     goal: str
+    ...     steps: list[Step]
+    >>> parser = StructuredStreamParser(Plan)
+    >>> for delta in stream_of_text_deltas:
+    ...     for update in parser.feed(delta):
+    ...         if update.path[:1] == ("steps",) and len(update.path) == 2:
+    ...             start_step(update.value)  # a validated `Step`
+    >>> plan = parser.close()  # the fully validated `Plan`
+"""
+
+import json
+import re
+import typing
+from dataclasses import dataclass
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, Iterator, Optional, Union
+
+from pydantic import BaseModel, TypeAdapter
+
+Path = tuple[Union[str, int], ...]
+
+# Characters that end a run of plain string content.
+_STRING_SPECIAL = re.compile(r'["\\]')
+# Start of the root value.
+_DOCUMENT_START = re.compile(r"[{\[]")
+_WHITESPACE = " \t\r\n"
+_SCALAR_END = ",]}" + _WHITESPACE
+
+
+@dataclass
+class JSONEvent:
+    """
+    A value that has been completely received.
+
+    Attributes:
+        path (Path): Keys/indices leading to the value; () is the root.
+        value (Any): The decoded value.
+    """
+
+    path: Path
+    value: Any
+
+
+class _Frame:
+    """An open object or array."""
+
+    __slots__ = ("kind", "path", "start", "key", "index", "expect_key")
+
+    def __init__(self, kind: str, path: Path, start: int):
+        self.kind = kind
+        self.path = path
+        self.start = start
+        self.key: Optional[str] = None
+        self.index = 0
+        self.expect_key = kind == "object"
+
+
+class IncrementalJSONParser:
+    """
+    Streaming JSON scanner that emits values as soon as they are complete.
+
+    Text before the first `{` or `[` (e.g. a Markdown code fence) and after
+    the end of the root value is ignored.
+
+    Args:
+        emit_depth (int): Emit values whose path has at most this many
+            components (1 = top-level fields/elements, 2 = also their
+            children, ...). The root value is always emitted on completion.
+    """
+
+    def __init__(self, emit_depth: int = 2):
+        self.emit_depth = emit_depth
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[_Frame] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._scalar_start: Optional[int] = None
+        self._events: list[JSONEvent] = []
+        self.root: Any = None
+
+    @property
+    def done(self) -> bool:
+        """True once the root value has been completely received."""
+        return self._done
+
+    def feed(self, delta: str) -> list[JSONEvent]:
+        """
+        Consume the next piece of text.
+
+        Args:
+            delta (str): Newly received text.
+
+        Returns:
+            list[JSONEvent]: Values completed by this delta, innermost first.
+
+        Raises:
+            ValueError: If the text is not valid JSON.
+        """
+        if self._done or not delta:
+            return []
+        self._buffer += delta
+        self._scan()
+        events, self._events = self._events, []
+        return events
+
+    def close(self) -> Any:
+        """
+        Finish parsing and return the root value.
+
+        Returns:
+            Any: The decoded root value.
+
+        Raises:
+            ValueError: If the stream ended before the JSON document did.
+        """
+        if not self._done:
+            raise ValueError("Stream ended before the JSON document was complete")
+        return self.root
+
+    # --- Scanner ---
+
+    def _child_path(self) -> Path:
+        """Path of the value that starts next in the current container."""
+        if not self._stack:
+            return ()
+        frame = self._stack[-1]
+        if frame.kind == "object":
+            return frame.path + (frame.key,)
+        return frame.path + (frame.index,)
+
+    def _complete(self, path: Path, start: int, end: int) -> None:
+        """Handle a value spanning buffer[start:end]."""
+        if self._stack:
+            parent = self._stack[-1]
+            if parent.kind == "array":
+                parent.index += 1
+        if path == ():
+            self.root = json.loads(self._buffer[start:end])
+            self._done = True
+            self._events.append(JSONEvent((), self.root))
+        elif len(path) <= self.emit_depth:
+            self._events.append(JSONEvent(path, json.loads(self._buffer[start:end])))
+
+    def _scan(self) -> None:
+        buffer = self._buffer
+        length = len(buffer)
+        i = self._pos
+
+        if not self._started:
+            # Skip anything before the document, such as "```json\n".
+            match = _DOCUMENT_START.search(buffer, i)
+            if match is None:
+                self._pos = length
+                return
+            i = match.start()
+            self._started = True
+
+        while i < length and not self._done:
+            if self._in_string:
+                match = _STRING_SPECIAL.search(buffer, i)
+                if match is None:
+                    i = length
+                    break
+                j = match.start()
+                if buffer[j] == "\\":
+                    if j + 1 >= length:
+                        # Escape sequence split across deltas: wait for more.
+                        i = j
+                        break
+                    i = j + 2
+                    continue
+                self._in_string = False
+                i = j + 1
+                if self._string_is_key:
+                    frame = self._stack[-1]
+                    frame.key = json.loads(buffer[self._string_start : i])
+                    frame.expect_key = False
+                else:
+                    self._complete(self._child_path(), self._string_start, i)
+                continue
+
+            char = buffer[i]
+            if self._scalar_start is not None:
+                if char not in _SCALAR_END:
+                    i += 1
+                    continue
+                # The delimiter is processed below as usual.
+                start, self._scalar_start = self._scalar_start, None
+                self._complete(self._child_path(), start, i)
+
+            if char in _WHITESPACE or char == ":":
+                i += 1
+            elif char == '"':
+                frame = self._stack[-1] if self._stack else None
+                self._string_is_key = (
+                    frame is not None and frame.kind == "object" and frame.expect_key
+                )
+                self._in_string = True
+                self._string_start = i
+                i += 1
+            elif char in "{[":
+                kind = "object" if char == "{" else "array"
+                self._stack.append(_Frame(kind, self._child_path(), i))
+                i += 1
+            elif char in "}]":
+                frame = self._stack.pop()
+                if (char == "}") != (frame.kind == "object"):
+                    raise ValueError(f"Mismatched '{char}' at offset {i}")
+                i += 1
+                self._complete(frame.path, frame.start, i)
+            elif char == ",":
+                if self._stack and self._stack[-1].kind == "object":
+                    self._stack[-1].expect_key = True
+                i += 1
+            else:
+                self._scalar_start = i
+                i += 1
+
+        self._pos = i
+
+
+# --- Pydantic validation ---
+
+
+@dataclass
+class StructuredUpdate:
+    """
+    A validated piece of a structured output.
+
+    Attributes:
+        path (Path): ("field",) for a top-level field, ("field", i) for an
+            element of a list field.
+        value (Any): The validated value (e.g. a nested model instance).
+    """
+
+    path: Path
+    value: Any
+
+
+def _list_item_type(annotation: Any) -> Optional[Any]:
+    """Return the item type of list[...]/Optional[list[...]] annotations."""
+    origin = typing.get_origin(annotation)
+    if origin in (list, tuple, set, frozenset):
+        args = typing.get_args(annotation)
+        return args[0] if args else Any
+    if origin is Union:
+        for arg in typing.get_args(annotation):
+            item = _list_item_type(arg)
+            if item is not None:
+                return item
+    return None
+
+
+class StructuredStreamParser:
+    """
+    Validate a streamed JSON object against a Pydantic model as it arrives.
+
+    Args:
+        schema (type[BaseModel]): The model describing the expected output.
+    """
+
+    def __init__(self, schema: type[BaseModel]):
+        self.schema = schema
+        self._parser = IncrementalJSONParser(emit_depth=2)
+        self._fields: dict[str, Any] = {}
+        self._field_adapters: dict[str, tuple[str, TypeAdapter]] = {}
+        self._item_adapters: dict[str, TypeAdapter] = {}
+        for name, field in schema.model_fields.items():
+            key = field.alias or name
+            self._field_adapters[key] = (name, TypeAdapter(field.annotation))
+            item_type = _list_item_type(field.annotation)
+            if item_type is not None:
+                self._item_adapters[key] = TypeAdapter(item_type)
+        self._items: dict[str, list[Any]] = {}
+
+    def feed(self, delta: str) -> list[StructuredUpdate]:
+        """
+        Consume a text delta and return newly validated fields/elements.
+
+        Args:
+            delta (str): Newly received text.
+
+        Returns:
+            list[StructuredUpdate]: Validated updates, in completion order.
+
+        Raises:
+            pydantic.ValidationError: If a completed field or element does
+                not match the schema.
+        """
+        updates = []
+        for event in self._parser.feed(delta):
+            if not event.path:
+                continue
+            key = event.path[0]
+            if len(event.path) == 2 and key in self._item_adapters:
+                item = self._item_adapters[key].validate_python(event.value)
+                self._items.setdefault(key, []).append(item)
+                updates.append(StructuredUpdate(event.path, item))
+            elif len(event.path) == 1 and key in self._field_adapters:
+                name, adapter = self._field_adapters[key]
+                self._fields[name] = adapter.validate_python(event.value)
+                updates.append(StructuredUpdate(event.path, self._fields[name]))
+        return updates
+
+    def partial(self) -> BaseModel:
+        """
+        Return a model holding everything validated so far.
+
+        Fields that have not arrived keep their defaults (or are missing);
+        list fields contain the elements completed so far. The result is
+        built with `model_construct`, i.e. without re-validation.
+
+        Returns:
+            BaseModel: The partial model.
+        """
+        values = dict(self._fields)
+        for key, items in self._items.items():
+            name = self._field_adapters[key][0]
+            values.setdefault(name, list(items))
+        return self.schema.model_construct(**values)
+
+    def close(self) -> BaseModel:
+        """
+        Validate and return the complete object.
+
+        Returns:
+            BaseModel: The validated model.
+
+        Raises:
+            ValueError: If the stream ended early.
+            pydantic.ValidationError: If the object does not match the schema.
+        """
+        return self.schema.model_validate(self._parser.close())
+
+
+def stream_structured(
+    deltas: Iterable[str], schema: type[BaseModel]
+) -> Iterator[Union[StructuredUpdate, BaseModel]]:
+    """
+    Yield validated updates from a stream of text deltas, then the final model.
+
+    Works with e.g. `chain.stream(...)` of an LCEL chain ending in
+    `StrOutputParser()`, or the text of streamed Gemini/OpenAI chunks.
+
+    Args:
+        deltas (Iterable[str]): Text deltas.
+        schema (type[BaseModel]): Expected output model.
+
+    Yields:
+        StructuredUpdate | BaseModel: Updates, and finally the full model.
+    """
+    parser = StructuredStreamParser(schema)
+    for delta in deltas:
+        yield from parser.feed(delta)
+    yield parser.close()
+
+
+async def astream_structured(
+    deltas: AsyncIterable[str], schema: type[BaseModel]
+) -> AsyncIterator[Union[StructuredUpdate, BaseModel]]:
+    """Async counterpart of `stream_structured()`."""
+    parser = StructuredStreamParser(schema)
+    async for delta in deltas:
+        for update in parser.feed(delta):
+            yield update
+    yield parser.close()
@@ -0,0 +1,942 @@
+"""
+Run telemetry: trace spans for model and tool calls, process resource
+samples, and on-demand sampling profiles tied to the spans.
+
+Provider latency dominates every agent run, which hides the time spent in
+our own Python code (prompt building, parsing, retrieval, tool glue).
+`trace()` records one run:
+
+    - Spans: `span()` blocks and, through `langchain_callback()`, every
+      LangChain chain, chat model, LLM, retriever and tool run. Each span
+      records wall time and, for spans that start and end on one thread,
+      the CPU time that thread spent, so `duration - cpu_seconds` is
+      roughly the time spent waiting (on the provider).
+    - Resources: `ResourceSampler` samples CPU %, RSS, threads, open file
+      descriptors and network connections of the process with psutil.
+    - Profile (optional): `SamplingProfiler` samples the Python stacks of
+      the threads and asyncio tasks inside the trace every few
+      milliseconds. Each stack is prefixed with its span path
+      (`chain:agent;llm:gemini-2.0-flash;src/...:func`), and samples in
+      which the code waits (socket, select, locks, a suspended task) end in
+      a `[waiting]` frame. Like any in-process sampler it can only sample
+      when the running thread yields the GIL (when it blocks, or after
+      `sys.getswitchinterval()`). The output is the collapsed-stack format read by
+      flamegraph.pl, speedscope and inferno; `hot_paths()` lists the
+      busiest functions excluding the waiting samples.
+
+Tracing is off unless a `trace()` is active; `span()` then costs one
+context-variable lookup. Profiling is enabled per trace by argument, by the
+AGENT_PROFILE environment variable, or per HTTP request by the `X-Profile`
+header (`TelemetryMiddleware`, any ASGI app).
+
+Example:
+    >>> with trace("research", profile=True, output_dir="data/traces") as run:
+    ...     chain.invoke(question, config={"callbacks": [langchain_callback()]})
+    ...     with span("rank results", kind="tool"):
+    ...         rank(results)
+    >>> run.summary()["hot_paths"][:3]
+    >>> # flamegraph.pl data/traces/research-<trace id>.folded > flame.svg
+"""
+
+import asyncio
+import contextvars
+import itertools
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, Iterator, Mapping, Optional
+
+from src.utils.lazy_imports import lazy_import
+
+logger = logging.getLogger(__name__)
+
+_psutil = lazy_import("psutil")
+
+PROFILE_ENV = "AGENT_PROFILE"
+PROFILE_HEADER = "x-profile"
+TRACE_ID_HEADER = "x-trace-id"
+
+# A leaf frame in one of these standard-library modules means the thread waits.
+_WAIT_MODULES = frozenset(
+    {"selectors.py", "socket.py", "ssl.py", "threading.py", "queue.py", "subprocess.py"}
+)
+_WAITING_FRAME = "[waiting]"
+
+
+# --- Spans ---
+
+
+@dataclass
+class Span:
+    """
+    One timed operation inside a trace.
+
+    Attributes:
+        name (str): Operation name, e.g. the model or tool name.
+        kind (str): "trace", "chain", "llm", "tool", "retriever" or "internal".
+        span_id (str): Unique id.
+        parent_id (Optional[str]): Id of the enclosing span.
+        start (float): `time.perf_counter()` at the start.
+        end (Optional[float]): `time.perf_counter()` at the end.
+        cpu_seconds (Optional[float]): CPU time of the thread during the
+            span (None if it ended on another thread; in asyncio code it
+            includes other tasks running on the loop meanwhile).
+        attributes (dict[str, Any]): Extra data, e.g. token usage.
+        error (Optional[str]): "ExceptionType: message" if the span failed.
+    """
+
+    name: str
+    kind: str
+    span_id: str
+    parent_id: Optional[str]
+    start: float
+    end: Optional[float] = None
+    cpu_seconds: Optional[float] = None
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    recorder: "TraceRecorder" = field(default=None, repr=False, compare=False)
+    parent: Optional["Span"] = field(default=None, repr=False, compare=False)
+    _thread: int = field(default=0, repr=False, compare=False)
+    _thread_cpu: float = field(default=0.0, repr=False, compare=False)
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+    @property
+    def label(self) -> str:
+        return f"{self.kind}:{self.name}".replace(";", ",").replace(" ", "_")
+
+    def path(self) -> tuple[str, ...]:
+        """Labels from the root span down to this one."""
+        labels = []
+        span: Optional[Span] = self
+        while span is not None:
+            labels.append(span.label)
+            span = span.parent
+        return tuple(reversed(labels))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "kind": self.kind,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": self.duration,
+            "cpu_seconds": self.cpu_seconds,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    "telemetry_span", default=None
+)
+
+# Open spans per (thread id, id of the asyncio task or None), innermost
+# last. Read by the profiler, which cannot see other threads' context vars.
+_active: dict[tuple[int, Optional[int]], list[Span]] = {}
+_active_lock = threading.Lock()
+# Span ids only need to be unique within the process. (uuid4() would read
+# os.urandom, which releases the GIL and so attracts the profiler's samples.)
+_span_ids = itertools.count(1)
+
+
+def _context_key() -> tuple[int, Optional[int]]:
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    return threading.get_ident(), None if task is None else id(task)
+
+
+def _push(key: tuple[int, Optional[int]], span: Span) -> None:
+    with _active_lock:
+        _active.setdefault(key, []).append(span)
+
+
+def _remove(key: tuple[int, Optional[int]], span: Span) -> None:
+    with _active_lock:
+        stack = _active.get(key)
+        if stack is None:
+            return
+        for i in range(len(stack) - 1, -1, -1):
+            if stack[i] is span:
+                del stack[i]
+                break
+        if not stack:
+            del _active[key]
+
+
+def current_span() -> Optional[Span]:
+    """The innermost open span of the current context, if a trace is active."""
+    return _current_span.get()
+
+
+def start_span(name: str, kind: str = "internal", parent: Optional[Span] = None, **attributes: Any) -> Optional[Span]:
+    """
+    Open a span without a `with` block (e.g. from callbacks); close it with
+    `end_span()`.
+
+    Args:
+        name (str): Operation name.
+        kind (str): Span kind.
+        parent (Optional[Span]): Enclosing span; defaults to the current one.
+        **attributes: Extra data stored on the span.
+
+    Returns:
+        Optional[Span]: The span, or None if no trace is active.
+    """
+    parent = parent or _current_span.get()
+    if parent is None:
+        return None
+    span = Span(
+        name=name,
+        kind=kind,
+        span_id=f"{next(_span_ids):x}",
+        parent_id=parent.span_id,
+        start=time.perf_counter(),
+        attributes=attributes,
+        recorder=parent.recorder,
+        parent=parent,
+        _thread=threading.get_ident(),
+        _thread_cpu=time.thread_time(),
+    )
+    parent.recorder._add(span)
+    return span
+
+
+def end_span(span: Optional[Span], error: Optional[BaseException] = None, **attributes: Any) -> None:
+    """
+    Close a span opened with `start_span()`.
+
+    Args:
+        span (Optional[Span]): The span (None is ignored).
+        error (Optional[BaseException]): Exception that ended the span.
+        **attributes: Extra data stored on the span.
+    """
+    if span is None or span.end is not None:
+        return
+    span.end = time.perf_counter()
+    if span._thread == threading.get_ident():
+        span.cpu_seconds = time.thread_time() - span._thread_cpu
+    if error is not None:
+        span.error = f"{type(error).__name__}: {error}"
+    span.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time a block as a span of the active trace (no-op without one).
+
+    Args:
+        name (str): Operation name.
+        kind (str): "chain", "llm", "tool", "retriever" or "internal".
+        **attributes: Extra data stored on the span.
+
+    Yields:
+        Optional[Span]: The span, or None if no trace is active.
+    """
+    opened = start_span(name, kind, **attributes)
+    if opened is None:
+        yield None
+        return
+    key = _context_key()
+    token = _current_span.set(opened)
+    _push(key, opened)
+    try:
+        yield opened
+    except BaseException as e:
+        end_span(opened, e)
+        raise
+    finally:
+        end_span(opened)
+        _remove(key, opened)
+        _current_span.reset(token)
+
+
+# --- Resources ---
+
+
+@dataclass
+class ResourceSample:
+    """
+    One sample of the process's resource usage.
+
+    Attributes:
+        t (float): Seconds since sampling started.
+        cpu_percent (float): CPU use since the previous sample (100 = one core).
+        rss_bytes (int): Resident set size.
+        threads (int): Number of threads.
+        open_fds (Optional[int]): Open file descriptors (POSIX only).
+        connections (Optional[int]): Open inet connections (sampled less often).
+    """
+
+    t: float
+    cpu_percent: float
+    rss_bytes: int
+    threads: int
+    open_fds: Optional[int]
+    connections: Optional[int]
+
+
+class ResourceSampler:
+    """
+    Samples the process's resources in a background thread.
+
+    Args:
+        interval (float): Seconds between samples.
+        connections_every (int): Count connections every n-th sample only
+            (listing them is comparatively expensive).
+        pid (Optional[int]): Process to sample (default: this process).
+    """
+
+    def __init__(self, interval: float = 0.1, connections_every: int = 5, pid: Optional[int] = None):
+        self.interval = interval
+        self.connections_every = connections_every
+        self.pid = pid
+        self.samples: list[ResourceSample] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "ResourceSampler":
+        self._process = _psutil.Process(self.pid)
+        self._process.cpu_percent(None)
+        self._started = time.perf_counter()
+        self._sample(0)
+        self._thread = threading.Thread(target=self._run, name="telemetry-resources", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._sample(0)
+
+    def __enter__(self) -> "ResourceSampler":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _run(self) -> None:
+        count = 1
+        while not self._stop.wait(self.interval):
+            self._sample(count)
+            count += 1
+
+    def _sample(self, count: int) -> None:
+        process = self._process
+        try:
+            with process.oneshot():
+                open_fds = process.num_fds() if hasattr(process, "num_fds") else None
+                connections = None
+                if count % self.connections_every == 0:
+                    connections = len(process.net_connections(kind="inet"))
+                self.samples.append(
+                    ResourceSample(
+                        t=time.perf_counter() - self._started,
+                        cpu_percent=process.cpu_percent(None),
+                        rss_bytes=process.memory_info().rss,
+                        threads=process.num_threads(),
+                        open_fds=open_fds,
+                        connections=connections,
+                    )
+                )
+        except (_psutil.Error, OSError) as e:
+            logger.debug("Resource sample failed: %s", e)
+
+    def summary(self) -> dict[str, Any]:
+        """Peak and mean values over the samples."""
+        if not self.samples:
+            return {}
+        cpu = [s.cpu_percent for s in self.samples[1:]] or [0.0]
+        connections = [s.connections for s in self.samples if s.connections is not None]
+        fds = [s.open_fds for s in self.samples if s.open_fds is not None]
+        return {
+            "samples": len(self.samples),
+            "cpu_percent_mean": sum(cpu) / len(cpu),
+            "cpu_percent_max": max(cpu),
+            "rss_mib_start": self.samples[0].rss_bytes / 2**20,
+            "rss_mib_max": max(s.rss_bytes for s in self.samples) / 2**20,
+            "rss_mib_end": self.samples[-1].rss_bytes / 2**20,
+            "threads_max": max(s.threads for s in self.samples),
+            "open_fds_max": max(fds) if fds else None,
+            "connections_max": max(connections) if connections else None,
+        }
+
+
+# --- Sampling profiler ---
+
+
+_signal_owner: Optional["SamplingProfiler"] = None
+
+
+def _running_tasks() -> dict[int, int]:
+    """Thread id -> id of the asyncio task running on that thread's loop right now."""
+    current = getattr(asyncio.tasks, "_current_tasks", None)
+    if not isinstance(current, dict):
+        return {}
+    running = {}
+    for loop, task in list(current.items()):
+        thread_id = getattr(loop, "_thread_id", None)
+        if thread_id is not None:
+            running[thread_id] = id(task)
+    return running
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stacks inside one trace.
+
+    Only threads and asyncio tasks with an open span of the trace are
+    sampled; each stack is prefixed with the span path.
+
+    A sampler thread can only look at other threads when they release the
+    GIL, which would attribute nearly all samples to blocking calls. So
+    when started on the main thread (POSIX), the main thread is sampled
+    from a SIGPROF handler on a CPU-time timer instead, which sees exactly
+    the Python code that is running; the sampler thread then covers other
+    threads and counts the main thread's waiting (suspended tasks, blocking
+    I/O). Only one profiler at a time can own SIGPROF; others use the
+    sampler thread for everything.
+
+    Args:
+        recorder (TraceRecorder): The trace whose spans select what to sample.
+        interval (float): Seconds between samples.
+        max_depth (int): Frames kept per stack (innermost).
+    """
+
+    def __init__(self, recorder: "TraceRecorder", interval: float = 0.005, max_depth: int = 96):
+        self.recorder = recorder
+        self.interval = interval
+        self.max_depth = max_depth
+        # (span labels, frame labels, waiting) -> samples; the signal handler
+        # writes to its own counter so the two samplers never race.
+        self._thread_stacks: Counter[tuple[tuple[str, ...], tuple[str, ...], bool]] = Counter()
+        self._signal_stacks: Counter[tuple[tuple[str, ...], tuple[str, ...], bool]] = Counter()
+        self._labels: dict[Any, str] = {}
+        self._own: set[str] = set()
+        self._root = os.getcwd() + os.sep
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signal_thread_id: Optional[int] = None
+        self._previous_handler: Any = None
+
+    @property
+    def stacks(self) -> Counter:
+        return self._thread_stacks + self._signal_stacks
+
+    @property
+    def samples(self) -> int:
+        return sum(self.stacks.values())
+
+    @property
+    def waiting_samples(self) -> int:
+        return sum(count for (_, _, waiting), count in self.stacks.items() if waiting)
+
+    def start(self) -> "SamplingProfiler":
+        global _signal_owner
+        if (
+            hasattr(signal, "setitimer")
+            and threading.current_thread() is threading.main_thread()
+            and _signal_owner is None
+        ):
+            _signal_owner = self
+            self._signal_thread_id = threading.get_ident()
+            self._previous_handler = signal.signal(signal.SIGPROF, self._on_signal)
+            signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+        self._thread = threading.Thread(target=self._run, name="telemetry-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        global _signal_owner
+        if self._signal_thread_id is not None:
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+            self._signal_thread_id = None
+            _signal_owner = None
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            own = path.startswith(self._root) and "site-packages" not in path
+            if path.startswith(self._root):
+                path = path[len(self._root) :]
+            else:
+                # Library code: keep "package/module.py".
+                path = "/".join(path.replace(os.sep, "/").split("/")[-2:])
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{path}:{name}".replace(";", ",").replace(" ", "_")
+            if own:
+                self._own.add(label)
+        return label
+
+    def _frames(self, frame) -> tuple[str, ...]:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(self._label(frame.f_code))
+            frame = frame.f_back
+        labels.reverse()
+        return tuple(labels)
+
+    def _on_signal(self, signum, frame) -> None:
+        # Runs on the main thread between two bytecodes: no locks here.
+        thread_id = threading.get_ident()
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        spans = _active.get((thread_id, None if task is None else id(task))) or _active.get((thread_id, None))
+        if not spans:
+            return
+        try:
+            span = spans[-1]
+        except IndexError:
+            return
+        if span.recorder is self.recorder and frame is not None:
+            self._signal_stacks[(span.path(), self._frames(frame), False)] += 1
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def _sample(self) -> None:
+        frames = sys._current_frames()
+        running = _running_tasks()
+        with _active_lock:
+            innermost = {key: spans[-1] for key, spans in _active.items() if spans}
+        for (thread_id, task_id), span in innermost.items():
+            if span.recorder is not self.recorder:
+                continue
+            if task_id is not None and running.get(thread_id) != task_id:
+                # The task is suspended (awaiting I/O such as a provider call).
+                self._thread_stacks[(span.path(), (), True)] += 1
+                continue
+            if task_id is None and running.get(thread_id) is not None and (thread_id, running[thread_id]) in innermost:
+                # The thread runs a task with spans of its own; sampled above.
+                continue
+            frame = frames.get(thread_id)
+            if frame is None:
+                continue
+            waiting = os.path.basename(frame.f_code.co_filename) in _WAIT_MODULES
+            if thread_id == self._signal_thread_id and not waiting:
+                # Busy samples of the signal-sampled thread come from SIGPROF.
+                continue
+            self._thread_stacks[(span.path(), self._frames(frame), waiting)] += 1
+
+    def collapsed(self) -> str:
+        """The samples in collapsed-stack format ("frame;frame;frame count" lines)."""
+        lines = []
+        for (span_labels, labels, waiting), count in self.stacks.most_common():
+            frames = list(span_labels) + list(labels) + ([_WAITING_FRAME] if waiting else [])
+            lines.append(f"{';'.join(frames)} {count}\n")
+        return "".join(lines)
+
+    def hot_paths(self, top: int = 15, own_code_only: bool = True) -> list[dict[str, Any]]:
+        """
+        Functions with the most busy (non-waiting) samples.
+
+        Args:
+            top (int): Number of entries.
+            own_code_only (bool): Only functions in files under the current
+                working directory (this project), not libraries.
+
+        Returns:
+            list[dict[str, Any]]: function, samples (inclusive), percent of
+                busy samples, and self samples (the function's own code, or
+                library code it called, was on top of the stack).
+        """
+        inclusive: Counter[str] = Counter()
+        self_samples: Counter[str] = Counter()
+        busy = 0
+        for (_, labels, waiting), count in self.stacks.items():
+            if waiting:
+                continue
+            busy += count
+            if own_code_only:
+                labels = tuple(label for label in labels if label in self._own)
+            for label in set(labels):
+                inclusive[label] += count
+            if labels:
+                self_samples[labels[-1]] += count
+        return [
+            {
+                "function": function,
+                "samples": count,
+                "percent": 100.0 * count / busy if busy else 0.0,
+                "self_samples": self_samples[function],
+            }
+            for function, count in inclusive.most_common(top)
+        ]
+
+
+# --- Traces ---
+
+
+class TraceRecorder:
+    """
+    Everything recorded for one trace (see `trace()`).
+
+    Attributes:
+        trace_id (str): Unique id (also sent as the X-Trace-Id header).
+        name (str): Trace name.
+        root (Span): The root span.
+        spans (list[Span]): All spans, in start order (root first).
+        resources (Optional[ResourceSampler]): Resource samples, if enabled.
+        profiler (Optional[SamplingProfiler]): Stack samples, if profiling.
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.spans: list[Span] = []
+        self._lock = threading.Lock()
+        self.resources: Optional[ResourceSampler] = None
+        self.profiler: Optional[SamplingProfiler] = None
+        self.root = Span(
+            name=name,
+            kind="trace",
+            span_id=f"{next(_span_ids):x}",
+            parent_id=None,
+            start=time.perf_counter(),
+            recorder=self,
+            _thread=threading.get_ident(),
+            _thread_cpu=time.thread_time(),
+        )
+        self.spans.append(self.root)
+
+    def _add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def span_totals(self) -> list[dict[str, Any]]:
+        """Wall and CPU time per span kind and name, slowest first."""
+        totals: dict[tuple[str, str], dict[str, Any]] = {}
+        for span in self.spans[1:]:
+            entry = totals.setdefault(
+                (span.kind, span.name),
+                {"kind": span.kind, "name": span.name, "count": 0, "seconds": 0.0, "cpu_seconds": 0.0},
+            )
+            entry["count"] += 1
+            entry["seconds"] += span.duration or 0.0
+            entry["cpu_seconds"] += span.cpu_seconds or 0.0
+        return sorted(totals.values(), key=lambda entry: entry["seconds"], reverse=True)
+
+    def summary(self, top: int = 10) -> dict[str, Any]:
+        """
+        Condensed view of the trace.
+
+        Returns:
+            dict[str, Any]: trace id, name, duration, CPU time, per-span
+                totals, resource summary and, if profiled, the sample counts
+                and hot paths in our own code.
+        """
+        result = {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "seconds": self.root.duration,
+            "cpu_seconds": self.root.cpu_seconds,
+            "spans": self.span_totals()[:top],
+        }
+        if self.resources is not None:
+            result["resources"] = self.resources.summary()
+        if self.profiler is not None:
+            result["profile"] = {
+                "samples": self.profiler.samples,
+                "waiting_samples": self.profiler.waiting_samples,
+                "interval": self.profiler.interval,
+            }
+            result["hot_paths"] = self.profiler.hot_paths(top)
+        return result
+
+    def to_dict(self) -> dict[str, Any]:
+        data = self.summary()
+        data["spans"] = [span.to_dict() for span in self.spans]
+        if self.resources is not None:
+            data["resource_samples"] = [asdict(sample) for sample in self.resources.samples]
+        return data
+
+    def write(self, directory: str) -> list[str]:
+        """
+        Write `<name>-<trace id>.json` (spans, resources, hot paths) and, if
+        profiled, `<name>-<trace id>.folded` (collapsed stacks).
+
+        Args:
+            directory (str): Output directory (created if missing).
+
+        Returns:
+            list[str]: Paths of the written files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        stem = os.path.join(directory, f"{_safe_name(self.name)}-{self.trace_id}")
+        paths = [f"{stem}.json"]
+        with open(paths[0], "w") as f:
+            json.dump(self.to_dict(), f, indent=1, default=str)
+        if self.profiler is not None:
+            paths.append(f"{stem}.folded")
+            with open(paths[1], "w") as f:
+                f.write(self.profiler.collapsed())
+        return paths
+
+
+def _safe_name(name: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_." else "_" for c in name)[:60] or "trace"
+
+
+def _write_trace(recorder: TraceRecorder, directory: str) -> None:
+    try:
+        recorder.write(directory)
+    except OSError as e:
+        logger.warning("Could not write trace %s: %s", recorder.trace_id, e)
+
+
+def profiling_requested(headers: Optional[Mapping[str, str]] = None, flag: Optional[bool] = None) -> bool:
+    """
+    Decide whether to profile a run.
+
+    Args:
+        headers (Optional[Mapping[str, str]]): Request headers; an
+            `X-Profile: 1` (or true/yes/on) header enables profiling.
+        flag (Optional[bool]): Explicit choice; takes precedence.
+
+    Returns:
+        bool: The explicit flag, else the header, else AGENT_PROFILE.
+    """
+    if flag is not None:
+        return flag
+    truthy = ("1", "true", "yes", "on")
+    if headers:
+        for name, value in headers.items():
+            if name.lower() == PROFILE_HEADER:
+                return value.strip().lower() in truthy
+    return os.getenv(PROFILE_ENV, "").strip().lower() in truthy
+
+
+@contextmanager
+def trace(
+    name: str,
+    profile: Optional[bool] = None,
+    resources: bool = True,
+    output_dir: Optional[str] = None,
+    resource_interval: float = 0.1,
+    profile_interval: float = 0.005,
+) -> Iterator[TraceRecorder]:
+    """
+    Record a run: spans, resource samples and optionally a sampling profile.
+
+    Args:
+        name (str): Trace name, e.g. the agent or endpoint.
+        profile (Optional[bool]): Sample stacks; None uses AGENT_PROFILE.
+        resources (bool): Sample process resources.
+        output_dir (Optional[str]): Write the results there when the run ends.
+        resource_interval (float): Seconds between resource samples.
+        profile_interval (float): Seconds between stack samples.
+
+    Yields:
+        TraceRecorder: The recording (complete after the block).
+    """
+    recorder = TraceRecorder(name)
+    if resources:
+        recorder.resources = ResourceSampler(interval=resource_interval).start()
+    if profiling_requested(flag=profile):
+        recorder.profiler = SamplingProfiler(recorder, interval=profile_interval).start()
+    key = _context_key()
+    token = _current_span.set(recorder.root)
+    _push(key, recorder.root)
+    try:
+        yield recorder
+    except BaseException as e:
+        end_span(recorder.root, e)
+        raise
+    finally:
+        end_span(recorder.root)
+        _remove(key, recorder.root)
+        _current_span.reset(token)
+        if recorder.profiler is not None:
+            recorder.profiler.stop()
+        if recorder.resources is not None:
+            recorder.resources.stop()
+        if output_dir:
+            _write_trace(recorder, output_dir)
+
+
+# --- LangChain ---
+
+_callback_class = None
+
+
+def langchain_callback():
+    """
+    Create a LangChain callback handler that records chain, model,
+    retriever and tool runs as spans of the active trace.
+
+    Pass it in the run config: `chain.invoke(x, config={"callbacks": [...]})`.
+    Runs outside a trace are ignored.
+
+    Returns:
+        langchain_core.callbacks.BaseCallbackHandler: The handler.
+    """
+    global _callback_class
+    if _callback_class is None:
+        _callback_class = _build_callback_class()
+    return _callback_class()
+
+
+def _run_name(serialized: Optional[dict[str, Any]], kwargs: dict[str, Any], default: str) -> str:
+    if kwargs.get("name"):
+        return kwargs["name"]
+    serialized = serialized or {}
+    if serialized.get("name"):
+        return serialized["name"]
+    ids = serialized.get("id") or []
+    return ids[-1] if ids else default
+
+
+def _model_name(serialized: Optional[dict[str, Any]], kwargs: dict[str, Any]) -> str:
+    params = kwargs.get("invocation_params") or {}
+    model = params.get("model") or params.get("model_name")
+    if model:
+        return str(model).removeprefix("models/")
+    return _run_name(serialized, kwargs, "llm")
+
+
+def _build_callback_class():
+    from langchain_core.callbacks import BaseCallbackHandler
+
+    class TelemetryCallbackHandler(BaseCallbackHandler):
+        """Records LangChain runs as telemetry spans."""
+
+        # Run in the caller's thread/task even for async runs, so spans are
+        # attributed to the code that is actually executing.
+        run_inline = True
+
+        def __init__(self):
+            self._runs: dict[Any, tuple[Span, tuple[int, Optional[int]]]] = {}
+
+        def _start(self, run_id, parent_run_id, name: str, kind: str, **attributes: Any) -> None:
+            parent = self._runs.get(parent_run_id, (None,))[0] if parent_run_id else None
+            opened = start_span(name, kind, parent=parent, **attributes)
+            if opened is None:
+                return
+            key = _context_key()
+            _push(key, opened)
+            self._runs[run_id] = (opened, key)
+
+        def _end(self, run_id, error: Optional[BaseException] = None, **attributes: Any) -> None:
+            entry = self._runs.pop(run_id, None)
+            if entry is None:
+                return
+            opened, key = entry
+            end_span(opened, error, **attributes)
+            _remove(key, opened)
+
+        def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+            self._start(run_id, parent_run_id, _run_name(serialized, kwargs, "chain"), "chain")
+
+        def on_chain_end(self, outputs, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_chain_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+            self._start(run_id, parent_run_id, _model_name(serialized, kwargs), "llm")
+
+        def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+            self._start(run_id, parent_run_id, _model_name(serialized, kwargs), "llm")
+
+        def on_llm_end(self, response, *, run_id, **kwargs):
+            usage = (getattr(response, "llm_output", None) or {}).get("token_usage")
+            self._end(run_id, **({"token_usage": usage} if usage else {}))
+
+        def on_llm_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, **kwargs):
+            self._start(run_id, parent_run_id, _run_name(serialized, kwargs, "tool"), "tool")
+
+        def on_tool_end(self, output, *, run_id, **kwargs):
+            self._end(run_id)
+
+        def on_tool_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+        def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+            self._start(run_id, parent_run_id, _run_name(serialized, kwargs, "retriever"), "retriever")
+
+        def on_retriever_end(self, documents, *, run_id, **kwargs):
+            self._end(run_id, documents=len(documents))
+
+        def on_retriever_error(self, error, *, run_id, **kwargs):
+            self._end(run_id, error)
+
+    return TelemetryCallbackHandler
+
+
+# --- ASGI ---
+
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware tracing every HTTP request; requests with an
+    `X-Profile: 1` header are also profiled.
+
+    Each response carries an `X-Trace-Id` header; traces are written to
+    `output_dir` (profiled requests only, unless `write_all`) from a worker
+    thread, so the event loop keeps serving other requests. Only profiled
+    requests sample process resources: starting a `ResourceSampler` costs
+    milliseconds, far more than the spans of a plain request.
+
+    Args:
+        app: The ASGI application.
+        output_dir (str): Where traces are written.
+        write_all (bool): Also write traces of requests without profiling.
+    """
+
+    def __init__(self, app, output_dir: str = os.path.join("data", "traces"), write_all: bool = False):
+        self.app = app
+        self.output_dir = output_dir
+        self.write_all = write_all
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        profile = profiling_requested(headers)
+        name = f"{scope.get('method', 'HTTP')} {scope.get('path', '')}"
+        run = None
+        try:
+            with trace(name, profile=profile, resources=profile) as run:
+
+                async def send_with_trace_id(message):
+                    if message["type"] == "http.response.start":
+                        message = dict(message)
+                        message["headers"] = list(message.get("headers", [])) + [
+                            (TRACE_ID_HEADER.encode(), run.trace_id.encode())
+                        ]
+                    await send(message)
+
+                await self.app(scope, receive, send_with_trace_id)
+        finally:
+            if run is not None and self.output_dir and (profile or self.write_all):
+                # Encoding and writing a trace takes milliseconds; keep it off the event loop.
+                await asyncio.to_thread(_write_trace, run, self.output_dir)
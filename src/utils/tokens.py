@@ -0,0 +1,65 @@
+"""
+Token counting helpers shared by the caching, streaming and compression code.
+
+`approximate_tokens()` is a dependency-free estimate (~4 characters per
+token). `count_tokens()` uses a cached Hugging Face tokenizer when a model
+name is given (see `src.utils.providers.get_hf_tokenizer`) and falls back to
+the estimate when `transformers` or the tokenizer files are unavailable.
+"""
+
+import functools
+import logging
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4
+
+
+def approximate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens in `text` (~4 characters per token).
+
+    Args:
+        text (str): Text to measure.
+
+    Returns:
+        int: Estimated token count (at least 1 for non-empty text).
+    """
+    if not text:
+        return 0
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+@functools.lru_cache(maxsize=8)
+def _load_tokenizer(model_name: str):
+    """Load a tokenizer once; None if it cannot be loaded."""
+    from src.utils.providers import get_hf_tokenizer
+
+    try:
+        return get_hf_tokenizer(model_name)
+    except Exception as e:
+        logger.warning(
+            "Tokenizer for %s unavailable (%s); using approximate counts", model_name, e
+        )
+        return None
+
+
+def count_tokens(text: str, model_name: Optional[str] = None) -> int:
+    """
+    Count tokens with the model's tokenizer, or estimate them.
+
+    Args:
+        text (str): Text to measure.
+        model_name (Optional[str]): Hugging Face model whose tokenizer to use,
+            e.g. "meta-llama/Llama-3.2-1B-Instruct". None uses the estimate.
+
+    Returns:
+        int: Token count.
+    """
+    if not text:
+        return 0
+    tokenizer = _load_tokenizer(model_name) if model_name else None
+    if tokenizer is None:
+        return approximate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False))
@@ -0,0 +1,191 @@
+"""
+Shared fixtures, including the performance regression harness.
+
+Tests in `tests/perf` time hot paths with fake and stub models (no network,
+no API keys) through the `perf` fixture, which compares each result with
+the baseline stored in `tests/perf/baselines.json` and fails when it is
+more than `--perf-tolerance` (default 0.75, i.e. 75 %) slower. A metric
+without a baseline fails too: record it with `--update-baselines` on a
+machine that has the optional packages it needs (tests whose packages are
+missing are skipped before they measure anything).
+
+Timings are stored relative to a fixed pure-Python calibration workload
+measured right after each metric, so baselines recorded on one machine
+remain meaningful on a faster or slower one (or a busier one). Each metric is the best of several
+rounds, and a metric over the limit is measured again before it fails,
+which filters out most scheduling noise.
+
+Usage (from the repository root):
+    pytest tests/perf
+    pytest tests/perf --perf-tolerance 1.0      # noisy CI machines: fail at 2x
+    pytest tests/perf --update-baselines        # after an intended change
+"""
+
+import gc
+import json
+import os
+import platform
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import pytest
+
+BASELINES_PATH = Path(__file__).parent / "perf" / "baselines.json"
+DEFAULT_TOLERANCE = 0.75
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("perf", "performance regression checks")
+    group.addoption(
+        "--update-baselines",
+        action="store_true",
+        help="record the measured timings as the new baselines instead of checking them",
+    )
+    group.addoption(
+        "--perf-tolerance",
+        type=float,
+        default=float(os.getenv("PERF_TOLERANCE", DEFAULT_TOLERANCE)),
+        help="allowed slowdown relative to the baseline (0.75 = 75%%; env PERF_TOLERANCE)",
+    )
+
+
+def _calibration_workload() -> None:
+    values = {}
+    for i in range(2000):
+        key = f"key-{i % 97}"
+        values[key] = values.get(key, 0) + len(key) * i
+    sorted(values.items(), key=lambda item: item[1])
+    sum(i * i for i in range(5000))
+
+
+def best_time(func: Callable[[], object], rounds: int = 7, min_round_seconds: float = 0.05) -> float:
+    """
+    Seconds per call of `func`, best of `rounds` rounds.
+
+    Each round repeats `func` often enough to take at least
+    `min_round_seconds`; garbage collection is off while timing.
+
+    Args:
+        func (Callable[[], object]): Code to time.
+        rounds (int): Rounds to take the best of.
+        min_round_seconds (float): Minimum duration of a round.
+
+    Returns:
+        float: Seconds per call.
+    """
+    def run(number: int) -> float:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        return time.perf_counter() - started
+
+    func()  # warm up caches and lazy imports
+    number = 1
+    while (elapsed := run(number)) < min_round_seconds and number < 1 << 20:
+        number = min(1 << 20, max(2 * number, int(1.2 * number * min_round_seconds / max(elapsed, 1e-9))))
+    best = elapsed / number
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(rounds - 1):
+            best = min(best, run(number) / number)
+    finally:
+        if enabled:
+            gc.enable()
+    return best
+
+
+class PerfRecorder:
+    """
+    Measures hot paths and checks them against the stored baselines.
+
+    Args:
+        baselines (dict): Contents of `baselines.json`.
+        tolerance (float): Allowed slowdown, e.g. 0.75 for 75 %.
+        update (bool): Record measurements instead of checking them.
+        retries (int): Extra measurements of a metric before it fails.
+    """
+
+    def __init__(self, baselines: dict, tolerance: float, update: bool, retries: int = 2):
+        self.baselines = baselines
+        self.tolerance = tolerance
+        self.update = update
+        self.retries = retries
+        self.results: dict[str, dict] = {}
+
+    def measure(self, name: str, func: Callable[[], object], per: int = 1, **timing) -> float:
+        """
+        Time `func` and check it against the baseline `name`.
+
+        Args:
+            name (str): Metric name, e.g. "lcel.invoke.simple".
+            func (Callable[[], object]): Code to time.
+            per (int): Items processed per call (e.g. streamed deltas); the
+                metric is seconds per item.
+            **timing: Options for `best_time()`.
+
+        Returns:
+            float: Seconds per item.
+        """
+        seconds = best_time(func, **timing) / per
+        relative = seconds / best_time(_calibration_workload)
+        # A slow result is measured again: noise rarely repeats, regressions do.
+        for _ in range(self.retries):
+            if self._within_tolerance(name, relative):
+                break
+            retry = best_time(func, **timing) / per
+            retry_relative = retry / best_time(_calibration_workload)
+            if retry_relative < relative:
+                seconds, relative = retry, retry_relative
+        self.check(name, seconds, relative)
+        return seconds
+
+    def _within_tolerance(self, name: str, relative: float) -> bool:
+        baseline = self.baselines.get("metrics", {}).get(name)
+        if self.update or baseline is None:
+            return True
+        return relative <= baseline["relative"] * (1 + self.tolerance)
+
+    def check(self, name: str, seconds: float, relative: float) -> None:
+        """Record a metric, or fail if it regressed past the tolerance."""
+        self.results[name] = {"seconds": seconds, "relative": relative}
+        if self.update:
+            return
+        baseline: Optional[dict] = self.baselines.get("metrics", {}).get(name)
+        if baseline is None:
+            pytest.fail(f"No baseline for {name!r}; record one with --update-baselines", pytrace=False)
+        ratio = relative / baseline["relative"]
+        assert ratio <= 1 + self.tolerance, (
+            f"{name} regressed: {seconds * 1e6:.2f} us per item is {ratio:.2f}x the baseline "
+            f"({baseline['seconds'] * 1e6:.2f} us when recorded; allowed {1 + self.tolerance:.2f}x)"
+        )
+
+
+@pytest.fixture(scope="session")
+def perf(request) -> PerfRecorder:
+    """The session's `PerfRecorder`."""
+    recorder = getattr(request.config, "_perf_recorder", None)
+    if recorder is None:
+        baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+        recorder = PerfRecorder(
+            baselines,
+            tolerance=request.config.getoption("--perf-tolerance"),
+            update=request.config.getoption("--update-baselines"),
+        )
+        request.config._perf_recorder = recorder
+    return recorder
+
+
+def pytest_sessionfinish(session, exitstatus):
+    recorder: Optional[PerfRecorder] = getattr(session.config, "_perf_recorder", None)
+    if recorder is None or not recorder.update or not recorder.results:
+        return
+    baselines = json.loads(BASELINES_PATH.read_text()) if BASELINES_PATH.exists() else {}
+    # Metrics not measured this time (skipped or deselected tests) keep their baseline.
+    metrics = {**baselines.get("metrics", {}), **recorder.results}
+    baselines = {
+        "recorded_with": f"Python {platform.python_version()} on {platform.machine()}",
+        "metrics": dict(sorted(metrics.items())),
+    }
+    BASELINES_PATH.write_text(json.dumps(baselines, indent=2) + "\n")
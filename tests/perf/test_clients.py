@@ -0,0 +1,50 @@
+"""Client creation: cache hits must stay near free, cold creation cheap."""
+
+import pytest
+
+from src.utils import providers
+
+
+@pytest.fixture(autouse=True)
+def _fresh_client_cache():
+    providers.clear_client_cache()
+    yield
+    providers.clear_client_cache()
+
+
+def test_openai_client_cached(perf):
+    pytest.importorskip("openai")
+    perf.measure("clients.openai.cached", lambda: providers.get_openai_client("openai", api_key="sk-test"))
+
+
+def test_openai_client_cold(perf):
+    pytest.importorskip("openai")
+
+    def create():
+        providers.clear_client_cache()
+        providers.get_openai_client("openai", api_key="sk-test")
+
+    perf.measure("clients.openai.cold", create)
+
+
+def test_genai_client_cached(perf):
+    pytest.importorskip("google.genai")
+    perf.measure("clients.genai.cached", lambda: providers.get_genai_client(api_key="test-key"))
+
+
+def test_genai_client_cold(perf):
+    pytest.importorskip("google.genai")
+
+    def create():
+        providers.clear_client_cache()
+        providers.get_genai_client(api_key="test-key")
+
+    perf.measure("clients.genai.cold", create)
+
+
+def test_langchain_chat_model(perf):
+    pytest.importorskip("langchain_google_genai")
+    perf.measure(
+        "clients.langchain_gemini.create",
+        lambda: providers.get_chat_model("gemini", "gemini-1.5-flash-latest", api_key="test-key"),
+    )
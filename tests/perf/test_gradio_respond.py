@@ -0,0 +1,46 @@
+"""The Gradio chat handler (`respond` in gemini_gradio_chat.py) with a fake model."""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils.chat_service import ChatService
+from src.utils.fake_llm import FakeStreamingLLM
+
+DELTAS = 50
+
+
+@pytest.fixture
+def gradio_chat(monkeypatch):
+    pytest.importorskip("gradio")
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key")
+    import playground.gemini.gemini_gradio_chat as module
+
+    fake = ChatService(
+        FakeStreamingLLM(tokens=DELTAS, first_token_latency=0, token_delay=0),
+        sessions=module.sessions,
+        max_concurrency=module.MAX_UPSTREAM_STREAMS,
+        max_queue_per_user=module.MAX_QUEUE_PER_USER,
+        timeout=module.RESPONSE_TIMEOUT_SECONDS,
+    )
+    monkeypatch.setattr(module, "chat_service", fake)
+    return module
+
+
+def test_respond(perf, gradio_chat):
+    async def is_disconnected() -> bool:
+        return False
+
+    # The parts of gr.Request the handler may use.
+    request = SimpleNamespace(session_hash="perf-session", is_disconnected=is_disconnected)
+
+    async def conversation() -> None:
+        history: list = []
+        for turn in range(5):
+            message = f"Question {turn}"
+            async for partial in gradio_chat.respond(message, history, request):
+                response = partial
+            history += [{"role": "user", "content": message}, {"role": "assistant", "content": response}]
+
+    perf.measure("gradio.respond.per_turn", lambda: asyncio.run(conversation()), per=5)
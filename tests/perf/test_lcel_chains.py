@@ -0,0 +1,48 @@
+"""Overhead of the LCEL chain shapes used in `playground/lcel` with fake models."""
+
+from operator import itemgetter
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel  # noqa: E402
+from langchain_core.output_parsers import StrOutputParser  # noqa: E402
+from langchain_core.prompts import ChatPromptTemplate, PromptTemplate  # noqa: E402
+from langchain_core.runnables import RunnableParallel, RunnablePassthrough  # noqa: E402
+
+from src.utils.context_compression import ContextCompressor  # noqa: E402
+
+
+def test_prompt_model_parser(perf):
+    # ex_gemini_01 / ex_ollama_01: prompt | chat | parser
+    prompt = ChatPromptTemplate.from_messages([("system", "You are a helpful assistant."), ("user", "{question}")])
+    chain = prompt | FakeListChatModel(responses=["Paris is the capital of France."]) | StrOutputParser()
+    perf.measure("lcel.invoke.simple", lambda: chain.invoke({"question": "What is the capital of France?"}))
+
+
+def test_story_with_analysis(perf):
+    # ex_gemini_02: story chain, then mood analysis of the compressed story in parallel with a passthrough
+    chat = FakeListChatModel(responses=["Once upon a time an astronaut was alone. " * 20, "Melancholic."])
+    story_chain = PromptTemplate.from_template("Write a short story about {topic}") | chat | StrOutputParser()
+    analysis_chain = PromptTemplate.from_template("Analyze the following story's mood:\n{story}") | chat | StrOutputParser()
+    compressor = ContextCompressor(token_budget=400)
+    output_prompt = PromptTemplate.from_template("Here's the story: \n{story}\n\nHere's the mood: \n{mood}")
+    chain = (
+        {"story": story_chain, "topic": RunnablePassthrough()}
+        | RunnableParallel(
+            story=itemgetter("story"),
+            mood=({"story": itemgetter("story") | compressor.as_runnable()} | analysis_chain),
+        )
+        | output_prompt
+        | chat
+        | StrOutputParser()
+    )
+    perf.measure("lcel.invoke.story_with_analysis", lambda: chain.invoke({"topic": "a lonely astronaut"}))
+
+
+def test_batch(perf):
+    prompt = PromptTemplate.from_template("Summarize: {text}")
+    chain = prompt | FakeListChatModel(responses=["A summary."]) | StrOutputParser()
+    inputs = [{"text": f"Document {i} " * 20} for i in range(16)]
+    perf.measure("lcel.batch.16", lambda: chain.batch(inputs, config={"max_concurrency": 4}), per=len(inputs))
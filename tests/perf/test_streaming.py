@@ -0,0 +1,44 @@
+"""Streaming throughput: seconds per delta through the chat service and LCEL."""
+
+import asyncio
+
+import pytest
+
+from src.utils.chat_service import ChatService
+from src.utils.chat_sessions import SessionStore
+from src.utils.fake_llm import FakeStreamingLLM
+
+DELTAS = 200
+
+
+def test_chat_service_stream(perf):
+    sessions = SessionStore(ttl_seconds=3600, max_messages=100)
+    service = ChatService(
+        FakeStreamingLLM(tokens=DELTAS, first_token_latency=0, token_delay=0), sessions=sessions
+    )
+
+    async def stream_many() -> None:
+        for i in range(10):
+            sessions.reset("perf")
+            async for _ in service.stream_reply("perf", f"Message {i}"):
+                pass
+
+    perf.measure("streaming.chat_service.per_delta", lambda: asyncio.run(stream_many()), per=10 * DELTAS)
+
+
+def test_lcel_stream(perf):
+    pytest.importorskip("langchain_core")
+    from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+    from langchain_core.messages import AIMessage
+    from langchain_core.output_parsers import StrOutputParser
+
+    reply = " ".join(f"token{i}" for i in range(DELTAS))
+
+    def stream() -> None:
+        # GenericFakeChatModel consumes its iterator, so build one per run.
+        chain = GenericFakeChatModel(messages=iter([AIMessage(content=reply)])) | StrOutputParser()
+        for _ in chain.stream("Hello"):
+            pass
+
+    # The fake model streams one chunk per word and one per space.
+    perf.measure("streaming.lcel.per_chunk", stream, per=2 * DELTAS - 1)
@@ -0,0 +1,35 @@
+"""Token counting used by caching, streaming and context compression."""
+
+import pytest
+
+from src.utils.tokens import approximate_tokens, count_tokens
+
+TEXT = "The quick brown fox jumps over the lazy dog. " * 250  # ~11 kB
+
+
+def test_approximate_tokens(perf):
+    perf.measure("tokens.approximate.11kb", lambda: approximate_tokens(TEXT))
+
+
+def test_count_tokens_without_model(perf):
+    perf.measure("tokens.count.estimate.11kb", lambda: count_tokens(TEXT))
+
+
+def test_count_tokens_hf_tokenizer(perf, monkeypatch):
+    pytest.importorskip("transformers")
+    monkeypatch.setenv("HF_HUB_OFFLINE", "1")
+    from src.utils.providers import get_hf_tokenizer
+
+    try:
+        get_hf_tokenizer("gpt2")
+    except Exception as e:
+        pytest.skip(f"gpt2 tokenizer not in the local Hugging Face cache: {e}")
+    perf.measure("tokens.count.gpt2.11kb", lambda: count_tokens(TEXT, "gpt2"))
+
+
+def test_context_compression(perf):
+    from src.utils.context_compression import ContextCompressor
+
+    story = "\n\n".join(f"Paragraph {i}. " + TEXT[: 400 + i] for i in range(20))
+    compressor = ContextCompressor(token_budget=300)
+    perf.measure("tokens.compress.story", lambda: compressor.compress(story, "fox"))
@@ -0,0 +1,142 @@
+"""The in-process message bus and the orchestrator, with fake models."""
+
+import asyncio
+
+import pytest
+
+from src.agents.bus import DeadlockError, MessageBus
+from src.agents.orchestrator import FunctionAgent, LLMAgent, Orchestrator
+from src.utils.fake_llm import FakeStreamingLLM
+
+
+def word_count(text: str) -> int:
+    """A picklable tool for the process pool."""
+    return len(text.split())
+
+
+def test_request_reply_and_errors():
+    async def main():
+        async with MessageBus() as bus:
+            async def upper(message):
+                if message.payload == "boom":
+                    raise ValueError("bad payload")
+                await bus.reply(message, message.payload.upper())
+
+            bus.subscribe("upper", upper)
+            assert await bus.request("upper", "hi") == "HI"
+            with pytest.raises(ValueError, match="bad payload"):
+                await bus.request("upper", "boom")
+            with pytest.raises(LookupError):
+                await bus.request("nobody", "hi")
+            assert bus.stats.failed == 1
+
+    asyncio.run(main())
+
+
+def test_one_worker_handles_messages_in_order_and_join_waits():
+    async def main():
+        seen = []
+        async with MessageBus(max_queue=2) as bus:
+            async def slow(message):
+                await asyncio.sleep(0.01)
+                seen.append(message.payload)
+
+            bus.subscribe("work", slow)
+            for i in range(6):  # more than the inbox holds: publishers wait
+                await bus.send("work", i)
+            await bus.join()
+            assert seen == list(range(6))
+            await bus.send("nobody", "lost")
+            assert bus.stats.undeliverable == 1
+
+    asyncio.run(main())
+
+
+def test_close_drops_unhandled_messages():
+    async def main():
+        bus = MessageBus()
+        await bus.start()
+        subscription = bus.subscribe("work", lambda message: asyncio.sleep(10))
+        for i in range(3):
+            await bus.send("work", i)
+        await bus.close()
+        assert subscription.unfinished == 0
+        await asyncio.wait_for(bus.join(), 1)
+
+    asyncio.run(main())
+
+
+def _countdown(bus, topic):
+    """Handler that requests its own topic until the payload reaches 0."""
+
+    async def handler(message):
+        if message.payload:
+            await bus.reply(message, await bus.request(topic, message.payload - 1))
+        else:
+            await bus.reply(message, "bottom")
+
+    return handler
+
+
+def test_request_to_own_topic_raises_instead_of_hanging():
+    async def main():
+        async with MessageBus() as bus:
+            bus.subscribe("one", _countdown(bus, "one"), name="one")
+            with pytest.raises(DeadlockError, match="'one' from one"):
+                await asyncio.wait_for(bus.request("one", 1), 1)
+            # A second worker can handle the nested request; a third level cannot.
+            bus.subscribe("two", _countdown(bus, "two"), concurrency=2, name="two")
+            assert await asyncio.wait_for(bus.request("two", 1), 1) == "bottom"
+            with pytest.raises(DeadlockError, match="'two' from two -> two"):
+                await asyncio.wait_for(bus.request("two", 2), 1)
+
+    asyncio.run(main())
+
+
+def test_orchestrator_workflow():
+    async def plan(task, ctx):
+        notes = await ctx.gather("research", [f"{task}: {q}" for q in ("who", "why")])
+        counts = [await ctx.run_tool(word_count, note) for note in notes]
+        return await ctx.request("write", f"{sum(counts)} words")
+
+    async def main():
+        async with Orchestrator(max_workers=0) as orchestrator:
+            orchestrator.register(FunctionAgent("planner", "task", plan, concurrency=4))
+            orchestrator.register(
+                LLMAgent("researcher", "research", FakeStreamingLLM(reply="a b c", first_token_latency=0, token_delay=0), concurrency=4)
+            )
+            orchestrator.register(FunctionAgent("writer", "write", lambda text, ctx: asyncio.sleep(0, f"Report: {text}")))
+            with pytest.raises(ValueError):
+                orchestrator.register(FunctionAgent("writer", "other", plan))
+            return await orchestrator.run_all("task", ["vector databases", "queues"], timeout=5)
+
+    assert asyncio.run(main()) == ["Report: 6 words", "Report: 6 words"]
+
+
+def test_orchestrator_cycle_raises():
+    def ask(topic):
+        async def fn(payload, ctx):
+            return await ctx.request(topic, payload)
+
+        return fn
+
+    async def main():
+        async with Orchestrator(max_workers=0) as orchestrator:
+            orchestrator.register(FunctionAgent("a", "a", ask("b")))
+            orchestrator.register(FunctionAgent("b", "b", ask("a")))
+            with pytest.raises(DeadlockError, match="from a -> b"):
+                await orchestrator.submit("a", "ping", timeout=5)
+
+    asyncio.run(main())
+
+
+def test_run_tool_in_the_process_pool():
+    async def count(payload, ctx):
+        return await ctx.run_tool(word_count, payload)
+
+    async def main():
+        async with Orchestrator(max_workers=1) as orchestrator:
+            orchestrator.register(FunctionAgent("counter", "count", count))
+            return await orchestrator.submit("count", "one two three", timeout=60)
+
+    assert asyncio.run(main()) == 3
@@ -0,0 +1,93 @@
+"""Best-of-n: scoring failures, early stop and cancellation."""
+
+import asyncio
+
+import pytest
+
+from src.utils.best_of_n import best_of_n
+
+
+class _Streams:
+    """Fake candidate streams: candidate i yields `lengths[i]` deltas, `delay` apart."""
+
+    def __init__(self, lengths: list[int], delay: float = 0.01):
+        self.lengths = lengths
+        self.delay = delay
+        self.closed: set[int] = set()
+
+    async def __call__(self, index: int):
+        try:
+            for i in range(self.lengths[index]):
+                await asyncio.sleep(self.delay)
+                yield f"c{index}." if i == 0 else "x"
+        finally:
+            self.closed.add(index)
+
+
+def test_scorer_error_disqualifies_only_that_candidate():
+    def scorer(text: str) -> float:
+        if text.startswith("c0."):
+            raise ValueError("bad candidate")
+        return len(text)
+
+    result = asyncio.run(best_of_n(_Streams([1, 3, 2]), n=3, scorer=scorer))
+    assert result.best.index == 1
+    assert isinstance(result.candidates[0].error, ValueError)
+    assert result.candidates[0].score is None
+    assert result.candidates[2].score == 4
+
+
+def test_all_scorers_failing_gives_no_best():
+    def scorer(text: str) -> float:
+        raise RuntimeError("scorer down")
+
+    result = asyncio.run(best_of_n(_Streams([1, 2]), n=2, scorer=scorer))
+    assert result.best is None
+    assert all(isinstance(c.error, RuntimeError) for c in result.candidates)
+
+
+def test_early_stop_cancels_and_closes_the_others():
+    streams = _Streams([2, 50, 50, 50])
+    result = asyncio.run(best_of_n(streams, n=4, scorer=lambda text: 1.0, threshold=0.5))
+    assert result.accepted
+    assert result.best.index == 0
+    assert result.cancelled == 3
+    assert streams.closed == {0, 1, 2, 3}
+    assert all(c.chunks < 50 for c in result.candidates[1:])
+
+
+def test_async_scorer_below_threshold_runs_all_to_completion():
+    async def scorer(text: str) -> float:
+        return len(text) / 10
+
+    result = asyncio.run(best_of_n(_Streams([2, 4, 3]), n=3, scorer=scorer, threshold=100))
+    assert not result.accepted
+    assert result.cancelled == 0
+    assert result.best.index == 1
+
+
+def test_timeout_keeps_best_finished_candidate():
+    streams = _Streams([1, 1000], delay=0.01)
+    result = asyncio.run(best_of_n(streams, n=2, scorer=len, timeout=0.2))
+    assert result.best.index == 0
+    assert result.candidates[1].cancelled
+    assert 1 in streams.closed
+
+
+def test_cancelling_the_run_cancels_every_candidate():
+    streams = _Streams([1000, 1000, 1000])
+
+    async def run():
+        task = asyncio.create_task(best_of_n(streams, n=3, scorer=len))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    assert streams.closed == {0, 1, 2}
+
+
+def test_n_must_be_positive():
+    with pytest.raises(ValueError):
+        asyncio.run(best_of_n(_Streams([]), n=0, scorer=len))
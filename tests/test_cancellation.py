@@ -0,0 +1,126 @@
+"""Cancelling wrapped provider streams: disconnects, timeouts and token accounting."""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.utils.cancellation import (
+    CancellationStats,
+    CancellationToken,
+    StreamCancelled,
+    acancellable_stream,
+    watch_disconnect,
+)
+from src.utils.chat_service import ChatService
+
+
+class _Upstream:
+    """Async stream that yields `chunks` words, then stalls until closed."""
+
+    def __init__(self, chunks: int = 2):
+        self.chunks = chunks
+        self.closed = False
+
+    def __aiter__(self):
+        return self._generate()
+
+    async def _generate(self):
+        for _ in range(self.chunks):
+            yield "word "
+        await asyncio.Event().wait()
+
+    async def aclose(self):
+        self.closed = True
+
+
+class _Request:
+    def __init__(self):
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+def test_disconnect_interrupts_a_pending_read():
+    upstream = _Upstream()
+    stats = CancellationStats()
+    request = _Request()
+    token = CancellationToken()
+
+    async def run():
+        watcher = asyncio.create_task(watch_disconnect(request, token, poll_interval=0.01))
+        received = []
+        with pytest.raises(StreamCancelled) as info:
+            async for chunk in acancellable_stream(upstream, token, max_tokens=100, stats=stats):
+                received.append(chunk)
+                if len(received) == 2:
+                    request.disconnected = True
+        await watcher
+        return received, info.value
+
+    received, error = asyncio.run(asyncio.wait_for(run(), 2))
+    assert received == ["word ", "word "]
+    assert error.args == ("disconnect",)
+    assert upstream.closed
+    assert stats.cancelled == 1
+    assert stats.tokens_saved == 100 - stats.tokens_delivered > 0
+
+
+def test_cancel_from_another_thread():
+    upstream = _Upstream(chunks=0)
+    token = CancellationToken()
+
+    async def run():
+        threading.Timer(0.05, token.cancel, args=("stopped",)).start()
+        async for _ in acancellable_stream(upstream, token):
+            pass
+
+    with pytest.raises(StreamCancelled, match="stopped"):
+        asyncio.run(asyncio.wait_for(run(), 2))
+    assert upstream.closed
+
+
+def test_timeout_reason():
+    upstream = _Upstream(chunks=1)
+    stats = CancellationStats()
+
+    async def run():
+        async for _ in acancellable_stream(upstream, CancellationToken(timeout=0.05), stats=stats):
+            pass
+
+    with pytest.raises(StreamCancelled, match="timeout"):
+        asyncio.run(asyncio.wait_for(run(), 2))
+    assert upstream.closed
+    assert stats.tokens_saved == 0  # no budget given
+
+
+def test_finished_stream_is_not_cancelled_later():
+    stats = CancellationStats()
+    token = CancellationToken()
+
+    async def words():
+        yield "a"
+        yield "b"
+
+    async def run():
+        return [chunk async for chunk in acancellable_stream(words(), token, stats=stats)]
+
+    assert asyncio.run(run()) == ["a", "b"]
+    token.cancel("disconnect")  # the loop is closed by now; must not raise
+    assert stats.cancelled == 0
+
+
+def test_chat_service_forwards_the_caller_token_and_budget():
+    upstream = _Upstream()
+    token = CancellationToken()
+    service = ChatService(lambda messages: upstream, timeout=None)
+
+    async def run():
+        async for _ in service.stream_reply("s", "Hi", token=token, max_tokens=50):
+            token.cancel("disconnect")
+
+    with pytest.raises(StreamCancelled, match="disconnect"):
+        asyncio.run(asyncio.wait_for(run(), 2))
+    assert upstream.closed
+    assert service.sessions.history("s") == []
@@ -0,0 +1,234 @@
+"""Record/replay of provider HTTP traffic against a local stand-in server."""
+
+import asyncio
+import gzip
+import json
+import runpy
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import httpx
+import pytest
+
+from src.utils.cassettes import Cassette, CassetteMissError, CassetteRecorder, CassetteTransport, use_cassette
+
+openai = pytest.importorskip("openai")
+
+CASSETTES = Path(__file__).parent / "cassettes"
+CHUNK_DELAY = 0.05
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """OpenAI-style chat completions (plain and SSE) plus a plain JSON endpoint."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.hits += 1
+        if self.path == "/unavailable":
+            self.send_error(503)
+            return
+        self._send_json({"models": [{"name": "llama3.2:latest"}], "hit": self.server.hits})
+
+    def do_POST(self):
+        self.server.hits += 1
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if not body.get("stream"):
+            self._send_json({
+                "id": f"chatcmpl-{self.server.hits}",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": f"answer {self.server.hits}"},
+                }],
+            })
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for word in ["one", " two", " three"]:
+            time.sleep(CHUNK_DELAY)
+            chunk = {
+                "id": "chatcmpl-stream",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": word}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def _send_json(self, data):
+        payload = json.dumps(data).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    httpd.hits = 0
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _url(server) -> str:
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def _client(server):
+    return openai.OpenAI(base_url=f"{_url(server)}/v1", api_key="sk-secret-key", max_retries=0)
+
+
+def _ask(client) -> str:
+    response = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "Hi"}])
+    return response.choices[0].message.content
+
+
+def test_openai_sync_record_then_replay(server, tmp_path):
+    path = tmp_path / "chat.json.gz"
+    with use_cassette(path, mode="record") as recorder:
+        recorded = _ask(_client(server))
+    assert recorder.stats["recorded"] == 1
+    assert b"sk-secret-key" not in gzip.decompress(path.read_bytes())
+
+    with use_cassette(path, mode="replay") as recorder:
+        assert _ask(_client(server)) == recorded
+    assert recorder.stats["replayed"] == 1
+    assert server.hits == 1
+
+
+def test_openai_async_record_then_replay(server, tmp_path):
+    path = tmp_path / "chat.json.gz"
+
+    async def ask():
+        client = openai.AsyncOpenAI(base_url=f"{_url(server)}/v1", api_key="sk-test", max_retries=0)
+        response = await client.chat.completions.create(model="m", messages=[{"role": "user", "content": "Hi"}])
+        await client.close()
+        return response.choices[0].message.content
+
+    with use_cassette(path, mode="record"):
+        recorded = asyncio.run(ask())
+    with use_cassette(path, mode="replay"):
+        assert asyncio.run(ask()) == recorded
+    assert server.hits == 1
+
+
+def _stream(client) -> tuple[str, float, float]:
+    """Streamed text, seconds to the first chunk and in total."""
+    started = time.perf_counter()
+    first = None
+    parts = []
+    stream = client.chat.completions.create(model="m", messages=[{"role": "user", "content": "Hi"}], stream=True)
+    for chunk in stream:
+        first = first or time.perf_counter() - started
+        parts.append(chunk.choices[0].delta.content or "")
+    return "".join(parts), first, time.perf_counter() - started
+
+
+def test_streamed_chunk_timing(server, tmp_path):
+    path = tmp_path / "stream.json.gz"
+    with use_cassette(path, mode="record"):
+        text, _, _ = _stream(_client(server))
+    assert text == "one two three"
+    chunks = json.loads(gzip.decompress(path.read_bytes()))["interactions"][0]["response"]["chunks"]
+    assert len(chunks) >= 3
+    assert chunks[-1]["t"] >= 3 * CHUNK_DELAY
+
+    with use_cassette(path, mode="replay", speed=1.0):
+        replayed, first, total = _stream(_client(server))
+    assert replayed == text
+    assert first >= 0.8 * CHUNK_DELAY
+    assert total >= 0.8 * 3 * CHUNK_DELAY
+
+    with use_cassette(path, mode="replay", speed=None):
+        _, _, fast = _stream(_client(server))
+    assert fast < CHUNK_DELAY
+    assert server.hits == 1
+
+
+def test_requests_record_then_replay(server, tmp_path):
+    requests = pytest.importorskip("requests")
+    path = tmp_path / "tags.json.gz"
+    with use_cassette(path, mode="record"):
+        recorded = requests.get(f"{_url(server)}/api/tags?key=secret", timeout=5).json()
+    assert b"secret" not in gzip.decompress(path.read_bytes())
+    with use_cassette(path, mode="replay"):
+        replayed = requests.get(f"{_url(server)}/api/tags?key=other", timeout=5)
+    assert replayed.status_code == 200
+    assert replayed.json() == recorded
+    assert server.hits == 1
+
+
+def test_scoped_transport_auto_mode(server, tmp_path):
+    path = tmp_path / "scoped.json.gz"
+    recorder = CassetteRecorder(Cassette(path), mode="auto")
+    with httpx.Client(transport=CassetteTransport(recorder)) as client:
+        first = client.get(f"{_url(server)}/api/tags").json()
+        second = client.get(f"{_url(server)}/api/tags").json()
+    assert first == second
+    assert recorder.stats == {"replayed": 1, "recorded": 1, "discarded": 0, "passed_through": 0}
+    assert len(Cassette(path)) == 1
+
+
+def test_incomplete_streams_and_server_errors_are_not_recorded(server, tmp_path):
+    path = tmp_path / "partial.json.gz"
+    recorder = CassetteRecorder(Cassette(path), mode="auto")
+    body = {"model": "m", "stream": True, "messages": []}
+    with httpx.Client(transport=CassetteTransport(recorder)) as client:
+        for _ in range(2):
+            with client.stream("POST", f"{_url(server)}/v1/chat/completions", json=body) as response:
+                next(response.iter_bytes())  # stop reading after the first chunk
+            assert client.get(f"{_url(server)}/unavailable").status_code == 503
+        recorder.cassette.save()
+    assert server.hits == 4
+    assert recorder.stats["discarded"] == 4
+    assert not path.exists()
+
+
+def test_incomplete_recording_is_a_miss(tmp_path):
+    cassette = Cassette(tmp_path / "old.json.gz")
+    cassette.record("k", "GET", "http://x/", b"", 200, [], [(0.0, b"par")], complete=False)
+    assert cassette.find("k") is None
+    cassette.record("k", "GET", "http://x/", b"", 200, [], [(0.0, b"full")])
+    assert cassette.find("k")["response"]["chunks"][0]["s"] == "full"
+
+
+def test_replay_miss_raises(server, tmp_path):
+    requests = pytest.importorskip("requests")
+    path = tmp_path / "empty.json.gz"
+    with use_cassette(path, mode="replay"):
+        with pytest.raises(CassetteMissError):
+            httpx.get(f"{_url(server)}/api/tags")
+        with pytest.raises(CassetteMissError):
+            requests.get(f"{_url(server)}/api/tags", timeout=5)
+    assert server.hits == 0
+    assert not path.exists()
+
+
+def test_playground_gemini_openailib_replays(monkeypatch, capsys):
+    # Drives playground/gemini/gemini_use_openailib.py (question generation
+    # with one model, answered by another) entirely from the cassette. It was
+    # recorded with stand-in responses, so it needs no API key; run the script
+    # inside use_cassette(..., mode="record") with a real key to refresh it.
+    monkeypatch.setenv("GOOGLE_API_KEY", "test-key-not-recorded")
+    script = Path(__file__).parents[1] / "playground" / "gemini" / "gemini_use_openailib.py"
+    with use_cassette(CASSETTES / "gemini_use_openailib.json.gz", mode="replay") as recorder:
+        runpy.run_path(str(script), run_name="__main__")
+    assert recorder.stats["replayed"] == 2
+    output = capsys.readouterr().out
+    assert "Generated Question:\nIf a ship" in output
+    assert "Answer from gemini-2.0-flash:" in output
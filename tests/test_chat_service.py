@@ -0,0 +1,110 @@
+"""ChatService: per-session limits, fair slot allocation and cancellation while queued."""
+
+import asyncio
+import time
+
+import pytest
+
+from src.utils.cancellation import CancellationToken, StreamCancelled
+from src.utils.chat_service import ChatService, QueueFullError
+
+
+class _Backend:
+    """Streams two deltas per reply after `delay`; records the order replies start in."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.started: list[str] = []
+
+    async def __call__(self, messages):
+        self.started.append(messages[-1]["content"])
+        await asyncio.sleep(self.delay)
+        yield "re: "
+        yield messages[-1]["content"]
+
+
+async def _reply(service: ChatService, session_id: str, message: str, **kwargs) -> str:
+    return "".join([delta async for delta in service.stream_reply(session_id, message, **kwargs)])
+
+
+def test_reply_is_recorded_in_the_session():
+    async def main():
+        service = ChatService(_Backend(delay=0))
+        assert await _reply(service, "s", "hi") == "re: hi"
+        assert service.sessions.history("s") == [
+            {"role": "user", "content": "hi"},
+            {"role": "assistant", "content": "re: hi"},
+        ]
+        assert service.stats.completed == 1
+        assert service.pending("s") == 0
+
+    asyncio.run(main())
+
+
+def test_per_session_queue_limit():
+    async def main():
+        service = ChatService(_Backend(), max_queue_per_user=2)
+        first = asyncio.create_task(_reply(service, "s", "1"))
+        second = asyncio.create_task(_reply(service, "s", "2"))
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await _reply(service, "s", "3")
+        # Other sessions are not affected by one session's queue.
+        assert await _reply(service, "other", "x") == "re: x"
+        assert await asyncio.gather(first, second) == ["re: 1", "re: 2"]
+        assert service.stats.rejected == 1
+        assert service.sessions.history("s")[-1] == {"role": "assistant", "content": "re: 2"}
+
+    asyncio.run(main())
+
+
+def test_slots_are_granted_first_come_first_served():
+    async def main():
+        backend = _Backend(delay=0.02)
+        service = ChatService(backend, max_concurrency=1)
+        order = ["a1", "b1", "c1", "a2", "b2"]
+        tasks = []
+        for message in order:
+            tasks.append(asyncio.create_task(_reply(service, message[0], message)))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        assert backend.started == order
+        assert service.stats.peak_active == 1
+
+    asyncio.run(main())
+
+
+def test_cancelling_a_queued_request_stops_its_wait():
+    async def main():
+        service = ChatService(_Backend(delay=0.5), max_concurrency=1, timeout=30)
+        busy = asyncio.create_task(_reply(service, "busy", "long"))
+        await asyncio.sleep(0)
+        token = CancellationToken()
+        queued = asyncio.create_task(_reply(service, "waiting", "hello", token=token))
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        token.cancel("disconnect")
+        with pytest.raises(StreamCancelled, match="disconnect"):
+            await queued
+        assert time.perf_counter() - started < 0.1
+        assert service.stats.waiting == 0
+        assert service.pending("waiting") == 0
+        await busy
+        # The slot was never taken by the cancelled request.
+        assert await _reply(service, "waiting", "again") == "re: again"
+
+    asyncio.run(main())
+
+
+def test_queued_request_times_out():
+    async def main():
+        service = ChatService(_Backend(delay=0.5), max_concurrency=1, timeout=0.1)
+        busy = asyncio.create_task(_reply(service, "busy", "long"))
+        await asyncio.sleep(0)
+        with pytest.raises(StreamCancelled, match="timeout"):
+            await _reply(service, "waiting", "hello")
+        with pytest.raises(StreamCancelled):
+            await busy
+        assert service.stats.failed == 2
+
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""The code sandbox: resource limits, isolation and worker replacement (POSIX only)."""
+
+import os
+
+import pytest
+
+from src.tools.code_sandbox import SandboxError, SandboxLimits, SandboxPool, execute_cold
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="the sandbox needs fork and rlimits")
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with SandboxPool(size=1) as pool:
+        yield pool
+
+
+def test_output_and_fresh_globals(pool):
+    first = pool.execute("x = 41\nprint(x + 1)")
+    assert first.ok and first.stdout == "42\n" and not first.cold
+    second = pool.execute("print('x' in globals())")
+    assert second.stdout == "False\n"
+    assert second.pid != first.pid  # every snippet runs in its own child
+
+
+def test_exception_reports_the_snippets_frames(pool):
+    result = pool.execute("def f():\n    return 1 / 0\nf()")
+    assert result.exit_reason == "error"
+    assert result.error == "ZeroDivisionError: division by zero"
+    assert 'File "<snippet>", line 2, in f' in result.traceback
+    assert "_sandbox_worker" not in result.traceback
+
+
+@pytest.mark.parametrize("code, reason, error", [
+    ("raise SystemExit", "ok", None),
+    ("import sys; sys.exit(0)", "ok", None),
+    ("raise SystemExit(3)", "error", "SystemExit: 3"),
+])
+def test_system_exit(pool, code, reason, error):
+    result = pool.execute(code)
+    assert (result.exit_reason, result.error) == (reason, error)
+
+
+def test_cpu_limit(pool):
+    result = pool.execute("while True:\n    pass", SandboxLimits(cpu_seconds=1, wall_seconds=20))
+    assert result.exit_reason == "cpu"
+    assert result.seconds < 5
+
+
+def test_memory_limit(pool):
+    result = pool.execute("data = bytearray(512 * 1024 * 1024)", SandboxLimits(memory_mb=64))
+    assert result.exit_reason == "memory"
+
+
+def test_wall_clock_limit(pool):
+    result = pool.execute("import time\ntime.sleep(30)", SandboxLimits(wall_seconds=0.5))
+    assert result.exit_reason == "timeout"
+    assert result.seconds < 5
+    assert pool.execute("print('still here')").stdout == "still here\n"
+
+
+def test_file_size_limit(pool, tmp_path):
+    code = f"open({str(tmp_path / 'big')!r}, 'wb').write(b'x' * (2 * 1024 * 1024))"
+    result = pool.execute(code, SandboxLimits(max_file_mb=1))
+    assert result.exit_reason == "error"
+    assert "File too large" in result.error
+
+
+def test_snippets_cannot_reach_the_protocol_channel(pool):
+    code = (
+        "import os, sys\n"
+        "os.write(1, b'not json\\n')\n"
+        "sys.__stdout__.write('not json either\\n')\n"
+        "sys.__stdout__.flush()\n"
+        "print(sorted(int(fd) for fd in os.listdir('/proc/self/fd'))[:3])\n"
+        "print(input())"
+    )
+    result = pool.execute(code)
+    assert result.exit_reason == "error"
+    assert result.error.startswith("EOFError")  # stdin is /dev/null
+    assert result.stdout == "[0, 1, 2]\n"
+    assert pool.execute("print('ok')").stdout == "ok\n"
+
+
+def test_output_is_truncated(pool):
+    result = pool.execute("print('x' * 1000)", SandboxLimits(max_output_chars=100))
+    assert result.stdout.startswith("x" * 100)
+    assert "[truncated" in result.stdout
+
+
+def test_dead_workers_are_replaced():
+    with SandboxPool(size=1) as pool:
+        [worker] = pool._workers
+        worker.process.kill()
+        worker.process.wait()
+        result = pool.execute("print('replaced')")
+        assert result.stdout == "replaced\n" and result.cold
+        # A snippet that kills its own worker fails that call only.
+        with pytest.raises(SandboxError):
+            pool.execute("import os, signal\nos.kill(os.getppid(), signal.SIGKILL)\nimport time\ntime.sleep(5)")
+        assert pool.execute("print('again')").stdout == "again\n"
+        assert len(pool._workers) == 1
+
+
+def test_execute_cold():
+    result = execute_cold("print(6 * 7)")
+    assert result.ok and result.cold and result.stdout == "42\n"
@@ -0,0 +1,104 @@
+"""Context compression with a fake summarizer (no model server needed)."""
+
+from types import SimpleNamespace
+
+from src.utils import providers
+from src.utils.context_compression import ContextCompressor, ollama_summarizer
+
+PARAGRAPH = (
+    "The captain repaired a broken compass before dawn. "
+    "A robot followed the last train without a word. "
+    "The river described the northern lights as the rain began."
+)
+
+
+class _Summarizer:
+    """Returns a fixed summary and records the budgets it was given."""
+
+    def __init__(self, summary: str = "The captain fixed the compass.", error: Exception = None):
+        self.summary = summary
+        self.error = error
+        self.calls: list[tuple[str, int]] = []
+
+    def __call__(self, text: str, max_tokens: int) -> str:
+        self.calls.append((text, max_tokens))
+        if self.error is not None:
+            raise self.error
+        return self.summary
+
+
+def _story(paragraphs: int = 12) -> str:
+    return "\n\n".join(f"{PARAGRAPH} Chapter {i} ends here." for i in range(paragraphs))
+
+
+def test_compress_dedupes_without_a_budget():
+    summarizer = _Summarizer()
+    text = "\n\n".join([PARAGRAPH, PARAGRAPH, "Something new happened."])
+    compressed, report = ContextCompressor(summarizer=summarizer).compress(text)
+    assert compressed.count("broken compass") == 1
+    assert report.steps == ["dedupe"]
+    assert report.tokens_after < report.tokens_before
+    assert summarizer.calls == []
+
+
+def test_compress_summarizes_over_budget():
+    summarizer = _Summarizer()
+    compressed, report = ContextCompressor(token_budget=50, dedupe=False, summarizer=summarizer).compress(_story())
+    assert compressed == summarizer.summary
+    assert report.steps == ["summarize"]
+    assert summarizer.calls[0][1] == 50
+
+
+def test_compress_trims_when_the_summarizer_fails():
+    summarizer = _Summarizer(error=RuntimeError("ollama down"))
+    compressor = ContextCompressor(token_budget=60, dedupe=False, summarizer=summarizer)
+    compressed, report = compressor.compress(_story(), query="compass")
+    assert report.steps == ["trim"]
+    assert report.tokens_after <= 60
+    assert "compass" in compressed
+    assert compressor.stats.calls == 1
+
+
+def test_compress_messages_summarizes_older_turns():
+    history = [{"role": "system", "content": "You are helpful."}]
+    for i in range(10):
+        history.append({"role": "user", "content": f"Question {i}: {PARAGRAPH}"})
+        history.append({"role": "assistant", "content": f"Answer {i}: {PARAGRAPH}"})
+    summarizer = _Summarizer()
+    compressed, report = ContextCompressor(token_budget=200, summarizer=summarizer).compress_messages(history, keep_last=2)
+    assert compressed[0] == history[0]
+    assert compressed[1] == {"role": "system", "content": f"Summary of the earlier conversation: {summarizer.summary}"}
+    assert compressed[2:] == history[-2:]
+    assert report.steps == ["summarize"]
+    transcript, budget = summarizer.calls[0]
+    assert transcript.startswith("user: Question 0")
+    assert 0 < budget < 200
+
+
+def test_compress_messages_drops_oldest_without_a_summarizer():
+    history = [{"role": "user", "content": f"Turn {i}: {PARAGRAPH}"} for i in range(10)]
+    compressed, report = ContextCompressor(token_budget=150).compress_messages(history, keep_last=2)
+    assert compressed[-2:] == history[-2:]
+    assert compressed == history[-len(compressed):]
+    assert report.steps == ["trim"]
+    assert report.tokens_after <= 150
+
+
+def test_ollama_summarizer_sets_num_predict_on_the_model(monkeypatch):
+    invocations = []
+
+    class FakeChatOllama:
+        def __init__(self, **fields):
+            self.fields = fields
+
+        def model_copy(self, update):
+            return FakeChatOllama(**{**self.fields, **update})
+
+        def invoke(self, prompt):
+            invocations.append(self.fields)
+            return SimpleNamespace(content=" short summary ")
+
+    monkeypatch.setattr(providers, "get_chat_model", lambda provider, model, **kwargs: FakeChatOllama(**kwargs))
+    summarize = ollama_summarizer("llama3.2:1b")
+    assert summarize("long text", 80) == "short summary"
+    assert invocations == [{"temperature": 0, "num_predict": 80}]
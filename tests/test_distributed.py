@@ -0,0 +1,58 @@
+"""Distributed agent runtime: worker loss and task lease expiry."""
+
+import threading
+from concurrent.futures import wait
+
+import pytest
+
+from src.agents.distributed import AgentHost, AgentWorker, spawn_local_workers
+
+pytest.importorskip("grpc")
+
+HANDLERS = {"turn": "src.benchmarks.distributed_agents:simulated_turn"}
+
+
+def test_killed_worker_tasks_are_requeued_and_complete():
+    with AgentHost(heartbeat_timeout=1.0, task_timeout=None) as host:
+        processes = spawn_local_workers(host.address, HANDLERS, count=2, capacity=4, heartbeat_interval=0.2)
+        try:
+            host.wait_for_workers(2)
+            futures = [
+                host.submit("turn", {"task": i, "io_ms": 100, "cpu_work": 0}) for i in range(40)
+            ]
+            wait(futures, timeout=0.3)
+            processes[0].kill()
+            done, not_done = wait(futures, timeout=30)
+            assert not not_done
+            assert sorted(f.result()["task"] for f in futures) == list(range(40))
+            assert host.stats.dead_workers == 1
+            assert host.stats.requeued > 0
+        finally:
+            for process in processes:
+                process.kill()
+                process.join()
+
+
+def test_expired_lease_reassigns_a_hung_task():
+    release = threading.Event()
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        if len(calls) == 1:
+            release.wait(10)  # hangs while its worker keeps heartbeating
+            return "late"
+        return "retried"
+
+    with AgentHost(heartbeat_timeout=2.0, task_timeout=0.5) as host:
+        worker = AgentWorker(host.address, {"hang": handler}, capacity=2, heartbeat_interval=0.1, poll_wait=0.2)
+        thread = threading.Thread(target=worker.run, daemon=True)
+        thread.start()
+        try:
+            assert host.run("hang", {}, timeout=10) == "retried"
+            assert host.stats.expired == 1
+            assert host.stats.dead_workers == 0
+        finally:
+            release.set()
+            worker.stop()
+            thread.join(10)
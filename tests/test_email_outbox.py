@@ -0,0 +1,132 @@
+"""The SendGrid email outbox, delivering to the benchmark's stub server."""
+
+import time
+
+import pytest
+
+from src.benchmarks.email_outbox import STUB_API_KEY, stub_server
+from src.tools.email_outbox import EmailOutbox
+
+SENDER = "agents@example.com"
+
+
+@pytest.fixture
+def server():
+    with stub_server(latency=0.0) as server:
+        yield server
+
+
+@pytest.fixture
+def outbox_path(tmp_path):
+    return str(tmp_path / "outbox.sqlite3")
+
+
+def _outbox(path: str, server=None, **kwargs) -> EmailOutbox:
+    options = {"flush_interval": 0.05, "base_backoff": 0.01, "max_backoff": 0.05}
+    options.update(kwargs)
+    if server is None:
+        return EmailOutbox(path, from_email=SENDER, start=False, **options)
+    options.setdefault("api_key", STUB_API_KEY)
+    return EmailOutbox(path, from_email=SENDER, host=server.url, **options)
+
+
+def _settle(outbox: EmailOutbox, messages: int, timeout: float = 10) -> dict[str, int]:
+    """Wait until `messages` messages are sent or failed; return the status counts."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        counts = outbox.counts()
+        if counts.get("sent", 0) + counts.get("failed", 0) >= messages:
+            return counts
+        time.sleep(0.01)
+    raise AssertionError(f"Outbox did not settle: {outbox.counts()}")
+
+
+def test_messages_are_delivered_in_one_batch(server, outbox_path):
+    producer = _outbox(outbox_path)
+    ids = [producer.enqueue(f"user{i}@example.com", "Nightly summary", text="All done.") for i in range(5)]
+    producer.enqueue("ops@example.com", "Price alert", text="A ticker moved.")
+
+    with _outbox(outbox_path, server) as sender:
+        assert _settle(sender, 6) == {"sent": 6}
+        assert sender.stats.batch_sizes == [5, 1]
+    assert sorted(server.delivered) == sorted(str(i) for i in ids + [6])
+    assert producer.status(ids[0])["attempts"] == 1
+
+
+def test_duplicates_are_dropped(outbox_path):
+    outbox = _outbox(outbox_path)
+    assert outbox.enqueue("ops@example.com", "Alert", text="Disk full") is not None
+    assert outbox.enqueue("Ops <ops@example.com>", "Alert", text="Disk full") is not None  # named differently
+    assert outbox.enqueue("ops@example.com", "Alert", text="Disk full") is None
+    assert outbox.enqueue("ops@example.com", "Alert", text="Disk full", dedupe_key="second") is not None
+    assert outbox.stats.deduplicated == 1
+    without_window = _outbox(outbox_path, dedupe_window=0)
+    assert without_window.enqueue("ops@example.com", "Alert", text="Disk full") is not None
+    assert outbox.counts() == {"pending": 4}
+
+
+def test_failed_requests_are_retried_with_backoff(server, outbox_path):
+    server.fail_rate = 1.0
+    with _outbox(outbox_path, server, base_backoff=0.5, max_backoff=0.5) as outbox:
+        message_id = outbox.enqueue("ops@example.com", "Alert", text="Disk full")
+        while server.requests == 0:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        status = outbox.status(message_id)
+        assert status["status"] == "pending" and status["attempts"] == 1
+        assert status["last_error"].startswith(("HTTP 429", "HTTP 503"))
+        assert server.requests == 1  # waiting out the backoff
+        server.fail_rate = 0.0
+        assert _settle(outbox, 1) == {"sent": 1}
+        assert outbox.status(message_id)["attempts"] == 2
+        assert outbox.stats.retried == 1
+
+
+def test_message_fails_after_max_attempts(server, outbox_path):
+    server.fail_rate = 1.0
+    with _outbox(outbox_path, server, max_attempts=3) as outbox:
+        message_id = outbox.enqueue("ops@example.com", "Alert", text="Disk full")
+        assert _settle(outbox, 1) == {"failed": 1}
+        assert outbox.status(message_id)["attempts"] == 3
+    assert server.requests == 3
+
+
+def test_unauthorized_requests_fail_without_retries(server, outbox_path):
+    with _outbox(outbox_path, server, api_key="SG.wrong") as outbox:
+        message_id = outbox.enqueue("ops@example.com", "Alert", text="Disk full")
+        assert _settle(outbox, 1) == {"failed": 1}
+        assert outbox.status(message_id)["last_error"].startswith("HTTP 401")
+        assert outbox.stats.retried == 0
+
+
+class _BrokenOutbox(EmailOutbox):
+    def _send_batch(self, client, rows):
+        raise ValueError("unexpected response")
+
+
+def test_unexpected_errors_count_as_attempts(server, outbox_path):
+    with _BrokenOutbox(
+        outbox_path, api_key=STUB_API_KEY, from_email=SENDER, host=server.url,
+        flush_interval=0.05, base_backoff=0.01, max_attempts=3,
+    ) as outbox:
+        message_id = outbox.enqueue("ops@example.com", "Alert", text="Disk full")
+        assert _settle(outbox, 1) == {"failed": 1}
+        status = outbox.status(message_id)
+        assert status["attempts"] == 3
+        assert status["last_error"] == "ValueError: unexpected response"
+
+
+def test_messages_of_a_crashed_sender_are_recovered(server, outbox_path):
+    crashed = _outbox(outbox_path, lease_seconds=0.1)
+    first = crashed.enqueue("ops@example.com", "Alert", text="Disk full")
+    second = crashed.enqueue("dev@example.com", "Alert", text="Disk full")
+    assert len(crashed._claim()) == 2  # leased, then the sender died before sending
+    assert crashed.counts() == {"sending": 2}
+    crashed._connection().execute("UPDATE outbox SET attempts = 1 WHERE id = ?", (second,))
+
+    with _outbox(outbox_path, server, max_attempts=2) as recovering:
+        assert _settle(recovering, 2) == {"sent": 1, "failed": 1}
+        # The expired lease counted as an attempt.
+        assert (recovering.status(first)["status"], recovering.status(first)["attempts"]) == ("sent", 2)
+        assert (recovering.status(second)["status"], recovering.status(second)["last_error"]) == ("failed", "Lease expired")
+    assert server.delivered == [str(first)]
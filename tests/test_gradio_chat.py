@@ -0,0 +1,82 @@
+"""The Gradio chat (`gemini_gradio_chat.py`) served through a real Gradio queue, with a fake model."""
+
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from src.utils.chat_service import ChatService
+
+pytest.importorskip("gradio")
+gradio_client = pytest.importorskip("gradio_client")
+
+
+class _Backend:
+    """Streams `deltas` deltas; records whether the stream was closed."""
+
+    def __init__(self, deltas: int, delay: float):
+        self.deltas = deltas
+        self.delay = delay
+        self.sent = 0
+        self.closed = threading.Event()
+
+    async def __call__(self, messages):
+        try:
+            for i in range(self.deltas):
+                await asyncio.sleep(self.delay)
+                self.sent += 1
+                yield f"t{i} "
+        finally:
+            self.closed.set()
+
+
+@pytest.fixture(scope="module")
+def chat_app():
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("GOOGLE_API_KEY", "test-key")
+        patch.setenv("GRADIO_ANALYTICS_ENABLED", "False")
+        import playground.gemini.gemini_gradio_chat as module
+
+        _, url, _ = module.iface.queue().launch(prevent_thread_lock=True, quiet=True, server_name="127.0.0.1")
+        try:
+            yield module, url
+        finally:
+            module.iface.close()
+
+
+def _use(monkeypatch, module, backend: _Backend) -> None:
+    service = ChatService(backend, sessions=module.sessions, timeout=60)
+    monkeypatch.setattr(module, "chat_service", service)
+
+
+def test_reply_streams_to_the_end(chat_app, monkeypatch):
+    module, url = chat_app
+    backend = _Backend(deltas=30, delay=0.005)
+    _use(monkeypatch, module, backend)
+    reply = gradio_client.Client(url, verbose=False).predict("Hello", api_name="/chat")
+    assert reply == "".join(f"t{i} " for i in range(30))
+
+
+def test_closing_the_tab_closes_the_upstream_stream(chat_app, monkeypatch):
+    module, url = chat_app
+    backend = _Backend(deltas=1000, delay=0.02)
+    _use(monkeypatch, module, backend)
+    config = httpx.get(f"{url}config").json()
+    fn_index = next(d["id"] for d in config["dependencies"] if d.get("api_name") == "chat")
+    api = url.rstrip("/") + config.get("api_prefix", "/gradio_api")
+
+    # What the browser does: join the queue, listen on the event stream, go away.
+    with httpx.Client(timeout=10) as client:
+        client.post(
+            f"{api}/queue/join",
+            json={"data": ["Hi", []], "fn_index": fn_index, "session_hash": "tab", "event_data": None, "trigger_id": None},
+        ).raise_for_status()
+        with client.stream("GET", f"{api}/queue/data", params={"session_hash": "tab"}) as events:
+            for line in events.iter_lines():
+                if "process_generating" in line:
+                    break
+
+    assert backend.closed.wait(10)
+    assert backend.sent < 100
+    assert module.sessions.history("tab") == []  # an unfinished reply is not kept
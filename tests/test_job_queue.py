@@ -0,0 +1,113 @@
+"""Durable job queue: persistence, priorities, retries and crash recovery."""
+
+import os
+import time
+
+from src.utils.job_queue import JobQueue, WorkerPool
+
+TASK = f"{__name__}:hang_first_time"
+
+
+def hang_first_time(marker: str, seconds: float = 60) -> str:
+    """Hang on the first attempt (the test kills the worker), succeed on the next."""
+    if os.path.exists(marker):
+        return "recovered"
+    open(marker, "w").close()
+    time.sleep(seconds)
+    return "not killed"
+
+
+def _wait_for(condition, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def _start_and_kill(path: str, marker) -> None:
+    """Run a worker until it started the job, keep it past the lease timeout, then SIGKILL it."""
+    pool = WorkerPool(path, processes=1, batch_size=1, lease_seconds=1.0, poll_interval=0.05).start()
+    try:
+        _wait_for(marker.exists, timeout=60)
+        time.sleep(1.5)  # longer than the lease: the worker's heartbeat must keep it
+        assert JobQueue(path).claim("intruder") == []
+        pool.processes[0].kill()
+        pool.processes[0].join()
+    finally:
+        pool.stop(timeout=5)
+
+
+def test_job_of_killed_worker_runs_again(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    marker = tmp_path / "started"
+    queue = JobQueue(path, lease_seconds=1.0)
+    job_id = queue.enqueue(TASK, {"marker": str(marker)})
+
+    _start_and_kill(path, marker)
+    assert queue.get(job_id)["status"] == "running"  # until the lease expires
+
+    with WorkerPool(path, processes=1, lease_seconds=1.0, poll_interval=0.05):
+        job = queue.wait(job_id, timeout=60)
+    assert job["status"] == "done"
+    assert job["result"] == "recovered"
+    assert job["attempts"] == 2
+
+
+def test_job_that_kills_its_last_attempt_fails(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    marker = tmp_path / "started"
+    queue = JobQueue(path, lease_seconds=1.0)
+    job_id = queue.enqueue(TASK, {"marker": str(marker)}, max_attempts=1)
+
+    _start_and_kill(path, marker)
+    time.sleep(1.1)
+    assert queue.claim("other") == []
+    job = queue.get(job_id)
+    assert job["status"] == "failed"
+    assert "Lease expired" in job["error"]
+
+
+def test_hung_job_is_given_up_after_run_timeout(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path)
+    job_id = queue.enqueue(TASK, {"marker": str(tmp_path / "started"), "seconds": 5})
+
+    with WorkerPool(path, processes=2, batch_size=1, lease_seconds=0.6, run_timeout=1.0, poll_interval=0.05):
+        job = queue.wait(job_id, timeout=60)
+    assert job["status"] == "done"
+    assert job["result"] == "recovered"  # the other worker, while the first still hangs
+    assert job["attempts"] == 2
+
+
+def test_jobs_survive_reopening_and_run_by_priority(tmp_path):
+    path = str(tmp_path / "jobs.sqlite3")
+    queue = JobQueue(path)
+    low = queue.enqueue("json:dumps", {"obj": 1})
+    high = queue.enqueue_many("json:dumps", [{"obj": 2}, {"obj": 3}], priority=5)
+    queue.enqueue("json:dumps", {"obj": 4}, delay=60)  # not due yet
+    del queue
+
+    queue = JobQueue(path)
+    assert queue.counts() == {"queued": 4}
+    jobs = queue.claim("worker", limit=10)
+    assert [job.id for job in jobs] == high + [low]
+    assert queue.claim("other", limit=10) == []  # leased
+
+    assert queue.complete([(job.id, "ok") for job in jobs], "worker") == 3
+    assert queue.complete([(low, "late")], "other") == 0  # not its lease
+    assert queue.get(low)["result"] == "ok"
+
+
+def test_failed_attempts_back_off_then_fail(tmp_path):
+    queue = JobQueue(str(tmp_path / "jobs.sqlite3"), base_backoff=0.2)
+    job_id = queue.enqueue("json:dumps", max_attempts=2)
+
+    [job] = queue.claim("worker")
+    queue.fail(job.id, "worker", "boom 1")
+    assert queue.claim("worker") == []  # backing off
+    time.sleep(0.25)
+    [job] = queue.claim("worker")
+    assert job.attempts == 2
+    queue.fail(job.id, "worker", "boom 2")
+    assert queue.get(job_id)["status"] == "failed"
+    assert queue.get(job_id)["error"] == "boom 2"
@@ -0,0 +1,126 @@
+"""Dynamic batching and the OpenAI-compatible API with a fake backend (no model needed)."""
+
+import threading
+
+import pytest
+
+from src.utils.local_inference import DynamicBatcher, Sampling, build_app
+
+
+class _Backend:
+    """Echoes `max_new_tokens` ids per prompt; records each batch."""
+
+    def __init__(self, fail_decode: bool = False, drop_result: bool = False):
+        self.fail_decode = fail_decode
+        self.drop_result = drop_result
+        self.batches: list[tuple[int, int]] = []
+        self.lock = threading.Lock()
+
+    def encode(self, text: str) -> list[int]:
+        return [1] * len(text.split())
+
+    def decode(self, token_ids: list[int]) -> str:
+        if self.fail_decode:
+            raise UnicodeDecodeError("utf-8", b"\xff", 0, 1, "invalid start byte")
+        return "x" * len(token_ids)
+
+    def generate(self, batch, max_new_tokens, sampling):
+        with self.lock:
+            self.batches.append((len(batch), max_new_tokens))
+        results = [([2] * max_new_tokens, "length") for _ in batch]
+        return results[:-1] if self.drop_result else results
+
+
+def _submit_all(batcher: DynamicBatcher, limits: list[int]):
+    return [batcher.submit([1, 2, 3], max_new_tokens=n) for n in limits]
+
+
+@pytest.mark.parametrize("backend", [_Backend(fail_decode=True), _Backend(drop_result=True)])
+def test_failed_post_processing_fails_futures_and_frees_the_worker(backend):
+    batcher = DynamicBatcher(backend, max_wait=0.05, workers=1)
+    futures = _submit_all(batcher, [4, 4, 4])
+    for future in futures:
+        with pytest.raises((UnicodeDecodeError, RuntimeError)):
+            future.result(timeout=5)
+    # The only worker is available again.
+    backend.fail_decode = backend.drop_result = False
+    assert batcher.submit([1], max_new_tokens=2).result(timeout=5).text == "xx"
+    batcher.close()
+
+
+def test_requests_with_distant_limits_are_not_batched_together():
+    backend = _Backend()
+    batcher = DynamicBatcher(backend, max_wait=0.05, max_batch_size=8)
+    futures = _submit_all(batcher, [3, 4, 256, 200])
+    completions = [future.result(timeout=5) for future in futures]
+    batcher.close()
+    assert [c.completion_tokens for c in completions] == [3, 4, 256, 200]
+    assert sorted(backend.batches) == [(2, 4), (2, 256)]
+
+
+def test_cancelled_request_does_not_break_its_batch():
+    batcher = DynamicBatcher(_Backend(), max_wait=0.1, max_batch_size=8)
+    cancelled, kept = _submit_all(batcher, [4, 4])
+    assert cancelled.cancel()
+    assert kept.result(timeout=5).text == "xxxx"
+    batcher.close()
+
+
+def test_default_sampling_batches_with_explicit_greedy():
+    backend = _Backend()
+    batcher = DynamicBatcher(backend, max_wait=0.1)
+    futures = [
+        batcher.submit([1], max_new_tokens=1, sampling=Sampling()),
+        batcher.submit([1], max_new_tokens=1),
+    ]
+    for future in futures:
+        future.result(timeout=5)
+    batcher.close()
+    assert backend.batches == [(2, 1)]
+
+
+@pytest.fixture
+def api():
+    fastapi_testclient = pytest.importorskip("fastapi.testclient")
+    backend = _Backend()
+    batcher = DynamicBatcher(backend, max_wait=0.01)
+    with fastapi_testclient.TestClient(build_app(batcher, "fake")) as client:
+        yield client, backend
+    batcher.close()
+
+
+def test_null_parameters_mean_the_defaults(api):
+    client, backend = api
+    response = client.post(
+        "/v1/completions",
+        json={"prompt": "one two", "max_tokens": None, "temperature": None, "top_p": None},
+    )
+    assert response.status_code == 200
+    assert response.json()["usage"]["completion_tokens"] == 128
+    response = client.post("/v1/completions", json={"prompt": "one two", "max_completion_tokens": 3})
+    assert response.json()["choices"][0]["text"] == "xxx"
+    assert backend.batches == [(1, 128), (1, 3)]
+
+
+@pytest.mark.parametrize(
+    "field, value",
+    [
+        ("max_tokens", 0),
+        ("max_tokens", -5),
+        ("max_tokens", 2.5),
+        ("max_tokens", "10"),
+        ("max_completion_tokens", 0),
+        ("temperature", "hot"),
+        ("temperature", -0.1),
+        ("temperature", True),
+        ("top_p", 0),
+        ("top_p", 1.5),
+        ("top_p", [1]),
+    ],
+)
+def test_invalid_parameters_are_rejected(api, field, value):
+    client, backend = api
+    response = client.post("/v1/completions", json={"prompt": "one two", field: value})
+    assert response.status_code == 400
+    assert response.json()["error"]["message"].startswith(f"'{field}' must be")
+    assert backend.batches == []
@@ -0,0 +1,86 @@
+"""The Polygon market-data cache, with a stub REST client."""
+
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from src.tools.polygon_market_data import MARKET_TIMEZONE, MarketData
+
+pytest.importorskip("pyarrow")
+
+
+def _ms(year, month, day, hour, minute=0) -> int:
+    return int(datetime(year, month, day, hour, minute, tzinfo=timezone.utc).timestamp() * 1000)
+
+
+# Minute bars of two winter trading days (New York is UTC-5).
+BARS = [
+    _ms(2024, 1, 2, 9, 0),  # 04:00 pre-market, Jan 2
+    _ms(2024, 1, 2, 15, 0),  # 10:00 regular session, Jan 2
+    _ms(2024, 1, 3, 0, 30),  # 19:30 after hours, Jan 2 (already Jan 3 in UTC)
+    _ms(2024, 1, 3, 15, 0),  # 10:00 regular session, Jan 3
+]
+
+
+class _Response:
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+class _StubClient:
+    """Serves `bars` whose New York date lies in the requested range, like Polygon."""
+
+    def __init__(self, bars, tz=MARKET_TIMEZONE):
+        self.bars = bars
+        self.tz = tz
+        self.calls = []
+
+    def get_aggs(self, ticker, multiplier, timespan, from_, to, raw=False, **kwargs):
+        self.calls.append((from_, to))
+        results = [
+            {"t": t, "o": 1.0, "h": 1.0, "l": 1.0, "c": 1.0, "v": 1.0, "vw": 1.0, "n": 1}
+            for t in self.bars
+            if from_ <= datetime.fromtimestamp(t / 1000, self.tz).date().isoformat() <= to
+        ]
+        return _Response(json.dumps({"status": "OK", "results": results}).encode())
+
+
+def _timestamps(table) -> list[int]:
+    return [int(t.timestamp() * 1000) for t in table.column("timestamp").to_pylist()]
+
+
+def test_trading_days_are_new_york_days(tmp_path):
+    client = _StubClient(BARS)
+    data = MarketData(cache_dir=str(tmp_path), requests_per_minute=None, client_factory=lambda: client)
+    jan2 = data.get_table("AAPL", "2024-01-02", "2024-01-02", timespan="minute")
+    assert _timestamps(jan2) == BARS[:3]
+
+    # The next day comes from the network once; the after-hours bar stays with Jan 2.
+    jan3 = data.get_table("AAPL", date(2024, 1, 3), date(2024, 1, 3), timespan="minute")
+    assert _timestamps(jan3) == BARS[3:]
+    assert client.calls == [("2024-01-02", "2024-01-02"), ("2024-01-03", "2024-01-03")]
+    both = data.get_table("AAPL", "2024-01-02", "2024-01-03", timespan="minute")
+    assert _timestamps(both) == BARS
+    assert len(client.calls) == 2
+
+    # An aware datetime names the New York day it falls on.
+    evening = datetime(2024, 1, 3, 0, 30, tzinfo=timezone.utc)
+    assert _timestamps(data.get_table("AAPL", evening, evening, timespan="minute")) == BARS[:3]
+
+
+def test_crypto_days_are_utc_days(tmp_path):
+    midnight = _ms(2024, 1, 3, 0, 0)
+    client = _StubClient([midnight - 60_000, midnight], tz=timezone.utc)
+    data = MarketData(cache_dir=str(tmp_path), requests_per_minute=None, client_factory=lambda: client)
+    table = data.get_table("X:BTCUSD", "2024-01-03", "2024-01-03", timespan="minute")
+    assert _timestamps(table) == [midnight]
+
+
+def test_today_is_not_marked_as_covered(tmp_path):
+    today = datetime.now(MARKET_TIMEZONE).date()
+    client = _StubClient([])
+    data = MarketData(cache_dir=str(tmp_path), requests_per_minute=None, client_factory=lambda: client)
+    data.get_table("AAPL", today - timedelta(days=3), today)
+    data.get_table("AAPL", today - timedelta(days=3), today)
+    assert client.calls[1] == (today.isoformat(), today.isoformat())
@@ -0,0 +1,88 @@
+"""MCP tool cache: single flight, cancellation and failures."""
+
+import asyncio
+import gc
+
+import httpx
+import pytest
+
+from src.tools.mcp_server import FetchError, SessionClients, ToolCache, _fetch
+
+
+def test_errors_are_not_cached():
+    cache = ToolCache()
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise FetchError("Failed to fetch: HTTP 503")
+        return "page"
+
+    async def run():
+        with pytest.raises(FetchError):
+            await cache.get_or_call(("fetch", "u"), flaky)
+        assert await cache.get_or_call(("fetch", "u"), flaky) == "page"
+        assert await cache.get_or_call(("fetch", "u"), flaky) == "page"
+
+    asyncio.run(run())
+    assert len(calls) == 2
+
+
+def test_cancelled_first_caller_does_not_cancel_the_others():
+    cache = ToolCache()
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def run():
+        first = asyncio.create_task(cache.get_or_call(("k",), slow))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.get_or_call(("k",), slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "result"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await cache.get_or_call(("k",), slow) == "result"
+
+    asyncio.run(run())
+    assert len(calls) == 1
+    assert cache.hits == 2 and cache.misses == 1
+
+
+def test_fetch_raises_on_http_errors():
+    def handler(request):
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        return httpx.Response(200, text="hello world", headers={"content-type": "text/plain"})
+
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            assert await _fetch(client, "http://example.test/", 5, 0, raw=True) == (
+                "hello\n\n[Content truncated: call again with start_index=5]"
+            )
+            with pytest.raises(FetchError, match="HTTP 404"):
+                await _fetch(client, "http://example.test/missing", 100, 0, raw=True)
+
+    asyncio.run(run())
+
+
+def test_session_keys_are_not_reused():
+    class Session:
+        pass
+
+    async def run():
+        clients = SessionClients()
+        first = Session()
+        key = clients.session_key(first)
+        assert clients.session_key(first) == key
+        del first
+        gc.collect()
+        assert clients.session_key(Session()) != key
+        await clients.aclose()
+
+    asyncio.run(run())
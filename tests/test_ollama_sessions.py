@@ -0,0 +1,69 @@
+"""Ollama sessions against a mock `/api/generate` (no server needed)."""
+
+import json
+
+import httpx
+import pytest
+
+from src.utils.ollama_sessions import OllamaSessions
+
+
+def _generate(request: httpx.Request) -> httpx.Response:
+    """Answers every prompt and returns a context that grows by a few tokens per turn."""
+    body = json.loads(request.content)
+    context = body.get("context", []) + [1, 2, 3]
+    return httpx.Response(200, json={"response": f"Answer to {body['prompt'][-12:]}", "done": True, "context": context})
+
+
+def _sessions(handler=_generate, **kwargs) -> OllamaSessions:
+    client = httpx.Client(transport=httpx.MockTransport(handler), base_url="http://ollama.test")
+    return OllamaSessions("fake", client=client, **kwargs)
+
+
+def test_ui_history_longer_than_max_messages_keeps_the_context():
+    sessions = _sessions(max_messages=6)
+    history: list[dict] = []
+    for i in range(8):
+        message = f"Question {i}"
+        turn = sessions.chat("tab", message, history=history)
+        assert turn.rebuild_reason is None, f"turn {i} rebuilt"
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": turn.text}]
+    assert sessions.stats.context_turns == 7
+    assert sessions.history("tab") == history[-6:]
+
+
+def test_edited_history_rebuilds_the_context():
+    sessions = _sessions(max_messages=6)
+    history: list[dict] = []
+    for i in range(4):
+        message = f"Question {i}"
+        turn = sessions.chat("tab", message, history=history)
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": turn.text}]
+    history[-1] = {"role": "assistant", "content": "A regenerated answer"}
+    assert sessions.chat("tab", "Question 4", history=history).rebuild_reason == "history"
+
+
+def test_failed_turn_after_an_edit_does_not_resume_the_old_context():
+    failures = [httpx.Response(500, json={"error": "model crashed"})]
+    sent: list[dict] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(json.loads(request.content))
+        return failures.pop() if failures and len(sent) == 4 else _generate(request)
+
+    sessions = _sessions(handler, max_messages=6)
+    history: list[dict] = []
+    for i in range(3):
+        turn = sessions.chat("tab", f"Question {i}", history=history)
+        history += [{"role": "user", "content": f"Question {i}"}, {"role": "assistant", "content": turn.text}]
+    history[-1] = {"role": "assistant", "content": "A regenerated answer"}
+    with pytest.raises(httpx.HTTPStatusError):
+        sessions.chat("tab", "Question 3", history=history)
+
+    turn = sessions.chat("tab", "Question 3", history=history)
+    assert "context" not in sent[-1]
+    assert "A regenerated answer" in sent[-1]["prompt"]
+    assert turn.rebuild_reason == "new"
+    assert sessions.history("tab") == (
+        history + [{"role": "user", "content": "Question 3"}, {"role": "assistant", "content": turn.text}]
+    )[-6:]
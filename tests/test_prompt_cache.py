@@ -0,0 +1,165 @@
+"""Prompt prefix caching with stubbed Gemini and Anthropic clients."""
+
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.utils.prompt_cache import AnthropicPromptCache, GeminiContextCache, PrefixTracker
+
+errors = pytest.importorskip("google.genai.errors")
+
+SYSTEM = "You are a meticulous assistant. " * 400  # well above min_tokens
+
+
+def _client_error(code: int, status: str, message: str):
+    return errors.ClientError(code, {"error": {"code": code, "status": status, "message": message}})
+
+
+class _StubGemini:
+    """Records calls; `fail_generate` errors are raised by the next cached generate calls."""
+
+    def __init__(self, create_delay: float = 0.0):
+        self.create_delay = create_delay
+        self.created: list[str] = []
+        self.deleted: list[str] = []
+        self.generated: list = []
+        self.fail_generate: list[Exception] = []
+        self.caches = SimpleNamespace(create=self._create, update=self._update, delete=self._delete)
+        self.models = SimpleNamespace(generate_content=self._generate)
+
+    def _create(self, model, config):
+        time.sleep(self.create_delay)
+        name = f"cachedContents/{len(self.created)}"
+        self.created.append(name)
+        return SimpleNamespace(name=name, expire_time=None)
+
+    def _update(self, name, config):
+        return SimpleNamespace(name=name, expire_time=None)
+
+    def _delete(self, name):
+        self.deleted.append(name)
+
+    def _generate(self, model, contents, config):
+        self.generated.append(config.cached_content)
+        if config.cached_content and self.fail_generate:
+            raise self.fail_generate.pop(0)
+        usage = SimpleNamespace(prompt_token_count=3000, cached_content_token_count=2900 if config.cached_content else 0)
+        return SimpleNamespace(text="ok", usage_metadata=usage)
+
+
+def _cache(client) -> GeminiContextCache:
+    return GeminiContextCache(client, tracker=PrefixTracker(min_repeats=1))
+
+
+def test_gemini_creates_once_then_hits():
+    client = _StubGemini()
+    cache = _cache(client)
+    _, first = cache.generate("gemini-2.0-flash-001", "a", system_instruction=SYSTEM)
+    _, second = cache.generate("gemini-2.0-flash-001", "b", system_instruction=SYSTEM)
+    assert first.cache_created and not second.cache_created
+    assert second.cached_tokens == 2900
+    assert client.created == ["cachedContents/0"]
+
+
+def test_gemini_recreates_and_deletes_a_missing_cache():
+    client = _StubGemini()
+    cache = _cache(client)
+    cache.generate("gemini-2.0-flash-001", "a", system_instruction=SYSTEM)
+    client.fail_generate.append(_client_error(403, "PERMISSION_DENIED", "CachedContent not found (or permission denied)"))
+    _, report = cache.generate("gemini-2.0-flash-001", "b", system_instruction=SYSTEM)
+    assert report.cache_created
+    assert client.created == ["cachedContents/0", "cachedContents/1"]
+    assert client.deleted == ["cachedContents/0"]
+    assert client.generated[-1] == "cachedContents/1"
+
+
+@pytest.mark.parametrize("code, status", [(429, "RESOURCE_EXHAUSTED"), (400, "INVALID_ARGUMENT")])
+def test_gemini_does_not_recreate_on_other_client_errors(code, status):
+    client = _StubGemini()
+    cache = _cache(client)
+    cache.generate("gemini-2.0-flash-001", "a", system_instruction=SYSTEM)
+    client.fail_generate.append(_client_error(code, status, "Quota exceeded" if code == 429 else "Bad request"))
+    with pytest.raises(errors.ClientError):
+        cache.generate("gemini-2.0-flash-001", "b", system_instruction=SYSTEM)
+    assert client.created == ["cachedContents/0"]
+    assert client.deleted == []
+
+
+def test_gemini_does_not_recreate_when_the_api_key_expired():
+    client = _StubGemini()
+    cache = _cache(client)
+    cache.generate("gemini-2.0-flash-001", "a", system_instruction=SYSTEM)
+    client.fail_generate.append(_client_error(400, "INVALID_ARGUMENT", "API key expired. Please renew the API key."))
+    with pytest.raises(errors.ClientError):
+        cache.generate("gemini-2.0-flash-001", "b", system_instruction=SYSTEM)
+    assert client.created == ["cachedContents/0"]
+    assert client.deleted == []
+
+
+def test_gemini_forgets_expired_caches():
+    client = _StubGemini()
+    cache = GeminiContextCache(client, ttl_seconds=0, tracker=PrefixTracker(min_repeats=1))
+    for i in range(5):
+        cache.generate("gemini-2.0-flash-001", "a", system_instruction=SYSTEM + f"Variant {i}.")
+    assert len(client.created) == 5
+    assert len(cache._entries) <= 1
+    assert len(cache._key_locks) <= 1
+
+
+def test_gemini_creation_does_not_block_other_prefixes():
+    client = _StubGemini(create_delay=0.3)
+    cache = _cache(client)
+    slow = threading.Thread(target=cache.generate, args=("gemini-2.0-flash-001", "a"), kwargs={"system_instruction": SYSTEM})
+    slow.start()
+    time.sleep(0.05)
+    started = time.perf_counter()
+    cache.generate("gemini-2.0-flash-001", "b", system_instruction=SYSTEM + "Other prompt.")
+    # Its own creation only; waiting for the first one too would take >= 0.55 s.
+    assert time.perf_counter() - started < 0.5
+    slow.join()
+    assert len(client.created) == 2
+
+
+def test_gemini_concurrent_requests_create_one_cache():
+    client = _StubGemini(create_delay=0.1)
+    cache = _cache(client)
+    threads = [
+        threading.Thread(target=cache.generate, args=("gemini-2.0-flash-001", str(i)), kwargs={"system_instruction": SYSTEM})
+        for i in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert client.created == ["cachedContents/0"]
+
+
+def test_prefix_tracker_is_bounded():
+    tracker = PrefixTracker(min_repeats=2, min_tokens=0, max_prefixes=2)
+    assert not tracker.observe("a", "x")
+    tracker.observe("b", "x")
+    tracker.observe("c", "x")  # evicts "a"
+    assert not tracker.observe("a", "x")
+    assert tracker.observe("c", "x")
+    assert len(tracker._seen) == 2
+
+
+def test_anthropic_breakpoints_clamp_stable_messages():
+    messages = [{"role": "user", "content": "Hi"}]
+    system, marked = AnthropicPromptCache.with_breakpoints("sys", messages, stable_messages=5)
+    assert system[0]["cache_control"] == {"type": "ephemeral"}
+    assert marked[0]["content"][-1]["cache_control"] == {"type": "ephemeral"}
+    assert messages[0]["content"] == "Hi"  # input untouched
+    _, unmarked = AnthropicPromptCache.with_breakpoints("sys", [], stable_messages=2)
+    assert unmarked == []
+
+
+def test_anthropic_reports_cache_reads():
+    usage = SimpleNamespace(input_tokens=10, cache_read_input_tokens=3000, cache_creation_input_tokens=0)
+    client = SimpleNamespace(messages=SimpleNamespace(create=lambda **kwargs: SimpleNamespace(usage=usage, kwargs=kwargs)))
+    cache = AnthropicPromptCache(client, tracker=PrefixTracker(min_repeats=1))
+    response, report = cache.create("claude", SYSTEM, [{"role": "user", "content": "Hi"}], max_tokens=10)
+    assert report.cache_used and report.cached_tokens == 3000
+    assert response.kwargs["system"][0]["cache_control"] == {"type": "ephemeral"}
@@ -0,0 +1,18 @@
+"""Provider client factories (no SDK calls are made)."""
+
+from types import SimpleNamespace
+
+from src.utils import providers
+
+
+def test_generativeai_is_reconfigured_when_the_key_changes(monkeypatch):
+    configured = []
+    fake = SimpleNamespace(configure=lambda api_key: configured.append(api_key))
+    monkeypatch.setattr(providers, "_generativeai", fake)
+    providers.clear_client_cache()
+    try:
+        for key in ["key-a", "key-a", "key-b", "key-a"]:
+            assert providers.get_generativeai(api_key=key) is fake
+    finally:
+        providers.clear_client_cache()
+    assert configured == ["key-a", "key-b", "key-a"]
@@ -0,0 +1,100 @@
+"""The Parquet response archive: partitions, hash lookups, compaction and empty queries."""
+
+import os
+from datetime import datetime, timezone
+
+import pytest
+
+from src.utils.response_archive import ResponseArchive, prompt_hash
+
+pytest.importorskip("pyarrow")
+pytest.importorskip("pandas")
+
+DAY1 = datetime(2025, 6, 1, 12, tzinfo=timezone.utc)
+DAY2 = datetime(2025, 6, 2, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    with ResponseArchive(str(tmp_path / "archive"), batch_size=2, row_group_size=2) as archive:
+        yield archive
+
+
+def _parquet_files(root: str) -> list[str]:
+    return sorted(
+        os.path.relpath(os.path.join(path, name), root)
+        for path, _, names in os.walk(root)
+        for name in names
+        if name.endswith(".parquet")
+    )
+
+
+def test_model_names_with_slashes(archive):
+    archive.append("hi", "hello", model="models/gemini-1.5-flash", timestamp=DAY1, params={"temperature": 0.2})
+    archive.append("hi", "hey", model="gpt-4o", timestamp=DAY1)
+    archive.flush()
+    assert [path.split(os.sep)[0] for path in _parquet_files(archive.root)] == [
+        "model=gpt-4o",
+        "model=models%2Fgemini-1.5-flash",
+    ]
+    rows = archive.query(model="models/gemini-1.5-flash")
+    assert list(rows["response"]) == ["hello"]
+    assert list(rows["model"]) == ["models/gemini-1.5-flash"]
+    assert list(rows["date"]) == ["2025-06-01"]
+    assert rows["params"][0] == '{"temperature": 0.2}'
+
+
+def test_prompt_hash_and_date_queries(archive):
+    prompts = [f"prompt {i}" for i in range(7)]
+    for i, prompt in enumerate(prompts):
+        archive.append(prompt, f"response {i}", model="m", timestamp=DAY1 if i % 2 else DAY2)
+    digest = archive.append(["chat", "messages"], "structured", model="m", system_instruction="be brief", timestamp=DAY1)
+    archive.flush()
+
+    assert digest == prompt_hash(["chat", "messages"], "be brief") != prompt_hash(["chat", "messages"])
+    rows = archive.query(prompt_hash=prompt_hash("prompt 3"), columns=["prompt", "response"])
+    assert rows.to_dict("records") == [{"prompt": "prompt 3", "response": "response 3"}]
+    assert archive.query(prompt_hash=digest)["prompt"][0] == '["chat", "messages"]'
+    assert archive.count(prompt_hash=[prompt_hash("prompt 0"), prompt_hash("prompt 1")]) == 2
+    assert archive.count(date="2025-06-01") == 4
+    assert archive.count(start_date=DAY2) == 4
+    assert archive.count(end_date=DAY1.date()) == 4
+    assert sum(batch.num_rows for batch in archive.iter_batches(model="m", columns=["prompt_hash"])) == 8
+
+
+def test_compact_merges_each_partition(archive):
+    for i in range(6):
+        archive.append(f"p{i}", f"r{i}", model="a/b", timestamp=DAY1)
+        archive.flush()
+    archive.append("other", "r", model="a/b", timestamp=DAY2)
+    archive.flush()
+    before = archive.query(model="a/b").sort_values("prompt").reset_index(drop=True)
+    assert len(_parquet_files(archive.root)) == 7
+
+    assert archive.compact(model="a/b", date=DAY2) == 0  # a single file is left alone
+    assert archive.compact() == 5
+    assert len(_parquet_files(archive.root)) == 2
+    after = archive.query(model="a/b").sort_values("prompt").reset_index(drop=True)
+    assert after.equals(before)
+    assert archive.compact() == 0
+
+
+def test_empty_queries(tmp_path, archive):
+    assert archive.count() == 0
+    assert list(archive.iter_batches()) == []
+    empty = archive.query(columns=["prompt", "model"])
+    assert list(empty.columns) == ["prompt", "model"] and len(empty) == 0
+    assert archive.query(as_pandas=False).num_rows == 0
+
+    archive.append("hi", "there", model="m", timestamp=DAY1)
+    archive.flush()
+    assert len(archive.query(model="missing")) == 0
+    assert archive.count(prompt_hash="0" * 64) == 0
+    with pytest.raises(LookupError):
+        ResponseArchive(str(tmp_path / "new")).scanner()
+
+
+def test_append_after_close_fails(archive):
+    archive.close()
+    with pytest.raises(RuntimeError, match="closed"):
+        archive.append("hi", "there", model="m")
@@ -0,0 +1,134 @@
+"""Incremental JSON parsing and validation of streamed structured outputs."""
+
+import asyncio
+import json
+import random
+
+import pytest
+from pydantic import BaseModel, ValidationError
+
+from src.utils.streaming_json import (
+    IncrementalJSONParser,
+    StructuredStreamParser,
+    StructuredUpdate,
+    astream_structured,
+    stream_structured,
+)
+
+
+class Step(BaseModel):
+    title: str
+    minutes: int
+
+
+class Plan(BaseModel):
+    goal: str
+    steps: list[Step]
+    notes: str = ""
+
+
+DOCUMENT = {
+    "goal": 'Bake "bread" \\ with a éclair\n',
+    "steps": [{"title": "Mix", "minutes": 10}, {"title": "Rest", "minutes": -1.5e2}, {"title": "", "minutes": 0}],
+    "flags": [True, False, None],
+    "nested": {"a": {"b": []}, "c": {}},
+}
+TEXT = json.dumps(DOCUMENT)
+
+
+def _splits(text: str, seed: int) -> list[str]:
+    """`text` cut at random offsets, including empty pieces."""
+    rng = random.Random(seed)
+    cuts = sorted(rng.randint(0, len(text)) for _ in range(rng.randint(1, len(text))))
+    return [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)], strict=True)]
+
+
+def _feed(parser: IncrementalJSONParser, deltas) -> list:
+    return [(event.path, event.value) for delta in deltas for event in parser.feed(delta)]
+
+
+def test_every_split_gives_the_same_events():
+    expected = _feed(IncrementalJSONParser(), [TEXT])
+    assert expected[-1] == ((), DOCUMENT)
+    # Each single-character split lands inside strings, escapes and numbers somewhere.
+    assert _feed(IncrementalJSONParser(), list(TEXT)) == expected
+    for seed in range(50):
+        parser = IncrementalJSONParser()
+        assert _feed(parser, _splits(TEXT, seed)) == expected
+        assert parser.close() == DOCUMENT
+
+
+@pytest.mark.parametrize(
+    "head, tail",
+    [('{"goal": "a\\', '"b"}'), ('{"goal": "a\\u00', 'e9"}'), ('{"n": -1.', '5e3}'), ('{"n": 12', "34}")],
+)
+def test_split_inside_escape_or_number(head, tail):
+    parser = IncrementalJSONParser()
+    assert parser.feed(head) == []
+    document = json.loads(head + tail)
+    [(key, value)] = document.items()
+    assert [(e.path, e.value) for e in parser.feed(tail)] == [((key,), value), ((), document)]
+
+
+def test_values_are_emitted_as_soon_as_they_close():
+    parser = IncrementalJSONParser(emit_depth=1)
+    assert [(e.path, e.value) for e in parser.feed('```json\n{"goal": "x", "steps": [1, ')] == [(("goal",), "x")]
+    assert not parser.done
+    assert [(e.path, e.value) for e in parser.feed('2]}\n```')] == [(("steps",), [1, 2]), ((), {"goal": "x", "steps": [1, 2]})]
+    assert parser.done
+    assert parser.feed("trailing text") == []
+
+
+def test_incomplete_and_invalid_documents():
+    parser = IncrementalJSONParser()
+    parser.feed('{"goal": "unfinished')
+    with pytest.raises(ValueError, match="ended before"):
+        parser.close()
+    with pytest.raises(ValueError, match="Mismatched"):
+        IncrementalJSONParser().feed('{"steps": [1, 2}')
+
+
+def test_structured_updates_and_partial_model():
+    parser = StructuredStreamParser(Plan)
+    updates = []
+    for delta in _splits(json.dumps({"goal": "Bread", "steps": [{"title": "Mix", "minutes": "10"}, {"title": "Bake", "minutes": 30}]}), 1):
+        updates += parser.feed(delta)
+        if len(updates) == 2:
+            partial = parser.partial()
+            assert partial.goal == "Bread"
+            assert partial.steps == [Step(title="Mix", minutes=10)]
+    assert updates[:3] == [
+        StructuredUpdate(("goal",), "Bread"),
+        StructuredUpdate(("steps", 0), Step(title="Mix", minutes=10)),
+        StructuredUpdate(("steps", 1), Step(title="Bake", minutes=30)),
+    ]
+    assert parser.close() == Plan(goal="Bread", steps=[Step(title="Mix", minutes=10), Step(title="Bake", minutes=30)])
+
+
+def test_invalid_element_raises_when_it_completes():
+    parser = StructuredStreamParser(Plan)
+    assert len(parser.feed('{"goal": "x", "steps": [{"title": "Mix", "minutes": 1}, ')) == 2
+    with pytest.raises(ValidationError):
+        parser.feed('{"title": "Bake", "minutes": "soon"}')
+
+
+def test_missing_field_fails_on_close():
+    parser = StructuredStreamParser(Plan)
+    parser.feed('{"steps": []}')
+    with pytest.raises(ValidationError):
+        parser.close()
+
+
+def test_stream_structured_sync_and_async():
+    deltas = ['{"goal": "g", "st', 'eps": [{"title": "t", "minutes": 1}]}']
+    results = list(stream_structured(deltas, Plan))
+    assert results[-1] == Plan(goal="g", steps=[Step(title="t", minutes=1)])
+
+    async def collect():
+        async def agen():
+            for delta in deltas:
+                yield delta
+
+        return [item async for item in astream_structured(agen(), Plan)]
+
+    assert asyncio.run(collect()) == results
@@ -0,0 +1,184 @@
+"""Run telemetry: span nesting, profiling switches, the ASGI middleware and profiles."""
+
+import asyncio
+import contextvars
+import json
+import os
+import threading
+
+import httpx
+import pytest
+
+from src.utils import telemetry
+from src.utils.telemetry import (
+    TelemetryMiddleware,
+    current_span,
+    profiling_requested,
+    span,
+    trace,
+)
+
+
+def _tree(run) -> dict[str, str]:
+    """Span name -> parent span name."""
+    names = {s.span_id: s.name for s in run.spans}
+    return {s.name: names.get(s.parent_id) for s in run.spans}
+
+
+def test_spans_nest_and_are_no_ops_outside_a_trace():
+    with span("outside") as outside:
+        assert outside is None
+    with trace("run", resources=False, profile=False) as run:
+        with span("outer", kind="chain") as outer:
+            with span("inner", kind="llm", model="m") as inner:
+                assert current_span() is inner
+                assert inner.path() == ("trace:run", "chain:outer", "llm:inner")
+            assert current_span() is outer
+        with pytest.raises(ValueError):
+            with span("failing"):
+                raise ValueError("boom")
+    assert current_span() is None
+    assert _tree(run) == {"run": None, "outer": "run", "inner": "outer", "failing": "run"}
+    assert run.spans[2].attributes == {"model": "m"}
+    assert run.spans[3].error == "ValueError: boom"
+    assert all(s.duration is not None and s.cpu_seconds is not None for s in run.spans)
+    assert telemetry._active == {}
+
+
+def test_spans_across_threads():
+    def work(name):
+        with span(name):
+            with span(f"{name}.step"):
+                pass
+
+    with trace("run", resources=False, profile=False) as run:
+        with span("parent"):
+            # Threads see the trace only if they run in a copy of the context.
+            threads = [
+                threading.Thread(target=contextvars.copy_context().run, args=(work, f"worker{i}"))
+                for i in range(4)
+            ]
+            threads.append(threading.Thread(target=work, args=("untraced",)))
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+    tree = _tree(run)
+    assert "untraced" not in tree
+    for i in range(4):
+        assert tree[f"worker{i}"] == "parent"
+        assert tree[f"worker{i}.step"] == f"worker{i}"
+    assert telemetry._active == {}
+
+
+def test_spans_across_tasks():
+    async def work(name):
+        with span(name):
+            await asyncio.sleep(0.01)
+            with span(f"{name}.step"):
+                await asyncio.sleep(0.01)
+
+    async def main():
+        with trace("run", resources=False, profile=False) as run:
+            with span("parent"):
+                await asyncio.gather(*(work(f"task{i}") for i in range(3)))
+        return run
+
+    tree = _tree(asyncio.run(main()))
+    for i in range(3):
+        assert tree[f"task{i}"] == "parent"
+        assert tree[f"task{i}.step"] == f"task{i}"
+    assert telemetry._active == {}
+
+
+@pytest.mark.parametrize(
+    "headers, flag, env, expected",
+    [
+        (None, None, "", False),
+        ({"X-Profile": "1"}, None, "", True),
+        ({"x-profile": " TRUE "}, None, "", True),
+        ({"X-PROFILE": "on"}, None, "", True),
+        ({"X-Profile": "0"}, None, "1", False),  # the header beats the environment
+        ({"X-Other": "1"}, None, "yes", True),
+        ({"X-Profile": "1"}, False, "1", False),  # the flag beats both
+        (None, True, "", True),
+    ],
+)
+def test_profiling_requested(monkeypatch, headers, flag, env, expected):
+    monkeypatch.setenv(telemetry.PROFILE_ENV, env)
+    assert profiling_requested(headers, flag) is expected
+
+
+def test_middleware_adds_trace_ids_and_writes_profiled_traces(tmp_path, monkeypatch):
+    monkeypatch.delenv(telemetry.PROFILE_ENV, raising=False)
+    traces = []
+
+    async def app(scope, receive, send):
+        traces.append(current_span().recorder)
+        with span("handler"):
+            await asyncio.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    write_threads = []
+    write = telemetry.TraceRecorder.write
+
+    def recording_write(recorder, directory):
+        write_threads.append(threading.current_thread())
+        return write(recorder, directory)
+
+    monkeypatch.setattr(telemetry.TraceRecorder, "write", recording_write)
+
+    async def main():
+        middleware = TelemetryMiddleware(app, output_dir=str(tmp_path))
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=middleware), base_url="http://test") as client:
+            plain = await client.get("/plain")
+            profiled = await client.get("/profiled", headers={"X-Profile": "1"})
+        return plain, profiled
+
+    plain, profiled = asyncio.run(main())
+    assert plain.text == "ok"
+    assert [plain.headers["x-trace-id"], profiled.headers["x-trace-id"]] == [run.trace_id for run in traces]
+    assert [run.name for run in traces] == ["GET /plain", "GET /profiled"]
+    assert traces[0].profiler is None and traces[1].profiler is not None
+
+    # Only the profiled request is written, and not on the event loop's thread.
+    trace_id = profiled.headers["x-trace-id"]
+    assert sorted(os.listdir(tmp_path)) == [f"GET__profiled-{trace_id}.folded", f"GET__profiled-{trace_id}.json"]
+    assert write_threads and threading.main_thread() not in write_threads
+    data = json.loads((tmp_path / f"GET__profiled-{trace_id}.json").read_text())
+    assert data["trace_id"] == trace_id
+    assert [s["name"] for s in data["spans"]] == ["GET /profiled", "handler"]
+
+
+def _busy(n: int) -> int:
+    total = 0
+    for i in range(n):
+        total += i * i % 7
+    return total
+
+
+@pytest.mark.skipif(os.name != "posix", reason="the main thread is sampled with SIGPROF")
+def test_profile_collapsed_stacks(tmp_path):
+    with trace("profiled", profile=True, resources=False, profile_interval=0.002) as run:
+        with span("compute"):
+            _busy(3_000_000)
+        with span("wait"):
+            threading.Event().wait(0.2)
+    profiler = run.profiler
+    assert profiler.samples > 10
+
+    lines = profiler.collapsed().splitlines()
+    parsed = [line.rsplit(" ", 1) for line in lines]
+    assert sum(int(count) for _, count in parsed) == profiler.samples
+    busy = [frames.split(";") for frames, _ in parsed if "_busy" in frames]
+    assert busy and all(frames[:2] == ["trace:profiled", "internal:compute"] for frames in busy)
+    assert any(frames.startswith("trace:profiled;internal:wait") and frames.endswith("[waiting]") for frames, _ in parsed)
+    assert profiler.waiting_samples > 0
+    hot = {entry["function"]: entry for entry in profiler.hot_paths(5)}
+    assert hot["tests/test_telemetry.py:_busy"]["self_samples"] > 0
+
+    paths = run.write(str(tmp_path))
+    assert [os.path.splitext(path)[1] for path in paths] == [".json", ".folded"]
+    with open(paths[1]) as f:
+        assert f.read() == profiler.collapsed()
@@ -0,0 +1,90 @@
+"""Offline Wikipedia lookups: local first, online only when the index misses."""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.tools import wikipedia_offline
+from src.tools.wikipedia_offline import WikipediaIndex, search_wikipedia
+
+ARTICLES = [
+    {"title": "Alan Turing", "text": "Alan Turing was an English mathematician. He formalised computation."},
+    {"title": "Turing machine", "text": "A Turing machine is a model of computation. It manipulates symbols on a tape."},
+    {"title": "Turing", "redirect": "Alan Turing"},
+]
+
+
+class _FakeWikipedia:
+    """The `wikipedia` package's interface; records every call."""
+
+    exceptions = SimpleNamespace(PageError=type("PageError", (LookupError,), {}))
+
+    def __init__(self):
+        self.calls: list[tuple[str, str]] = []
+
+    def search(self, query, results=10):
+        self.calls.append(("search", query))
+        return ["Enigma machine"]
+
+    def page(self, title, auto_suggest=False):
+        self.calls.append(("page", title))
+        if title != "Enigma machine":
+            raise self.exceptions.PageError(title)
+        return SimpleNamespace(
+            title=title,
+            content="The Enigma machine is a cipher device. It was used in the Second World War.",
+            url="https://en.wikipedia.org/wiki/Enigma_machine",
+        )
+
+
+@pytest.fixture
+def client():
+    return _FakeWikipedia()
+
+
+@pytest.fixture
+def index(tmp_path, monkeypatch, client):
+    dump = tmp_path / "dump.jsonl"
+    dump.write_text("\n".join(json.dumps(article) for article in ARTICLES))
+    index = WikipediaIndex(str(tmp_path / "wiki.sqlite"), client=client)
+    index.build(str(dump))
+    monkeypatch.setattr(wikipedia_offline, "get_default_index", lambda: index)
+    return index
+
+
+@pytest.mark.usefixtures("index")
+def test_free_text_query_is_answered_locally(client):
+    text = search_wikipedia("model of computation")
+    assert text.startswith("Turing machine (https://en.wikipedia.org/wiki/Turing_machine)")
+    assert client.calls == []
+
+
+@pytest.mark.usefixtures("index")
+def test_redirect_is_followed_locally(client):
+    assert search_wikipedia("turing").startswith("Alan Turing ")
+    assert client.calls == []
+
+
+@pytest.mark.usefixtures("index")
+def test_online_only_when_title_and_search_miss(client):
+    text = search_wikipedia("cipher device")
+    assert text.startswith("Enigma machine ")
+    assert client.calls == [("page", "cipher device"), ("search", "cipher device"), ("page", "Enigma machine")]
+    # Cached: the same query never goes online again.
+    client.calls.clear()
+    assert search_wikipedia("Enigma machine").startswith("Enigma machine ")
+    assert client.calls == []
+
+
+@pytest.mark.usefixtures("index")
+def test_partial_word_matches_go_online(client):
+    # "Alan" alone matches the Alan Turing article; that is not an answer.
+    assert search_wikipedia("Alan Kay").startswith("Enigma machine ")
+    assert client.calls == [("page", "Alan Kay"), ("search", "Alan Kay"), ("page", "Enigma machine")]
+
+
+def test_page_online_false_never_calls_the_api(index, client):
+    assert index.page("Something else", online=False) is None
+    assert index.search("zzz unknown", online=False) == []
+    assert client.calls == []